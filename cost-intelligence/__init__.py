@@ -0,0 +1,40 @@
+"""
+Cost Intelligence Engine
+Metric collection, storage and cost analysis for customer environments
+"""
+
+from .store import METRICS, AnomalyStore, CostFrame, CostStore, MetricSummaryStore, MetricWindow
+from .collector import CollectionError, CostCollector, MetricsCollector
+from .analyzer import CostAnomalyDetector, RightsizingAnalyzer
+from .inventory import (
+    InventoryCollector, InventoryError, InventorySnapshot, InventoryStore,
+    ResourceGraphSource, FixtureSource, RecordingSource, diff_snapshots
+)
+from .recommendations import WasteDetector
+from .forecaster import SpendRollup, forecast_month_end, spend_rollup
+
+__all__ = [
+    'METRICS',
+    'AnomalyStore',
+    'CostFrame',
+    'CostStore',
+    'MetricSummaryStore',
+    'MetricWindow',
+    'CollectionError',
+    'CostCollector',
+    'MetricsCollector',
+    'CostAnomalyDetector',
+    'RightsizingAnalyzer',
+    'InventoryCollector',
+    'InventoryError',
+    'InventorySnapshot',
+    'InventoryStore',
+    'ResourceGraphSource',
+    'FixtureSource',
+    'RecordingSource',
+    'diff_snapshots',
+    'WasteDetector',
+    'SpendRollup',
+    'forecast_month_end',
+    'spend_rollup'
+]
@@ -0,0 +1,443 @@
+"""
+Cost Intelligence Analyzer
+Vectorized analysis over collected metric summaries
+"""
+
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence
+import logging
+import re
+import warnings
+
+import numpy as np
+
+from .collector import nan_percentile
+from .config import settings
+from .store import METRIC_INDEX, AnomalyStore, CostFrame, CostStore, MetricWindow
+
+logger = logging.getLogger(__name__)
+
+HOURS_PER_MONTH = 730
+
+# Pay-as-you-go reference rates, used only when no actual cost is known.
+# Within a VM family price scales linearly with vCPU count.
+VM_VCPU_HOURLY_RATE = {"B": 0.0416, "D": 0.048, "E": 0.063, "F": 0.0423, "M": 0.2, "L": 0.078}
+VM_DEFAULT_VCPU_HOURLY_RATE = 0.05
+SQL_VCORE_HOURLY_RATE = {"GP": 0.2522, "BC": 0.6787, "HS": 0.2731}
+
+# DTU ladders per edition: (sku, dtus, monthly list price), ascending
+SQL_DTU_TIERS = {
+    "S": [("S0", 10, 15.03), ("S1", 20, 30.05), ("S2", 50, 75.13), ("S3", 100, 150.26),
+          ("S4", 200, 300.52), ("S6", 400, 601.03), ("S7", 800, 1202.06),
+          ("S9", 1600, 2404.13), ("S12", 3000, 4507.74)],
+    "P": [("P1", 125, 465.00), ("P2", 250, 930.00), ("P4", 500, 1860.00),
+          ("P6", 1000, 3720.00), ("P11", 1750, 7001.00), ("P15", 4000, 16003.00)],
+}
+
+_VM_SIZE = re.compile(r"^Standard_([A-Z]+)(\d+)([a-z]*)(_v\d+)?$")
+_SQL_VCORE = re.compile(r"^(GP|BC|HS)_(Gen\d+|S_Gen\d+)_(\d+)$")
+
+KIND_NONE, KIND_VM, KIND_SQL_VCORE, KIND_SQL_DTU = 0, 1, 2, 3
+
+# Separates customer and dimension in anomaly series keys
+SERIES_SEPARATOR = "\x1f"
+MAD_TO_SIGMA = 1.4826
+
+# Metrics that constrain each kind of downsize
+_CONSTRAINTS = {
+    KIND_VM: ["cpu", "memory", "iops"],
+    KIND_SQL_VCORE: ["cpu", "memory", "iops"],
+    KIND_SQL_DTU: ["dtu"],
+}
+
+
+@lru_cache(maxsize=None)
+def parse_sku(resource_type: str, sku: str):
+    """Return (kind, capacity, family, template, reference monthly cost)"""
+    resource_type = resource_type.lower()
+    if resource_type == "microsoft.compute/virtualmachines":
+        m = _VM_SIZE.match(sku)
+        if m:
+            family, vcpus = m.group(1), int(m.group(2))
+            rate = VM_VCPU_HOURLY_RATE.get(family[0], VM_DEFAULT_VCPU_HOURLY_RATE)
+            template = f"Standard_{family}{{}}{m.group(3)}{m.group(4) or ''}"
+            return KIND_VM, vcpus, family, template, vcpus * rate * HOURS_PER_MONTH
+    elif resource_type == "microsoft.sql/servers/databases":
+        m = _SQL_VCORE.match(sku)
+        if m:
+            tier, vcores = m.group(1), int(m.group(3))
+            template = f"{tier}_{m.group(2)}_{{}}"
+            return KIND_SQL_VCORE, vcores, tier, template, vcores * SQL_VCORE_HOURLY_RATE[tier] * HOURS_PER_MONTH
+        for edition, tiers in SQL_DTU_TIERS.items():
+            for name, dtus, price in tiers:
+                if name == sku:
+                    return KIND_SQL_DTU, dtus, edition, None, price
+    return KIND_NONE, 0, "", None, 0.0
+
+
+class RightsizingAnalyzer:
+    """
+    Find over-provisioned VMs and databases from daily p95 summaries
+
+    All resources are evaluated in one pass of array operations: the
+    window's daily p95 values are reduced to a peak p95 per metric, turned
+    into a required capacity, and snapped to the smallest size in the same
+    family that keeps utilization at or below the target.
+    """
+
+    def __init__(
+        self,
+        target_utilization: Optional[float] = None,
+        min_days: Optional[int] = None,
+        min_savings: Optional[float] = None
+    ):
+        self.target_utilization = target_utilization or settings.RIGHTSIZING_TARGET_UTILIZATION
+        self.min_days = min_days or settings.RIGHTSIZING_MIN_DAYS
+        self.min_savings = min_savings if min_savings is not None else settings.RIGHTSIZING_MIN_SAVINGS
+
+    def analyze(self, window: MetricWindow, monthly_costs: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
+        """
+        Produce rightsizing recommendations for every resource in `window`
+
+        monthly_costs maps resource ID (case-insensitive) to actual monthly
+        cost; list prices are used for resources without one.
+        """
+        n = len(window)
+        if n == 0:
+            return []
+
+        parsed = [parse_sku(t, s) for t, s in zip(window.resource_types, window.skus)]
+        kinds = np.fromiter((p[0] for p in parsed), dtype=np.int8, count=n)
+        capacity = np.fromiter((p[1] for p in parsed), dtype=np.float64, count=n)
+        reference_cost = np.fromiter((p[4] for p in parsed), dtype=np.float64, count=n)
+
+        cost = reference_cost
+        if monthly_costs:
+            lowered = {k.lower(): v for k, v in monthly_costs.items()}
+            actual = np.fromiter((lowered.get(rid.lower(), np.nan) for rid in window.resource_ids),
+                                 dtype=np.float64, count=n)
+            cost = np.where(np.isnan(actual), reference_cost, actual)
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            peak_p95 = np.nanmax(window.p95, axis=1)  # (resources, metrics)
+
+        # Required utilization ratio per kind, NaN when no constraining metric was observed
+        ratio = np.full(n, np.nan)
+        for kind, metrics in _CONSTRAINTS.items():
+            mask = kinds == kind
+            if mask.any():
+                cols = peak_p95[np.ix_(mask, [METRIC_INDEX[m] for m in metrics])]
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore", RuntimeWarning)
+                    ratio[mask] = np.nanmax(cols, axis=1) / self.target_utilization
+
+        required = capacity * ratio
+        target = capacity.copy()
+
+        # VMs and vCore databases: next power of two, at least 2 cores
+        linear = ((kinds == KIND_VM) | (kinds == KIND_SQL_VCORE)) & ~np.isnan(required)
+        with np.errstate(divide="ignore"):
+            snapped = np.exp2(np.ceil(np.log2(np.maximum(required[linear], 2.0))))
+        target[linear] = np.minimum(snapped, capacity[linear])
+        target_cost = cost.copy()
+        target_cost[linear] = cost[linear] * target[linear] / capacity[linear]
+
+        # DTU databases: smallest tier in the same edition with enough DTUs
+        target_names = np.empty(n, dtype=object)
+        for edition, tiers in SQL_DTU_TIERS.items():
+            mask = (kinds == KIND_SQL_DTU) & np.array([p[2] == edition for p in parsed]) & ~np.isnan(required)
+            if not mask.any():
+                continue
+            dtus = np.array([t[1] for t in tiers], dtype=np.float64)
+            prices = np.array([t[2] for t in tiers])
+            idx = np.minimum(np.searchsorted(dtus, required[mask]), len(tiers) - 1)
+            target[mask] = np.minimum(dtus[idx], capacity[mask])
+            target_cost[mask] = cost[mask] * np.minimum(prices[idx] / reference_cost[mask], 1.0)
+            target_names[mask] = [tiers[i][0] for i in idx]
+
+        savings = cost - target_cost
+        observed = window.observed_days()
+        eligible = (
+            (kinds != KIND_NONE)
+            & (observed >= self.min_days)
+            & (target < capacity)
+            & (savings >= self.min_savings)
+        )
+
+        recommendations = []
+        for i in np.flatnonzero(eligible):
+            kind, cap, _, template, _ = parsed[i]
+            new_sku = target_names[i] if kind == KIND_SQL_DTU else template.format(int(target[i]))
+            usage = ", ".join(
+                f"p95 {m}: {peak_p95[i, METRIC_INDEX[m]]:.0f}%"
+                for m in _CONSTRAINTS[kind]
+                if not np.isnan(peak_p95[i, METRIC_INDEX[m]])
+            )
+            label = "VM" if kind == KIND_VM else "Database"
+            recommendations.append({
+                "resource_id": str(window.resource_ids[i]),
+                "resource_name": str(window.resource_ids[i]).rstrip("/").split("/")[-1],
+                "recommendation_type": "rightsizing",
+                "current_cost": round(float(cost[i]), 2),
+                "potential_savings": round(float(savings[i]), 2),
+                "savings_percentage": round(float(savings[i] / cost[i] * 100), 1),
+                "description": (
+                    f"{label} is underutilized ({usage} over {int(observed[i])} days). "
+                    f"Downsize from {window.skus[i]} to {new_sku}."
+                ),
+                "action": f"Downsize to {new_sku}"
+            })
+
+        recommendations.sort(key=lambda r: r["potential_savings"], reverse=True)
+        return recommendations
+
+
+def _rolling_baseline(window: np.ndarray):
+    """Per-row median and MAD of a (series, days) window, ignoring NaNs"""
+    ordered = np.sort(window, axis=1)
+    counts = (~np.isnan(ordered)).sum(axis=1)
+    median = nan_percentile(ordered, counts, 50)
+    deviation = np.sort(np.abs(window - median[:, None]), axis=1)
+    return median, nan_percentile(deviation, counts, 50), counts
+
+
+class CostAnomalyDetector:
+    """
+    Flag daily cost spikes per customer x dimension (service name)
+
+    Each series is scored against the median and MAD of its own last
+    ANOMALY_WINDOW_DAYS days. The window for every series lives in one
+    (series, days) array, so a day costs one sort over all series and the
+    window rolls forward as days land instead of being rebuilt from history.
+    """
+
+    def __init__(
+        self,
+        window_days: Optional[int] = None,
+        threshold: Optional[float] = None,
+        min_delta: Optional[float] = None,
+        min_history: Optional[int] = None,
+        relative_floor: float = 0.05
+    ):
+        self.window_days = window_days or settings.ANOMALY_WINDOW_DAYS
+        self.threshold = threshold or settings.ANOMALY_THRESHOLD
+        self.min_delta = min_delta if min_delta is not None else settings.ANOMALY_MIN_DELTA
+        self.min_history = min_history or settings.ANOMALY_MIN_HISTORY
+        # Flat series have MAD 0; spread is floored at this fraction of the median
+        self.relative_floor = relative_floor
+
+    def score(self, window: np.ndarray, current: np.ndarray):
+        """
+        Score `current` (series,) against `window` (series, days)
+
+        Returns (baseline, robust z-score, anomaly mask). Series with fewer
+        than min_history observed days are never flagged.
+        """
+        baseline, mad, counts = _rolling_baseline(window)
+        spread = np.maximum(MAD_TO_SIGMA * mad, self.relative_floor * np.abs(baseline))
+        delta = current - baseline
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scores = np.where(spread > 0, delta / spread, np.where(delta > 0, np.inf, 0.0))
+        anomalous = (
+            (counts >= self.min_history)
+            & ~np.isnan(current)
+            & (delta >= self.min_delta)
+            & (scores >= self.threshold)
+        )
+        return baseline, scores, anomalous
+
+    def advance(self, keys: np.ndarray, window: np.ndarray, day_keys: np.ndarray, day_values: np.ndarray):
+        """
+        Score one day and roll it into the window
+
+        keys/window are the sorted state; day_keys/day_values are the
+        series totals that landed for the day. Series first seen today are
+        added, series without a value in the whole window are dropped.
+        Returns (keys, window, current, baseline, scores, anomaly mask)
+        aligned with the returned keys.
+        """
+        merged = np.union1d(keys, day_keys)
+        rows = np.full((len(merged), self.window_days), np.nan)
+        if len(keys):
+            kept = min(window.shape[1], self.window_days)
+            rows[np.searchsorted(merged, keys), -kept:] = window[:, -kept:]
+        current = np.full(len(merged), np.nan)
+        current[np.searchsorted(merged, day_keys)] = day_values
+
+        baseline, scores, anomalous = self.score(rows, current)
+
+        rolled = np.concatenate([rows[:, 1:], current[:, None]], axis=1)
+        alive = ~np.isnan(rolled).all(axis=1)
+        return (merged[alive], rolled[alive], current[alive], baseline[alive],
+                scores[alive], anomalous[alive])
+
+    def _month_series(self, cost_store: CostStore, customer_ids: Sequence[str], month: date):
+        """Sorted series keys and (series, days in month) totals from the rollups"""
+        keys, totals = [], []
+        for customer_id in customer_ids:
+            dimensions, table = cost_store.load_rollup(customer_id, month)
+            if len(dimensions):
+                keys.append(np.char.add(customer_id + SERIES_SEPARATOR, dimensions.astype(str)))
+                totals.append(table)
+        if not keys:
+            return np.array([], dtype=str), np.zeros((0, 31))
+        keys, totals = np.concatenate(keys), np.concatenate(totals)
+        order = np.argsort(keys)
+        return keys[order], totals[order]
+
+    def _days(self, cost_store: CostStore, customer_ids: Sequence[str], first: date, last: date):
+        """Yield (day, series keys, totals) from the rollups; zero means no cost landed for a series"""
+        month, month_keys, month_totals = None, None, None
+        day = first
+        while day <= last:
+            if (day.year, day.month) != month:
+                month = (day.year, day.month)
+                month_keys, month_totals = self._month_series(cost_store, customer_ids, day)
+            values = month_totals[:, day.day - 1] if len(month_keys) else np.zeros(0)
+            present = values != 0
+            yield day, month_keys[present], values[present]
+            day += timedelta(days=1)
+
+    def landed_through(self, cost_store: CostStore, customer_ids: Sequence[str], end: date) -> Optional[date]:
+        """
+        Last day, at most `end`, collected for every active customer
+
+        Cost Management lags, so the newest days are often not collected
+        yet. Customers with nothing collected in the last window_days days
+        (offboarded, or never collected) do not hold the others back.
+        """
+        active = [
+            last for last in (cost_store.last_collected_day(c, end) for c in customer_ids)
+            if last is not None and last > end - timedelta(days=self.window_days)
+        ]
+        return min(active) if active else None
+
+    def first_revised_day(
+        self, cost_store: CostStore, customer_ids: Sequence[str], keys: np.ndarray, window: np.ndarray, last_day: date
+    ) -> Optional[date]:
+        """
+        Earliest day of the saved window whose rollup totals differ from what was scored
+
+        CostCollector rewrites recent days on every run, so late and
+        corrected costs show up here and get those days rescored.
+        """
+        first = last_day - timedelta(days=self.window_days - 1)
+        if window.shape[1] != self.window_days:
+            return first
+        for column, (day, day_keys, values) in enumerate(self._days(cost_store, customer_ids, first, last_day)):
+            rows = np.searchsorted(keys, day_keys)
+            if len(day_keys) and (rows.max() >= len(keys) or (keys[rows] != day_keys).any()):
+                return day  # A series landed that the window never saw
+            expected = np.full(len(keys), np.nan)
+            expected[rows] = values
+            if not np.allclose(expected, window[:, column], rtol=1e-9, atol=1e-9, equal_nan=True):
+                return day
+        return None
+
+    def history(self, cost_store: CostStore, customer_ids: Sequence[str], start: date):
+        """Window state (keys, window) as of the day before `start`, rebuilt from the rollups"""
+        keys, window = np.array([], dtype=str), np.zeros((0, self.window_days))
+        first = start - timedelta(days=self.window_days)
+        for _, day_keys, values in self._days(cost_store, customer_ids, first, start - timedelta(days=1)):
+            keys, window = self.advance(keys, window, day_keys, values)[:2]
+        return keys, window
+
+    def run(
+        self,
+        cost_store: Optional[CostStore] = None,
+        anomaly_store: Optional[AnomalyStore] = None,
+        customer_ids: Optional[Sequence[str]] = None,
+        end: Optional[date] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Score every landed day since the last run up to `end` (default: yesterday)
+
+        Days are scored only once every active customer's costs for them
+        have been collected. Days of the saved window whose costs were
+        revised since (late or corrected data) are rescored: the window is
+        rebuilt from the rollups as of the first revised day and replayed,
+        replacing that day's stored anomalies. The first run backfills
+        window_days days. Each day is one vectorized pass over all series.
+        """
+        cost_store = cost_store or CostStore()
+        anomaly_store = anomaly_store or AnomalyStore()
+        customer_ids = customer_ids if customer_ids is not None else cost_store.customer_ids()
+        end = self.landed_through(cost_store, customer_ids, end or date.today() - timedelta(days=1))
+
+        state = anomaly_store.load_state()
+        if state:
+            keys, window, last_day = state
+            end = max(end, last_day) if end else last_day
+            start = last_day + timedelta(days=1)
+            revised = self.first_revised_day(cost_store, customer_ids, keys, window, last_day)
+            if revised is not None:
+                logger.info(f"Cost data revised from {revised}; rescoring through {last_day}")
+                start = revised
+                keys, window = self.history(cost_store, customer_ids, start)
+        elif end is None:
+            return []
+        else:
+            last_day = None
+            start = end - timedelta(days=self.window_days - 1)
+            keys, window = np.array([], dtype=str), np.zeros((0, self.window_days))
+        if start > end:
+            return []
+
+        found = []
+        for day, day_keys, day_values in self._days(cost_store, customer_ids, start, end):
+            keys, window, current, baseline, scores, anomalous = self.advance(keys, window, day_keys, day_values)
+
+            if last_day is not None and day <= last_day:
+                for customer_id in customer_ids:
+                    anomaly_store.clear_day(customer_id, day)
+
+            per_customer: Dict[str, list] = {}
+            for i in np.flatnonzero(anomalous):
+                customer_id, dimension = str(keys[i]).split(SERIES_SEPARATOR, 1)
+                per_customer.setdefault(customer_id, []).append((dimension, current[i], baseline[i], scores[i]))
+            for customer_id, rows in per_customer.items():
+                dimensions, costs, baselines, day_scores = zip(*rows)
+                anomaly_store.write_day(customer_id, day, dimensions, costs, baselines, day_scores)
+                found += [
+                    {"customer_id": customer_id, "date": day, "dimension": d, "cost": float(c),
+                     "baseline": float(b), "score": float(z)}
+                    for d, c, b, z in rows
+                ]
+
+        anomaly_store.save_state(keys, window, end)
+        return found
+
+    def contributors(self, frame: CostFrame, dimension: str, day: date, limit: int = 5) -> List[Dict[str, Any]]:
+        """
+        Resources of `dimension` that drove the cost on `day`
+
+        Each resource's cost that day is compared with its median daily
+        cost over the earlier days of `frame`; the largest increases win.
+        """
+        days = frame.days.astype("datetime64[D]")
+        column = np.flatnonzero(days == np.datetime64(day, "D"))
+        if len(column) == 0:
+            return []
+        column = column[0]
+        rows = np.flatnonzero(frame.service_names == dimension)
+        if len(rows) == 0:
+            return []
+
+        current = frame.costs[rows, column]
+        history = frame.costs[rows, :column]
+        baseline = np.median(history, axis=1) if history.shape[1] else np.zeros(len(rows))
+        delta = current - baseline
+        top = np.argsort(-delta)[:limit]
+        return [
+            {
+                "resource_id": str(frame.resource_ids[rows[i]]),
+                "resource_name": str(frame.resource_ids[rows[i]]).rstrip("/").split("/")[-1],
+                "cost": round(float(current[i]), 2),
+                "baseline": round(float(baseline[i]), 2),
+                "increase": round(float(delta[i]), 2)
+            }
+            for i in top
+            if delta[i] > 0
+        ]
@@ -0,0 +1,319 @@
+"""
+Cost Intelligence Collector
+Batched Azure Monitor metric and Cost Management collection
+"""
+
+from collections import defaultdict
+from datetime import datetime, date, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import logging
+
+import numpy as np
+
+from .config import settings
+from .store import METRICS, METRIC_INDEX, CostStore, MetricSummaryStore
+
+logger = logging.getLogger(__name__)
+
+# Azure Monitor metric names per resource type, mapped to canonical metrics.
+# Every value is a utilization percentage; `invert` metrics report free
+# capacity and are converted with 100 - value.
+METRIC_DEFINITIONS: Dict[str, Dict[str, Dict[str, Any]]] = {
+    "microsoft.compute/virtualmachines": {
+        "cpu": {"name": "Percentage CPU"},
+        "memory": {"name": "Available Memory Percentage", "invert": True},
+        "iops": {"name": "OS Disk IOPS Consumed Percentage"},
+    },
+    "microsoft.sql/servers/databases": {
+        "cpu": {"name": "cpu_percent"},
+        "memory": {"name": "sqlserver_process_memory_percent"},
+        "dtu": {"name": "dtu_consumption_percent"},
+        "iops": {"name": "physical_data_read_percent"},
+    },
+}
+
+
+def _subscription_of(resource_id: str) -> str:
+    parts = resource_id.split("/")
+    return parts[2].lower() if len(parts) > 2 else ""
+
+
+def nan_percentile(sorted_values: np.ndarray, counts: np.ndarray, q: float) -> np.ndarray:
+    """Linear-interpolated percentile along the last axis of NaN-last sorted data"""
+    position = (np.maximum(counts, 1) - 1) * (q / 100.0)
+    lower = np.floor(position).astype(np.intp)
+    upper = np.minimum(lower + 1, np.maximum(counts - 1, 0))
+    lo = np.take_along_axis(sorted_values, lower[..., None], axis=-1)[..., 0]
+    hi = np.take_along_axis(sorted_values, upper[..., None], axis=-1)[..., 0]
+    result = lo + (hi - lo) * (position - lower)
+    return np.where(counts > 0, result, np.nan)
+
+
+def summarize_daily(values: np.ndarray, points_per_day: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Reduce raw points to daily p50/p95/max
+
+    values: (resources, metrics, days * points_per_day), NaN where missing
+    returns three arrays of shape (resources, days, metrics)
+
+    One sort along the point axis (NaNs sort last) serves all three
+    statistics; this is much faster than np.nanpercentile on many short rows.
+    """
+    n_resources, n_metrics, n_points = values.shape
+    days = n_points // points_per_day
+    per_day = np.sort(values[:, :, :days * points_per_day].reshape(n_resources, n_metrics, days, points_per_day), axis=3)
+    counts = (~np.isnan(per_day)).sum(axis=3)
+
+    p50 = nan_percentile(per_day, counts, 50)
+    p95 = nan_percentile(per_day, counts, 95)
+    peak = np.take_along_axis(per_day, np.maximum(counts - 1, 0)[..., None], axis=3)[..., 0]
+    peak = np.where(counts > 0, peak, np.nan)
+
+    # (resources, metrics, days) -> (resources, days, metrics)
+    return (
+        p50.transpose(0, 2, 1).astype(np.float32),
+        p95.transpose(0, 2, 1).astype(np.float32),
+        peak.transpose(0, 2, 1).astype(np.float32),
+    )
+
+
+class MetricsCollector:
+    """
+    Pull utilization metrics for many resources per Azure Monitor call
+
+    Uses the metrics batch API (metrics:getBatch), which accepts up to 50
+    resource IDs sharing a subscription, region and namespace. Points are
+    reduced to daily p50/p95/max before they are stored.
+    """
+
+    def __init__(self, credential, store: Optional[MetricSummaryStore] = None, batch_size: Optional[int] = None):
+        self.credential = credential
+        self.store = store or MetricSummaryStore()
+        self.batch_size = batch_size or settings.METRICS_BATCH_SIZE
+        self._clients: Dict[str, Any] = {}
+
+    def _get_client(self, location: str):
+        """Regional metrics client (the batch API is served per region)"""
+        if location not in self._clients:
+            from azure.monitor.query import MetricsClient
+            endpoint = f"https://{location}.metrics.monitor.azure.com"
+            self._clients[location] = MetricsClient(endpoint, self.credential)
+        return self._clients[location]
+
+    def _batches(self, resources: List[Dict[str, Any]]) -> Iterable[Tuple[str, str, List[int]]]:
+        """Group resource row indexes by (location, type) within a subscription and chunk them"""
+        groups = defaultdict(list)
+        for i, r in enumerate(resources):
+            key = (_subscription_of(r["id"]), r["location"].lower(), r["type"].lower())
+            groups[key].append(i)
+
+        for (_, location, resource_type), rows in groups.items():
+            for start in range(0, len(rows), self.batch_size):
+                yield location, resource_type, rows[start:start + self.batch_size]
+
+    def collect(
+        self,
+        customer_id: str,
+        resources: List[Dict[str, Any]],
+        days: Optional[int] = None,
+        end: Optional[date] = None
+    ) -> Dict[str, Any]:
+        """
+        Collect and store daily summaries for `resources`
+
+        Each resource is a dict with at least id, type and location; sku is
+        stored alongside the summaries for the rightsizing analyzer.
+        Covers the `days` whole UTC days before `end` (default: today).
+        """
+        days = days or settings.METRICS_LOOKBACK_DAYS
+        end = end or datetime.now(timezone.utc).date()
+        resources = [r for r in resources if r.get("type", "").lower() in METRIC_DEFINITIONS]
+
+        granularity = timedelta(minutes=settings.METRICS_GRANULARITY_MINUTES)
+        points_per_day = int(timedelta(days=1) / granularity)
+        end_time = datetime(end.year, end.month, end.day, tzinfo=timezone.utc)
+        start_time = end_time - timedelta(days=days)
+
+        values = np.full((len(resources), len(METRICS), days * points_per_day), np.nan, dtype=np.float32)
+        row_of = {r["id"].lower(): i for i, r in enumerate(resources)}
+
+        collected = np.ones(len(resources), dtype=bool)
+        calls = 0
+        failed = 0
+        for location, resource_type, rows in self._batches(resources):
+            definitions = METRIC_DEFINITIONS[resource_type]
+            by_name = {d["name"].lower(): (METRIC_INDEX[metric], d.get("invert", False))
+                       for metric, d in definitions.items()}
+            try:
+                results = self._get_client(location).query_resources(
+                    resource_ids=[resources[i]["id"] for i in rows],
+                    metric_namespace=resource_type,
+                    metric_names=[d["name"] for d in definitions.values()],
+                    timespan=(start_time, end_time),
+                    granularity=granularity,
+                    aggregations=["Average"]
+                )
+                calls += 1
+            except Exception as e:
+                # Leave these resources out of the stored days rather than
+                # recording them as idle
+                collected[rows] = False
+                failed += 1
+                logger.error(f"Metrics batch failed ({resource_type} in {location}, {len(rows)} resources): {e}")
+                continue
+
+            # Flatten into index/value vectors, then scatter in one assignment
+            res_idx, met_idx, pt_idx, vals = [], [], [], []
+            for result in results:
+                row = row_of.get((result.resource_id or "").lower())
+                if row is None:
+                    continue
+                for metric in result.metrics:
+                    metric_idx, invert = by_name.get(metric.name.lower(), (None, False))
+                    if metric_idx is None:
+                        continue
+                    for series in metric.timeseries:
+                        for point in series.data:
+                            if point.average is None:
+                                continue
+                            res_idx.append(row)
+                            met_idx.append(metric_idx)
+                            pt_idx.append(int((point.timestamp - start_time) / granularity))
+                            vals.append(100.0 - point.average if invert else point.average)
+
+            if vals:
+                pt = np.asarray(pt_idx)
+                ok = (pt >= 0) & (pt < values.shape[2])
+                values[np.asarray(res_idx)[ok], np.asarray(met_idx)[ok], pt[ok]] = np.asarray(vals, dtype=np.float32)[ok]
+
+        p50, p95, peak = summarize_daily(values, points_per_day)
+
+        resource_ids = np.array([r["id"] for r in resources], dtype=str)[collected]
+        resource_types = np.array([r["type"] for r in resources], dtype=str)[collected]
+        skus = np.array([r.get("sku") or "" for r in resources], dtype=str)[collected]
+        p50, p95, peak = p50[collected], p95[collected], peak[collected]
+        for d in range(days):
+            day = (start_time + timedelta(days=d)).date()
+            self.store.write_day(customer_id, day, resource_ids, resource_types, skus,
+                                 p50[:, d], p95[:, d], peak[:, d])
+
+        logger.info(f"Collected metrics for {len(resources)} resources of {customer_id} in {calls} calls ({failed} failed)")
+
+        return {
+            "customer_id": customer_id,
+            "resources": len(resources),
+            "days": days,
+            "api_calls": calls,
+            "failed_batches": failed
+        }
+
+
+class CollectionError(Exception):
+    """Raised when cost data for a customer cannot be collected completely"""
+
+
+class CostCollector:
+    """
+    Pull daily actual cost per resource from Cost Management
+
+    One query per subscription covers the whole window, grouped by
+    ResourceId and ServiceName; pages are followed via nextLink.
+    """
+
+    def __init__(self, credential, store: Optional[CostStore] = None):
+        self.credential = credential
+        self.store = store or CostStore()
+        self._client = None
+
+    def _get_client(self):
+        if self._client is None:
+            from azure.mgmt.costmanagement import CostManagementClient
+            self._client = CostManagementClient(self.credential)
+        return self._client
+
+    def _query_rows(self, scope: str, start: datetime, end: datetime) -> Tuple[List[str], List[list]]:
+        from azure.core.rest import HttpRequest
+        from azure.mgmt.costmanagement.models import (
+            QueryAggregation, QueryDataset, QueryDefinition, QueryGrouping, QueryTimePeriod
+        )
+
+        query = QueryDefinition(
+            type="ActualCost",
+            timeframe="Custom",
+            time_period=QueryTimePeriod(from_property=start, to=end),
+            dataset=QueryDataset(
+                granularity="Daily",
+                aggregation={"totalCost": QueryAggregation(name="Cost", function="Sum")},
+                grouping=[
+                    QueryGrouping(type="Dimension", name="ResourceId"),
+                    QueryGrouping(type="Dimension", name="ServiceName")
+                ]
+            )
+        )
+        client = self._get_client()
+        result = client.query.usage(scope, query)
+        columns = [c.name for c in result.columns]
+        rows = list(result.rows or [])
+
+        next_link = result.next_link
+        while next_link:
+            response = client._send_request(HttpRequest("POST", next_link, json=query.serialize()))
+            response.raise_for_status()
+            page = response.json().get("properties", {})
+            rows.extend(page.get("rows") or [])
+            next_link = page.get("nextLink")
+
+        return columns, rows
+
+    def collect(
+        self,
+        customer_id: str,
+        subscription_ids: List[str],
+        days: Optional[int] = None,
+        end: Optional[date] = None
+    ) -> Dict[str, Any]:
+        """
+        Collect and store per-resource cost for the `days` whole days before `end`
+
+        A failed subscription raises CollectionError and nothing is written,
+        since a partial day would read as a cost drop.
+        """
+        days = days or settings.METRICS_LOOKBACK_DAYS
+        end = end or datetime.now(timezone.utc).date()
+        end_time = datetime(end.year, end.month, end.day, tzinfo=timezone.utc)
+        start_time = end_time - timedelta(days=days)
+
+        ids, services, usage_dates, costs = [], [], [], []
+        for subscription_id in subscription_ids:
+            try:
+                columns, rows = self._query_rows(f"/subscriptions/{subscription_id}", start_time, end_time - timedelta(seconds=1))
+            except Exception as e:
+                logger.error(f"Cost query failed for {customer_id}/{subscription_id}: {e}")
+                raise CollectionError(f"Cost query failed for subscription {subscription_id}: {e}") from e
+
+            index = {name.lower(): i for i, name in enumerate(columns)}
+            cost_col = index.get("totalcost", index.get("cost", 0))
+            for row in rows:
+                ids.append(str(row[index["resourceid"]] or ""))
+                services.append(str(row[index["servicename"]] or ""))
+                usage_dates.append(int(row[index["usagedate"]]))
+                costs.append(float(row[cost_col]))
+
+        ids = np.char.lower(np.array(ids, dtype=str))
+        services = np.array(services, dtype=str)
+        costs = np.array(costs, dtype=np.float64)
+        usage_dates = np.array(usage_dates, dtype=np.int64)
+
+        for d in range(days):
+            day = (start_time + timedelta(days=d)).date()
+            mask = usage_dates == int(day.strftime("%Y%m%d"))
+            self.store.write_day(customer_id, day, ids[mask], services[mask], costs[mask])
+
+        logger.info(f"Collected {len(costs)} cost rows for {customer_id} across {len(subscription_ids)} subscriptions")
+
+        return {
+            "customer_id": customer_id,
+            "rows": int(len(costs)),
+            "days": days,
+            "total_cost": round(float(costs.sum()), 2)
+        }
@@ -0,0 +1,51 @@
+"""
+Cost Intelligence Configuration
+Loads from environment variables
+"""
+
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+
+
+def _env(name: str, default, cast=str):
+    value = os.getenv(name)
+    return cast(value) if value not in (None, "") else default
+
+
+@dataclass(frozen=True)
+class Settings:
+    # Storage
+    DATA_PATH: str = _env("COST_INTELLIGENCE_DATA_PATH", "./data/cost-intelligence")
+
+    # Azure Monitor metrics collection
+    METRICS_BATCH_SIZE: int = _env("METRICS_BATCH_SIZE", 50, int)  # getBatch limit per call
+    METRICS_GRANULARITY_MINUTES: int = _env("METRICS_GRANULARITY_MINUTES", 60, int)
+    METRICS_LOOKBACK_DAYS: int = _env("METRICS_LOOKBACK_DAYS", 14, int)
+
+    # Inventory
+    INVENTORY_RETENTION: int = _env("INVENTORY_RETENTION", 90, int)  # snapshots kept per customer
+
+    # Rightsizing
+    RIGHTSIZING_MIN_DAYS: int = _env("RIGHTSIZING_MIN_DAYS", 7, int)
+    RIGHTSIZING_TARGET_UTILIZATION: float = _env("RIGHTSIZING_TARGET_UTILIZATION", 65.0, float)
+    RIGHTSIZING_MIN_SAVINGS: float = _env("RIGHTSIZING_MIN_SAVINGS", 5.0, float)  # USD/month
+
+    # Waste detection
+    IDLE_CPU_THRESHOLD: float = _env("IDLE_CPU_THRESHOLD", 2.0, float)  # peak daily p95 CPU %
+    COST_WINDOW_DAYS: int = _env("COST_WINDOW_DAYS", 30, int)
+
+    # Cost anomaly detection
+    ANOMALY_WINDOW_DAYS: int = _env("ANOMALY_WINDOW_DAYS", 28, int)  # rolling baseline per series
+    ANOMALY_MIN_HISTORY: int = _env("ANOMALY_MIN_HISTORY", 7, int)  # days before a series is scored
+    ANOMALY_THRESHOLD: float = _env("ANOMALY_THRESHOLD", 3.5, float)  # robust z-score
+    ANOMALY_MIN_DELTA: float = _env("ANOMALY_MIN_DELTA", 10.0, float)  # USD/day above baseline
+
+
+@lru_cache()
+def get_settings() -> Settings:
+    """Cached settings instance"""
+    return Settings()
+
+
+settings = get_settings()
@@ -0,0 +1,90 @@
+"""
+Cost Intelligence Forecaster
+Month-to-date spend and month-end forecasts from the cost rollups
+"""
+
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Optional, Sequence
+import calendar
+
+import numpy as np
+
+from .store import CostStore
+
+FORECAST_TRAILING_DAYS = 7
+
+
+@dataclass
+class SpendRollup:
+    """
+    Month-to-date spend for a set of customers
+
+    daily has shape (customers, days in month); mtd and forecast are
+    aligned with customer_ids.
+    """
+    customer_ids: np.ndarray
+    as_of: date
+    daily: np.ndarray
+    mtd: np.ndarray
+    forecast: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.customer_ids)
+
+    def evaluate(self, rows, budgets, thresholds, use_forecast):
+        """
+        Compare spend with budget thresholds for many alert rules at once
+
+        Arguments are aligned per rule: `rows` indexes customer_ids,
+        thresholds are percentages of the budget and `use_forecast` selects
+        month-end forecast instead of month-to-date spend. Returns
+        (spend, percentage of budget used, triggered mask).
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        budgets = np.asarray(budgets, dtype=np.float64)
+        spend = np.where(np.asarray(use_forecast, dtype=bool), self.forecast[rows], self.mtd[rows])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            used = np.where(budgets > 0, spend / budgets * 100, np.nan)
+        triggered = (budgets > 0) & (used >= np.asarray(thresholds, dtype=np.float64))
+        return spend, used, triggered
+
+
+def forecast_month_end(daily: np.ndarray, elapsed: int, trailing: int = FORECAST_TRAILING_DAYS) -> np.ndarray:
+    """
+    Month-end spend per row of `daily` (rows, days in month)
+
+    Spend to date plus the trailing average daily run rate for the days
+    left in the month.
+    """
+    days_in_month = daily.shape[1]
+    mtd = daily[:, :elapsed].sum(axis=1)
+    window = daily[:, max(elapsed - trailing, 0):elapsed]
+    run_rate = window.mean(axis=1) if window.shape[1] else np.zeros(len(daily))
+    return mtd + run_rate * (days_in_month - elapsed)
+
+
+def spend_rollup(customer_ids: Sequence[str], as_of: Optional[date] = None, store: Optional[CostStore] = None) -> SpendRollup:
+    """
+    Load every customer's rollup for the month of `as_of` (default: yesterday)
+
+    One small file per customer is read; spend and forecasts for all
+    customers are then computed in a single pass over the stacked totals.
+    """
+    store = store or CostStore()
+    as_of = as_of or date.today() - timedelta(days=1)
+    days_in_month = calendar.monthrange(as_of.year, as_of.month)[1]
+
+    daily = np.zeros((len(customer_ids), days_in_month))
+    for i, customer_id in enumerate(customer_ids):
+        _, totals = store.load_rollup(customer_id, as_of)
+        if len(totals):
+            daily[i] = totals.sum(axis=0)
+
+    return SpendRollup(
+        customer_ids=np.asarray(customer_ids, dtype=str),
+        as_of=as_of,
+        daily=daily,
+        mtd=daily[:, :as_of.day].sum(axis=1),
+        forecast=forecast_month_end(daily, as_of.day)
+    )
@@ -0,0 +1,395 @@
+"""
+Cost Intelligence Inventory
+Resource Graph snapshots of every resource a customer owns, and diffs between them
+"""
+
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import hashlib
+import json
+import logging
+import time
+
+import numpy as np
+
+from .config import settings
+from .store import _atomic_savez
+
+logger = logging.getLogger(__name__)
+
+# One row per resource; SKU covers both ARM sku.name and VM sizes, which
+# Resource Graph only exposes under hardwareProfile. `state` carries the
+# attachment/power signal the waste detector needs for each type.
+INVENTORY_QUERY = """
+Resources
+| extend state = case(
+    type =~ 'microsoft.compute/disks', tostring(properties.diskState),
+    type =~ 'microsoft.compute/virtualmachines', tostring(properties.extended.instanceView.powerState.code),
+    type =~ 'microsoft.network/publicipaddresses',
+        iff(isempty(properties.ipConfiguration) and isempty(properties.natGateway), 'Unassociated', 'Associated'),
+    type =~ 'microsoft.network/networkinterfaces',
+        iff(isempty(properties.virtualMachine) and isempty(properties.privateEndpoint), 'Detached', 'Attached'),
+    type =~ 'microsoft.web/serverfarms', iff(toint(properties.numberOfSites) == 0, 'Empty', 'InUse'),
+    ''),
+  stateSince = iff(type =~ 'microsoft.compute/disks', tostring(properties.LastOwnershipUpdateTime), '')
+| project id = tolower(id), name, type = tolower(type), location, resourceGroup = tolower(resourceGroup),
+          subscriptionId, sku = coalesce(tostring(properties.hardwareProfile.vmSize), tostring(sku.name)), tags,
+          state, stateSince
+""".strip()
+
+MAX_SUBSCRIPTIONS_PER_QUERY = 1000  # Resource Graph limit
+PAGE_SIZE = 1000  # Resource Graph maximum `top`
+
+# Categorical columns are stored as (categories, int32 codes)
+_CATEGORICAL = ("types", "locations", "resource_groups", "subscription_ids", "skus", "states")
+_PLAIN = ("ids", "names", "tags", "state_since")
+_HASHES = ("id_hash", "tags_hash", "sku_hash")
+
+
+class InventoryError(Exception):
+    """Raised when a snapshot cannot be taken completely"""
+
+
+def hash64(values) -> np.ndarray:
+    """Stable 64-bit hash per string, the join key for inventory rows"""
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(v.encode(), digest_size=8).digest(), "little") for v in values),
+        dtype=np.uint64,
+        count=len(values)
+    )
+
+
+def _tags_key(tags: Optional[Dict[str, str]]) -> str:
+    return json.dumps(tags or {}, sort_keys=True, separators=(",", ":"))
+
+
+# =============================================================================
+# Sources
+# =============================================================================
+
+class ResourceGraphSource:
+    """Page through Azure Resource Graph for many subscriptions per request"""
+
+    def __init__(self, credential, max_retries: int = 5):
+        self.credential = credential
+        self.max_retries = max_retries
+        self._client = None
+
+    def _get_client(self):
+        if self._client is None:
+            from azure.mgmt.resourcegraph import ResourceGraphClient
+            self._client = ResourceGraphClient(self.credential)
+        return self._client
+
+    def fetch_page(self, subscriptions: List[str], query: str, skip_token: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Return (rows, next skip token)"""
+        from azure.core.exceptions import HttpResponseError
+        from azure.mgmt.resourcegraph.models import QueryRequest, QueryRequestOptions, ResultFormat
+
+        request = QueryRequest(
+            subscriptions=subscriptions,
+            query=query,
+            options=QueryRequestOptions(top=PAGE_SIZE, skip_token=skip_token, result_format=ResultFormat.OBJECT_ARRAY)
+        )
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self._get_client().resources(request)
+                return list(response.data or []), response.skip_token
+            except HttpResponseError as e:
+                # Resource Graph throttles per user in 5-second windows
+                if e.status_code != 429 or attempt == self.max_retries:
+                    raise
+                resets_after = e.response.headers.get("x-ms-user-quota-resets-after") if e.response else None
+                delay = 2 ** attempt
+                if resets_after:
+                    h, m, s = (float(x) for x in resets_after.split(":"))
+                    delay = max(delay, h * 3600 + m * 60 + s)
+                logger.warning(f"Resource Graph throttled, retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+
+class FixtureSource:
+    """
+    Replay recorded Resource Graph pages from a directory
+
+    Pages are read in order from page-0001.json, page-0002.json, ... and
+    each holds {"data": [...], "skipToken": "..."} as recorded by
+    RecordingSource. Subscriptions and query are ignored.
+    """
+
+    def __init__(self, directory: str):
+        self.pages = sorted(Path(directory).glob("page-*.json"))
+        self._next = 0
+
+    def fetch_page(self, subscriptions: List[str], query: str, skip_token: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        if self._next >= len(self.pages):
+            raise InventoryError("Fixture exhausted: more pages requested than were recorded")
+        page = json.loads(self.pages[self._next].read_text())
+        self._next += 1
+        return page["data"], page.get("skipToken")
+
+
+class RecordingSource:
+    """Pass pages through from another source and save them as fixtures"""
+
+    def __init__(self, source, directory: str):
+        self.source = source
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._count = 0
+
+    def fetch_page(self, subscriptions: List[str], query: str, skip_token: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        rows, next_token = self.source.fetch_page(subscriptions, query, skip_token)
+        self._count += 1
+        path = self.directory / f"page-{self._count:04d}.json"
+        path.write_text(json.dumps({"data": rows, "skipToken": next_token}, indent=1, default=str))
+        return rows, next_token
+
+
+# =============================================================================
+# Snapshots
+# =============================================================================
+
+@dataclass
+class InventorySnapshot:
+    """Columnar resource inventory, rows sorted by id_hash"""
+    taken_at: datetime
+    columns: Dict[str, np.ndarray] = field(repr=False)
+
+    def __len__(self) -> int:
+        return len(self.columns["id_hash"])
+
+    @classmethod
+    def from_rows(cls, rows: List[Dict[str, Any]], taken_at: Optional[datetime] = None) -> "InventorySnapshot":
+        ids = [r["id"].lower() for r in rows]
+        skus = [r.get("sku") or "" for r in rows]
+        tags = [_tags_key(r.get("tags")) for r in rows]
+
+        id_hash = hash64(ids)
+        order = np.argsort(id_hash, kind="stable")
+        if len(order) > 1 and (np.diff(id_hash[order]) == 0).any():
+            # Resource Graph can repeat rows across pages; keep the first
+            keep = np.concatenate([[True], np.diff(id_hash[order]) != 0])
+            order = order[keep]
+
+        columns = {
+            "ids": np.array(ids, dtype=str),
+            "names": np.array([r.get("name") or "" for r in rows], dtype=str),
+            "types": np.array([(r.get("type") or "").lower() for r in rows], dtype=str),
+            "locations": np.array([r.get("location") or "" for r in rows], dtype=str),
+            "resource_groups": np.array([(r.get("resourceGroup") or "").lower() for r in rows], dtype=str),
+            "subscription_ids": np.array([r.get("subscriptionId") or "" for r in rows], dtype=str),
+            "skus": np.array(skus, dtype=str),
+            "tags": np.array(tags, dtype=str),
+            "states": np.array([r.get("state") or "" for r in rows], dtype=str),
+            "state_since": np.array([r.get("stateSince") or "" for r in rows], dtype=str),
+            "id_hash": id_hash,
+            "tags_hash": hash64(tags),
+            "sku_hash": hash64(skus),
+        }
+        columns = {k: v[order] for k, v in columns.items()}
+        return cls(taken_at=taken_at or datetime.now(timezone.utc), columns=columns)
+
+    def rows(self, indexes: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        """Materialize selected rows (all rows if no indexes are given)"""
+        c = self.columns
+        indexes = np.arange(len(self)) if indexes is None else indexes
+        return [{
+            "id": str(c["ids"][i]),
+            "name": str(c["names"][i]),
+            "type": str(c["types"][i]),
+            "location": str(c["locations"][i]),
+            "resource_group": str(c["resource_groups"][i]),
+            "subscription_id": str(c["subscription_ids"][i]),
+            "sku": str(c["skus"][i]) or None,
+            "tags": json.loads(str(c["tags"][i])),
+            "state": str(c["states"][i]) or None,
+        } for i in indexes]
+
+
+class InventoryCollector:
+    """Take a complete snapshot of a customer's subscriptions"""
+
+    def __init__(self, source, store: Optional["InventoryStore"] = None):
+        self.source = source
+        self.store = store or InventoryStore()
+
+    def snapshot(self, customer_id: str, subscription_ids: List[str], save: bool = True) -> InventorySnapshot:
+        """
+        Query all subscriptions in batches and store the result
+
+        Any failed page raises InventoryError and nothing is stored: a
+        partial snapshot would diff as mass deletion.
+        """
+        rows: List[Dict[str, Any]] = []
+        pages = 0
+        for start in range(0, len(subscription_ids), MAX_SUBSCRIPTIONS_PER_QUERY):
+            batch = subscription_ids[start:start + MAX_SUBSCRIPTIONS_PER_QUERY]
+            skip_token = None
+            while True:
+                try:
+                    page, skip_token = self.source.fetch_page(batch, INVENTORY_QUERY, skip_token)
+                except InventoryError:
+                    raise
+                except Exception as e:
+                    raise InventoryError(f"Inventory query failed for {customer_id} after {pages} pages: {e}") from e
+                rows.extend(page)
+                pages += 1
+                if not skip_token:
+                    break
+
+        snapshot = InventorySnapshot.from_rows(rows)
+        logger.info(f"Inventory snapshot for {customer_id}: {len(snapshot)} resources in {pages} pages")
+        if save:
+            self.store.save(customer_id, snapshot)
+            self.store.prune(customer_id, settings.INVENTORY_RETENTION)
+        return snapshot
+
+
+class InventoryStore:
+    """
+    One compressed file per snapshot:
+    {DATA_PATH}/inventory/{customer_id}/{YYYYMMDDTHHMMSS.ffffffZ}.npz
+
+    Low-cardinality columns are dictionary-encoded. Each snapshot also
+    carries 64-bit hashes of id, tags and SKU so diffs only read those.
+    """
+
+    TIMESTAMP_FORMAT = "%Y%m%dT%H%M%S.%fZ"
+    # Snapshots written before microsecond keys; still listed and loaded
+    LEGACY_TIMESTAMP_FORMAT = "%Y%m%dT%H%M%SZ"
+
+    def __init__(self, base_path: Optional[str] = None):
+        self.base_path = Path(base_path or settings.DATA_PATH) / "inventory"
+
+    def _path(self, customer_id: str, taken_at: datetime) -> Path:
+        path = self.base_path / customer_id / f"{taken_at.strftime(self.TIMESTAMP_FORMAT)}.npz"
+        if not taken_at.microsecond and not path.exists():
+            legacy = path.with_name(f"{taken_at.strftime(self.LEGACY_TIMESTAMP_FORMAT)}.npz")
+            if legacy.exists():
+                return legacy
+        return path
+
+    def _parse(self, stem: str) -> datetime:
+        fmt = self.TIMESTAMP_FORMAT if "." in stem else self.LEGACY_TIMESTAMP_FORMAT
+        return datetime.strptime(stem, fmt).replace(tzinfo=timezone.utc)
+
+    def snapshots(self, customer_id: str) -> List[datetime]:
+        """Snapshot times, oldest first"""
+        folder = self.base_path / customer_id
+        if not folder.exists():
+            return []
+        return sorted(self._parse(p.stem) for p in folder.glob("*.npz"))
+
+    def save(self, customer_id: str, snapshot: InventorySnapshot) -> datetime:
+        """
+        Store a snapshot under its taken_at and return that key
+
+        Keys have microsecond resolution; a snapshot taken at the same
+        instant as a stored one is moved 1 µs later (and its taken_at
+        updated) rather than overwriting it.
+        """
+        while self._path(customer_id, snapshot.taken_at).exists():
+            snapshot.taken_at += timedelta(microseconds=1)
+        arrays = {}
+        for name in _CATEGORICAL:
+            categories, codes = np.unique(snapshot.columns[name], return_inverse=True)
+            arrays[f"{name}__categories"] = categories
+            arrays[f"{name}__codes"] = codes.astype(np.int32)
+        for name in _PLAIN + _HASHES:
+            arrays[name] = snapshot.columns[name]
+        _atomic_savez(self._path(customer_id, snapshot.taken_at), **arrays)
+        return snapshot.taken_at
+
+    def load(self, customer_id: str, taken_at: Optional[datetime] = None, columns: Optional[Tuple[str, ...]] = None) -> InventorySnapshot:
+        """
+        Load a snapshot (latest by default)
+
+        Pass `columns` to read only those arrays from the file.
+        """
+        if taken_at is None:
+            available = self.snapshots(customer_id)
+            if not available:
+                raise InventoryError(f"No inventory snapshots for {customer_id}")
+            taken_at = available[-1]
+
+        wanted = columns or _PLAIN + _CATEGORICAL + _HASHES
+        loaded = {}
+        with np.load(self._path(customer_id, taken_at)) as data:
+            for name in wanted:
+                if name not in data.files and f"{name}__codes" not in data.files:
+                    # Column added after this snapshot was written
+                    loaded[name] = np.full(len(data["id_hash"]), "", dtype=str)
+                elif name in _CATEGORICAL:
+                    loaded[name] = data[f"{name}__categories"][data[f"{name}__codes"]]
+                else:
+                    loaded[name] = data[name]
+        return InventorySnapshot(taken_at=taken_at, columns=loaded)
+
+    def prune(self, customer_id: str, keep: int):
+        """Delete all but the newest `keep` snapshots"""
+        for taken_at in self.snapshots(customer_id)[:-keep or None]:
+            self._path(customer_id, taken_at).unlink()
+
+    def diff(self, customer_id: str, old: datetime, new: datetime, include_rows: bool = True) -> Dict[str, Any]:
+        """
+        Compare two stored snapshots
+
+        Only the hash columns are read to classify resources; detail
+        columns are read afterwards, and only if something changed.
+        """
+        return diff_snapshots(
+            self.load(customer_id, old, columns=_HASHES),
+            self.load(customer_id, new, columns=_HASHES),
+            load_detail=(lambda: (self.load(customer_id, old), self.load(customer_id, new))) if include_rows else None
+        )
+
+
+def diff_snapshots(
+    old: InventorySnapshot,
+    new: InventorySnapshot,
+    load_detail: Optional[Callable[[], Tuple[InventorySnapshot, InventorySnapshot]]] = None
+) -> Dict[str, Any]:
+    """
+    Classify resources as added, removed, tags changed or SKU changed
+
+    Both snapshots are sorted by id_hash, so membership is a merge of two
+    sorted arrays. Changed rows are materialized from the snapshots when
+    they carry detail columns, from `load_detail` otherwise; with neither,
+    only counts are returned.
+    """
+    a, b = old.columns, new.columns
+    _, ia, ib = np.intersect1d(a["id_hash"], b["id_hash"], assume_unique=True, return_indices=True)
+    removed = np.setdiff1d(np.arange(len(old)), ia, assume_unique=True)
+    added = np.setdiff1d(np.arange(len(new)), ib, assume_unique=True)
+    tags_mask = a["tags_hash"][ia] != b["tags_hash"][ib]
+    sku_mask = a["sku_hash"][ia] != b["sku_hash"][ib]
+    tags_changed = ia[tags_mask], ib[tags_mask]
+    sku_changed = ia[sku_mask], ib[sku_mask]
+
+    counts = {
+        "added": int(len(added)),
+        "removed": int(len(removed)),
+        "tags_changed": int(len(tags_changed[0])),
+        "sku_changed": int(len(sku_changed[0])),
+    }
+    result: Dict[str, Any] = {"old": old.taken_at.isoformat(), "new": new.taken_at.isoformat(), "counts": counts}
+
+    if any(counts.values()) and not ("ids" in a and "ids" in b):
+        if load_detail is None:
+            return result
+        old, new = load_detail()
+
+    def changes(pair, column):
+        before, after = old.rows(pair[0]), new.rows(pair[1])
+        return [{"id": n["id"], "before": o[column], "after": n[column]} for o, n in zip(before, after)]
+
+    result.update({
+        "added": new.rows(added) if counts["added"] else [],
+        "removed": old.rows(removed) if counts["removed"] else [],
+        "tags_changed": changes(tags_changed, "tags") if counts["tags_changed"] else [],
+        "sku_changed": changes(sku_changed, "sku") if counts["sku_changed"] else [],
+    })
+    return result
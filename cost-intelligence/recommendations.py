@@ -0,0 +1,177 @@
+"""
+Cost Intelligence Recommendations
+Waste detection joining the resource inventory with cost rows and metric summaries
+"""
+
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+import warnings
+
+import numpy as np
+
+from .analyzer import parse_sku
+from .config import settings
+from .inventory import InventorySnapshot, hash64
+from .store import METRIC_INDEX, CostFrame, MetricWindow
+
+# List prices used when a resource has no cost rows (monthly, USD)
+PUBLIC_IP_MONTHLY = {"basic": 2.63, "standard": 3.65}
+DISK_MONTHLY = {  # 128 GiB tier of each SKU; real size is not in the inventory
+    "premium_lrs": 19.71, "premium_zrs": 29.57, "standardssd_lrs": 9.60,
+    "standardssd_zrs": 12.00, "standard_lrs": 5.89, "ultrassd_lrs": 87.60
+}
+APP_SERVICE_PLAN_MONTHLY = {
+    "f1": 0.0, "d1": 9.49, "b1": 13.14, "b2": 26.28, "b3": 52.56,
+    "s1": 73.00, "s2": 146.00, "s3": 292.00,
+    "p1v2": 146.00, "p2v2": 292.00, "p3v2": 584.00,
+    "p0v3": 62.05, "p1v3": 124.10, "p2v3": 248.20, "p3v3": 496.40
+}
+
+# finding -> (resource type, inventory state, action)
+RULES = {
+    "orphaned_disk": ("microsoft.compute/disks", "Unattached", "Snapshot if needed, then delete the disk"),
+    "unattached_public_ip": ("microsoft.network/publicipaddresses", "Unassociated", "Release the public IP"),
+    "idle_nic": ("microsoft.network/networkinterfaces", "Detached", "Delete the network interface"),
+    "empty_app_service_plan": ("microsoft.web/serverfarms", "Empty", "Delete the App Service plan or scale to Free"),
+    "stopped_allocated_vm": ("microsoft.compute/virtualmachines", "PowerState/stopped", "Deallocate the VM (stop from the portal or az vm deallocate)"),
+}
+
+
+def _reference_cost(resource_type: str, sku: str) -> float:
+    sku_key = (sku or "").lower()
+    if resource_type == "microsoft.network/publicipaddresses":
+        return PUBLIC_IP_MONTHLY.get(sku_key, PUBLIC_IP_MONTHLY["basic"])
+    if resource_type == "microsoft.compute/disks":
+        return DISK_MONTHLY.get(sku_key, DISK_MONTHLY["standard_lrs"])
+    if resource_type == "microsoft.web/serverfarms":
+        return APP_SERVICE_PLAN_MONTHLY.get(sku_key, 0.0)
+    if resource_type == "microsoft.compute/virtualmachines":
+        return parse_sku(resource_type, sku)[4]
+    return 0.0
+
+
+def _join(inventory_hash: np.ndarray, resource_ids: np.ndarray):
+    """
+    Index join of resource IDs onto inventory rows
+
+    Returns (inventory rows, positions in resource_ids) for the IDs that
+    exist in the inventory. inventory_hash must be sorted.
+    """
+    keys = hash64(np.char.lower(np.asarray(resource_ids, dtype=str)))
+    rows = np.searchsorted(inventory_hash, keys)
+    rows = np.minimum(rows, max(len(inventory_hash) - 1, 0))
+    hit = (inventory_hash[rows] == keys) if len(inventory_hash) else np.zeros(len(keys), dtype=bool)
+    return rows[hit], np.flatnonzero(hit)
+
+
+class WasteDetector:
+    """
+    Find resources that cost money without doing work
+
+    Inventory state flags orphaned disks, unassociated public IPs, detached
+    NICs, empty App Service plans and stopped-but-allocated VMs. Running VMs
+    whose CPU p95 never rises above IDLE_CPU_THRESHOLD are flagged as idle.
+    Cost rows and metric summaries are joined by hashed resource ID with
+    searchsorted, so a tenant is analyzed in a handful of array passes.
+    """
+
+    def __init__(self, idle_cpu_threshold: Optional[float] = None, min_idle_days: Optional[int] = None):
+        self.idle_cpu_threshold = idle_cpu_threshold if idle_cpu_threshold is not None else settings.IDLE_CPU_THRESHOLD
+        self.min_idle_days = min_idle_days or settings.RIGHTSIZING_MIN_DAYS
+
+    def detect(
+        self,
+        inventory: InventorySnapshot,
+        costs: Optional[CostFrame] = None,
+        metrics: Optional[MetricWindow] = None,
+        now: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        """Return one finding per wasteful resource with its estimated monthly waste"""
+        c = inventory.columns
+        n = len(inventory)
+        if n == 0:
+            return []
+        now = now or datetime.now(timezone.utc)
+        types, states = c["types"], c["states"]
+
+        # Actual monthly cost from cost rows
+        monthly = np.full(n, np.nan)
+        if costs is not None and len(costs):
+            rows, pos = _join(c["id_hash"], costs.resource_ids)
+            monthly[rows] = costs.monthly_costs()[pos]
+
+        # Peak daily CPU p95 and observed days from metric summaries
+        peak_cpu = np.full(n, np.nan)
+        observed = np.zeros(n, dtype=np.int64)
+        if metrics is not None and len(metrics):
+            rows, pos = _join(c["id_hash"], metrics.resource_ids)
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning)
+                peak_cpu[rows] = np.nanmax(metrics.p95[pos, :, METRIC_INDEX["cpu"]], axis=1)
+            observed[rows] = metrics.observed_days()[pos]
+
+        findings = {name: (types == rtype) & (states == state) for name, (rtype, state, _) in RULES.items()}
+        findings["idle_vm"] = (
+            (types == "microsoft.compute/virtualmachines")
+            & (states == "PowerState/running")
+            & (observed >= self.min_idle_days)
+            & (peak_cpu < self.idle_cpu_threshold)
+        )
+
+        flagged = np.zeros(n, dtype=bool)
+        for mask in findings.values():
+            flagged |= mask
+        flagged_rows = np.flatnonzero(flagged)
+        if len(flagged_rows) == 0:
+            return []
+
+        # Reference prices only for flagged rows without cost data
+        waste = monthly.copy()
+        missing = flagged_rows[np.isnan(monthly[flagged_rows])]
+        waste[missing] = [_reference_cost(types[i], c["skus"][i]) for i in missing]
+
+        results = []
+        for name, mask in findings.items():
+            for i in np.flatnonzero(mask):
+                results.append(self._finding(name, i, c, waste[i], not np.isnan(monthly[i]), peak_cpu[i], observed[i], now))
+
+        results.sort(key=lambda r: r["potential_savings"], reverse=True)
+        return results
+
+    def _finding(self, name, i, c, waste, from_costs, peak_cpu, observed, now) -> Dict[str, Any]:
+        resource_id = str(c["ids"][i])
+        sku = str(c["skus"][i])
+        if name == "orphaned_disk":
+            since = str(c["state_since"][i])
+            days = None
+            if since:
+                try:
+                    days = (now - datetime.fromisoformat(since.replace("Z", "+00:00"))).days
+                except ValueError:
+                    pass
+            description = f"Disk ({sku}) is unattached" + (f" for {days} days." if days is not None else ".")
+        elif name == "unattached_public_ip":
+            description = f"Public IP ({sku or 'Basic'}) is not associated with any resource."
+        elif name == "idle_nic":
+            description = "Network interface is not attached to a VM or private endpoint."
+        elif name == "empty_app_service_plan":
+            description = f"App Service plan ({sku}) hosts no apps."
+        elif name == "stopped_allocated_vm":
+            description = f"VM ({sku}) is stopped but still allocated, so compute is still billed."
+        else:
+            description = f"VM ({sku}) is running but idle (peak daily p95 CPU: {peak_cpu:.1f}% over {observed} days)."
+        action = RULES[name][2] if name in RULES else "Deallocate or delete the VM"
+
+        waste = round(float(waste), 2)
+        return {
+            "resource_id": resource_id,
+            "resource_name": str(c["names"][i]) or resource_id.rsplit("/", 1)[-1],
+            "recommendation_type": "unused",
+            "finding": name,
+            "current_cost": waste,
+            "potential_savings": waste,
+            "savings_percentage": 100.0 if waste > 0 else 0.0,
+            "waste_source": "cost_data" if from_costs else "list_price",
+            "description": description,
+            "action": action
+        }
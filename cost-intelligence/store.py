@@ -0,0 +1,374 @@
+"""
+Cost Intelligence Store
+Compact on-disk storage for collected metric summaries
+"""
+
+from dataclasses import dataclass
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Optional
+import calendar
+import os
+import tempfile
+
+import numpy as np
+
+from .config import settings
+
+# Canonical metric order used by every summary array (last axis)
+METRICS = ("cpu", "memory", "dtu", "iops")
+METRIC_INDEX = {name: i for i, name in enumerate(METRICS)}
+
+
+@dataclass
+class MetricWindow:
+    """
+    Daily percentile summaries for a set of resources
+
+    p50/p95/max have shape (resources, days, metrics) and are NaN where
+    no data was collected.
+    """
+    resource_ids: np.ndarray
+    resource_types: np.ndarray
+    skus: np.ndarray
+    days: np.ndarray
+    p50: np.ndarray
+    p95: np.ndarray
+    max: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.resource_ids)
+
+    def observed_days(self) -> np.ndarray:
+        """Number of days with at least one metric per resource"""
+        return (~np.isnan(self.p95)).any(axis=2).sum(axis=1)
+
+
+def _atomic_savez(path: Path, **arrays):
+    """Write a compressed .npz without leaving partial files behind"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class MetricSummaryStore:
+    """
+    One compressed file per customer per day:
+    {DATA_PATH}/metrics/{customer_id}/{YYYY-MM-DD}.npz
+
+    Each file holds the resource table plus float32 p50/p95/max arrays of
+    shape (resources, metrics) - raw data points are never persisted.
+    """
+
+    def __init__(self, base_path: Optional[str] = None):
+        self.base_path = Path(base_path or settings.DATA_PATH) / "metrics"
+
+    def _day_path(self, customer_id: str, day: date) -> Path:
+        return self.base_path / customer_id / f"{day.isoformat()}.npz"
+
+    def write_day(
+        self,
+        customer_id: str,
+        day: date,
+        resource_ids: np.ndarray,
+        resource_types: np.ndarray,
+        skus: np.ndarray,
+        p50: np.ndarray,
+        p95: np.ndarray,
+        max_: np.ndarray
+    ):
+        """Persist one day of summaries (replaces any previous file for that day)"""
+        _atomic_savez(
+            self._day_path(customer_id, day),
+            resource_ids=np.asarray(resource_ids, dtype=str),
+            resource_types=np.asarray(resource_types, dtype=str),
+            skus=np.asarray(skus, dtype=str),
+            p50=np.asarray(p50, dtype=np.float32),
+            p95=np.asarray(p95, dtype=np.float32),
+            max=np.asarray(max_, dtype=np.float32)
+        )
+
+    def available_days(self, customer_id: str) -> list:
+        """Days with stored summaries, oldest first"""
+        folder = self.base_path / customer_id
+        if not folder.exists():
+            return []
+        return sorted(date.fromisoformat(p.stem) for p in folder.glob("*.npz"))
+
+    def load_window(self, customer_id: str, days: Optional[int] = None, end: Optional[date] = None) -> MetricWindow:
+        """
+        Load the last `days` days (ending at `end`, inclusive) into one window
+
+        `end` defaults to yesterday, the last day the collector completes.
+
+        Resources are aligned across days with a single sorted-union and
+        searchsorted per day, so no per-resource Python loop is needed.
+        """
+        days = days or settings.METRICS_LOOKBACK_DAYS
+        end = end or date.today() - timedelta(days=1)
+        wanted = [end - timedelta(days=i) for i in range(days - 1, -1, -1)]
+        frames = []
+        for day in wanted:
+            path = self._day_path(customer_id, day)
+            if path.exists():
+                with np.load(path) as data:
+                    frames.append((day, {k: data[k] for k in data.files}))
+
+        n_metrics = len(METRICS)
+        if not frames:
+            empty = np.empty((0, 0, n_metrics), dtype=np.float32)
+            return MetricWindow(
+                resource_ids=np.array([], dtype=str),
+                resource_types=np.array([], dtype=str),
+                skus=np.array([], dtype=str),
+                days=np.array([], dtype="datetime64[D]"),
+                p50=empty, p95=empty.copy(), max=empty.copy()
+            )
+
+        resource_ids = np.unique(np.concatenate([f["resource_ids"] for _, f in frames]))
+        resource_types = np.empty(len(resource_ids), dtype=object)
+        skus = np.empty(len(resource_ids), dtype=object)
+
+        shape = (len(resource_ids), len(frames), n_metrics)
+        p50 = np.full(shape, np.nan, dtype=np.float32)
+        p95 = np.full(shape, np.nan, dtype=np.float32)
+        max_ = np.full(shape, np.nan, dtype=np.float32)
+
+        # Later days overwrite type/SKU so the window reflects the latest size
+        for d, (_, frame) in enumerate(frames):
+            rows = np.searchsorted(resource_ids, frame["resource_ids"])
+            resource_types[rows] = frame["resource_types"]
+            skus[rows] = frame["skus"]
+            p50[rows, d] = frame["p50"]
+            p95[rows, d] = frame["p95"]
+            max_[rows, d] = frame["max"]
+
+        return MetricWindow(
+            resource_ids=resource_ids,
+            resource_types=resource_types.astype(str),
+            skus=skus.astype(str),
+            days=np.array([day for day, _ in frames], dtype="datetime64[D]"),
+            p50=p50, p95=p95, max=max_
+        )
+
+
+@dataclass
+class CostFrame:
+    """
+    Daily actual cost per resource
+
+    costs has shape (resources, days); resource_ids are lower-cased and
+    sorted so they can be joined with searchsorted.
+    """
+    resource_ids: np.ndarray
+    service_names: np.ndarray
+    days: np.ndarray
+    costs: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.resource_ids)
+
+    def monthly_costs(self) -> np.ndarray:
+        """Cost per resource normalized to a 30-day month"""
+        if self.costs.shape[1] == 0:
+            return np.zeros(len(self))
+        return self.costs.sum(axis=1) * (30.0 / self.costs.shape[1])
+
+
+class CostStore:
+    """
+    One compressed file per customer per day:
+    {DATA_PATH}/costs/{customer_id}/{YYYY-MM-DD}.npz
+
+    Writing a day also updates the customer's monthly rollup
+    {DATA_PATH}/costs/{customer_id}/rollup-{YYYY-MM}.npz, daily totals per
+    service name, so month-level questions never re-read the cost rows.
+    The rollup also records which days were collected, so a day without
+    cost can be told apart from a day that has not landed yet.
+    """
+
+    def __init__(self, base_path: Optional[str] = None):
+        self.base_path = Path(base_path or settings.DATA_PATH) / "costs"
+
+    def _day_path(self, customer_id: str, day: date) -> Path:
+        return self.base_path / customer_id / f"{day.isoformat()}.npz"
+
+    def _rollup_path(self, customer_id: str, month: date) -> Path:
+        return self.base_path / customer_id / f"rollup-{month:%Y-%m}.npz"
+
+    def write_day(self, customer_id: str, day: date, resource_ids, service_names, costs):
+        """Persist one day of cost rows (replaces any previous file for that day)"""
+        categories, codes = np.unique(np.asarray(service_names, dtype=str), return_inverse=True)
+        costs = np.asarray(costs, dtype=np.float64)
+        _atomic_savez(
+            self._day_path(customer_id, day),
+            resource_ids=np.char.lower(np.asarray(resource_ids, dtype=str)),
+            service_names__categories=categories,
+            service_names__codes=codes.astype(np.int32),
+            costs=costs
+        )
+        self._update_rollup(customer_id, day, categories, np.bincount(codes, weights=costs, minlength=len(categories)))
+
+    def _update_rollup(self, customer_id: str, day: date, dimensions: np.ndarray, totals: np.ndarray):
+        """Replace one day's column of the monthly rollup"""
+        existing, table = self.load_rollup(customer_id, day)
+        collected = self.collected_days(customer_id, day)
+        merged = np.union1d(existing, dimensions)
+        rollup = np.zeros((len(merged), table.shape[1]))
+        rollup[np.searchsorted(merged, existing)] = table
+        rollup[:, day.day - 1] = 0.0
+        rollup[np.searchsorted(merged, dimensions), day.day - 1] = totals
+        collected[day.day - 1] = True
+        _atomic_savez(self._rollup_path(customer_id, day), dimensions=merged, totals=rollup, collected=collected)
+
+    def customer_ids(self) -> list:
+        """Customers with stored cost data"""
+        if not self.base_path.exists():
+            return []
+        return sorted(p.name for p in self.base_path.iterdir() if p.is_dir())
+
+    def load_rollup(self, customer_id: str, month: date):
+        """
+        Return (service names, daily totals) for the month containing `month`
+
+        totals has shape (services, days in month) and is zero for days
+        that were never collected.
+        """
+        path = self._rollup_path(customer_id, month)
+        if not path.exists():
+            return np.array([], dtype=str), np.zeros((0, calendar.monthrange(month.year, month.month)[1]))
+        with np.load(path) as data:
+            return data["dimensions"], data["totals"]
+
+    def collected_days(self, customer_id: str, month: date) -> np.ndarray:
+        """Per day of the month containing `month`: whether it has been collected"""
+        path = self._rollup_path(customer_id, month)
+        if not path.exists():
+            return np.zeros(calendar.monthrange(month.year, month.month)[1], dtype=bool)
+        with np.load(path) as data:
+            if "collected" in data.files:
+                return data["collected"]
+            # Rollups written before collection was tracked: days with any cost
+            return data["totals"].any(axis=0)
+
+    def last_collected_day(self, customer_id: str, on_or_before: date, months: int = 2) -> Optional[date]:
+        """Latest collected day up to `on_or_before`, looking back at most `months` months"""
+        month = on_or_before.replace(day=1)
+        for _ in range(months + 1):
+            collected = self.collected_days(customer_id, month)
+            if month.year == on_or_before.year and month.month == on_or_before.month:
+                collected = collected[:on_or_before.day]
+            days = np.flatnonzero(collected)
+            if len(days):
+                return month.replace(day=int(days[-1]) + 1)
+            month = (month - timedelta(days=1)).replace(day=1)
+        return None
+
+    def load_range(self, customer_id: str, days: Optional[int] = None, end: Optional[date] = None) -> CostFrame:
+        """Load the last `days` days ending at `end` (default: yesterday) into one frame"""
+        days = days or settings.COST_WINDOW_DAYS
+        end = end or date.today() - timedelta(days=1)
+        wanted = [end - timedelta(days=i) for i in range(days - 1, -1, -1)]
+        frames = []
+        for day in wanted:
+            path = self._day_path(customer_id, day)
+            if path.exists():
+                with np.load(path) as data:
+                    frames.append((day, {
+                        "resource_ids": data["resource_ids"],
+                        "service_names": data["service_names__categories"][data["service_names__codes"]],
+                        "costs": data["costs"]
+                    }))
+
+        if not frames:
+            return CostFrame(
+                resource_ids=np.array([], dtype=str),
+                service_names=np.array([], dtype=str),
+                days=np.array([], dtype="datetime64[D]"),
+                costs=np.zeros((0, 0))
+            )
+
+        resource_ids = np.unique(np.concatenate([f["resource_ids"] for _, f in frames]))
+        service_names = np.empty(len(resource_ids), dtype=object)
+        costs = np.zeros((len(resource_ids), len(frames)))
+        for d, (_, frame) in enumerate(frames):
+            rows = np.searchsorted(resource_ids, frame["resource_ids"])
+            service_names[rows] = frame["service_names"]
+            # A resource can appear on several meter rows per day
+            np.add.at(costs[:, d], rows, frame["costs"])
+
+        return CostFrame(
+            resource_ids=resource_ids,
+            service_names=service_names.astype(str),
+            days=np.array([day for day, _ in frames], dtype="datetime64[D]"),
+            costs=costs
+        )
+
+
+class AnomalyStore:
+    """
+    Rolling detector state plus the anomalies found per customer per day:
+    {DATA_PATH}/anomalies/state.npz
+    {DATA_PATH}/anomalies/{customer_id}/{YYYY-MM-DD}.npz
+
+    The state holds the last window of daily totals for every
+    customer x dimension series, so each new day is scored without
+    re-reading history.
+    """
+
+    def __init__(self, base_path: Optional[str] = None):
+        self.base_path = Path(base_path or settings.DATA_PATH) / "anomalies"
+
+    def _day_path(self, customer_id: str, day: date) -> Path:
+        return self.base_path / customer_id / f"{day.isoformat()}.npz"
+
+    def load_state(self):
+        """Return (series keys, window, last scored day), or None before the first run"""
+        path = self.base_path / "state.npz"
+        if not path.exists():
+            return None
+        with np.load(path) as data:
+            return data["keys"], data["window"], date.fromisoformat(str(data["last_day"]))
+
+    def save_state(self, keys: np.ndarray, window: np.ndarray, last_day: date):
+        _atomic_savez(self.base_path / "state.npz", keys=keys, window=window, last_day=np.array(last_day.isoformat()))
+
+    def write_day(self, customer_id: str, day: date, dimensions, costs, baselines, scores):
+        """Persist the anomalies found for one customer on one day"""
+        _atomic_savez(
+            self._day_path(customer_id, day),
+            dimensions=np.asarray(dimensions, dtype=str),
+            costs=np.asarray(costs, dtype=np.float64),
+            baselines=np.asarray(baselines, dtype=np.float64),
+            scores=np.asarray(scores, dtype=np.float64)
+        )
+
+    def clear_day(self, customer_id: str, day: date):
+        """Drop the anomalies stored for one customer on one day (before rescoring it)"""
+        self._day_path(customer_id, day).unlink(missing_ok=True)
+
+    def load_range(self, customer_id: str, days: int = 30, end: Optional[date] = None) -> list:
+        """Anomalies of the last `days` days ending at `end` (default: yesterday), newest first"""
+        end = end or date.today() - timedelta(days=1)
+        anomalies = []
+        for i in range(days):
+            day = end - timedelta(days=i)
+            path = self._day_path(customer_id, day)
+            if not path.exists():
+                continue
+            with np.load(path) as data:
+                for dimension, cost, baseline, score in zip(data["dimensions"], data["costs"], data["baselines"], data["scores"]):
+                    anomalies.append({
+                        "date": day,
+                        "dimension": str(dimension),
+                        "cost": float(cost),
+                        "baseline": float(baseline),
+                        "score": float(score)
+                    })
+        return anomalies
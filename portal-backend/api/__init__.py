@@ -1,9 +1,10 @@
 """
 API Package
 All API route modules
-"""
 
-from . import auth, customers, deploy, cost, recommendations
+Route modules are imported where they are used (main.py imports the
+routers it mounts), not by the package itself.
+"""
 
 __all__ = [
     'auth',
@@ -11,4 +12,4 @@ __all__ = [
     'deploy',
     'cost',
     'recommendations'
-]
\ No newline at end of file
+]
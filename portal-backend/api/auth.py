@@ -5,24 +5,39 @@ JWT-based authentication for API access
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from sqlalchemy import delete, update
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from pydantic import BaseModel
+import hashlib
+import logging
+import threading
+import time
 
 from database import get_db
 from config import settings
+from models.auth_state import AuthGeneration, RevokedToken
+from models.user import User as UserRecord
+from utils.cache import TTLCache
+from utils.passwords import PasswordHasherBusy, get_pwd_context, password_hasher
 
 router = APIRouter()
-
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+logger = logging.getLogger(__name__)
 
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_PREFIX}/auth/token")
 
+# Verified, unrevoked token payloads (until exp) and user records (short TTL)
+token_cache = TTLCache(settings.AUTH_TOKEN_CACHE_SIZE, name="auth_token")
+user_cache = TTLCache(settings.AUTH_USER_CACHE_SIZE, ttl=settings.AUTH_USER_CACHE_TTL_SECONDS, name="auth_user")
+
+# auth_generation value the caches above are valid for, and when it was last read
+_cached_generation: Optional[int] = None
+_generation_checked_at = float("-inf")
+_generation_lock = threading.Lock()
+
 # Models
 class Token(BaseModel):
     access_token: str
@@ -35,13 +50,15 @@ class User(BaseModel):
     username: str
     email: Optional[str] = None
     disabled: Optional[bool] = None
+    role: Optional[str] = None
 
 # Utility functions
+# Synchronous helpers block for the full bcrypt cost; use password_hasher from async code
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -54,7 +71,95 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def sync_auth_caches(db: Session):
+    """
+    Drop this worker's token and user caches if any worker has revoked a
+    token or changed a user since they were filled
+    
+    auth_generation is read at most every AUTH_SYNC_INTERVAL_SECONDS, so
+    most requests skip the database; a revocation made by another worker
+    applies here within that interval. Call it before consulting the caches.
+    """
+    global _cached_generation, _generation_checked_at
+    now = time.monotonic()
+    if now - _generation_checked_at < settings.AUTH_SYNC_INTERVAL_SECONDS:
+        return
+    with _generation_lock:
+        if now - _generation_checked_at < settings.AUTH_SYNC_INTERVAL_SECONDS:
+            return
+        generation = db.query(AuthGeneration.generation).filter(AuthGeneration.id == 1).scalar()
+        if generation != _cached_generation:
+            token_cache.clear()
+            user_cache.clear()
+            _cached_generation = generation
+        _generation_checked_at = time.monotonic()
+
+def _bump_generation(db: Session):
+    db.execute(update(AuthGeneration).where(AuthGeneration.id == 1).values(generation=AuthGeneration.generation + 1))
+
+def decode_token(db: Session, token: str) -> dict:
+    """
+    Verify a JWT and return its payload
+    
+    Verified payloads are cached by token hash until the token's exp, so
+    repeated calls with the same token skip signature verification and
+    the revocation lookup. Call sync_auth_caches first.
+    """
+    key = _token_key(token)
+    payload = token_cache.get(key)
+    if payload is None:
+        if db.get(RevokedToken, key) is not None:
+            raise JWTError("Token has been revoked")
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        if "exp" in payload:
+            token_cache.set(key, payload, expires_at=float(payload["exp"]))
+    return payload
+
+def revoke_token(db: Session, token: str):
+    """Reject `token` in every worker from now on (until it would have expired anyway)"""
+    key = _token_key(token)
+    payload = token_cache.pop(key) or jwt.get_unverified_claims(token)
+    exp = payload.get("exp")
+    now = datetime.utcnow()
+    
+    db.execute(delete(RevokedToken).where(RevokedToken.expires_at < now))
+    if db.get(RevokedToken, key) is None:
+        db.add(RevokedToken(token_hash=key, expires_at=datetime.utcfromtimestamp(exp) if exp else None, revoked_at=now))
+    _bump_generation(db)
+    db.commit()
+
+def load_user(db: Session, username: str) -> Optional[User]:
+    """
+    Load a user by username through the user cache
+    
+    Entries live for AUTH_USER_CACHE_TTL_SECONDS; call invalidate_user
+    after changing or deactivating a user to apply it in every worker
+    immediately. Call sync_auth_caches first.
+    """
+    user = user_cache.get(username)
+    if user is None:
+        record = db.query(UserRecord).filter(UserRecord.username == username).first()
+        if record is None:
+            return None
+        user = User(
+            username=record.username,
+            email=record.email,
+            disabled=not record.is_active,
+            role=record.role
+        )
+        user_cache.set(username, user)
+    return user
+
+def invalidate_user(db: Session, username: str):
+    """Drop a cached user record in every worker; commits `db`"""
+    user_cache.pop(username)
+    _bump_generation(db)
+    db.commit()
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     """Verify JWT token and return current user"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -62,8 +167,9 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         headers={"WWW-Authenticate": "Bearer"},
     )
     
+    sync_auth_caches(db)
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        payload = decode_token(db, token)
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
@@ -71,27 +177,53 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     except JWTError:
         raise credentials_exception
     
-    # TODO: Load user from database
-    user = User(username=token_data.username)
-    if user is None:
+    user = load_user(db, token_data.username)
+    if user is None or user.disabled:
         raise credentials_exception
     return user
 
+async def get_admin_user(user: User = Depends(get_current_user)):
+    """Current user, who must have the admin role"""
+    if user.role != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin role required")
+    return user
+
 # Endpoints
 @router.post("/token", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends()):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     """
     Login endpoint - returns JWT token
+    
+    bcrypt runs in the password hashing pool; stored hashes with outdated
+    cost parameters are upgraded on successful login.
     """
-    # TODO: Verify credentials against database
-    # For now, simple check
-    if form_data.username != "admin" or form_data.password != "admin":
+    record = db.query(UserRecord).filter(UserRecord.username == form_data.username).first()
+    
+    try:
+        valid, new_hash = await password_hasher.verify_and_update(
+            form_data.password, record.hashed_password if record else None
+        )
+    except PasswordHasherBusy as e:
+        logger.warning(f"Login rejected, password hashing queue full: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many login attempts in progress, retry shortly",
+            headers={"Retry-After": "1"},
+        )
+    
+    if not valid or not record.is_active:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    if new_hash:
+        record.hashed_password = new_hash
+        logger.info(f"Upgraded password hash for {record.username}")
+    record.last_login = datetime.utcnow()
+    db.commit()
+    
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": form_data.username}, expires_delta=access_token_expires
@@ -99,6 +231,16 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     
     return {"access_token": access_token, "token_type": "bearer"}
 
+@router.post("/logout")
+async def logout(
+    token: str = Depends(oauth2_scheme),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Revoke the current access token"""
+    revoke_token(db, token)
+    return {"message": "Logged out"}
+
 @router.get("/me", response_model=User)
 async def read_users_me(current_user: User = Depends(get_current_user)):
     """Get current user info"""
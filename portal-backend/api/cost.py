@@ -4,19 +4,20 @@ Azure Cost analysis, recommendations, and budget tracking
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel
 from datetime import datetime, timedelta
-from azure.identity import DefaultAzureCredential
-from azure.mgmt.costmanagement import CostManagementClient
-from azure.mgmt.costmanagement.models import QueryDefinition, TimeframeType
 import logging
 
 from database import get_db
 from models.customer import Customer
+from models.cost_alert import CostAlert
 from api.auth import get_current_user
 from config import settings
+from utils.azure import telemetry_policy
+from utils.cost_intelligence import get_cost_engine
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -53,11 +54,29 @@ class CostRecommendation(BaseModel):
     description: str
     action: str
 
+class ContributingResource(BaseModel):
+    resource_id: str
+    resource_name: str
+    cost: float
+    baseline: float
+    increase: float
+
+class CostAnomaly(BaseModel):
+    date: str
+    dimension: str  # service name
+    cost: float
+    expected_cost: float
+    score: float
+    contributing_resources: List[ContributingResource]
+
 # Azure Cost Management Client
-def get_cost_client(subscription_id: str) -> CostManagementClient:
-    """Initialize Azure Cost Management client"""
+def get_cost_client(subscription_id: str):
+    """Initialize Azure Cost Management client (the SDK is imported on first use)"""
+    from azure.identity import DefaultAzureCredential
+    from azure.mgmt.costmanagement import CostManagementClient
+
     credential = DefaultAzureCredential()
-    return CostManagementClient(credential, subscription_id)
+    return CostManagementClient(credential, subscription_id, per_retry_policies=[telemetry_policy("cost")])
 
 # Helper functions
 def calculate_trend(current: float, previous: float) -> tuple[str, float]:
@@ -76,6 +95,60 @@ def calculate_trend(current: float, previous: float) -> tuple[str, float]:
     
     return trend, change
 
+def alert_config(alert: CostAlert, customer: Customer) -> Dict[str, Any]:
+    """Serialize a cost alert rule"""
+    return {
+        "id": alert.id,
+        "customer_id": str(customer.id),
+        "threshold_percentage": alert.threshold_percentage,
+        "threshold_amount": (customer.monthly_budget or 0) * (alert.threshold_percentage / 100),
+        "basis": alert.basis,
+        "alert_emails": alert.alert_emails,
+        "enabled": alert.enabled,
+        "last_notified_at": alert.last_notified_at
+    }
+
+def analyze_customer_costs(customer_id: str) -> List[Dict[str, Any]]:
+    """Run rightsizing and waste detection over the cost intelligence stores"""
+    engine = get_cost_engine()
+    window = engine.MetricSummaryStore().load_window(customer_id)
+    costs = engine.CostStore().load_range(customer_id)
+    monthly_costs = dict(zip(costs.resource_ids.tolist(), costs.monthly_costs().tolist()))
+    
+    recommendations = engine.RightsizingAnalyzer().analyze(window, monthly_costs)
+    
+    try:
+        inventory = engine.InventoryStore().load(customer_id)
+    except engine.InventoryError:
+        logger.info(f"No inventory snapshot for {customer_id}, skipping waste detection")
+    else:
+        recommendations += engine.WasteDetector().detect(inventory, costs, window)
+    
+    return recommendations
+
+def find_customer_anomalies(customer_id: str, days: int) -> List[Dict[str, Any]]:
+    """Load detected cost anomalies and attribute them to resources"""
+    engine = get_cost_engine()
+    anomalies = engine.AnomalyStore().load_range(customer_id, days)
+    if not anomalies:
+        return []
+    
+    detector = engine.CostAnomalyDetector()
+    end = anomalies[0]["date"]
+    frame = engine.CostStore().load_range(customer_id, days + detector.window_days, end=end)
+    
+    return [
+        {
+            "date": anomaly["date"].isoformat(),
+            "dimension": anomaly["dimension"],
+            "cost": round(anomaly["cost"], 2),
+            "expected_cost": round(anomaly["baseline"], 2),
+            "score": round(anomaly["score"], 1),
+            "contributing_resources": detector.contributors(frame, anomaly["dimension"], anomaly["date"])
+        }
+        for anomaly in anomalies
+    ]
+
 # Endpoints
 @router.get("/{customer_id}/summary", response_model=CostSummary)
 async def get_cost_summary(
@@ -206,18 +279,11 @@ async def get_cost_recommendations(
     if not customer:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Customer not found")
     
+    # Rightsizing and waste findings from collected inventory, cost and metrics
+    recommendations = await run_in_threadpool(analyze_customer_costs, customer.customer_id)
+    
     # Mock recommendations (in production, analyze actual Azure resources)
-    recommendations = [
-        {
-            "resource_id": f"/subscriptions/.../resourceGroups/rg-{customer_id}-prod/providers/Microsoft.Compute/virtualMachines/vm-app-01",
-            "resource_name": "vm-app-01",
-            "recommendation_type": "rightsizing",
-            "current_cost": 120.00,
-            "potential_savings": 60.00,
-            "savings_percentage": 50.0,
-            "description": "VM is underutilized (avg CPU: 15%). Downsize from Standard_D4s_v3 to Standard_D2s_v3.",
-            "action": "Downsize to Standard_D2s_v3"
-        },
+    recommendations += [
         {
             "resource_id": f"/subscriptions/.../resourceGroups/rg-{customer_id}-prod/providers/Microsoft.Sql/servers/sql-{customer_id}/databases/app-db",
             "resource_name": "app-db",
@@ -228,16 +294,6 @@ async def get_cost_recommendations(
             "description": "Database shows no activity on nights/weekends. Enable serverless auto-pause.",
             "action": "Enable serverless with 60-min auto-pause"
         },
-        {
-            "resource_id": f"/subscriptions/.../resourceGroups/rg-{customer_id}-prod/providers/Microsoft.Compute/disks/disk-unattached-01",
-            "resource_name": "disk-unattached-01",
-            "recommendation_type": "unused",
-            "current_cost": 30.00,
-            "potential_savings": 30.00,
-            "savings_percentage": 100.0,
-            "description": "Disk is unattached for 45+ days. Delete or archive.",
-            "action": "Delete unattached disk"
-        },
         {
             "resource_id": f"/subscriptions/.../resourceGroups/rg-{customer_id}-prod/providers/Microsoft.OperationalInsights/workspaces/law-{customer_id}-central",
             "resource_name": f"law-{customer_id}-central",
@@ -262,43 +318,112 @@ async def get_cost_recommendations(
     
     return [CostRecommendation(**rec) for rec in recommendations]
 
+@router.get("/{customer_id}/anomalies", response_model=List[CostAnomaly])
+async def get_cost_anomalies(
+    customer_id: str,
+    days: int = 30,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Get daily cost spikes per service with the resources that drove them
+    """
+    customer = db.query(Customer).filter(Customer.id == customer_id).first()
+    if not customer:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Customer not found")
+    
+    anomalies = await run_in_threadpool(find_customer_anomalies, customer.customer_id, days)
+    return [CostAnomaly(**anomaly) for anomaly in anomalies]
+
 @router.post("/{customer_id}/alerts")
 async def configure_cost_alerts(
     customer_id: str,
-    threshold_percentage: float,
     alert_emails: List[str],
+    threshold_percentage: Optional[float] = None,
+    basis: str = "actual",
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
     """
     Configure cost alerts for customer
+    
+    basis: actual (month-to-date spend) | forecast (forecast month-end spend)
     """
     customer = db.query(Customer).filter(Customer.id == customer_id).first()
     if not customer:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Customer not found")
     
-    if customer.monthly_budget == 0:
+    if not customer.monthly_budget:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Cannot configure alerts without a budget. Set monthly_budget first."
         )
     
-    # Create alert configuration (store in database or Azure)
-    alert_config = {
-        "customer_id": customer_id,
-        "threshold_percentage": threshold_percentage,
-        "threshold_amount": customer.monthly_budget * (threshold_percentage / 100),
-        "alert_emails": alert_emails,
-        "enabled": True
-    }
+    if basis not in ("actual", "forecast"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="basis must be 'actual' or 'forecast'"
+        )
+    
+    if threshold_percentage is None:
+        threshold_percentage = settings.COST_ALERT_THRESHOLD * 100
+    
+    # One rule per threshold and basis; reconfiguring updates recipients
+    alert = db.query(CostAlert).filter(
+        CostAlert.customer_id == customer.id,
+        CostAlert.threshold_percentage == threshold_percentage,
+        CostAlert.basis == basis
+    ).first()
+    if not alert:
+        alert = CostAlert(customer_id=customer.id, threshold_percentage=threshold_percentage, basis=basis)
+        db.add(alert)
+    alert.alert_emails = alert_emails
+    alert.enabled = True
+    db.commit()
+    db.refresh(alert)
     
-    logger.info(f"Cost alert configured for {customer_id}: {threshold_percentage}%")
+    logger.info(f"Cost alert configured for {customer_id}: {threshold_percentage}% ({basis})")
     
     return {
         "message": "Cost alert configured successfully",
-        "config": alert_config
+        "config": alert_config(alert, customer)
     }
 
+@router.get("/{customer_id}/alerts")
+async def list_cost_alerts(
+    customer_id: str,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    List cost alerts configured for customer
+    """
+    customer = db.query(Customer).filter(Customer.id == customer_id).first()
+    if not customer:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Customer not found")
+    
+    alerts = db.query(CostAlert).filter(CostAlert.customer_id == customer.id).order_by(CostAlert.threshold_percentage).all()
+    return [alert_config(alert, customer) for alert in alerts]
+
+@router.delete("/{customer_id}/alerts/{alert_id}")
+async def delete_cost_alert(
+    customer_id: str,
+    alert_id: int,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Delete a cost alert
+    """
+    alert = db.query(CostAlert).filter(CostAlert.id == alert_id, CostAlert.customer_id == customer_id).first()
+    if not alert:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Alert not found")
+    
+    db.delete(alert)
+    db.commit()
+    
+    return {"message": "Cost alert deleted"}
+
 @router.get("/{customer_id}/trends")
 async def get_cost_trends(
     customer_id: str,
@@ -9,10 +9,12 @@ from typing import List, Optional
 from pydantic import BaseModel, EmailStr, Field
 import logging
 
+from config import settings
 from database import get_db
 from models.customer import Customer
 from api.auth import get_current_user
 from utils.encryption import encrypt_value, decrypt_value
+from utils.ip_registry import CidrConflict, get_registry, invalidate_registry, release_cidrs, reserve_cidrs, spoke_cidrs
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -34,8 +36,8 @@ class CustomerCreate(BaseModel):
     region: str
     region_code: str
     environment: str = "prd"
-    hub_vnet_cidr: str = "10.0.0.0/16"
-    spoke_vnets: dict = {"production": "10.2.0.0/16"}
+    hub_vnet_cidr: Optional[str] = None  # Allocated from IP_POOL when omitted
+    spoke_vnets: Optional[dict] = None  # name -> CIDR or {"cidr": ...}; defaults to one allocated "production" spoke
     
     # Features
     enable_bastion: bool = True
@@ -85,50 +87,78 @@ async def create_customer(
     Create new customer
     """
     # Check if customer already exists
-    existing = db.query(Customer).filter(Customer.id == customer.id).first()
+    existing = db.query(Customer).filter(Customer.customer_id == customer.id).first()
     if existing:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail=f"Customer {customer.id} already exists"
         )
     
-    # Encrypt sensitive data
-    encrypted_secret = encrypt_value(customer.sp_client_secret)
-    
-    # Create customer record
-    db_customer = Customer(
-        id=customer.id,
-        name=customer.name,
-        email=customer.email,
-        phone=customer.phone,
-        tenant_id=customer.tenant_id,
-        subscription_ids=customer.subscription_ids,
-        sp_client_id=customer.sp_client_id,
-        sp_client_secret=encrypted_secret,
-        region=customer.region,
-        region_code=customer.region_code,
-        environment=customer.environment,
-        hub_vnet_cidr=customer.hub_vnet_cidr,
-        spoke_vnets=customer.spoke_vnets,
-        enable_bastion=customer.enable_bastion,
-        enable_vpn_gateway=customer.enable_vpn_gateway,
-        firewall_sku=customer.firewall_sku,
-        services_config=customer.services_config,
-        cost_center=customer.cost_center or f"{customer.id}-{customer.environment}",
-        monthly_budget=customer.monthly_budget,
-        tags=customer.tags,
-        notes=customer.notes,
-        status="created"
-    )
-    
-    db.add(db_customer)
-    db.commit()
+    # Address space must not overlap any other customer; the reservation
+    # holds the allocation lock until this transaction commits. Blocks are
+    # owned by the customer_id the record is stored under.
+    try:
+        hub_vnet_cidr, spoke_vnets = reserve_cidrs(db, customer.id, customer.hub_vnet_cidr, customer.spoke_vnets)
+    except CidrConflict as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"CIDR {e.cidr} overlaps {e.existing} of customer {e.owner}"
+        )
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    try:
+        # Encrypt sensitive data
+        encrypted_secret = encrypt_value(customer.sp_client_secret)
+    
+        # Create customer record
+        db_customer = Customer(
+            customer_id=customer.id,
+            customer_name=customer.name,
+            email=customer.email,
+            tenant_id=customer.tenant_id,
+            subscription_ids=customer.subscription_ids,
+            sp_client_id=customer.sp_client_id,
+            sp_client_secret=encrypted_secret,
+            region=customer.region,
+            region_code=customer.region_code,
+            hub_vnet_cidr=hub_vnet_cidr,
+            spoke_vnet_cidr=next(iter(spoke_cidrs(spoke_vnets)), None),
+            spoke_vnets=spoke_vnets,
+            monthly_budget=customer.monthly_budget,
+            status="created"
+        )
+    
+        db.add(db_customer)
+        db.commit()
+    except Exception:
+        db.rollback()
+        release_cidrs(customer.id)
+        raise
     db.refresh(db_customer)
     
     logger.info(f"Customer created: {customer.id} by {current_user.username}")
     
     return db_customer.to_dict()
 
+@router.get("/network/next-cidr")
+async def next_free_cidr(
+    prefix_length: int = 16,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Next address block not used by any customer (not reserved until a customer is created with it)
+    """
+    try:
+        cidr = get_registry(db).allocate(prefix_length)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    return {"cidr": cidr, "pool": settings.IP_POOL}
+
 @router.get("/", response_model=List[CustomerResponse])
 async def list_customers(
     skip: int = 0,
@@ -228,6 +258,8 @@ async def delete_customer(
         customer.status = "deleted"
     
     db.commit()
+    if force:
+        invalidate_registry()  # Free its address space
     
     logger.warning(f"Customer deleted: {customer_id} by {current_user.username} (force={force})")
     
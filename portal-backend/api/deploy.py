@@ -14,6 +14,8 @@ from database import get_db
 from models.customer import Customer
 from models.deployment import Deployment
 from api.auth import get_current_user
+from utils.logging import deployment_id_var
+from utils.tracing import annotate, record_error, traced
 from utils.terraform import TerraformRunner
 
 router = APIRouter()
@@ -38,6 +40,7 @@ class DeploymentResponse(BaseModel):
         from_attributes = True
 
 # Background task for deployment
+@traced("run_deployment_task")
 async def run_deployment_task(
     deployment_id: int,
     customer_id: str,
@@ -49,6 +52,8 @@ async def run_deployment_task(
     """
     Background task to run Terraform deployment
     """
+    log_token = deployment_id_var.set(str(deployment_id))
+    annotate(**{"deployment.id": deployment_id, "customer.id": customer_id, "terraform.component": component, "deployment.action": action})
     deployment = db_session.query(Deployment).filter(Deployment.id == deployment_id).first()
     deployment.status = "running"
     db_session.commit()
@@ -98,12 +103,14 @@ async def run_deployment_task(
         
     except Exception as e:
         logger.error(f"Deployment failed: {e}", exc_info=True)
+        record_error(e)
         deployment.status = "failed"
         deployment.error_message = str(e)
         deployment.completed_at = datetime.utcnow()
     
     finally:
         db_session.commit()
+        deployment_id_var.reset(log_token)
 
 # Endpoints
 @router.post("/", response_model=DeploymentResponse, status_code=status.HTTP_202_ACCEPTED)
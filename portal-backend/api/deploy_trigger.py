@@ -7,11 +7,13 @@ from fastapi import APIRouter, HTTPException, Depends
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import Optional
-import requests
-import os
+import asyncio
+from config import settings
 from database import get_db
 from models.customer import Customer
 from models.deployment import Deployment, DeploymentStatus
+from utils.workflow_dispatch import dispatch_queue, github_client
+from utils.tracing import annotate, traced
 
 router = APIRouter(prefix="/api/deploy", tags=["deploy"])
 
@@ -25,6 +27,7 @@ class DeployRequest(BaseModel):
     spoke_vnet_cidr: str = "10.2.0.0/16"
 
 @router.post("/")
+@traced("deploy_trigger")
 async def trigger_deployment(
     request: DeployRequest,
     db: Session = Depends(get_db)
@@ -59,12 +62,10 @@ async def trigger_deployment(
     db.add(deployment)
     db.commit()
     db.refresh(deployment)
+    annotate(**{"deployment.id": deployment.id, "customer.id": request.customer_id})
     
     # Trigger GitHub Actions
-    github_token = os.getenv("GITHUB_TOKEN")
-    github_repo = os.getenv("GITHUB_REPO")  # e.g., "username/repo"
-    
-    if not github_token or not github_repo:
+    if not github_client.configured:
         # For testing without GitHub integration
         deployment.status = DeploymentStatus.VALIDATING.value
         deployment.github_run_url = "https://github.com/actions"
@@ -77,50 +78,36 @@ async def trigger_deployment(
             "github_url": deployment.github_run_url
         }
     
-    url = f"https://api.github.com/repos/{github_repo}/actions/workflows/deploy-infrastructure.yml/dispatches"
-    headers = {
-        "Accept": "application/vnd.github+json",
-        "Authorization": f"Bearer {github_token}",
-        "X-GitHub-Api-Version": "2022-11-28"
-    }
-    payload = {
-        "ref": "main",
-        "inputs": {
-            "customer_id": request.customer_id,
-            "customer_name": request.customer_name,
-            "customer_email": request.customer_email,
-            "region": request.region,
-            "package_tier": request.package_tier,
-            "hub_vnet_cidr": request.hub_vnet_cidr,
-            "spoke_vnet_cidr": request.spoke_vnet_cidr
-        }
+    inputs = {
+        "customer_id": request.customer_id,
+        "customer_name": request.customer_name,
+        "customer_email": request.customer_email,
+        "region": request.region,
+        "package_tier": request.package_tier,
+        "hub_vnet_cidr": request.hub_vnet_cidr,
+        "spoke_vnet_cidr": request.spoke_vnet_cidr,
+        "deployment_id": str(deployment.id)  # Lets the run reconciler match the run
     }
     
+    # Dispatched by the background queue; the deployment moves to validating (or failed) when sent.
+    # The stored inputs let a restarted worker re-queue it if this one stops first.
+    deployment.dispatch_inputs = inputs
+    db.commit()
     try:
-        response = requests.post(url, headers=headers, json=payload)
-        
-        if response.status_code != 204:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Failed to trigger deployment: {response.text}"
-            )
-        
-        # Update deployment with GitHub info
-        deployment.status = DeploymentStatus.VALIDATING.value
-        deployment.github_run_url = f"https://github.com/{github_repo}/actions"
-        db.commit()
-        
-        return {
-            "deployment_id": deployment.id,
-            "status": "triggered",
-            "message": "Deployment started successfully",
-            "github_url": deployment.github_run_url
-        }
-    except Exception as e:
+        dispatch_queue.submit(deployment.id, inputs)
+    except asyncio.QueueFull:
         deployment.status = DeploymentStatus.FAILED.value
-        deployment.error_message = str(e)
+        deployment.error_message = "Deployment queue is full"
+        deployment.dispatch_inputs = None
         db.commit()
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=503, detail="Too many deployments queued, try again later")
+    
+    return {
+        "deployment_id": deployment.id,
+        "status": "queued",
+        "message": f"Deployment queued ({dispatch_queue.pending} ahead)",
+        "github_url": github_client.workflow_url(settings.GITHUB_WORKFLOW_FILE)
+    }
 
 @router.get("/{deployment_id}")
 async def get_deployment_status(
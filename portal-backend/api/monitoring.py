@@ -0,0 +1,51 @@
+"""
+Monitoring API
+GET /metrics - Prometheus text exposition of application metrics
+GET /api/admin/profiles - Recent slow-request profiles
+GET /api/admin/profiles/{id} - Stack samples and query log of one profile
+"""
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import PlainTextResponse
+import hmac
+
+from api.auth import get_admin_user
+from config import settings
+from utils.deployment_events import deployment_events
+from utils.workflow_dispatch import dispatch_queue
+from utils.metrics import queue_depth, registry
+from utils.passwords import password_hasher
+from utils.profiling import request_profiler
+
+router = APIRouter(tags=["monitoring"])
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+queue_depth.track(lambda: {
+    ("deployment_events",): deployment_events.pending,
+    ("workflow_dispatch",): dispatch_queue.pending,
+    ("password_hash",): password_hasher.pending,
+})
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics(request: Request):
+    """Scrape endpoint; bearer-token protected when METRICS_TOKEN is set"""
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Metrics disabled")
+    if settings.METRICS_TOKEN:
+        supplied = request.headers.get("Authorization", "")
+        if not hmac.compare_digest(supplied, f"Bearer {settings.METRICS_TOKEN}"):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token")
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
+
+@router.get("/api/admin/profiles")
+async def list_profiles(user=Depends(get_admin_user)):
+    """Kept profiles, newest first"""
+    return [profile.summary() for profile in reversed(request_profiler.profiles)]
+
+@router.get("/api/admin/profiles/{profile_id}")
+async def get_profile(profile_id: int, top: int = 100, user=Depends(get_admin_user)):
+    """Collapsed stacks (most sampled first) and the query log of one profile"""
+    profile = request_profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    return profile.detail(top)
@@ -2,11 +2,19 @@
 Packages API
 GET /api/packages - List all packages
 """
-from fastapi import APIRouter, HTTPException
-from typing import List, Dict
+from fastapi import APIRouter, HTTPException, Request, Response
+
+from utils.http_cache import StaticJSON
 
 router = APIRouter(prefix="/api/packages", tags=["packages"])
 
+# The package catalog, served by both main.py and app.py; bump on every change
+CATALOG_VERSION = 2
+
+# Clients reuse the catalog this long, then revalidate by ETag. A constant rather than
+# a setting: app.py serves the catalog too and does not load the API's settings.
+CATALOG_CACHE_SECONDS = 300
+
 PACKAGES = {
     "basic": {
         "tier": "basic",
@@ -83,14 +91,20 @@ PACKAGES = {
     }
 }
 
-@router.get("/")
-async def list_packages() -> List[Dict]:
-    """Get all available packages"""
-    return list(PACKAGES.values())
+# Serialized once at import; requests are answered from these bytes
+_headers = {"X-Catalog-Version": str(CATALOG_VERSION)}
+_catalog = StaticJSON(list(PACKAGES.values()), CATALOG_CACHE_SECONDS, _headers)
+_tiers = {tier: StaticJSON(package, CATALOG_CACHE_SECONDS, _headers) for tier, package in PACKAGES.items()}
+
+@router.get("")
+@router.get("/", include_in_schema=False)
+async def list_packages(request: Request) -> Response:
+    """Get all available packages (ETag-validated; If-None-Match gets a 304)"""
+    return _catalog.response(request)
 
 @router.get("/{tier}")
-async def get_package(tier: str) -> Dict:
+async def get_package(tier: str, request: Request) -> Response:
     """Get specific package details"""
-    if tier not in PACKAGES:
+    if tier not in _tiers:
         raise HTTPException(status_code=404, detail="Package not found")
-    return PACKAGES[tier]
\ No newline at end of file
+    return _tiers[tier].response(request)
@@ -0,0 +1,63 @@
+"""
+Webhooks API
+POST /api/webhook/github - GitHub Actions workflow progress
+"""
+from fastapi import APIRouter, HTTPException, Request, status
+from typing import Optional
+import hashlib
+import hmac
+import json
+import logging
+
+from config import settings
+from utils.cache import TTLCache
+from utils.deployment_events import deployment_events, parse_event
+
+router = APIRouter(prefix="/api/webhook", tags=["webhooks"])
+logger = logging.getLogger(__name__)
+
+# GitHub retries deliveries with the same X-GitHub-Delivery id
+recent_deliveries = TTLCache(maxsize=10000, ttl=3600)
+
+def verify_signature(body: bytes, signature: Optional[str]) -> bool:
+    """Check X-Hub-Signature-256 (HMAC-SHA256 of the raw body)"""
+    if not settings.GITHUB_WEBHOOK_SECRET or not signature or not signature.startswith("sha256="):
+        return False
+    expected = hmac.new(settings.GITHUB_WEBHOOK_SECRET.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature[len("sha256="):])
+
+@router.post("/github", status_code=status.HTTP_202_ACCEPTED)
+async def github_webhook(request: Request):
+    """
+    Receive `workflow_run` / `workflow_job` events
+
+    Acknowledged as soon as the signature is checked and the event queued;
+    deployments are updated by the next batched flush.
+    """
+    if not settings.GITHUB_WEBHOOK_SECRET:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Webhook secret not configured")
+
+    body = await request.body()
+    if not verify_signature(body, request.headers.get("X-Hub-Signature-256")):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid signature")
+
+    event = request.headers.get("X-GitHub-Event", "")
+    if event == "ping":
+        return {"success": True, "event": "ping"}
+
+    delivery = request.headers.get("X-GitHub-Delivery")
+    if delivery:
+        if delivery in recent_deliveries:
+            return {"success": True, "duplicate": True}
+        recent_deliveries.set(delivery, True)
+
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid JSON payload")
+
+    update = parse_event(event, payload) if isinstance(payload, dict) else None
+    if update:
+        deployment_events.submit(update)
+
+    return {"success": True, "queued": update is not None}
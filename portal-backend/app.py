@@ -1,12 +1,26 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+from contextlib import asynccontextmanager
 import os
-import requests
 from datetime import datetime
 from typing import Optional
 
-app = FastAPI()
+from api import packages
+from utils.github import GitHubClient
+from utils.state_store import create_state_store
+
+# Config from environment (this app does not use the main API's settings)
+GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
+GITHUB_REPO = os.getenv("GITHUB_REPO")  # e.g., "username/azure-caflz-saas"
+github = GitHubClient(GITHUB_TOKEN, GITHUB_REPO, base_url=os.getenv("GITHUB_API_URL", "https://api.github.com"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await github.aclose()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -16,12 +30,33 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Config from environment
-GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
-GITHUB_REPO = os.getenv("GITHUB_REPO")  # e.g., "username/azure-caflz-saas"
+# Package catalog, shared with main.py
+app.include_router(packages.router)
+
+# Deployment state shared by all workers and instances: the portal_state table
+# in STATE_DATABASE_URL or DATABASE_URL (STATE_BACKEND=memory for a single worker)
+state = create_state_store(
+    os.getenv("STATE_BACKEND", "database"),
+    os.getenv("STATE_DATABASE_URL") or os.getenv("DATABASE_URL", "sqlite:///./portal-state.db"),
+    float(os.getenv("STATE_POLL_SECONDS", "1.0")),
+)
+DEPLOYMENTS = "deployments"
 
-# In-memory storage (replace with database later)
-deployments = {}
+# Longest a status request may wait for a change
+MAX_WAIT_SECONDS = 60
+
+# Webhook step -> progress
+PROGRESS_MAP = {
+    "validate": 10,
+    "management": 30,
+    "hub": 60,
+    "spoke": 90,
+    "completed": 100
+}
+
+def deployment_view(entry) -> dict:
+    """Stored deployment plus its version, for change polling"""
+    return {**entry.value, "version": entry.version}
 
 class DeployRequest(BaseModel):
     packageType: str
@@ -34,33 +69,20 @@ def generate_customer_id(company_name: str) -> str:
     """Generate customer ID from company name"""
     return company_name.lower().replace(' ', '').replace('-', '')[:6]
 
-def trigger_github_workflow(customer_id: str, request: DeployRequest):
+async def trigger_github_workflow(customer_id: str, request: DeployRequest):
     """Trigger GitHub Actions deployment workflow"""
-    headers = {
-        "Authorization": f"Bearer {GITHUB_TOKEN}",
-        "Accept": "application/vnd.github+json",
-        "X-GitHub-Api-Version": "2022-11-28"
-    }
-    
-    url = f"https://api.github.com/repos/{GITHUB_REPO}/actions/workflows/deploy-infrastructure.yml/dispatches"
-    
-    payload = {
-        "ref": "main",
-        "inputs": {
-            "customer_id": customer_id,
-            "customer_name": request.companyName,
-            "customer_email": request.contactEmail,
-            "region": "eastus",
-            "package_tier": request.packageType,
-            "hub_vnet_cidr": request.networkConfig.get('hubVnetCidr', '10.1.0.0/16'),
-            "spoke_vnet_cidr": request.networkConfig.get('spokeVnetCidr', '10.2.0.0/16')
-        }
+    inputs = {
+        "customer_id": customer_id,
+        "customer_name": request.companyName,
+        "customer_email": request.contactEmail,
+        "region": "eastus",
+        "package_tier": request.packageType,
+        "hub_vnet_cidr": request.networkConfig.get('hubVnetCidr', '10.1.0.0/16'),
+        "spoke_vnet_cidr": request.networkConfig.get('spokeVnetCidr', '10.2.0.0/16')
     }
     
-    response = requests.post(url, json=payload, headers=headers)
-    
-    if response.status_code != 204:
-        raise Exception(f"GitHub API error: {response.status_code} - {response.text}")
+    # Shared pooled client: timeouts, retries and rate-limit handling
+    await github.dispatch_workflow("deploy-infrastructure.yml", inputs)
     
     return True
 
@@ -72,7 +94,7 @@ async def deploy_infrastructure(request: DeployRequest):
         customer_id = generate_customer_id(request.companyName)
         
         # Store deployment info
-        deployments[customer_id] = {
+        await state.put(DEPLOYMENTS, customer_id, {
             "id": customer_id,
             "customer_name": request.companyName,
             "email": request.contactEmail,
@@ -82,10 +104,10 @@ async def deploy_infrastructure(request: DeployRequest):
             "current_step": "Queued",
             "created_at": datetime.now().isoformat(),
             "github_url": f"https://github.com/{GITHUB_REPO}/actions"
-        }
+        })
         
         # Trigger GitHub Actions
-        trigger_github_workflow(customer_id, request)
+        await trigger_github_workflow(customer_id, request)
         
         return {
             "success": True,
@@ -98,19 +120,28 @@ async def deploy_infrastructure(request: DeployRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/deployments/{deployment_id}")
-async def get_deployment_status(deployment_id: str):
-    """Get deployment status"""
-    deployment = deployments.get(deployment_id)
+async def get_deployment_status(deployment_id: str, after: Optional[int] = None, wait: float = 0):
+    """
+    Get deployment status
+
+    With `after=<version>&wait=<seconds>` the request is held until the
+    deployment moves past that version (or the wait ends), so clients can
+    follow progress without polling.
+    """
+    if after is not None and wait > 0:
+        entry = await state.wait(DEPLOYMENTS, deployment_id, after, min(wait, MAX_WAIT_SECONDS))
+    else:
+        entry = await state.get(DEPLOYMENTS, deployment_id)
     
-    if not deployment:
+    if not entry:
         raise HTTPException(status_code=404, detail="Deployment not found")
     
-    return deployment
+    return deployment_view(entry)
 
 @app.get("/api/deployments")
 async def list_deployments():
     """List all deployments"""
-    return list(deployments.values())
+    return [deployment_view(entry) for entry in await state.list(DEPLOYMENTS)]
 
 @app.post("/api/webhook/github")
 async def github_webhook(payload: dict):
@@ -119,46 +150,18 @@ async def github_webhook(payload: dict):
     status = payload.get("status")
     step = payload.get("step", "")
     
-    if customer_id in deployments:
-        deployments[customer_id]["status"] = status
-        deployments[customer_id]["current_step"] = step
-        
+    def apply(deployment: dict) -> dict:
+        deployment["status"] = status
+        deployment["current_step"] = step
         # Update progress based on step
-        progress_map = {
-            "validate": 10,
-            "management": 30,
-            "hub": 60,
-            "spoke": 90,
-            "completed": 100
-        }
-        deployments[customer_id]["progress"] = progress_map.get(step.lower(), 0)
+        deployment["progress"] = PROGRESS_MAP.get(step.lower(), 0)
+        return deployment
+    
+    if customer_id:
+        await state.update(DEPLOYMENTS, customer_id, apply)
     
     return {"success": True}
 
-@app.get("/api/packages")
-async def get_packages():
-    """Get available packages"""
-    return [
-        {
-            "id": "basic",
-            "name": "Basic",
-            "price": 1500,
-            "features": ["Management", "Hub", "1 Spoke", "Key Vault"]
-        },
-        {
-            "id": "standard",
-            "name": "Standard",
-            "price": 3500,
-            "features": ["Management", "Hub", "1 Spoke", "SQL", "Storage", "Key Vault"]
-        },
-        {
-            "id": "premium",
-            "name": "Premium",
-            "price": 6500,
-            "features": ["Management", "Hub", "2 Spokes", "SQL", "Storage", "Key Vault", "VPN Gateway", "Premium Firewall"]
-        }
-    ]
-
 @app.get("/")
 async def root():
     return {"status": "Azure CAF-LZ Portal API", "version": "1.0"}
@@ -2,12 +2,19 @@
 Database Configuration and Session Management
 """
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
-from typing import Generator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Generator, Iterator
+import os
+import tempfile
 from config import settings
 
+# Directory holding alembic.ini and migrations/
+BACKEND_DIR = Path(__file__).resolve().parent
+
 # Database engine
 engine = create_engine(
     settings.DATABASE_URL,
@@ -33,6 +40,70 @@ def get_db() -> Generator[Session, None, None]:
     finally:
         db.close()
 
+@contextmanager
+def leader_lock(key: int) -> Iterator[bool]:
+    """
+    Try to become the single process running a periodic job; yields whether it did
+
+    A session-level PostgreSQL advisory lock, so one worker across all
+    instances wins and the others skip the round. On other databases
+    (single-host development) a non-blocking file lock elects one worker
+    of this host.
+    """
+    if engine.dialect.name == "postgresql":
+        with engine.connect() as connection:
+            acquired = connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": key}).scalar()
+            try:
+                yield bool(acquired)
+            finally:
+                if acquired:
+                    connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": key})
+        return
+
+    import fcntl
+
+    with open(os.path.join(tempfile.gettempdir(), f"caflz-leader-{key}.lock"), "w") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def alembic_config():
+    """Alembic configuration for in-process use (keeps the app's logging setup)"""
+    from alembic.config import Config
+
+    config = Config(str(BACKEND_DIR / "alembic.ini"))
+    config.set_main_option("script_location", str(BACKEND_DIR / "migrations"))
+    config.attributes["configure_logger"] = False
+    return config
+
 def init_db():
-    """Initialize database tables"""
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    """Bring the schema up to date by applying pending migrations"""
+    from alembic import command
+
+    command.upgrade(alembic_config(), "head")
+
+def check_schema():
+    """
+    Verify the database is at the latest migration
+
+    Runs at startup instead of create_all: one read of alembic_version,
+    and the schema is only ever changed by migrations, never implicitly
+    by a booting worker.
+    """
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+
+    heads = set(ScriptDirectory.from_config(alembic_config()).get_heads())
+    with engine.connect() as connection:
+        current = set(MigrationContext.configure(connection).get_current_heads())
+    if current != heads:
+        raise RuntimeError(
+            f"Database schema is at {', '.join(sorted(current)) or 'no revision'}, expected {', '.join(sorted(heads))} "
+            "(run: alembic upgrade head; for a database created before migrations, alembic stamp 0001 first)"
+        )
\ No newline at end of file
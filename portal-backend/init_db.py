@@ -1,16 +1,17 @@
 """
 Initialize Database
-Creates all tables and seeds initial data
+Applies the migrations and seeds initial data
 
 Run: python init_db.py
 """
 import sys
-from sqlalchemy import create_engine, inspect
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker
-from database import Base, engine, SessionLocal
+from database import Base, engine, SessionLocal, init_db
 from models.customer import Customer
 from models.deployment import Deployment
 from models.user import User
+from models.cost_alert import CostAlert
 
 def check_tables_exist():
     """Check if tables already exist"""
@@ -19,9 +20,9 @@ def check_tables_exist():
     return existing_tables
 
 def create_tables():
-    """Create all tables"""
-    print("Creating database tables...")
-    Base.metadata.create_all(bind=engine)
+    """Create all tables by applying every migration"""
+    print("Applying database migrations...")
+    init_db()
     print("✅ Tables created successfully!")
 
 def seed_data():
@@ -119,6 +120,8 @@ def main():
         
         print("\n🗑️  Dropping existing tables...")
         Base.metadata.drop_all(bind=engine)
+        with engine.begin() as connection:
+            connection.execute(text("DROP TABLE IF EXISTS alembic_version"))
         print("✅ Tables dropped.")
     
     # Create tables
@@ -6,18 +6,24 @@ from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
+import asyncio
 import logging
-from api import customers, deploy, cost, recommendations, auth, packages, deploy_trigger, deployments
+from api import customers, deploy, cost, recommendations, auth, packages, deploy_trigger, deployments, webhooks, monitoring
 from config import settings
-from database import init_db
-from api import customers, deploy, cost, recommendations, auth, packages, deploy_trigger
+from database import check_schema, engine, init_db
+from utils.cost_alerts import run_cost_alert_scheduler
+from utils.deployment_events import deployment_events
+from utils.logging import RequestContextMiddleware, configure_logging, shutdown_logging
+from utils.metrics import MetricsMiddleware, instrument_engine
+from utils import profiling
+from utils.run_reconciler import run_reconciler
+from utils.tracing import TracingMiddleware, configure_tracing, shutdown_tracing
+from utils.workflow_dispatch import dispatch_queue, github_client
 
 
 # Configure logging
-logging.basicConfig(
-    level=settings.LOG_LEVEL,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+configure_logging(settings.LOG_LEVEL, settings.LOG_FORMAT, settings.LOG_SAMPLING)
+configure_tracing()
 logger = logging.getLogger(__name__)
 
 @asynccontextmanager
@@ -25,13 +31,41 @@ async def lifespan(app: FastAPI):
     """Startup and shutdown events"""
     # Startup
     logger.info(f"Starting {settings.APP_NAME} v{settings.APP_VERSION}")
-    init_db()
-    logger.info("Database initialized")
+    if settings.DB_MIGRATE_ON_STARTUP:
+        init_db()
+        logger.info("Database migrated")
+    else:
+        check_schema()
+        logger.info("Database schema checked")
+    
+    if github_client.configured:
+        await dispatch_queue.recover()
+    event_task = asyncio.create_task(deployment_events.run())
+    dispatch_task = asyncio.create_task(dispatch_queue.run())
+    reconcile_task = None
+    if github_client.configured:
+        reconcile_task = asyncio.create_task(run_reconciler.run(settings.GITHUB_RECONCILE_INTERVAL_SECONDS))
+    alert_task = None
+    if settings.COST_ANALYSIS_ENABLED:
+        alert_task = asyncio.create_task(run_cost_alert_scheduler())
     
     yield
     
     # Shutdown
     logger.info("Shutting down application")
+    if alert_task:
+        alert_task.cancel()
+    event_task.cancel()
+    dispatch_task.cancel()
+    if reconcile_task:
+        reconcile_task.cancel()
+    await github_client.aclose()
+    try:
+        await deployment_events.flush()
+    except Exception as e:
+        logger.error(f"Final deployment event flush failed: {e}")
+    shutdown_tracing()
+    shutdown_logging()
 
 # Create FastAPI app
 app = FastAPI(
@@ -52,6 +86,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Metrics: request latency per route and DB usage per request
+if settings.METRICS_ENABLED:
+    instrument_engine(engine)
+    app.add_middleware(MetricsMiddleware)
+
+# Opt-in request profiling (X-Profile header or PROFILING_SAMPLE_RATE)
+if settings.PROFILING_TOKEN or settings.PROFILING_SAMPLE_RATE:
+    profiling.instrument_engine(engine)
+    app.add_middleware(profiling.ProfilingMiddleware)
+
+# Server span per request; deploy, Terraform, Azure and GitHub spans nest under it
+if settings.TRACING_EXPORTER != "none":
+    app.add_middleware(TracingMiddleware)
+
+# Request IDs for log records (outermost, so every layer's logs carry it)
+app.add_middleware(RequestContextMiddleware)
+
 # Global Exception Handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -95,6 +146,8 @@ app.include_router(deployments.router)
 # New routers (already have /api prefix defined in them)
 app.include_router(packages.router)
 app.include_router(deploy_trigger.router)
+app.include_router(webhooks.router)
+app.include_router(monitoring.router)
 
 if __name__ == "__main__":
     import uvicorn
@@ -102,5 +155,6 @@ if __name__ == "__main__":
         "main:app",
         host=settings.HOST,
         port=settings.PORT,
-        reload=settings.DEBUG
+        reload=settings.DEBUG,
+        log_config=None  # Keep the queue-based pipeline set up by configure_logging
     )
\ No newline at end of file
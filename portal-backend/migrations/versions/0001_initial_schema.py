@@ -0,0 +1,87 @@
+"""
+Initial schema
+
+The schema as create_all built it before migrations were introduced:
+customers, users and deployments. Databases created that way are adopted
+with `alembic stamp 0001`; later revisions bring them up to date.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "customers",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("customer_id", sa.String(10), nullable=False),
+        sa.Column("customer_name", sa.String(100), nullable=False),
+        sa.Column("email", sa.String(100), nullable=False),
+        sa.Column("package_tier", sa.String(20)),
+        sa.Column("monthly_cost", sa.Float()),
+        sa.Column("region", sa.String(50)),
+        sa.Column("region_code", sa.String(10)),
+        sa.Column("hub_vnet_cidr", sa.String(20)),
+        sa.Column("spoke_vnet_cidr", sa.String(20)),
+        sa.Column("status", sa.String(20)),
+        sa.Column("is_deployed", sa.Boolean()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+    op.create_index("ix_customers_id", "customers", ["id"])
+    op.create_index("ix_customers_customer_id", "customers", ["customer_id"], unique=True)
+    op.create_index("ix_customers_email", "customers", ["email"], unique=True)
+
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("username", sa.String(50)),
+        sa.Column("email", sa.String(100)),
+        sa.Column("hashed_password", sa.String(255)),
+        sa.Column("role", sa.String(20)),
+        sa.Column("customer_id", sa.Integer(), sa.ForeignKey("customers.id"), nullable=True),
+        sa.Column("is_active", sa.Boolean()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("last_login", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    op.create_table(
+        "deployments",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("customer_id", sa.Integer(), sa.ForeignKey("customers.id"), nullable=False),
+        sa.Column("deployment_name", sa.String(100)),
+        sa.Column("status", sa.String(50)),
+        sa.Column("package_tier", sa.String(20)),
+        sa.Column("github_run_id", sa.String(50)),
+        sa.Column("github_run_url", sa.String(500)),
+        sa.Column("current_step", sa.String(100)),
+        sa.Column("progress_percentage", sa.Integer()),
+        sa.Column("management_deployed", sa.Boolean()),
+        sa.Column("hub_deployed", sa.Boolean()),
+        sa.Column("spoke_deployed", sa.Boolean()),
+        sa.Column("estimated_monthly_cost", sa.Float()),
+        sa.Column("logs", sa.JSON()),
+        sa.Column("error_message", sa.String(1000), nullable=True),
+        sa.Column("started_at", sa.DateTime()),
+        sa.Column("completed_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_deployments_id", "deployments", ["id"])
+    op.create_index("ix_deployments_github_run_id", "deployments", ["github_run_id"])
+
+
+def downgrade():
+    op.drop_table("deployments")
+    op.drop_table("users")
+    op.drop_table("customers")
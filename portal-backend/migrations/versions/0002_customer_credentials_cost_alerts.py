@@ -0,0 +1,58 @@
+"""
+Customer credentials and cost alerts
+
+- customers: monthly_budget, per-customer Azure credentials (tenant_id,
+  subscription_ids, sp_client_id, encrypted sp_client_secret) and named
+  spoke_vnets
+- cost_alerts: persisted budget alert rules
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+CUSTOMER_COLUMNS = (
+    ("monthly_budget", sa.Float()),
+    ("tenant_id", sa.String(50)),
+    ("subscription_ids", sa.JSON()),
+    ("sp_client_id", sa.String(50)),
+    ("sp_client_secret", sa.String(500)),
+    ("spoke_vnets", sa.JSON()),
+)
+
+
+def upgrade():
+    for name, type_ in CUSTOMER_COLUMNS:
+        op.add_column("customers", sa.Column(name, type_))
+
+    op.create_table(
+        "cost_alerts",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("customer_id", sa.Integer(), sa.ForeignKey("customers.id"), nullable=False),
+        sa.Column("threshold_percentage", sa.Float(), nullable=False),
+        sa.Column("basis", sa.String(20)),
+        sa.Column("alert_emails", sa.JSON()),
+        sa.Column("enabled", sa.Boolean()),
+        sa.Column("last_notified_period", sa.String(7), nullable=True),
+        sa.Column("last_notified_at", sa.DateTime(), nullable=True),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+        sa.UniqueConstraint("customer_id", "threshold_percentage", "basis", name="uq_cost_alert_rule"),
+    )
+    op.create_index("ix_cost_alerts_id", "cost_alerts", ["id"])
+    op.create_index("ix_cost_alerts_customer_id", "cost_alerts", ["customer_id"])
+
+
+def downgrade():
+    op.drop_table("cost_alerts")
+    with op.batch_alter_table("customers") as batch:
+        for name, _ in reversed(CUSTOMER_COLUMNS):
+            batch.drop_column(name)
@@ -0,0 +1,46 @@
+"""
+Hot path indexes
+
+- deployments (customer_id, started_at): a customer's deployments, newest first
+- deployments (status, started_at): in-flight deployments for the run reconciler
+- deployments (started_at): the deployment list, newest first
+- customers (status), (updated_at): list filters and recently changed customers
+- cost_alerts (enabled, customer_id): the alert scheduler's rule scan; the
+  customer_id index is dropped, uq_cost_alert_rule already leads with it
+
+On PostgreSQL the indexes are built CONCURRENTLY so live tables stay writable.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ("ix_deployments_customer_started", "deployments", ["customer_id", "started_at"]),
+    ("ix_deployments_status_started", "deployments", ["status", "started_at"]),
+    ("ix_deployments_started_at", "deployments", ["started_at"]),
+    ("ix_customers_status", "customers", ["status"]),
+    ("ix_customers_updated_at", "customers", ["updated_at"]),
+    ("ix_cost_alerts_enabled_customer", "cost_alerts", ["enabled", "customer_id"]),
+)
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True)
+        op.drop_index("ix_cost_alerts_customer_id", table_name="cost_alerts", postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.create_index("ix_cost_alerts_customer_id", "cost_alerts", ["customer_id"], postgresql_concurrently=True)
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,33 @@
+"""
+Portal state
+
+Shared deployment state of the lightweight portal (app.py), so every
+worker and instance reads and updates the same records.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "portal_state",
+        sa.Column("namespace", sa.String(50), primary_key=True),
+        sa.Column("key", sa.String(100), primary_key=True),
+        sa.Column("value", sa.JSON(), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+
+
+def downgrade():
+    op.drop_table("portal_state")
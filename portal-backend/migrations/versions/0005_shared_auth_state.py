@@ -0,0 +1,41 @@
+"""
+Shared auth state
+
+- revoked_tokens: logged-out access tokens, checked by every worker
+- auth_generation: single-row counter telling workers to drop their
+  token and user caches
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "revoked_tokens",
+        sa.Column("token_hash", sa.String(64), primary_key=True),
+        sa.Column("expires_at", sa.DateTime(), nullable=True),
+        sa.Column("revoked_at", sa.DateTime()),
+    )
+    op.create_index("ix_revoked_tokens_expires_at", "revoked_tokens", ["expires_at"])
+
+    auth_generation = op.create_table(
+        "auth_generation",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("generation", sa.Integer(), nullable=False),
+    )
+    op.bulk_insert(auth_generation, [{"id": 1, "generation": 0}])
+
+
+def downgrade():
+    op.drop_table("auth_generation")
+    op.drop_table("revoked_tokens")
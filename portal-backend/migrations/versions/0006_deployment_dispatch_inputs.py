@@ -0,0 +1,27 @@
+"""
+Deployment dispatch inputs
+
+deployments.dispatch_inputs keeps a deployment's workflow inputs until
+its dispatch is sent, so workers re-queue dispatches lost in a restart.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("deployments", sa.Column("dispatch_inputs", sa.JSON(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("deployments") as batch:
+        batch.drop_column("dispatch_inputs")
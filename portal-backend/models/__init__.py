@@ -4,8 +4,15 @@ Database Models Package
 
 from .customer import Customer
 from .deployment import Deployment
+from .cost_alert import CostAlert
+from .portal_state import PortalState
+from .auth_state import RevokedToken, AuthGeneration
 
 __all__ = [
     'Customer',
-    'Deployment'
+    'Deployment',
+    'CostAlert',
+    'PortalState',
+    'RevokedToken',
+    'AuthGeneration'
 ]
\ No newline at end of file
@@ -0,0 +1,28 @@
+"""
+Auth State Models
+"""
+from sqlalchemy import Column, Integer, String, DateTime
+from database import Base
+from datetime import datetime
+
+class RevokedToken(Base):
+    """A logged-out access token, rejected by every worker until it expires"""
+    __tablename__ = "revoked_tokens"
+
+    token_hash = Column(String(64), primary_key=True)  # sha256 hex of the JWT
+    expires_at = Column(DateTime, nullable=True, index=True)  # Purged once past
+
+    # Timestamps
+    revoked_at = Column(DateTime, default=datetime.utcnow)
+
+class AuthGeneration(Base):
+    """
+    Single-row counter bumped on every revocation and user change
+
+    Workers compare it with the value they last saw and drop their token
+    and user caches when it has moved.
+    """
+    __tablename__ = "auth_generation"
+
+    id = Column(Integer, primary_key=True)  # Always 1
+    generation = Column(Integer, nullable=False, default=0)
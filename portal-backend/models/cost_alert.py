@@ -0,0 +1,34 @@
+"""
+Cost Alert Model
+"""
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, JSON, Float, Index, UniqueConstraint
+from sqlalchemy.orm import relationship
+from database import Base
+from datetime import datetime
+
+class CostAlert(Base):
+    __tablename__ = "cost_alerts"
+    __table_args__ = (
+        UniqueConstraint("customer_id", "threshold_percentage", "basis", name="uq_cost_alert_rule"),
+        Index("ix_cost_alerts_enabled_customer", "enabled", "customer_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    customer_id = Column(Integer, ForeignKey("customers.id"), nullable=False)  # Indexed by uq_cost_alert_rule
+
+    # Rule
+    threshold_percentage = Column(Float, nullable=False)
+    basis = Column(String(20), default="actual")  # actual (month-to-date) | forecast (month-end)
+    alert_emails = Column(JSON, default=list)
+    enabled = Column(Boolean, default=True)
+
+    # Notification state (one notification per rule per billing month)
+    last_notified_period = Column(String(7), nullable=True)  # YYYY-MM
+    last_notified_at = Column(DateTime, nullable=True)
+
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Relationships
+    customer = relationship("Customer", back_populates="cost_alerts")
@@ -1,7 +1,7 @@
 """
 Customer Model
 """
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, JSON
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
@@ -17,20 +17,46 @@ class Customer(Base):
     # Package
     package_tier = Column(String(20), default="standard")
     monthly_cost = Column(Float, default=3500.0)
+    monthly_budget = Column(Float, default=0.0)
+
+    # Azure Credentials
+    tenant_id = Column(String(50))
+    subscription_ids = Column(JSON, default=dict)  # {"hub": ..., "management": ..., "spokes": {...}}
+    sp_client_id = Column(String(50))
+    sp_client_secret = Column(String(500))  # Encrypted (utils.encryption)
 
     # Azure Config
     region = Column(String(50), default="eastus")
     region_code = Column(String(10), default="eus")
     hub_vnet_cidr = Column(String(20), default="10.1.0.0/16")
     spoke_vnet_cidr = Column(String(20), default="10.2.0.0/16")
+    spoke_vnets = Column(JSON, default=dict)  # {"production": "10.2.0.0/16", ...}
 
     # Status
-    status = Column(String(20), default="active")
+    status = Column(String(20), default="active", index=True)
     is_deployed = Column(Boolean, default=False)
 
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
     # Relationships
-    deployments = relationship("Deployment", back_populates="customer", cascade="all, delete-orphan")
\ No newline at end of file
+    deployments = relationship("Deployment", back_populates="customer", cascade="all, delete-orphan")
+    cost_alerts = relationship("CostAlert", back_populates="customer", cascade="all, delete-orphan")
+
+    def to_dict(self) -> dict:
+        """API representation (api.customers.CustomerResponse)"""
+        deployed_at = None
+        if self.is_deployed:
+            completed = [d.completed_at for d in self.deployments if d.completed_at]
+            deployed_at = max(completed).isoformat() if completed else None
+        return {
+            "id": self.customer_id,
+            "name": self.customer_name,
+            "email": self.email,
+            "region": self.region,
+            "status": self.status,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "deployed_at": deployed_at,
+            "monthly_budget": int(self.monthly_budget or 0),
+        }
@@ -1,7 +1,7 @@
 """
 Deployment Model
 """
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, JSON, Float
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, JSON, Float, Index
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
@@ -20,6 +20,10 @@ class DeploymentStatus(str, enum.Enum):
 
 class Deployment(Base):
     __tablename__ = "deployments"
+    __table_args__ = (
+        Index("ix_deployments_customer_started", "customer_id", "started_at"),
+        Index("ix_deployments_status_started", "status", "started_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     customer_id = Column(Integer, ForeignKey("customers.id"), nullable=False)
@@ -31,6 +35,7 @@ class Deployment(Base):
     # GitHub Actions
     github_run_id = Column(String(50), index=True)
     github_run_url = Column(String(500))
+    dispatch_inputs = Column(JSON(none_as_null=True), nullable=True)  # Workflow inputs until the dispatch is sent
 
     # Progress
     current_step = Column(String(100))
@@ -49,7 +54,7 @@ class Deployment(Base):
     error_message = Column(String(1000), nullable=True)
 
     # Timestamps
-    started_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, default=datetime.utcnow, index=True)
     completed_at = Column(DateTime, nullable=True)
 
     # Relationships
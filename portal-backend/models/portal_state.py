@@ -0,0 +1,10 @@
+"""
+Portal State Model
+"""
+from database import Base
+from utils.state_store import portal_state
+
+class PortalState(Base):
+    """Shared key/value state of the lightweight portal (app.py), one row per entry"""
+    # Defined in utils.state_store, which app.py uses without the API's models
+    __table__ = portal_state.to_metadata(Base.metadata)
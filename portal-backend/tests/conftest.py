@@ -0,0 +1,75 @@
+"""
+Test Configuration
+Throwaway database and dummy settings, set before any app module is imported
+
+Run from portal-backend: python -m pytest tests
+TEST_DATABASE_URL points the suite at another database (e.g. PostgreSQL).
+"""
+
+from typing import Callable, List
+import os
+import sys
+import tempfile
+import time
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+_tmp = tempfile.mkdtemp(prefix="portal-tests-")
+os.environ["DATABASE_URL"] = os.environ.get("TEST_DATABASE_URL", f"sqlite:///{_tmp}/portal.db")
+os.environ.setdefault("AZURE_TENANT_ID", "00000000-0000-0000-0000-000000000000")
+os.environ.setdefault("AZURE_SUBSCRIPTION_ID", "00000000-0000-0000-0000-000000000000")
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ["COST_INTELLIGENCE_DATA_PATH"] = f"{_tmp}/cost-intelligence"
+
+# Benchmark results, shown in the terminal summary
+_benchmarks: List[str] = []
+
+
+def per_call(fn: Callable[[], object], rounds: int, repeat: int = 1) -> float:
+    """Mean seconds per call of `fn` over `rounds` calls, best of `repeat` runs"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            fn()
+        best = min(best, (time.perf_counter() - started) / rounds)
+    return best
+
+
+@pytest.fixture
+def benchmark_report(request):
+    """Record a result line for the benchmarks section of the terminal summary"""
+    def report(line: str):
+        _benchmarks.append(f"{request.node.name}: {line}")
+    return report
+
+
+def pytest_terminal_summary(terminalreporter):
+    if _benchmarks:
+        terminalreporter.write_sep("-", "benchmarks")
+        for line in _benchmarks:
+            terminalreporter.write_line(line)
+
+
+@pytest.fixture(scope="session")
+def migrated_db():
+    """The test database at the latest migration"""
+    from database import engine, init_db
+
+    init_db()
+    yield engine
+
+
+@pytest.fixture
+def db(migrated_db):
+    from database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.close()
@@ -0,0 +1,140 @@
+"""
+Cost Anomalies
+Rolling robust scores over daily cost series, replayed from recorded cost rows in fixtures/costs
+"""
+
+from collections import defaultdict
+from datetime import date, timedelta
+from pathlib import Path
+import csv
+
+import numpy as np
+import pytest
+
+from utils.cost_intelligence import get_cost_engine
+
+FIXTURE = Path(__file__).parent / "fixtures" / "costs" / "daily_costs.csv"
+SPIKE = date(2026, 10, 8)
+LAST = date(2026, 10, 9)  # c001 is collected through here, c002 lags a day behind
+
+
+def _recorded_days() -> dict:
+    """(customer, day) -> (resource ids, service names, costs) from the fixture"""
+    days = defaultdict(lambda: ([], [], []))
+    with open(FIXTURE, newline="") as f:
+        for row in csv.DictReader(f):
+            ids, services, costs = days[(row["customer_id"], date.fromisoformat(row["date"]))]
+            ids.append(row["resource_id"])
+            services.append(row["service_name"])
+            costs.append(float(row["cost"]))
+    return dict(days)
+
+
+RECORDED = _recorded_days()
+
+
+@pytest.fixture
+def engine():
+    return get_cost_engine()
+
+
+@pytest.fixture
+def stores(engine, tmp_path):
+    """Cost and anomaly stores holding every recorded day"""
+    cost_store = engine.CostStore(str(tmp_path))
+    for (customer_id, day), (ids, services, costs) in RECORDED.items():
+        cost_store.write_day(customer_id, day, ids, services, costs)
+    return cost_store, engine.AnomalyStore(str(tmp_path))
+
+
+@pytest.fixture
+def detector(engine):
+    return engine.CostAnomalyDetector(window_days=14, threshold=3.5, min_delta=10.0, min_history=7)
+
+
+def _found(anomalies) -> list:
+    return [(a["customer_id"], a["date"], a["dimension"]) for a in anomalies]
+
+
+def test_spike_is_flagged_once_every_customer_has_landed(detector, stores):
+    cost_store, anomaly_store = stores
+    # c002 has not landed the 9th yet: scoring stops at the 8th
+    assert detector.landed_through(cost_store, ["c001", "c002"], LAST) == SPIKE
+
+    anomalies = detector.run(cost_store, anomaly_store, ["c001", "c002"], end=LAST)
+    assert _found(anomalies) == [("c001", SPIKE, "Virtual Machines")]
+    spike = anomalies[0]
+    assert spike["cost"] == 250.0
+    assert spike["baseline"] == pytest.approx(101.0, abs=1.0)
+    assert spike["score"] > 20
+
+    keys, window, last_day = anomaly_store.load_state()
+    assert last_day == SPIKE
+    assert window.shape == (len(keys), 14)
+    assert [(a["date"], a["dimension"]) for a in anomaly_store.load_range("c001", days=30, end=LAST)] == [
+        (SPIKE, "Virtual Machines")
+    ]
+    assert anomaly_store.load_range("c002", days=30, end=LAST) == []
+
+
+def test_each_day_is_scored_once_as_it_lands(detector, stores):
+    cost_store, anomaly_store = stores
+    assert detector.run(cost_store, anomaly_store, ["c001", "c002"], end=SPIKE - timedelta(days=1)) == []
+    assert _found(detector.run(cost_store, anomaly_store, ["c001", "c002"], end=LAST)) == [
+        ("c001", SPIKE, "Virtual Machines")
+    ]
+    # Nothing new landed: the spike is not reported again
+    assert detector.run(cost_store, anomaly_store, ["c001", "c002"], end=LAST) == []
+
+    # c002's 9th lands; only that day is scored
+    cost_store.write_day("c002", LAST, *RECORDED[("c002", SPIKE)])
+    assert detector.run(cost_store, anomaly_store, ["c001", "c002"], end=LAST) == []
+    assert anomaly_store.load_state()[2] == LAST
+
+
+def test_corrected_costs_rescore_the_revised_day(detector, stores):
+    cost_store, anomaly_store = stores
+    detector.run(cost_store, anomaly_store, ["c001", "c002"], end=LAST)
+
+    # Cost Management corrects the spike away: the stored anomaly goes with it
+    ids, services, costs = RECORDED[("c001", SPIKE)]
+    cost_store.write_day("c001", SPIKE, ids, services, [60.0, 41.0, 12.0])
+    keys, window, last_day = anomaly_store.load_state()
+    assert detector.first_revised_day(cost_store, ["c001", "c002"], keys, window, last_day) == SPIKE
+    assert detector.run(cost_store, anomaly_store, ["c001", "c002"], end=LAST) == []
+    assert anomaly_store.load_range("c001", days=30, end=LAST) == []
+
+    # A late cost row revises an earlier day into a spike
+    late = SPIKE - timedelta(days=3)
+    ids, services, costs = RECORDED[("c001", late)]
+    cost_store.write_day("c001", late, ids + ["/late/vm"], services + ["Virtual Machines"], costs + [400.0])
+    assert _found(detector.run(cost_store, anomaly_store, ["c001", "c002"], end=LAST)) == [
+        ("c001", late, "Virtual Machines")
+    ]
+
+
+def test_vectorized_scores_match_a_per_series_baseline(detector):
+    rng = np.random.default_rng(3)
+    window = rng.normal(100, 5, size=(50, 14))
+    window[::7, :10] = np.nan  # Series with too little history
+    current = window[:, -1] + rng.choice([0.0, 80.0], size=50, p=[0.8, 0.2])
+
+    baseline, scores, anomalous = detector.score(window, current)
+    for i in range(50):
+        history = window[i][~np.isnan(window[i])]
+        median = np.median(history)
+        spread = max(1.4826 * np.median(np.abs(history - median)), 0.05 * median)
+        assert baseline[i] == pytest.approx(median)
+        assert scores[i] == pytest.approx((current[i] - median) / spread)
+        flagged = len(history) >= 7 and current[i] - median >= 10 and scores[i] >= 3.5
+        assert anomalous[i] == flagged
+
+
+def test_contributors_name_the_resource_behind_the_spike(detector, stores):
+    cost_store, _ = stores
+    frame = cost_store.load_range("c001", days=14, end=SPIKE)
+    contributors = detector.contributors(frame, "Virtual Machines", SPIKE)
+    assert [(c["resource_name"], c["cost"], c["increase"]) for c in contributors] == [
+        ("vm-batch-01", 190.0, 149.0)
+    ]
+    assert detector.contributors(frame, "Storage", SPIKE - timedelta(days=30)) == []
@@ -0,0 +1,196 @@
+"""
+Authentication
+Shared revocation and cache invalidation, the per-request auth overhead and login benchmarks
+"""
+
+from datetime import timedelta
+import asyncio
+import os
+import statistics
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from conftest import per_call
+from models.user import User as UserRecord
+
+
+@pytest.fixture
+def auth(db):
+    from api import auth
+
+    if db.query(UserRecord).filter(UserRecord.username == "alice").first() is None:
+        db.add(UserRecord(username="alice", email="alice@example.com", hashed_password="x", role="admin"))
+        db.commit()
+    auth.token_cache.clear()
+    auth.user_cache.clear()
+    _sync_interval_passes(auth)
+    return auth
+
+
+def _sync_interval_passes(auth):
+    """As if AUTH_SYNC_INTERVAL_SECONDS went by: the next request reads auth_generation"""
+    auth._generation_checked_at = float("-inf")
+
+
+def _token(auth, minutes: int = 15) -> str:
+    """Tokens for the same user and expiry are identical; tests revoking one use their own expiry"""
+    return auth.create_access_token({"sub": "alice"}, expires_delta=timedelta(minutes=minutes))
+
+
+def test_revocation_reaches_other_workers(auth, db):
+    token = _token(auth)
+    assert asyncio.run(auth.get_current_user(token=token, db=db)).username == "alice"
+
+    # Another worker still holds the verified payload when this one revokes it
+    stale = auth.token_cache.get(auth._token_key(token))
+    auth.revoke_token(db, token)
+    auth.token_cache.set(auth._token_key(token), stale)
+
+    # Until it next reads auth_generation, the other worker still accepts the token
+    assert asyncio.run(auth.get_current_user(token=token, db=db)).username == "alice"
+    _sync_interval_passes(auth)
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(auth.get_current_user(token=token, db=db))
+    assert excinfo.value.status_code == 401
+
+
+def test_user_invalidation_reaches_other_workers(auth, db):
+    token = _token(auth, minutes=16)
+    asyncio.run(auth.get_current_user(token=token, db=db))
+
+    record = db.query(UserRecord).filter(UserRecord.username == "alice").first()
+    record.is_active = False
+    stale = auth.user_cache.get("alice")
+    auth.invalidate_user(db, "alice")
+    auth.user_cache.set("alice", stale)
+    _sync_interval_passes(auth)
+    try:
+        with pytest.raises(HTTPException):
+            asyncio.run(auth.get_current_user(token=token, db=db))
+    finally:
+        record.is_active = True
+        auth.invalidate_user(db, "alice")
+
+
+def test_auth_overhead_per_request(auth, db):
+    """Microbenchmark: cached token and user vs. verifying and loading on every request"""
+    from jose import jwt
+
+    token = _token(auth, minutes=17)
+    rounds = 500
+
+    def uncached():
+        payload = jwt.decode(token, auth.settings.SECRET_KEY, algorithms=[auth.settings.ALGORITHM])
+        db.query(UserRecord).filter(UserRecord.username == payload["sub"]).first()
+
+    def cached():
+        auth.sync_auth_caches(db)
+        payload = auth.decode_token(db, token)
+        auth.load_user(db, payload["sub"])
+
+    cached()
+    uncached_s = per_call(uncached, rounds)
+    cached_s = per_call(cached, rounds)
+
+    # Within the sync interval the cached path touches neither the signature nor the database
+    assert cached_s * 10 < uncached_s, f"cached {cached_s * 1e6:.0f} us, verify+load {uncached_s * 1e6:.0f} us"
+
+
+# bcrypt cost for the login benchmarks: ~10 ms per verify instead of ~250 ms at 12 rounds
+BENCH_ROUNDS = 8
+
+
+@pytest.fixture
+def login_user(auth, db, monkeypatch):
+    """A user with a BENCH_ROUNDS hash, and auth.password_hasher using that cost"""
+    from passlib.context import CryptContext
+    from utils.passwords import PasswordHasher
+
+    context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BENCH_ROUNDS)
+    record = db.query(UserRecord).filter(UserRecord.username == "bench").first()
+    if record is None:
+        record = UserRecord(username="bench", email="bench@example.com", role="customer")
+        db.add(record)
+    record.hashed_password = context.hash("bench-password")
+    db.commit()
+
+    hasher = PasswordHasher(workers=4, queue_limit=64, context=context)
+    monkeypatch.setattr(auth, "password_hasher", hasher)
+    return hasher
+
+
+def _login(auth, db, password: str = "bench-password"):
+    from fastapi.security import OAuth2PasswordRequestForm
+
+    return auth.login(OAuth2PasswordRequestForm(username="bench", password=password), db=db)
+
+
+def test_login_throughput_and_latency(auth, db, login_user, benchmark_report):
+    """Benchmark: a burst of logins runs in the hashing pool while the event loop keeps serving"""
+    logins = 32
+    record = db.query(UserRecord).filter(UserRecord.username == "bench").first()
+    verify_s = per_call(lambda: login_user.context.verify("bench-password", record.hashed_password), 3)
+
+    async def burst():
+        loop = asyncio.get_running_loop()
+        stalls = []
+
+        async def ticker():
+            while True:
+                before = loop.time()
+                await asyncio.sleep(0.001)
+                stalls.append(loop.time() - before - 0.001)
+
+        async def timed_login():
+            started = time.perf_counter()
+            await _login(auth, db)
+            return time.perf_counter() - started
+
+        tick = asyncio.create_task(ticker())
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(timed_login() for _ in range(logins)))
+        elapsed = time.perf_counter() - started
+        tick.cancel()
+        return latencies, elapsed, stalls
+
+    latencies, elapsed, stalls = asyncio.run(burst())
+    throughput = logins / elapsed
+    benchmark_report(
+        f"login: {throughput:.0f}/s, p50 {statistics.median(latencies) * 1000:.0f} ms, "
+        f"p95 {statistics.quantiles(latencies, n=20)[-1] * 1000:.0f} ms, "
+        f"worst event loop stall {max(stalls) * 1000:.1f} ms (one verify {verify_s * 1000:.0f} ms)"
+    )
+
+    # Off the loop, other tasks keep running between and during verifies; bcrypt
+    # on the loop would let the ticker in about once per login
+    assert len(stalls) > 2 * logins
+    # The pool uses the cores it has (at least half of the ideal rate)
+    parallelism = min(os.cpu_count() or 1, 4)
+    assert throughput > 0.5 * parallelism / verify_s
+    assert login_user.pending == 0
+
+
+def test_login_storm_is_shed_not_queued(auth, db, login_user):
+    login_user.queue_limit = 2
+
+    async def storm():
+        return await asyncio.gather(*(_login(auth, db) for _ in range(8)), return_exceptions=True)
+
+    results = asyncio.run(storm())
+    rejected = [r for r in results if isinstance(r, HTTPException) and r.status_code == 503]
+    assert len(rejected) == 6
+    assert all(r["token_type"] == "bearer" for r in results if isinstance(r, dict))
+
+
+def test_login_upgrades_outdated_hash(auth, db, login_user):
+    from passlib.context import CryptContext
+
+    record = db.query(UserRecord).filter(UserRecord.username == "bench").first()
+    record.hashed_password = CryptContext(schemes=["bcrypt"], bcrypt__rounds=BENCH_ROUNDS - 1).hash("bench-password")
+    db.commit()
+
+    asyncio.run(_login(auth, db))
+    db.refresh(record)
+    assert record.hashed_password.startswith(f"$2b${BENCH_ROUNDS:02d}$")
@@ -0,0 +1,182 @@
+"""
+Cost Alerts
+Budget alert evaluation and email delivery through a local SMTP sink
+"""
+
+from contextlib import contextmanager
+from datetime import date, datetime
+from email import message_from_bytes, policy
+from typing import Iterator
+import socketserver
+import threading
+
+import pytest
+
+from models.cost_alert import CostAlert
+from models.customer import Customer
+from utils.cost_alerts import evaluate_cost_alerts
+from utils.cost_intelligence import get_cost_engine
+from utils.notifications import EmailNotifier
+
+AS_OF = date(2026, 10, 10)
+
+
+class SmtpSink(socketserver.ThreadingTCPServer):
+    """Minimal SMTP server that accepts every message and keeps it"""
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SmtpSinkHandler)
+        self.messages = []  # (envelope recipients, parsed message)
+        self.connections = 0
+
+    def notifier(self) -> EmailNotifier:
+        return EmailNotifier(host="127.0.0.1", port=self.server_address[1], use_tls=False, from_email="portal@example.com")
+
+
+class SmtpSinkHandler(socketserver.StreamRequestHandler):
+    def reply(self, line: str):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply("220 sink ESMTP")
+        recipients = []
+        for line in self.rfile:
+            command = line.decode().strip()
+            verb = command[:4].upper()
+            if verb in ("HELO", "EHLO"):
+                self.reply("250 sink")
+            elif verb == "MAIL":
+                recipients = []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(command.split(":", 1)[1].strip(" <>"))
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                for body_line in self.rfile:
+                    if body_line == b".\r\n":
+                        break
+                    data.append(body_line[1:] if body_line.startswith(b"..") else body_line)
+                self.server.messages.append((recipients, message_from_bytes(b"".join(data), policy=policy.default)))
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("250 OK")
+
+
+@contextmanager
+def smtp_sink() -> Iterator[SmtpSink]:
+    server = SmtpSink()
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def customer(db):
+    """A customer at 100% of a $1,000 budget on AS_OF (ten days of $100)"""
+    record = Customer(customer_id="al001", customer_name="Alert Test", email="al001@example.com", monthly_budget=1000.0)
+    db.add(record)
+    db.commit()
+    store = get_cost_engine().CostStore()
+    for day in range(1, AS_OF.day + 1):
+        store.write_day("al001", AS_OF.replace(day=day), ["/subscriptions/s/vm1"], ["Virtual Machines"], [100.0])
+    try:
+        yield record
+    finally:
+        db.query(CostAlert).filter(CostAlert.customer_id == record.id).delete()
+        db.delete(record)
+        db.commit()
+
+
+def _rule(db, customer, threshold: float, basis: str = "actual") -> CostAlert:
+    rule = CostAlert(
+        customer_id=customer.id, threshold_percentage=threshold, basis=basis,
+        alert_emails=["finops@example.com", "owner@example.com"], enabled=True
+    )
+    db.add(rule)
+    db.commit()
+    return rule
+
+
+def test_notifier_sends_a_batch_over_one_connection():
+    with smtp_sink() as sink:
+        with sink.notifier().session() as send:
+            send(["a@example.com"], "First", "Body one")
+            send(["b@example.com", "c@example.com"], "Second", "Body two")
+
+    assert sink.connections == 1
+    assert [(rcpt, msg["Subject"]) for rcpt, msg in sink.messages] == [
+        (["a@example.com"], "First"),
+        (["b@example.com", "c@example.com"], "Second"),
+    ]
+    assert sink.messages[1][1].get_content().strip() == "Body two"
+
+
+def test_alert_is_sent_once_per_period(db, customer):
+    _rule(db, customer, 80)
+    with smtp_sink() as sink:
+        first = evaluate_cost_alerts(db, as_of=AS_OF, notifier=sink.notifier(), now=datetime(2026, 10, 11, 8))
+        again = evaluate_cost_alerts(db, as_of=AS_OF, notifier=sink.notifier(), now=datetime(2026, 10, 12, 9))
+
+    assert first == {"rules": 1, "triggered": 1, "notified": 1, "deferred": 0, "failed": 0}
+    assert again["notified"] == 0
+    assert len(sink.messages) == 1
+    recipients, message = sink.messages[0]
+    assert recipients == ["finops@example.com", "owner@example.com"]
+    assert message["Subject"] == "Cost alert: Alert Test at 100% of budget"
+    assert "Month-to-date spend $1,000.00 is 100.0% of the $1,000.00 monthly budget" in message.get_content()
+
+
+def test_customer_emails_are_rate_limited(db, customer):
+    _rule(db, customer, 80)
+    with smtp_sink() as sink:
+        evaluate_cost_alerts(db, as_of=AS_OF, notifier=sink.notifier(), now=datetime(2026, 10, 11, 8))
+        _rule(db, customer, 90)
+        held = evaluate_cost_alerts(db, as_of=AS_OF, notifier=sink.notifier(), now=datetime(2026, 10, 11, 9))
+        later = evaluate_cost_alerts(db, as_of=AS_OF, notifier=sink.notifier(), now=datetime(2026, 10, 12, 9))
+
+    assert held["deferred"] == 1 and held["notified"] == 0
+    assert later["notified"] == 1
+    assert len(sink.messages) == 2
+
+
+def test_failed_delivery_is_retried(db, customer):
+    rule = _rule(db, customer, 80)
+    with smtp_sink() as sink:
+        unreachable = sink.notifier()
+    # The sink is closed now: the connection is refused
+    failed = evaluate_cost_alerts(db, as_of=AS_OF, notifier=unreachable, now=datetime(2026, 10, 11, 8))
+    assert failed["failed"] == 1
+    db.refresh(rule)
+    assert rule.last_notified_period is None
+
+    with smtp_sink() as sink:
+        retried = evaluate_cost_alerts(db, as_of=AS_OF, notifier=sink.notifier(), now=datetime(2026, 10, 11, 9))
+    assert retried["notified"] == 1
+    assert len(sink.messages) == 1
+
+
+def test_rules_stay_unclaimed_without_smtp(db, customer):
+    rule = _rule(db, customer, 80)
+    unconfigured = EmailNotifier(host="", from_email="portal@example.com")
+    assert not unconfigured.configured
+
+    held = evaluate_cost_alerts(db, as_of=AS_OF, notifier=unconfigured, now=datetime(2026, 10, 11, 8))
+    assert (held["triggered"], held["notified"], held["deferred"]) == (1, 0, 1)
+    db.refresh(rule)
+    assert rule.last_notified_period is None
+
+    with smtp_sink() as sink:
+        delivered = evaluate_cost_alerts(db, as_of=AS_OF, notifier=sink.notifier(), now=datetime(2026, 10, 11, 9))
+    assert delivered["notified"] == 1
+    assert len(sink.messages) == 1
@@ -0,0 +1,164 @@
+"""
+Deployment Events
+Merging GitHub Actions progress events and writing them to deployments in batches
+"""
+
+from datetime import datetime
+import asyncio
+
+import pytest
+
+from models.customer import Customer
+from models.deployment import Deployment, DeploymentStatus
+from utils.deployment_events import DeploymentEventQueue, RunUpdate, parse_event
+
+DONE_AT = datetime(2026, 10, 19, 6, 30)
+
+
+def _job(run_id: str, name: str, conclusion: str = None) -> RunUpdate:
+    return parse_event("workflow_job", {"workflow_job": {
+        "run_id": run_id, "name": name, "status": "completed" if conclusion else "in_progress",
+        "conclusion": conclusion, "completed_at": "2026-10-19T06:30:00Z",
+    }})
+
+
+def _run(run_id: str, conclusion: str = None) -> RunUpdate:
+    return parse_event("workflow_run", {"workflow_run": {
+        "id": run_id, "html_url": f"https://github.com/org/repo/actions/runs/{run_id}",
+        "status": "completed" if conclusion else "in_progress",
+        "conclusion": conclusion, "updated_at": "2026-10-19T06:30:00Z",
+    }})
+
+
+def _merged(*updates: RunUpdate) -> RunUpdate:
+    merged = updates[0]
+    for u in updates[1:]:
+        merged = merged.merge(u)
+    return merged
+
+
+def test_parse_maps_jobs_to_steps():
+    assert (_job("1", "🔍 Validate").status, _job("1", "🔍 Validate").step) == ("validating", "Validate")
+    assert (_job("1", "Deploy Hub").status, _job("1", "Deploy Hub").progress) == ("deploying_hub", 60)
+    failed = _job("1", "Deploy Spoke", "failure")
+    assert (failed.status, failed.progress, failed.error, failed.completed_at) == (
+        "failed", 90, "Deploy Spoke failure", DONE_AT
+    )
+    assert _job("1", "Notify Slack") is None
+    assert parse_event("push", {}) is None
+    assert _run("1", "success").progress == 100
+    assert _run("1", "cancelled").error is None
+
+
+def test_merge_keeps_the_furthest_state_in_any_order():
+    events = [_run("1"), _job("1", "Validate"), _job("1", "Deploy Hub"), _job("1", "Deploy Management")]
+    for ordering in (events, events[::-1], events[1:] + events[:1]):
+        merged = _merged(*ordering)
+        assert (merged.status, merged.progress) == ("deploying_hub", 60)
+        # The URL only arrives with the run event and survives later job events
+        assert merged.url == "https://github.com/org/repo/actions/runs/1"
+
+
+def test_first_terminal_state_wins():
+    completed, failed = _run("1", "success"), _run("1", "failure")
+    assert _merged(completed, failed).status == "completed"
+    assert _merged(failed, completed).status == "failed"
+    # A late job event never reopens a finished run
+    assert _merged(_run("1", "cancelled"), _job("1", "Deploy Spoke")).status == "cancelled"
+
+
+def test_failure_keeps_the_progress_reached():
+    # The run failure (progress 0) is reported before the job events that preceded it
+    merged = _merged(_run("1", "failure"), _job("1", "Deploy Hub"))
+    assert (merged.status, merged.progress, merged.error) == ("failed", 60, "Workflow run failure")
+
+
+def test_queue_coalesces_events_per_run():
+    queue = DeploymentEventQueue(flush_interval=60, max_batch=100)
+    for update_ in (_job("1", "Validate"), _job("1", "Deploy Hub"), _job("2", "Validate"), _job("1", "Deploy Hub")):
+        queue.submit(update_)
+    assert queue.pending == 2
+    assert {u.run_id: u.progress for u in queue._take()} == {"1": 60, "2": 10}
+    assert queue.pending == 0
+
+
+@pytest.fixture
+def deployments(db):
+    """Three deployments of one customer, tracking runs de-1 .. de-3"""
+    customer = Customer(customer_id="de001", customer_name="Events", email="de001@example.com")
+    db.add(customer)
+    db.flush()
+    records = [
+        Deployment(customer_id=customer.id, github_run_id=f"de-{i}", status="pending", progress_percentage=0)
+        for i in (1, 2, 3)
+    ]
+    db.add_all(records)
+    db.commit()
+    try:
+        yield records
+    finally:
+        db.rollback()
+        for record in records:
+            db.delete(record)
+        db.delete(customer)
+        db.commit()
+
+
+def _state(db, records) -> list:
+    for record in records:
+        db.refresh(record)
+    return [(r.status, r.progress_percentage, r.current_step) for r in records]
+
+
+def test_write_moves_deployments_forward_only(db, deployments):
+    write = DeploymentEventQueue.write
+    assert write([_job("de-1", "Deploy Hub"), _job("de-2", "Validate")]) == 2
+
+    # Duplicate and stale progress is ignored; the other run moves on
+    assert write([_job("de-1", "Deploy Hub"), _job("de-1", "Validate"), _job("de-2", "Deploy Spoke")]) == 1
+    assert _state(db, deployments) == [
+        ("deploying_hub", 60, "Deploy Hub"),
+        ("deploying_spoke", 90, "Deploy Spoke"),
+        ("pending", 0, None),
+    ]
+
+
+def test_terminal_state_is_final(db, deployments):
+    write = DeploymentEventQueue.write
+    write([_job("de-1", "Deploy Hub")])
+    assert write([_run("de-1", "failure")]) == 1
+
+    # Late, out-of-order and conflicting events after the run finished change nothing
+    assert write([_job("de-1", "Deploy Spoke"), _run("de-1", "success")]) == 0
+    record = deployments[0]
+    db.refresh(record)
+    assert (record.status, record.progress_percentage, record.error_message, record.completed_at) == (
+        DeploymentStatus.FAILED.value, 60, "Workflow run failure", DONE_AT
+    )
+    assert record.github_run_url == "https://github.com/org/repo/actions/runs/de-1"
+
+
+def test_flush_writes_one_merged_update_per_run(db, deployments):
+    queue = DeploymentEventQueue(flush_interval=60, max_batch=100)
+    for update_ in (_run("de-3"), _job("de-3", "Validate"), _job("de-3", "Deploy Management"), _run("de-3", "success")):
+        queue.submit(update_)
+    assert queue.pending == 1
+
+    assert asyncio.run(queue.flush()) == 1
+    assert asyncio.run(queue.flush()) == 0
+    assert _state(db, deployments)[2] == ("completed", 100, "Completed")
+
+
+def test_failed_flush_requeues_the_batch(monkeypatch):
+    queue = DeploymentEventQueue(flush_interval=60, max_batch=100)
+    queue.submit(_job("1", "Deploy Hub"))
+
+    def unavailable(batch):
+        raise ConnectionError("database unavailable")
+
+    monkeypatch.setattr(queue, "write", unavailable)
+    with pytest.raises(ConnectionError):
+        asyncio.run(queue.flush())
+    # Requeued, and merged with what arrived meanwhile
+    queue.submit(_job("1", "Validate"))
+    assert [(u.run_id, u.progress) for u in queue._take()] == [("1", 60)]
@@ -0,0 +1,137 @@
+"""
+GitHub Dispatch
+The pooled client and the dispatch queue against a local mock GitHub API
+"""
+
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, List, Tuple
+import asyncio
+import json
+import threading
+
+import pytest
+
+from models.customer import Customer
+from models.deployment import Deployment, DeploymentStatus
+from utils.github import GitHubClient, GitHubError
+
+REPO = "org/portal"
+WORKFLOW = "deploy-infrastructure.yml"
+DISPATCH_PATH = f"/repos/{REPO}/actions/workflows/{WORKFLOW}/dispatches"
+
+
+class MockGitHub(ThreadingHTTPServer):
+    """Records requests; answers each with the next scripted (status, headers), then 204"""
+
+    def __init__(self, responses: List[Tuple[int, dict]]):
+        super().__init__(("127.0.0.1", 0), MockGitHubHandler)
+        self.responses = list(responses)
+        self.requests: List[Tuple[str, str, dict]] = []
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class MockGitHubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like api.github.com
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"null")
+        with self.server.lock:
+            self.server.requests.append((self.command, self.path, body))
+            status, headers = self.server.responses.pop(0) if self.server.responses else (204, {})
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def mock_github(*responses: Tuple[int, dict]) -> Iterator[MockGitHub]:
+    server = MockGitHub(list(responses))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _client(server: MockGitHub, **kwargs) -> GitHubClient:
+    return GitHubClient("test-token", REPO, base_url=server.url, **kwargs)
+
+
+def test_dispatch_retries_unavailable_and_rate_limited():
+    async def dispatch(server):
+        client = _client(server)
+        try:
+            await client.dispatch_workflow(WORKFLOW, {"customer_id": "c1"}, "main")
+        finally:
+            await client.aclose()
+
+    with mock_github((503, {}), (429, {"Retry-After": "0"})) as server:
+        asyncio.run(dispatch(server))
+
+    assert [path for _, path, _ in server.requests] == [DISPATCH_PATH] * 3
+    assert server.requests[-1][2] == {"ref": "main", "inputs": {"customer_id": "c1"}}
+
+
+def test_dispatch_client_errors_are_not_retried():
+    async def dispatch(server):
+        client = _client(server)
+        try:
+            await client.dispatch_workflow(WORKFLOW, {}, "main")
+        finally:
+            await client.aclose()
+
+    with mock_github((422, {})) as server:
+        with pytest.raises(GitHubError) as excinfo:
+            asyncio.run(dispatch(server))
+    assert excinfo.value.status_code == 422
+    assert len(server.requests) == 1
+
+
+def test_restart_requeues_undispatched_deployments_once(db):
+    from utils.workflow_dispatch import WorkflowDispatchQueue
+
+    customer = Customer(customer_id="gh001", customer_name="GitHub Test", email="gh001@example.com")
+    db.add(customer)
+    db.commit()
+    waiting = Deployment(customer_id=customer.id, status=DeploymentStatus.PENDING.value, dispatch_inputs={"deployment_id": "w"})
+    sent = Deployment(customer_id=customer.id, status=DeploymentStatus.PENDING.value)
+    db.add_all([waiting, sent])
+    db.commit()
+
+    async def restart(server):
+        client = _client(server)
+        # Two workers starting together both find the stranded deployment
+        workers = [WorkflowDispatchQueue(client, WORKFLOW, "main", interval=0, maxsize=10) for _ in range(2)]
+        for queue in workers:
+            await queue.recover()
+        tasks = [asyncio.create_task(queue.run()) for queue in workers]
+        await asyncio.gather(*(queue._queue.join() for queue in workers))
+        for task in tasks:
+            task.cancel()
+        await client.aclose()
+
+    try:
+        with mock_github() as server:
+            asyncio.run(restart(server))
+
+        assert [body["inputs"] for _, _, body in server.requests] == [{"deployment_id": "w"}]
+        db.expire_all()
+        assert db.get(Deployment, waiting.id).status == DeploymentStatus.VALIDATING.value
+        assert db.get(Deployment, waiting.id).dispatch_inputs is None
+        assert db.get(Deployment, sent.id).status == DeploymentStatus.PENDING.value
+    finally:
+        db.query(Deployment).filter(Deployment.customer_id == customer.id).delete()
+        db.delete(customer)
+        db.commit()
@@ -0,0 +1,109 @@
+"""
+HTTP Caching
+ETag validation, 304 answers and gzip negotiation of the pre-serialized package catalog
+"""
+
+import gzip
+import json
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from utils.http_cache import StaticJSON, accepts_gzip, etag_matches
+
+
+@pytest.fixture(scope="module")
+def client():
+    from api import packages
+
+    app = FastAPI()
+    app.include_router(packages.router)
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip", True),
+    ("br, GZIP;q=0.5", True),
+    ("*", True),
+    ("gzip;q=0", False),
+    ("gzip;q=0.000", False),
+    ("gzip;q=bogus", False),
+    ("identity, deflate", False),
+    ("", False),
+    (None, False),
+])
+def test_accept_encoding(header, expected):
+    assert accepts_gzip(header) is expected
+
+
+@pytest.mark.parametrize("header, expected", [
+    ('"abc"', True),
+    ('W/"abc"', True),  # Weak comparison
+    ('"old", "abc"', True),
+    ("*", True),
+    ('"abcd"', False),
+    ("abc", False),  # Unquoted is not the same tag
+    ("", False),
+    (None, False),
+])
+def test_if_none_match(header, expected):
+    assert etag_matches(header, '"abc"') is expected
+
+
+def test_catalog_is_gzipped_for_clients_that_accept_it(client):
+    plain = client.get("/api/packages", headers={"Accept-Encoding": "identity"})
+    zipped = client.get("/api/packages", headers={"Accept-Encoding": "gzip"})
+
+    assert plain.status_code == zipped.status_code == 200
+    assert "content-encoding" not in plain.headers
+    assert zipped.headers["content-encoding"] == "gzip"
+    # Both representations carry the same document under different strong ETags
+    assert zipped.json() == plain.json()
+    assert zipped.headers["etag"] == plain.headers["etag"][:-1] + '-gzip"'
+    for response in (plain, zipped):
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert response.headers["cache-control"].startswith("public, max-age=")
+        assert "x-catalog-version" in response.headers
+
+
+def test_matching_etag_gets_an_empty_304(client):
+    for encoding in ("identity", "gzip"):
+        first = client.get("/api/packages/basic", headers={"Accept-Encoding": encoding})
+        etag = first.headers["etag"]
+
+        again = client.get("/api/packages/basic", headers={"Accept-Encoding": encoding, "If-None-Match": etag})
+        assert (again.status_code, again.content) == (304, b"")
+        assert again.headers["etag"] == etag
+        assert again.headers["cache-control"] == first.headers["cache-control"]
+
+    # A tag from the other representation, or from another document, does not match
+    plain_etag = client.get("/api/packages/basic", headers={"Accept-Encoding": "identity"}).headers["etag"]
+    other = client.get("/api/packages/basic", headers={"Accept-Encoding": "gzip", "If-None-Match": plain_etag})
+    assert other.status_code == 200
+    catalog = client.get("/api/packages", headers={"Accept-Encoding": "identity", "If-None-Match": plain_etag})
+    assert catalog.status_code == 200
+
+
+def test_unknown_tier_is_not_found(client):
+    assert client.get("/api/packages/diamond").status_code == 404
+
+
+def test_document_is_serialized_once_and_small_bodies_stay_plain():
+    document = StaticJSON({"tiers": ["basic"] * 200, "name": "Café"}, max_age=60)
+    assert json.loads(gzip.decompress(document.gzip_body)) == json.loads(document.body)
+    assert "Café".encode() in document.body  # Not \u-escaped
+
+    tiny = StaticJSON({"a": 1}, max_age=60)
+    assert len(tiny.gzip_body) >= len(tiny.body)
+
+    app = FastAPI()
+
+    @app.get("/tiny")
+    async def serve(request: Request):
+        return tiny.response(request)
+
+    response = TestClient(app).get("/tiny", headers={"Accept-Encoding": "gzip"})
+    # Gzip would only make it larger
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == tiny.etag
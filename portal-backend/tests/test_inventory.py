@@ -0,0 +1,131 @@
+"""
+Inventory
+Resource Graph snapshots and diffs, replayed from recorded pages in fixtures/resource_graph
+"""
+
+from dataclasses import replace
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+
+from utils.cost_intelligence import get_cost_engine
+
+FIXTURES = Path(__file__).parent / "fixtures" / "resource_graph"
+SUBSCRIPTIONS = ["11111111-1111-1111-1111-111111111111"]
+DAY1 = datetime(2026, 10, 18, 6, 0, tzinfo=timezone.utc)
+DAY2 = datetime(2026, 10, 19, 6, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def engine():
+    return get_cost_engine()
+
+
+@pytest.fixture
+def store(engine, tmp_path):
+    return engine.InventoryStore(str(tmp_path))
+
+
+def _snapshot(engine, store, day: str, taken_at: datetime):
+    collector = engine.InventoryCollector(engine.FixtureSource(str(FIXTURES / day)), store)
+    snapshot = replace(collector.snapshot("c001", SUBSCRIPTIONS, save=False), taken_at=taken_at)
+    store.save("c001", snapshot)
+    return snapshot
+
+
+def _name(resource_id: str) -> str:
+    return resource_id.rsplit("/", 1)[-1]
+
+
+def test_snapshot_follows_skip_tokens_and_drops_repeated_rows(engine, store):
+    snapshot = _snapshot(engine, store, "day1", DAY1)
+
+    # Two pages, six rows, the VM repeated on the second page
+    assert len(snapshot) == 5
+    loaded = store.load("c001")
+    assert loaded.taken_at == DAY1
+    rows = {row["name"]: row for row in loaded.rows()}
+    assert sorted(rows) == ["disk-data-01", "nsg-app", "pip-legacy", "vm-app-01", "vnet-spoke"]
+    assert rows["vm-app-01"]["sku"] == "Standard_D2s_v3"
+    assert rows["disk-data-01"]["state"] == "Unattached"
+    assert rows["pip-legacy"]["tags"] == {}
+
+
+def test_diff_between_recorded_snapshots(engine, store):
+    _snapshot(engine, store, "day1", DAY1)
+    _snapshot(engine, store, "day2", DAY2)
+    assert store.snapshots("c001") == [DAY1, DAY2]
+
+    diff = store.diff("c001", DAY1, DAY2)
+    assert diff["counts"] == {"added": 1, "removed": 1, "tags_changed": 1, "sku_changed": 1}
+    assert [row["name"] for row in diff["added"]] == ["stappdata01"]
+    assert [row["name"] for row in diff["removed"]] == ["pip-legacy"]
+    assert [(_name(c["id"]), c["before"], c["after"]) for c in diff["sku_changed"]] == [
+        ("vm-app-01", "Standard_D2s_v3", "Standard_D4s_v3")
+    ]
+    assert [(_name(c["id"]), c["after"]) for c in diff["tags_changed"]] == [
+        ("disk-data-01", {"env": "prod", "owner": "data-team"})
+    ]
+
+    counts_only = store.diff("c001", DAY1, DAY2, include_rows=False)
+    assert counts_only["counts"] == diff["counts"]
+    assert "added" not in counts_only
+
+
+def test_unchanged_inventory_diffs_empty(engine, store):
+    _snapshot(engine, store, "day2", DAY1)
+    _snapshot(engine, store, "day2", DAY2)
+    diff = store.diff("c001", DAY1, DAY2)
+    assert diff["counts"] == {"added": 0, "removed": 0, "tags_changed": 0, "sku_changed": 0}
+
+
+def test_failed_page_stores_nothing(engine, store):
+    class FailsOnSecondPage:
+        def __init__(self):
+            self.fixture = engine.FixtureSource(str(FIXTURES / "day1"))
+            self.calls = 0
+
+        def fetch_page(self, subscriptions, query, skip_token=None):
+            self.calls += 1
+            if self.calls == 2:
+                raise ConnectionError("Resource Graph unavailable")
+            return self.fixture.fetch_page(subscriptions, query, skip_token)
+
+    collector = engine.InventoryCollector(FailsOnSecondPage(), store)
+    with pytest.raises(engine.InventoryError):
+        collector.snapshot("c001", SUBSCRIPTIONS)
+    # A partial snapshot would diff as mass deletion
+    assert store.snapshots("c001") == []
+
+
+def test_recorded_pages_replay_identically(engine, store, tmp_path):
+    recording = engine.RecordingSource(engine.FixtureSource(str(FIXTURES / "day1")), str(tmp_path / "recorded"))
+    original = engine.InventoryCollector(recording, store).snapshot("c001", SUBSCRIPTIONS, save=False)
+    replayed = engine.InventoryCollector(
+        engine.FixtureSource(str(tmp_path / "recorded")), store
+    ).snapshot("c001", SUBSCRIPTIONS, save=False)
+    assert original.rows() == replayed.rows()
+
+
+def test_snapshots_in_the_same_second_are_kept(engine, store):
+    first = _snapshot(engine, store, "day1", DAY1)
+    second = _snapshot(engine, store, "day2", DAY1.replace(microsecond=250))
+    # Same instant: stored 1 µs later instead of overwriting
+    third = _snapshot(engine, store, "day2", DAY1)
+
+    assert store.snapshots("c001") == [DAY1, DAY1.replace(microsecond=1), DAY1.replace(microsecond=250)]
+    assert (first.taken_at, second.taken_at, third.taken_at) == (
+        DAY1, DAY1.replace(microsecond=250), DAY1.replace(microsecond=1)
+    )
+    assert len(store.load("c001", DAY1)) == 5
+
+
+def test_second_resolution_snapshots_still_load(engine, store):
+    snapshot = _snapshot(engine, store, "day1", DAY1)
+    path = store.base_path / "c001" / f"{DAY1:%Y%m%dT%H%M%S.%fZ}.npz"
+    path.rename(path.with_name(f"{DAY1:%Y%m%dT%H%M%SZ}.npz"))
+
+    assert store.snapshots("c001") == [DAY1]
+    assert store.load("c001").rows() == store.load("c001", DAY1).rows()
+    assert len(store.load("c001")) == len(snapshot)
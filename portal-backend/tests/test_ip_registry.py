@@ -0,0 +1,140 @@
+"""
+IP Address Registry
+Fleet-wide overlap checks, allocation from the pool and reservations for new customers
+"""
+
+from types import SimpleNamespace
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from models.customer import Customer
+from utils.ip_registry import CidrConflict, CidrRegistry, get_registry, release_cidrs, reserve_cidrs
+
+
+def _registry(*entries):
+    return CidrRegistry.from_entries(entries)
+
+
+@pytest.mark.parametrize("cidr, existing", [
+    ("10.1.0.0/16", "10.1.0.0/16"),    # same block
+    ("10.1.128.0/17", "10.1.0.0/16"),  # inside an existing block
+    ("10.0.0.0/8", "10.1.0.0/16"),     # contains an existing block
+    ("10.1.255.0/24", "10.1.0.0/16"),  # shares the last address
+])
+def test_overlap_and_containment_conflict(cidr, existing):
+    registry = _registry(("c001", "10.1.0.0/16"), ("c002", "10.3.0.0/16"))
+    with pytest.raises(CidrConflict) as excinfo:
+        registry.check(cidr)
+    assert (excinfo.value.owner, excinfo.value.existing) == ("c001", existing)
+
+
+def test_adjacent_blocks_do_not_conflict():
+    registry = _registry(("c001", "10.1.0.0/16"))
+    registry.check("10.0.0.0/16")
+    registry.check("10.2.0.0/16")
+    registry.check("fd00::/8")  # Other IP version
+
+
+def test_overlap_hidden_behind_a_later_start():
+    # Legacy rows may already overlap; the wide block starting first must still be found
+    registry = _registry(("c001", "10.0.0.0/8"), ("c002", "10.1.0.0/16"), ("c003", "10.2.0.0/16"))
+    with pytest.raises(CidrConflict) as excinfo:
+        registry.check("10.200.0.0/16")
+    assert excinfo.value.owner == "c001"
+
+
+def test_allocate_skips_used_and_misaligned_space():
+    registry = _registry(("c001", "10.0.0.0/16"), ("c002", "10.1.0.0/24"), ("c003", "10.3.0.0/16"))
+    assert registry.allocate(16, "10.0.0.0/14") == "10.2.0.0/16"
+    assert registry.allocate(24, "10.0.0.0/14") == "10.1.1.0/24"
+
+    registry.add("c004", "10.2.0.0/16")
+    with pytest.raises(ValueError, match="No free /16"):
+        registry.allocate(16, "10.0.0.0/14")
+    with pytest.raises(ValueError, match="does not fit"):
+        registry.allocate(8, "10.0.0.0/14")
+
+
+def test_remove_owner_frees_its_blocks():
+    registry = _registry(("c001", "10.0.0.0/16"), ("c002", "10.1.0.0/16"))
+    registry.remove_owner("c001")
+    assert len(registry) == 1
+    assert registry.allocate(16, "10.0.0.0/15") == "10.0.0.0/16"
+
+
+@pytest.fixture
+def fleet(db):
+    """One existing customer owning 10.1.0.0/16 and 10.2.0.0/16"""
+    existing = Customer(
+        customer_id="ip001", customer_name="Existing", email="ip001@example.com",
+        hub_vnet_cidr="10.1.0.0/16", spoke_vnets={"production": {"cidr": "10.2.0.0/16"}},
+    )
+    db.add(existing)
+    db.commit()
+    try:
+        yield existing
+    finally:
+        db.rollback()
+        db.query(Customer).filter(Customer.customer_id.like("ip%")).delete(synchronize_session=False)
+        db.commit()
+        get_registry(db, refresh=True)
+
+
+def test_conflicting_reservation_keeps_nothing(db, fleet):
+    with pytest.raises(CidrConflict) as excinfo:
+        reserve_cidrs(db, "ip002", "10.5.0.0/16", {"production": {"cidr": "10.2.128.0/17"}})
+    db.rollback()
+    assert (excinfo.value.owner, excinfo.value.existing) == ("ip001", "10.2.0.0/16")
+
+    # The hub checked before the conflict is not left reserved
+    get_registry(db).check("10.5.0.0/16")
+
+
+def test_reserve_allocates_missing_blocks_and_release_frees_them(db, fleet, monkeypatch):
+    from config import settings
+
+    monkeypatch.setattr(settings, "IP_POOL", "10.0.0.0/13")
+    hub, spokes = reserve_cidrs(db, "ip002", None, {"production": {"cidr": None, "tier": "gold"}, "dev": None})
+    db.rollback()
+    assert hub == "10.0.0.0/16"
+    assert spokes == {"production": {"cidr": "10.3.0.0/16", "tier": "gold"}, "dev": "10.4.0.0/16"}
+
+    with pytest.raises(CidrConflict) as excinfo:
+        get_registry(db).check("10.3.0.0/24")
+    assert excinfo.value.owner == "ip002"
+    release_cidrs("ip002")
+    get_registry(db).check("10.3.0.0/24")
+
+
+def _create(db, **fields):
+    from api.customers import CustomerCreate, create_customer
+
+    request = CustomerCreate(**{
+        "id": "ip002", "name": "New", "email": "ip002@example.com",
+        "tenant_id": "t", "subscription_ids": {}, "sp_client_id": "sp", "sp_client_secret": "secret",
+        "region": "eastus", "region_code": "eus", **fields,
+    })
+    return asyncio.run(create_customer(request, db=db, current_user=SimpleNamespace(username="admin")))
+
+
+def test_create_customer_stores_reserved_blocks(db, fleet):
+    created = _create(db, hub_vnet_cidr="10.5.0.0/16", spoke_vnets={"production": {"cidr": "10.6.0.0/16"}})
+    assert (created["id"], created["name"], created["status"]) == ("ip002", "New", "created")
+
+    record = db.query(Customer).filter(Customer.customer_id == "ip002").one()
+    assert (record.hub_vnet_cidr, record.spoke_vnet_cidr) == ("10.5.0.0/16", "10.6.0.0/16")
+
+    # A rebuilt registry names the new customer by the same key the reservation used
+    with pytest.raises(CidrConflict) as excinfo:
+        get_registry(db, refresh=True).check("10.6.0.0/24")
+    assert excinfo.value.owner == "ip002"
+
+
+def test_create_customer_rejects_overlap(db, fleet):
+    with pytest.raises(HTTPException) as excinfo:
+        _create(db, hub_vnet_cidr="10.1.0.0/24")
+    assert excinfo.value.status_code == 409
+    assert "ip001" in excinfo.value.detail
+    assert db.query(Customer).filter(Customer.customer_id == "ip002").first() is None
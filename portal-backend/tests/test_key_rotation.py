@@ -0,0 +1,95 @@
+"""
+Key Rotation
+Re-encrypting customer secrets with a new key version
+"""
+
+import pytest
+
+from config import settings
+from models.customer import Customer
+from utils.encryption import decrypt_value, encrypt_value, key_version
+from utils.key_rotation import reencrypt_customer_secrets
+
+
+@pytest.fixture
+def customers(db, monkeypatch):
+    """Three customers with version 1 secrets, the middle one unreadable, then key version 2 made current"""
+    records = [
+        Customer(customer_id=f"kr00{i}", customer_name=f"Rotation {i}", email=f"kr00{i}@example.com")
+        for i in range(3)
+    ]
+    records[0].sp_client_secret = encrypt_value("secret-0")
+    records[1].sp_client_secret = "v1:not-a-fernet-token"
+    records[2].sp_client_secret = encrypt_value("secret-2")
+    db.add_all(records)
+    db.commit()
+
+    monkeypatch.setattr(settings, "ENCRYPTION_KEYS", "2:second-key")
+    monkeypatch.setattr(settings, "ENCRYPTION_KEY_VERSION", 2)
+    try:
+        yield records
+    finally:
+        for record in records:
+            db.delete(record)
+        db.commit()
+
+
+def test_unreadable_secret_does_not_stop_rotation(db, customers):
+    # One row per batch: the failure sits in its own batch, later batches must still run
+    summary = reencrypt_customer_secrets(batch_size=1)
+    assert summary == {"rotated": 2, "failed": 1, "batches": 3}
+
+    for record in customers:
+        db.refresh(record)
+    assert [key_version(r.sp_client_secret) for r in customers] == [2, 1, 2]
+    assert decrypt_value(customers[0].sp_client_secret) == "secret-0"
+    assert decrypt_value(customers[2].sp_client_secret) == "secret-2"
+    assert customers[1].sp_client_secret == "v1:not-a-fernet-token"
+
+
+def test_rerun_counts_only_rows_it_updates(db, customers):
+    reencrypt_customer_secrets()
+    # Only the unreadable secret is still on version 1; it is scanned but not rotated
+    assert reencrypt_customer_secrets() == {"rotated": 0, "failed": 1, "batches": 1}
+
+
+
+@pytest.fixture
+def rotate_calls(monkeypatch):
+    """Sizes of the rotate_many calls made by the job"""
+    from utils import key_rotation
+
+    calls = []
+    real_rotate_many = key_rotation.rotate_many
+
+    def rotate_many(ciphertexts):
+        calls.append(len(ciphertexts))
+        return real_rotate_many(ciphertexts)
+
+    monkeypatch.setattr(key_rotation, "rotate_many", rotate_many)
+    return calls
+
+
+def _drop_unreadable(db, customers):
+    db.delete(customers.pop(1))
+    db.commit()
+
+
+def test_each_batch_is_rotated_in_one_call(db, customers, rotate_calls):
+    _drop_unreadable(db, customers)
+    assert reencrypt_customer_secrets() == {"rotated": 2, "failed": 0, "batches": 1}
+    assert rotate_calls == [2]
+
+
+def test_batch_with_an_unreadable_secret_is_retried_row_by_row(db, customers, rotate_calls):
+    assert reencrypt_customer_secrets() == {"rotated": 2, "failed": 1, "batches": 1}
+    assert rotate_calls == [3, 1, 1, 1]
+
+
+def test_cli_exits_nonzero_while_secrets_fail(db, customers, monkeypatch):
+    from utils import key_rotation
+
+    monkeypatch.setattr(key_rotation, "configure_logging", lambda *args: None)
+    assert key_rotation.main() == 1
+    _drop_unreadable(db, customers)
+    assert key_rotation.main() == 0
@@ -0,0 +1,141 @@
+"""
+Structured Logging
+Secret redaction, request/deployment context IDs and sampling on the queued JSON pipeline
+"""
+
+import io
+import json
+import logging
+import threading
+
+import pytest
+
+from utils.logging import (
+    REDACTED, RequestContextMiddleware, SamplingFilter, configure_logging, log_context,
+    parse_sampling, redact, redact_text, request_id_var, shutdown_logging,
+)
+
+
+@pytest.fixture
+def records():
+    """Configure JSON logging into a buffer; calling the result flushes and returns the parsed records"""
+    root = logging.getLogger()
+    saved = root.handlers[:], root.level
+    stream = io.StringIO()
+    configure_logging("DEBUG", "json", stream=stream)
+
+    def flush():
+        shutdown_logging()
+        return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    try:
+        yield flush
+    finally:
+        shutdown_logging()
+        root.handlers[:], level = saved
+        root.setLevel(level)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("ARM_CLIENT_SECRET=s3cr3t terraform apply", f"ARM_CLIENT_SECRET={REDACTED} terraform apply"),
+    ('{"password": "hunter2", "user": "admin"}', f'{{"password": "{REDACTED}", "user": "admin"}}'),
+    ("api_key: abc123; region: eastus", f"api_key: {REDACTED}; region: eastus"),
+    ("Authorization: Bearer eyJhbGciOi.x-y", f"Authorization: Bearer {REDACTED}"),
+    ("Connection_String=Server=db;Password=pw", f"Connection_String={REDACTED};Password={REDACTED}"),
+    ("Deployed hub for c001 in eastus", "Deployed hub for c001 in eastus"),
+])
+def test_secret_values_are_masked_in_text(text, expected):
+    assert redact_text(text) == expected
+
+
+def test_structured_values_are_masked_by_key():
+    assert redact({
+        "sp_client_secret": "s3cr3t",
+        "nested": {"token": ["a", "b"], "command": "az login --password=pw"},
+        "items": ["TOKEN=abc", 3],
+        "count": 3,
+    }) == {
+        "sp_client_secret": REDACTED,
+        "nested": {"token": REDACTED, "command": f"az login --password={REDACTED}"},
+        "items": [f"TOKEN={REDACTED}", 3],
+        "count": 3,
+    }
+
+
+def test_records_carry_context_ids_and_redacted_fields(records):
+    logger = logging.getLogger("tests.logging")
+    with log_context(request_id="req-1"):
+        with log_context(deployment_id=42):
+            logger.info("Applying with ARM_CLIENT_SECRET=%s", "s3cr3t", extra={"password": "pw", "stage": "hub"})
+        logger.warning("After the deployment block")
+    logger.info("Outside any request")
+    try:
+        raise RuntimeError("token=abc failed")
+    except RuntimeError:
+        logger.exception("Step failed")
+
+    applying, after, outside, failed = records()
+    assert applying["message"] == f"Applying with ARM_CLIENT_SECRET={REDACTED}"
+    assert (applying["request_id"], applying["deployment_id"]) == ("req-1", "42")
+    assert (applying["password"], applying["stage"], applying["level"]) == (REDACTED, "hub", "INFO")
+    assert after["request_id"] == "req-1" and "deployment_id" not in after
+    assert "request_id" not in outside
+    assert "RuntimeError: token=[REDACTED] failed" in failed["exception"]
+
+
+def test_context_ids_are_captured_on_the_logging_thread(records):
+    # Records are formatted on the listener thread; the IDs must come from the caller
+    logger = logging.getLogger("tests.logging")
+
+    def worker(n):
+        with log_context(request_id=f"req-{n}"):
+            logger.info(f"worker {n}")
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted((r["message"], r["request_id"]) for r in records()) == [
+        (f"worker {n}", f"req-{n}") for n in range(8)
+    ]
+
+
+def test_middleware_assigns_and_echoes_request_ids():
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    app = FastAPI()
+    app.add_middleware(RequestContextMiddleware)
+
+    @app.get("/id")
+    def current_id():
+        return {"request_id": request_id_var.get()}
+
+    client = TestClient(app)
+    response = client.get("/id", headers={"X-Request-ID": "from-gateway"})
+    assert response.json() == {"request_id": "from-gateway"}
+    assert response.headers["x-request-id"] == "from-gateway"
+
+    # Oversized or unprintable IDs are replaced
+    for header in ("x" * 129, "bad\tid"):
+        response = client.get("/id", headers={"X-Request-ID": header})
+        assert response.json()["request_id"] == response.headers["x-request-id"] != header
+    assert request_id_var.get() is None
+
+
+def test_sampling_keeps_warnings_and_matches_child_loggers(monkeypatch):
+    rates = parse_sampling("uvicorn.access=0, utils.github=0.5 ,bogus=7")
+    assert rates == {"uvicorn.access": 0.0, "utils.github": 0.5, "bogus": 1.0}
+
+    sampler = SamplingFilter(rates)
+    monkeypatch.setattr("utils.logging.random.random", lambda: 0.7)
+
+    def kept(name, level=logging.INFO):
+        return sampler.filter(logging.LogRecord(name, level, "", 0, "message", (), None))
+
+    assert not kept("uvicorn.access")
+    assert kept("uvicorn.access", logging.WARNING)
+    assert not kept("utils.github.client")  # 0.7 is above the 0.5 rate of its parent
+    assert kept("utils.githubber")  # Not a child of utils.github
+    assert kept("api.auth")
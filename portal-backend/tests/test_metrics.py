@@ -0,0 +1,94 @@
+"""
+Metrics
+Hot-path cost of the counters, histograms and request middleware, and query timing
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from conftest import per_call
+from utils.metrics import Counter, Histogram, MetricsMiddleware
+
+# Per-call budgets, far above the expected cost so slow CI machines pass
+UPDATE_BUDGET_SECONDS = 5e-6
+MIDDLEWARE_BUDGET_SECONDS = 50e-6
+
+
+def test_counter_and_histogram_update_cost(benchmark_report):
+    counter = Counter("bench", "Benchmark counter", ("route",))
+    histogram = Histogram("bench_seconds", "Benchmark histogram", ("route",))
+    labels = ("/api/bench",)
+
+    inc = per_call(lambda: counter.inc(labels=labels), 100_000, repeat=3)
+    observe = per_call(lambda: histogram.observe(0.042, labels), 100_000, repeat=3)
+    benchmark_report(f"Counter.inc {inc * 1e9:.0f} ns, Histogram.observe {observe * 1e9:.0f} ns")
+
+    assert inc < UPDATE_BUDGET_SECONDS, f"Counter.inc {inc * 1e9:.0f} ns"
+    assert observe < UPDATE_BUDGET_SECONDS, f"Histogram.observe {observe * 1e9:.0f} ns"
+
+
+def test_concurrent_updates_are_not_lost():
+    counter = Counter("bench_threads", "Benchmark counter")
+    threads = [threading.Thread(target=lambda: [counter.inc() for _ in range(10_000)]) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert list(counter.samples()) == [("bench_threads_total", (), 80_000)]
+
+
+def test_middleware_overhead_per_request(benchmark_report):
+    class Route:
+        path = "/api/bench/{id}"
+
+    async def app(scope, receive, send):
+        scope["route"] = Route
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        pass
+
+    async def receive():
+        return {"type": "http.request"}
+
+    def requests(asgi, rounds: int):
+        async def run():
+            for _ in range(rounds):
+                await asgi({"type": "http", "method": "GET", "path": "/api/bench/1"}, receive, send)
+        return lambda: asyncio.run(run())
+
+    rounds = 20_000
+    bare = per_call(requests(app, rounds), 1, repeat=3) / rounds
+    instrumented = per_call(requests(MetricsMiddleware(app), rounds), 1, repeat=3) / rounds
+    overhead = instrumented - bare
+    benchmark_report(f"MetricsMiddleware overhead {overhead * 1e6:.2f} us per request")
+
+    assert overhead < MIDDLEWARE_BUDGET_SECONDS, f"{overhead * 1e6:.2f} us per request"
+
+
+def _sample(metric, name: str) -> float:
+    return sum(value for sample, _, value in metric.samples() if sample == name)
+
+
+def test_failed_statements_do_not_leak_query_timers():
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.exc import OperationalError
+    from utils.metrics import db_query_duration, db_query_errors, instrument_engine
+
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+    timed = _sample(db_query_duration, "db_query_duration_seconds_count")
+    errors = _sample(db_query_errors, "db_query_errors_total")
+
+    with engine.connect() as connection:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                connection.execute(text("SELECT * FROM missing_table"))
+        assert connection.execute(text("SELECT 1")).scalar() == 1
+        assert connection.info["query_start"] == {}
+
+    assert _sample(db_query_errors, "db_query_errors_total") - errors == 3
+    assert _sample(db_query_duration, "db_query_duration_seconds_count") - timed == 1
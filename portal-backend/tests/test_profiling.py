@@ -0,0 +1,153 @@
+"""
+Request Profiling
+Which requests are profiled and kept, what a profile captures, and the admin endpoints
+"""
+
+from types import SimpleNamespace
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from utils import profiling
+from utils.profiling import Profiler, ProfilingMiddleware
+
+TOKEN = "profile-token"
+
+
+def _profiler(**kwargs) -> Profiler:
+    options = dict(sample_rate=0.0, token=TOKEN, slow_ms=60_000, keep=2, interval=0.001)
+    return Profiler(**{**options, **kwargs})
+
+
+def _busy(seconds: float):
+    """Hold the event loop thread so the sampler sees this frame"""
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    profiling.instrument_engine(engine)
+    return engine
+
+
+def _app(profiler: Profiler, engine) -> TestClient:
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware, profiler=profiler)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        _busy(0.05)
+        with engine.connect() as connection:
+            return {"value": connection.execute(text("SELECT :id"), {"id": item_id}).scalar()}
+
+    return TestClient(app)
+
+
+def test_trigger_by_token_or_sample():
+    profiler = _profiler()
+    assert profiler.trigger({"headers": [(b"x-profile", TOKEN.encode())]}) == "header"
+    assert profiler.trigger({"headers": [(b"x-profile", b"guess")]}) is None
+    assert profiler.trigger({"headers": []}) is None
+
+    assert _profiler(token=None).trigger({"headers": [(b"x-profile", TOKEN.encode())]}) is None
+    assert _profiler(sample_rate=1.0).trigger({"headers": []}) == "sampled"
+
+
+def test_header_profile_captures_stacks_and_queries(engine):
+    profiler = _profiler()
+    client = _app(profiler, engine)
+
+    response = client.get("/items/424242", headers={"X-Profile": TOKEN})
+    assert response.json() == {"value": 424242}
+    profile = profiler.get(int(response.headers["x-profile-id"]))
+
+    assert (profile.method, profile.path, profile.route, profile.status, profile.trigger) == (
+        "GET", "/items/424242", "/items/{item_id}", 200, "header"
+    )
+    assert profile.duration_ms >= 50 and profile.samples > 0
+    # Only application frames, outermost first: the middleware, the endpoint, then the busy loop
+    functions = [[frame.split(" (")[0] for frame in stack.split(";")] for stack in profile.stacks]
+    assert ["__call__", "item", "_busy"] in functions, profile.stacks
+    assert all("site-packages" not in stack for stack in profile.stacks)
+    assert [(q["statement"], q["executemany"]) for q in profile.queries] == [("SELECT ?", False)]
+    # Parameters are never stored
+    assert "424242" not in str(profile.queries)
+
+
+def test_unprofiled_and_fast_sampled_requests_are_not_kept(engine):
+    client = _app(_profiler(), engine)
+    assert "x-profile-id" not in client.get("/items/1").headers
+
+    profiler = _profiler(sample_rate=1.0)
+    response = _app(profiler, engine).get("/items/1")
+    assert "x-profile-id" in response.headers
+    assert list(profiler.profiles) == []  # Faster than slow_ms
+
+    profiler.slow_ms = 0
+    _app(profiler, engine).get("/items/1")
+    assert [p.trigger for p in profiler.profiles] == ["sampled"]
+
+
+def test_only_the_last_profiles_are_kept(engine):
+    profiler = _profiler()
+    client = _app(profiler, engine)
+    ids = [int(client.get("/items/1", headers={"X-Profile": TOKEN}).headers["x-profile-id"]) for _ in range(3)]
+    assert [p.id for p in profiler.profiles] == ids[1:]
+    assert profiler.get(ids[0]) is None
+
+
+def test_failed_statements_do_not_leak_query_timers(engine):
+    token = profiling._active_profile.set(profiling.Profile(
+        id=0, method="GET", path="/", trigger="header", started_at=None, threads=set(),
+    ))
+    try:
+        with engine.connect() as connection:
+            for _ in range(3):
+                with pytest.raises(OperationalError):
+                    connection.execute(text("SELECT * FROM missing_table"))
+            connection.execute(text("SELECT 1"))
+            assert connection.info["profile_start"] == {}
+        profile = profiling._active_profile.get()
+        assert [q["statement"] for q in profile.queries] == ["SELECT 1"]
+    finally:
+        profiling._active_profile.reset(token)
+
+
+@pytest.fixture
+def admin_api(monkeypatch):
+    """The monitoring router with a swappable current user and its own profiler"""
+    from api import auth, monitoring
+
+    profiler = _profiler()
+    monkeypatch.setattr(monitoring, "request_profiler", profiler)
+    app = FastAPI()
+    app.include_router(monitoring.router)
+    user = SimpleNamespace(role="admin")
+    app.dependency_overrides[auth.get_current_user] = lambda: user
+    return SimpleNamespace(client=TestClient(app), profiler=profiler, user=user)
+
+
+def test_admin_endpoints_list_and_show_profiles(admin_api, engine):
+    app_client = _app(admin_api.profiler, engine)
+    first, second = (
+        int(app_client.get(f"/items/{n}", headers={"X-Profile": TOKEN}).headers["x-profile-id"]) for n in (1, 2)
+    )
+
+    listed = admin_api.client.get("/api/admin/profiles").json()
+    assert [p["id"] for p in listed] == [second, first]  # Newest first
+    assert listed[0]["path"] == "/items/2" and listed[0]["query_count"] == 1
+
+    detail = admin_api.client.get(f"/api/admin/profiles/{first}", params={"top": 1}).json()
+    assert len(detail["stacks"]) == 1 and detail["stacks"][0]["samples"] > 0
+    assert detail["queries"][0]["statement"] == "SELECT ?"
+    assert admin_api.client.get("/api/admin/profiles/999").status_code == 404
+
+    admin_api.user.role = "viewer"
+    assert admin_api.client.get("/api/admin/profiles").status_code == 403
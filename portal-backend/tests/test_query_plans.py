@@ -0,0 +1,135 @@
+"""
+Query Plans
+The hot queries must be served by indexes, never by sequential scans
+
+Where the application issues the query itself, the statement is captured
+from the real code path, so a changed query is checked as well as a
+dropped index.
+"""
+
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator, List, Tuple
+import asyncio
+import json
+
+from sqlalchemy import event, select
+
+from models.customer import Customer
+from models.deployment import Deployment
+
+
+@contextmanager
+def captured_selects(engine) -> Iterator[List[Tuple[str, object]]]:
+    """Collect (statement, parameters) of every SELECT run inside the block"""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+
+def _pg_seq_scans(node) -> List[str]:
+    scans = [node["Relation Name"]] if node["Node Type"] == "Seq Scan" else []
+    for child in node.get("Plans", ()):
+        scans += _pg_seq_scans(child)
+    return scans
+
+
+def sequential_scans(engine, statement: str, parameters=()) -> List[str]:
+    """Tables the plan reads without an index"""
+    with engine.connect() as conn:
+        if engine.dialect.name == "postgresql":
+            # Tiny test tables make seq scans cheapest; only report those no index can avoid
+            conn.exec_driver_sql("SET enable_seqscan = off")
+            plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()
+            plan = plan if isinstance(plan, list) else json.loads(plan)
+            return _pg_seq_scans(plan[0]["Plan"])
+        details = [row[3] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+        return [d for d in details if d.startswith("SCAN ") and " USING " not in d]
+
+
+def assert_indexed(engine, statement, parameters=()):
+    if not isinstance(statement, str):
+        statement = str(statement.compile(engine, compile_kwargs={"literal_binds": True}))
+    scans = sequential_scans(engine, statement, parameters)
+    assert not scans, f"Sequential scan of {scans} in:\n{statement}"
+
+
+def test_customer_deployments_newest_first(migrated_db):
+    stmt = (
+        select(Deployment.id, Deployment.status, Deployment.started_at)
+        .where(Deployment.customer_id == 1)
+        .order_by(Deployment.started_at.desc())
+        .limit(20)
+    )
+    assert_indexed(migrated_db, stmt)
+
+
+def test_deployments_by_status(migrated_db):
+    stmt = (
+        select(Deployment.id)
+        .where(Deployment.status == "pending", Deployment.started_at >= datetime(2026, 1, 1))
+    )
+    assert_indexed(migrated_db, stmt)
+
+
+def test_customers_recently_updated(migrated_db):
+    stmt = select(Customer.id).where(Customer.updated_at >= datetime(2026, 1, 1))
+    assert_indexed(migrated_db, stmt)
+
+
+def test_reconciler_in_flight(migrated_db):
+    from utils.run_reconciler import run_reconciler
+
+    with captured_selects(migrated_db) as statements:
+        run_reconciler._in_flight()
+    assert statements
+    for statement, parameters in statements:
+        assert_indexed(migrated_db, statement, parameters)
+
+
+def test_deployment_list(migrated_db, db):
+    from api.deployments import list_deployments
+
+    with captured_selects(migrated_db) as statements:
+        asyncio.run(list_deployments(db=db))
+    assert statements
+    for statement, parameters in statements:
+        assert_indexed(migrated_db, statement, parameters)
+
+
+def test_customer_list_by_status(migrated_db, db):
+    from api.customers import list_customers
+
+    with captured_selects(migrated_db) as statements:
+        asyncio.run(list_customers(status="active", db=db, current_user=None))
+    assert statements
+    for statement, parameters in statements:
+        assert_indexed(migrated_db, statement, parameters)
+
+
+def test_cost_alert_rules(migrated_db, db):
+    from utils.cost_alerts import evaluate_cost_alerts
+
+    with captured_selects(migrated_db) as statements:
+        evaluate_cost_alerts(db)
+    assert statements
+    for statement, parameters in statements:
+        assert_indexed(migrated_db, statement, parameters)
+
+
+def test_undispatched_deployments(migrated_db):
+    from utils.workflow_dispatch import WorkflowDispatchQueue
+
+    with captured_selects(migrated_db) as statements:
+        WorkflowDispatchQueue._undispatched()
+    assert statements
+    for statement, parameters in statements:
+        assert_indexed(migrated_db, statement, parameters)
@@ -0,0 +1,172 @@
+"""
+Rightsizing
+Daily metric summaries from the batched collector and the vectorized rightsizing analyzer
+"""
+
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from utils.cost_intelligence import get_cost_engine
+
+END = date(2026, 10, 19)
+VM = "microsoft.compute/virtualmachines"
+SQL = "microsoft.sql/servers/databases"
+
+
+@pytest.fixture
+def engine():
+    return get_cost_engine()
+
+
+def test_summaries_match_nanpercentile(engine):
+    from cost_intelligence.collector import summarize_daily
+
+    rng = np.random.default_rng(7)
+    values = rng.uniform(0, 100, size=(3, 4, 2 * 24)).astype(np.float32)
+    values[rng.random(values.shape) < 0.3] = np.nan
+    values[0, 1, :24] = np.nan  # A metric with no points on the first day
+
+    p50, p95, peak = summarize_daily(values, 24)
+    assert p50.shape == (3, 2, 4)
+
+    per_day = values.reshape(3, 4, 2, 24).astype(np.float64)
+    with pytest.warns(RuntimeWarning):
+        expected = {
+            "p50": np.nanpercentile(per_day, 50, axis=3),
+            "p95": np.nanpercentile(per_day, 95, axis=3),
+            "peak": np.nanmax(per_day, axis=3),
+        }
+    for name, actual in (("p50", p50), ("p95", p95), ("peak", peak)):
+        np.testing.assert_allclose(actual, expected[name].transpose(0, 2, 1), rtol=1e-5, err_msg=name)
+    assert np.isnan(p95[0, 0, 1]) and not np.isnan(p95[0, 1, 1])
+
+
+def _vm(name: str, location: str = "westeurope", sku: str = "Standard_D8s_v3") -> dict:
+    return {
+        "id": f"/subscriptions/sub-1/resourceGroups/rg/providers/Microsoft.Compute/virtualMachines/{name}",
+        "type": "Microsoft.Compute/virtualMachines",
+        "location": location,
+        "sku": sku,
+    }
+
+
+class FakeMetricsClient:
+    """Answers query_resources with hourly points: constant CPU and free memory per resource"""
+
+    def __init__(self, usage: dict):
+        self.usage = usage
+        self.calls = []
+
+    def query_resources(self, resource_ids, metric_namespace, metric_names, timespan, granularity, aggregations):
+        self.calls.append(list(resource_ids))
+        start, end = timespan
+        hours = int((end - start) / granularity)
+        results = []
+        for resource_id in resource_ids:
+            cpu, free_memory = self.usage[resource_id.rsplit("/", 1)[-1]]
+            series = lambda value: [SimpleNamespace(data=[
+                SimpleNamespace(timestamp=start + h * granularity, average=value) for h in range(hours)
+            ])]
+            results.append(SimpleNamespace(resource_id=resource_id.upper(), metrics=[
+                SimpleNamespace(name="Percentage CPU", timeseries=series(cpu)),
+                SimpleNamespace(name="Available Memory Percentage", timeseries=series(free_memory)),
+                SimpleNamespace(name="Unrelated Metric", timeseries=series(99.0)),
+            ]))
+        return results
+
+
+class FailingMetricsClient:
+    def query_resources(self, **kwargs):
+        raise ConnectionError("Azure Monitor unavailable")
+
+
+def test_collector_batches_and_stores_daily_summaries(engine, tmp_path):
+    store = engine.MetricSummaryStore(str(tmp_path))
+    collector = engine.MetricsCollector(credential=None, store=store, batch_size=2)
+    client = FakeMetricsClient({"vm-a": (10.0, 80.0), "vm-b": (40.0, 50.0), "vm-c": (20.0, 90.0)})
+    collector._clients = {"westeurope": client, "northeurope": FailingMetricsClient()}
+
+    resources = [_vm("vm-a"), _vm("vm-b"), _vm("vm-c"), _vm("vm-d", location="northeurope"),
+                 {"id": "/subscriptions/sub-1/disks/d1", "type": "Microsoft.Compute/disks", "location": "westeurope"}]
+    summary = collector.collect("c001", resources, days=2, end=END)
+
+    # Three VMs in one region at two per call, the other region's batch fails
+    assert summary == {"customer_id": "c001", "resources": 4, "days": 2, "api_calls": 2, "failed_batches": 1}
+    assert [len(ids) for ids in client.calls] == [2, 1]
+    assert store.available_days("c001") == [END - timedelta(days=2), END - timedelta(days=1)]
+
+    window = store.load_window("c001", days=2, end=END - timedelta(days=1))
+    names = [rid.rsplit("/", 1)[-1] for rid in window.resource_ids]
+    assert names == ["vm-a", "vm-b", "vm-c"]  # The failed batch is left out, not stored as idle
+    assert window.p95.shape == (3, 2, 4)
+    cpu, memory, dtu = (engine.METRICS.index(m) for m in ("cpu", "memory", "dtu"))
+    np.testing.assert_allclose(window.p95[:, :, cpu], [[10, 10], [40, 40], [20, 20]])
+    np.testing.assert_allclose(window.max[:, :, memory], [[20, 20], [50, 50], [10, 10]])
+    assert np.isnan(window.p50[:, :, dtu]).all()
+    assert list(window.skus) == ["Standard_D8s_v3"] * 3
+
+
+def _window(rows, days: int = 7):
+    """One resource per row: (id, type, sku, observed days, {metric: daily p95})"""
+    from cost_intelligence.store import METRICS, MetricWindow
+
+    p95 = np.full((len(rows), days, len(METRICS)), np.nan, dtype=np.float32)
+    for i, (_, _, _, observed, usage) in enumerate(rows):
+        for metric, value in usage.items():
+            p95[i, days - observed:, METRICS.index(metric)] = value
+    return MetricWindow(
+        resource_ids=np.array([r[0] for r in rows]),
+        resource_types=np.array([r[1] for r in rows]),
+        skus=np.array([r[2] for r in rows]),
+        days=np.array([END - timedelta(days=days - d) for d in range(days)], dtype="datetime64[D]"),
+        p50=p95 * 0.5, p95=p95, max=p95 * 1.2,
+    )
+
+
+WINDOW_ROWS = [
+    ("/vm/idle", VM, "Standard_D8s_v3", 7, {"cpu": 10.0, "memory": 15.0}),
+    ("/vm/half", VM, "Standard_D8s_v3", 7, {"cpu": 30.0, "memory": 20.0}),
+    ("/vm/busy", VM, "Standard_D8s_v3", 7, {"cpu": 90.0, "memory": 40.0}),
+    ("/vm/new", VM, "Standard_D8s_v3", 3, {"cpu": 5.0, "memory": 5.0}),
+    ("/vm/custom", VM, "Custom_Size", 7, {"cpu": 5.0}),
+    ("/sql/dtu", SQL, "S3", 7, {"dtu": 20.0, "cpu": 95.0}),
+    ("/sql/vcore", SQL, "GP_Gen5_8", 7, {"cpu": 12.0, "memory": 10.0, "iops": 5.0}),
+]
+
+
+def test_analyzer_snaps_to_the_smallest_size_that_fits(engine):
+    analyzer = engine.RightsizingAnalyzer(target_utilization=65.0, min_days=7, min_savings=5.0)
+    recommendations = {r["resource_id"]: r for r in analyzer.analyze(_window(WINDOW_ROWS))}
+
+    # Busy, too recently observed and unparseable resources are left alone
+    assert sorted(recommendations) == ["/sql/dtu", "/sql/vcore", "/vm/half", "/vm/idle"]
+    assert recommendations["/vm/idle"]["action"] == "Downsize to Standard_D2s_v3"  # 8 x 15/65 -> 2
+    assert recommendations["/vm/half"]["action"] == "Downsize to Standard_D4s_v3"  # 8 x 30/65 -> 4
+    assert recommendations["/sql/vcore"]["action"] == "Downsize to GP_Gen5_2"
+    # DTU databases are sized on DTU alone: 20% of S3 needs 31 DTUs -> S2
+    assert recommendations["/sql/dtu"]["action"] == "Downsize to S2"
+    assert recommendations["/sql/dtu"]["potential_savings"] == pytest.approx(150.26 - 75.13)
+
+    idle = recommendations["/vm/idle"]
+    assert idle["current_cost"] == pytest.approx(8 * 0.048 * 730, abs=0.01)
+    assert idle["savings_percentage"] == 75.0
+    assert "p95 cpu: 10%, p95 memory: 15%" in idle["description"]
+
+
+def test_analyzer_prefers_actual_cost_and_sorts_by_savings(engine):
+    analyzer = engine.RightsizingAnalyzer(target_utilization=65.0, min_days=7, min_savings=5.0)
+    recommendations = analyzer.analyze(_window(WINDOW_ROWS), monthly_costs={"/VM/IDLE": 100.0, "/vm/half": 4.0})
+
+    by_id = {r["resource_id"]: r for r in recommendations}
+    assert (by_id["/vm/idle"]["current_cost"], by_id["/vm/idle"]["potential_savings"]) == (100.0, 75.0)
+    assert "/vm/half" not in by_id  # Saving 2 USD is below min_savings
+    savings = [r["potential_savings"] for r in recommendations]
+    assert savings == sorted(savings, reverse=True)
+
+
+def test_analyzer_on_an_empty_window(engine, tmp_path):
+    window = engine.MetricSummaryStore(str(tmp_path)).load_window("c001", days=7, end=END)
+    assert engine.RightsizingAnalyzer().analyze(window) == []
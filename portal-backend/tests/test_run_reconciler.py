@@ -0,0 +1,124 @@
+"""
+Run Reconciler
+Syncing in-flight deployments from the bulk workflow run listing, against an httpx mock transport
+"""
+
+from datetime import datetime
+import asyncio
+import hashlib
+import json
+
+import httpx
+import pytest
+
+from models.customer import Customer
+from models.deployment import Deployment, DeploymentStatus
+from utils import run_reconciler
+from utils.github import GitHubClient
+from utils.run_reconciler import RunReconciler, title_deployment_id
+
+REPO = "org/portal"
+WORKFLOW = "deploy-infrastructure.yml"
+RUNS_PATH = f"/repos/{REPO}/actions/workflows/{WORKFLOW}/runs"
+
+
+class FakeRunListing:
+    """Serves the run listing page by page with ETags, answering 304 when the page is unchanged"""
+
+    def __init__(self):
+        self.runs = []
+        self.requests = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        assert request.url.path == RUNS_PATH
+        page, per_page = int(request.url.params["page"]), int(request.url.params["per_page"])
+        self.requests.append(page)
+        body = {"total_count": len(self.runs), "workflow_runs": self.runs[(page - 1) * per_page:page * per_page]}
+        etag = '"' + hashlib.sha256(json.dumps(body, sort_keys=True).encode()).hexdigest()[:16] + '"'
+        if request.headers.get("if-none-match") == etag:
+            return httpx.Response(304, headers={"etag": etag})
+        return httpx.Response(200, json=body, headers={"etag": etag})
+
+
+def _run(run_id: int, title: str, status: str = "in_progress", conclusion: str = None) -> dict:
+    return {
+        "id": run_id, "display_title": title, "status": status, "conclusion": conclusion,
+        "html_url": f"https://github.com/{REPO}/actions/runs/{run_id}", "updated_at": "2026-10-19T06:30:00Z",
+    }
+
+
+@pytest.fixture
+def deployments(db):
+    """In-flight deployments: linked to run 901, unlinked, linked to run 903, and one without a run yet"""
+    customer = Customer(customer_id="rr001", customer_name="Reconcile", email="rr001@example.com")
+    db.add(customer)
+    db.flush()
+    records = [
+        Deployment(customer_id=customer.id, status="pending", progress_percentage=0, github_run_id=run_id,
+                   started_at=datetime.utcnow())
+        for run_id in ("901", None, "903", None)
+    ]
+    db.add_all(records)
+    db.commit()
+    try:
+        yield records
+    finally:
+        db.rollback()
+        for record in records:
+            db.delete(record)
+        db.delete(customer)
+        db.commit()
+
+
+def test_title_carries_the_deployment_id():
+    assert title_deployment_id("Deploy rr001 #42") == 42
+    assert title_deployment_id("Deploy rr001") is None
+    assert title_deployment_id(None) is None
+
+
+def test_sweep_reconciles_from_the_bulk_listing(db, deployments, monkeypatch):
+    monkeypatch.setattr(run_reconciler, "PAGE_SIZE", 2)
+    linked, unlinked, failing, waiting = deployments
+    listing = FakeRunListing()
+    listing.runs = [
+        _run(903, f"Deploy rr001 #{failing.id}", "completed", "failure"),
+        _run(902, f"Deploy rr001 #{unlinked.id}", "completed", "success"),
+        _run(900, f"Deploy rr001 #{unlinked.id}", "completed", "cancelled"),  # Older run, superseded
+        _run(901, f"Deploy rr001 #{linked.id}"),
+        _run(800, "Deploy other #999999"),
+    ]
+    reconciler = RunReconciler(GitHubClient("test-token", REPO, transport=httpx.MockTransport(listing)), WORKFLOW)
+
+    async def sweep():
+        try:
+            return await reconciler.reconcile()
+        finally:
+            await reconciler.client.aclose()
+
+    summary = asyncio.run(sweep())
+    assert (summary["runs"], summary["linked"], summary["updated"]) == (5, 1, 3)
+    assert listing.requests == [1, 2, 3]  # Every page of the listing, not one request per deployment
+
+    for record in deployments:
+        db.refresh(record)
+    assert [(r.status, r.progress_percentage) for r in deployments] == [
+        (DeploymentStatus.VALIDATING.value, 5),
+        (DeploymentStatus.COMPLETED.value, 100),
+        (DeploymentStatus.FAILED.value, 0),
+        ("pending", 0),
+    ]
+    assert (unlinked.github_run_id, unlinked.github_run_url) == ("902", f"https://github.com/{REPO}/actions/runs/902")
+    assert failing.error_message == "Workflow run failure"
+
+    # Nothing changed on GitHub: every page is a 304 and no row is written
+    summary = asyncio.run(sweep())
+    assert (summary["runs"], summary["linked"], summary["updated"]) == (5, 0, 0)
+    assert reconciler.stats == {"requests": 6, "not_modified": 3}
+
+
+def test_sweep_without_in_flight_deployments_skips_github(monkeypatch):
+    listing = FakeRunListing()
+    reconciler = RunReconciler(GitHubClient("test-token", REPO, transport=httpx.MockTransport(listing)), WORKFLOW)
+    monkeypatch.setattr(reconciler, "_in_flight", lambda: [])
+    assert asyncio.run(reconciler.reconcile()) == {"in_flight": 0, "runs": 0, "linked": 0, "updated": 0}
+    assert listing.requests == []
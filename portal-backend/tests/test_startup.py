@@ -0,0 +1,51 @@
+"""
+Startup
+What importing the application entry points costs and requires
+"""
+
+from typing import Dict
+import os
+import subprocess
+import sys
+
+from conftest import BACKEND_DIR
+
+# Cumulative seconds `import main` may take (FastAPI and SQLAlchemy are most of it)
+IMPORT_BUDGET_SECONDS = float(os.environ.get("IMPORT_BUDGET_SECONDS", "3.0"))
+
+# Imported on first use, never at startup
+LAZY_MODULES = ("azure", "pandas", "numpy", "passlib", "alembic")
+
+
+def _python(args: list, env: dict, cwd: str = BACKEND_DIR) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *args], cwd=cwd, env=env, capture_output=True, text=True, timeout=120)
+
+
+def importtime(module: str) -> Dict[str, float]:
+    """Cumulative import seconds per module, from `python -X importtime -c "import <module>"`"""
+    result = _python(["-X", "importtime", "-c", f"import {module}"], dict(os.environ))
+    assert result.returncode == 0, result.stderr
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times.setdefault(name.strip(), int(cumulative) / 1e6)
+    return times
+
+
+def test_main_import_time_budget(benchmark_report):
+    # Best of three: the first run also pays for cold .pyc and disk caches
+    times = min((importtime("main") for _ in range(3)), key=lambda t: t["main"])
+    benchmark_report(f"import main {times['main'] * 1000:.0f} ms (budget {IMPORT_BUDGET_SECONDS * 1000:.0f} ms)")
+    assert times["main"] < IMPORT_BUDGET_SECONDS, f"import main took {times['main'] * 1000:.0f} ms"
+
+    eager = sorted(name for name in times if name.split(".")[0] in LAZY_MODULES)
+    assert not eager, f"Imported at startup: {eager}"
+
+
+def test_portal_app_imports_without_api_settings(tmp_path):
+    """app.py runs on its own environment; the API's required settings must not be needed"""
+    env = {"PATH": os.environ.get("PATH", ""), "PYTHONPATH": BACKEND_DIR}
+    result = _python(["-c", "import app"], env, cwd=str(tmp_path))
+    assert result.returncode == 0, result.stderr
@@ -0,0 +1,161 @@
+"""
+Shared State Store
+Compare-and-swap updates under concurrent writers and waiting for an entry to change
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from utils import state_store
+from utils.state_store import MemoryStateStore, StateConflict, create_state_store
+
+POLL = 0.2
+
+
+@pytest.fixture
+def database_url(tmp_path):
+    return f"sqlite:///{tmp_path}/state.db"
+
+
+@pytest.fixture(params=["memory", "database"])
+def store(request, database_url):
+    if request.param == "memory":
+        return MemoryStateStore(POLL)
+    return create_state_store("database", database_url, POLL)
+
+
+def test_put_update_and_read(store):
+    async def scenario():
+        created = await store.put("deployments", "d1", {"status": "pending", "steps": []})
+        updated = await store.update("deployments", "d1", lambda v: {**v, "status": "running"})
+        missing = await store.update("deployments", "nope", lambda v: {**v, "status": "running"})
+        return created, updated, missing, await store.get("deployments", "d1"), await store.list("deployments")
+
+    created, updated, missing, entry, entries = asyncio.run(scenario())
+    assert (created.version, updated.version, missing) == (1, 2, None)
+    assert (entry.value, entry.version) == ({"status": "running", "steps": []}, 2)
+    assert [(e.key, e.version) for e in entries] == [("d1", 2)]
+
+
+def test_mutation_gets_a_private_copy(store):
+    async def scenario():
+        await store.put("deployments", "d1", {"steps": ["validate"]})
+
+        def abandon(value):
+            value["steps"].append("hub")  # Mutated in place, then the write is abandoned
+            return None
+
+        await store.update("deployments", "d1", abandon)
+        return await store.get("deployments", "d1")
+
+    assert asyncio.run(scenario()).value == {"steps": ["validate"]}
+
+
+def test_concurrent_writers_never_lose_an_update(database_url):
+    # Two stores on one database stand in for two workers
+    workers = [create_state_store("database", database_url, POLL) for _ in range(2)]
+    workers[0]._write("deployments", "d1", lambda v: {"count": 0})
+
+    def increment(store):
+        for _ in range(25):
+            store._write("deployments", "d1", lambda v: {"count": v["count"] + 1})
+
+    threads = [threading.Thread(target=increment, args=(workers[i % 2],)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    entry = workers[1]._get("deployments", "d1")
+    assert (entry.value, entry.version) == ({"count": 100}, 101)
+
+
+def test_lost_race_is_retried_on_the_new_value(database_url):
+    ours, theirs = (create_state_store("database", database_url, POLL) for _ in range(2))
+    ours._write("deployments", "d1", lambda v: {"steps": []})
+    seen = []
+
+    def add_hub(value):
+        seen.append(list(value["steps"]))
+        if len(seen) == 1:
+            # Another worker writes between our read and our compare-and-swap
+            theirs._write("deployments", "d1", lambda v: {"steps": v["steps"] + ["validate"]})
+        return {"steps": value["steps"] + ["hub"]}
+
+    entry = ours._write("deployments", "d1", add_hub)
+    assert seen == [[], ["validate"]]
+    assert (entry.value, entry.version) == ({"steps": ["validate", "hub"]}, 3)
+
+
+def test_writer_that_always_loses_gives_up(database_url, monkeypatch):
+    monkeypatch.setattr(state_store, "MAX_WRITE_ATTEMPTS", 3)
+    ours, theirs = (create_state_store("database", database_url, POLL) for _ in range(2))
+    ours._write("deployments", "d1", lambda v: {"n": 0})
+    attempts = []
+
+    def always_overtaken(value):
+        attempts.append(value["n"])
+        theirs._write("deployments", "d1", lambda v: {"n": v["n"] + 1})
+        return {"n": -1}
+
+    with pytest.raises(StateConflict):
+        ours._write("deployments", "d1", always_overtaken)
+    assert attempts == [0, 1, 2]
+    assert ours._get("deployments", "d1").value == {"n": 3}
+
+
+def test_wait_wakes_on_local_writes_at_once(store):
+    async def scenario():
+        await store.put("deployments", "d1", {"status": "pending"})
+
+        async def write_soon():
+            await asyncio.sleep(0.02)
+            await store.update("deployments", "d1", lambda v: {"status": "running"})
+
+        writer = asyncio.create_task(write_soon())
+        started = time.monotonic()
+        entry = await store.wait("deployments", "d1", after_version=1, timeout=5)
+        await writer
+        return entry, time.monotonic() - started
+
+    entry, waited = asyncio.run(scenario())
+    assert (entry.value, entry.version) == ({"status": "running"}, 2)
+    assert waited < POLL / 2
+
+
+def test_wait_sees_other_workers_within_the_poll_interval(database_url):
+    ours, theirs = (create_state_store("database", database_url, POLL) for _ in range(2))
+
+    async def scenario():
+        await ours.put("deployments", "d1", {"status": "pending"})
+        threading.Timer(0.02, theirs._write, ("deployments", "d1", lambda v: {"status": "done"})).start()
+        started = time.monotonic()
+        entry = await ours.wait("deployments", "d1", after_version=1, timeout=5)
+        return entry, time.monotonic() - started
+
+    entry, waited = asyncio.run(scenario())
+    assert entry.value == {"status": "done"}
+    assert waited < 2 * POLL
+
+
+def test_wait_returns_the_current_entry_on_timeout(store):
+    async def scenario():
+        await store.put("deployments", "d1", {"status": "pending"})
+        return (
+            await store.wait("deployments", "d1", after_version=1, timeout=0.05),
+            await store.wait("deployments", "d1", after_version=0, timeout=5),
+            await store.wait("deployments", "missing", after_version=0, timeout=5),
+        )
+
+    timed_out, already_newer, missing = asyncio.run(scenario())
+    assert timed_out.version == 1 and already_newer.version == 1
+    assert missing is None
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError, match="Unknown STATE_BACKEND"):
+        create_state_store("redis")
+    with pytest.raises(ValueError, match="needs a database URL"):
+        create_state_store("database")
@@ -0,0 +1,106 @@
+"""
+Terraform Runner
+Secret cache hits, expiry and zeroization, and runner validation
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from utils import cache, terraform
+from utils.cache import TTLCache
+from utils.encryption import encrypt_value
+
+
+@pytest.fixture
+def secrets(monkeypatch):
+    """A fresh two-entry secret cache with a 60 s TTL, a settable clock and a decrypt call log"""
+    clock = SimpleNamespace(now=1_000_000.0)
+    monkeypatch.setattr(cache.time, "time", lambda: clock.now)
+    monkeypatch.setattr(terraform, "_secret_cache", TTLCache(2, ttl=60, on_evict=terraform._zeroize))
+    monkeypatch.setattr(terraform, "_next_secret_purge", 0.0)
+
+    decrypted = []
+    real_decrypt = terraform.decrypt_value
+
+    def decrypt(ciphertext):
+        decrypted.append(ciphertext)
+        return real_decrypt(ciphertext)
+
+    monkeypatch.setattr(terraform, "decrypt_value", decrypt)
+    return SimpleNamespace(clock=clock, decrypted=decrypted, cache=terraform._secret_cache)
+
+
+def _buffer(cache: TTLCache, ciphertext: str) -> bytearray:
+    """The cached plaintext buffer itself (what zeroization must wipe)"""
+    key = terraform.hashlib.sha256(ciphertext.encode()).digest()
+    return cache._data[key][0]
+
+
+def test_cache_hit_skips_decryption(secrets):
+    ciphertext = encrypt_value("sp-secret")
+    assert terraform.client_secret(ciphertext) == "sp-secret"
+    assert terraform.client_secret(ciphertext) == "sp-secret"
+    assert secrets.decrypted == [ciphertext]
+
+
+def test_expired_secret_is_zeroized_and_decrypted_again(secrets):
+    ciphertext = encrypt_value("sp-secret")
+    terraform.client_secret(ciphertext)
+    buffer = _buffer(secrets.cache, ciphertext)
+
+    secrets.clock.now += 61
+    assert terraform.client_secret(ciphertext) == "sp-secret"
+    assert buffer == bytearray(len("sp-secret"))
+    assert len(secrets.decrypted) == 2
+
+
+def test_evicted_secret_is_zeroized(secrets):
+    first, second, third = (encrypt_value(f"secret-{i}") for i in range(3))
+    terraform.client_secret(first)
+    buffer = _buffer(secrets.cache, first)
+
+    terraform.client_secret(second)
+    terraform.client_secret(third)  # Over maxsize: the least recently used entry goes
+    assert buffer == bytearray(len("secret-0"))
+    assert len(secrets.cache) == 2
+
+
+def test_purge_runs_on_an_interval_not_every_call(secrets, monkeypatch):
+    purges = []
+    monkeypatch.setattr(secrets.cache, "purge", lambda: purges.append(1))
+    ciphertext = encrypt_value("sp-secret")
+    for _ in range(100):
+        terraform.client_secret(ciphertext)
+    assert len(purges) == 1
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    from config import settings
+
+    monkeypatch.setattr(settings, "TF_ENVIRONMENTS_PATH", str(tmp_path))
+    (tmp_path / "abc" / "hub").mkdir(parents=True)
+    (tmp_path / "abc" / "edge").mkdir(parents=True)
+    return tmp_path
+
+
+def _customer(secret: str):
+    return SimpleNamespace(
+        id=1, tenant_id="tenant", sp_client_id="client", sp_client_secret=secret,
+        subscription_ids={"hub": "sub-hub"},
+    )
+
+
+def test_runner_environment(secrets, workdir):
+    runner = terraform.TerraformRunner("abc", "hub", _customer(encrypt_value("sp-secret")))
+    env = runner.env
+    assert (env["ARM_SUBSCRIPTION_ID"], env["ARM_CLIENT_SECRET"]) == ("sub-hub", "sp-secret")
+    assert "ARM_CLIENT_SECRET" not in terraform.base_environment(runner.customer, "sub-hub")
+
+
+def test_runner_rejects_bad_configuration_up_front(secrets, workdir):
+    with pytest.raises(ValueError, match="Unknown component"):
+        terraform.TerraformRunner("abc", "edge", _customer(encrypt_value("sp-secret")))
+    with pytest.raises(ValueError):
+        terraform.TerraformRunner("abc", "hub", _customer("v1:not-a-fernet-token"))
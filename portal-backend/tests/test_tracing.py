@@ -0,0 +1,176 @@
+"""
+Tracing
+Span parenting across tasks, threads and queues, W3C traceparent propagation and export
+"""
+
+import asyncio
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response
+from fastapi.testclient import TestClient
+
+from utils.tracing import (
+    STATUS_ERROR, FileExporter, SpanContext, TracingMiddleware, annotate, current_context, traced, tracer,
+)
+
+INCOMING = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+
+
+class ListExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, spans):
+        self.spans.extend(spans)
+
+
+@pytest.fixture
+def exported():
+    """Export every span into a list; calling the result flushes and returns them by name"""
+    sample_rate = tracer.sample_rate
+    exporter = ListExporter()
+    tracer.sample_rate = 1.0
+    tracer.processor.start(exporter)
+
+    def flush():
+        tracer.processor.shutdown()
+        return {span.name: span for span in exporter.spans}
+
+    try:
+        yield flush
+    finally:
+        tracer.processor.shutdown()
+        tracer.sample_rate = sample_rate
+
+
+@pytest.mark.parametrize("header, expected", [
+    (INCOMING, ("4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7", True)),
+    (INCOMING[:-2] + "00", ("4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7", False)),
+    (" " + INCOMING.upper() + " ", ("4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7", True)),
+    ("00-" + "0" * 32 + "-00f067aa0ba902b7-01", None),  # All-zero trace id
+    ("01-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01", None),  # Unknown version
+    ("garbage", None),
+    (None, None),
+])
+def test_traceparent_parsing(header, expected):
+    context = SpanContext.from_traceparent(header)
+    assert (None if context is None else (context.trace_id, context.span_id, context.sampled)) == expected
+    if context is not None and context.sampled:
+        assert context.traceparent == INCOMING
+
+
+def test_spans_follow_tasks_threads_and_queues(exported):
+    @traced("threadpool work")
+    def blocking():
+        annotate(rows=3)
+
+    async def child(name):
+        with tracer.span(name):
+            await asyncio.sleep(0)
+
+    async def request():
+        handed_over = asyncio.Queue()
+        with tracer.span("request", kind="server"):
+            await asyncio.gather(child("task a"), child("task b"))
+            await run_in_threadpool(blocking)
+            handed_over.put_nowait(current_context())
+        # A worker picks the job up after the request span ended
+        with tracer.span("queued job", parent=handed_over.get_nowait(), kind="producer"):
+            pass
+
+    asyncio.run(request())
+    spans = exported()
+    root = spans["request"]
+    assert root.parent_id is None
+    for name in ("task a", "task b", "threadpool work", "queued job"):
+        assert (spans[name].context.trace_id, spans[name].parent_id) == (root.context.trace_id, root.context.span_id)
+    assert spans["threadpool work"].attributes == {"rows": 3}
+    assert current_context() is None
+
+
+def test_unsampled_traces_propagate_but_record_nothing(exported):
+    tracer.sample_rate = 0.0
+    with tracer.span("root", attribute="dropped") as root:
+        with tracer.span("child") as child:
+            annotate(ignored=True)
+    assert not root.context.sampled and not child.context.sampled
+    assert child.context.trace_id == root.context.trace_id
+    assert (root.attributes, child.attributes) == ({}, {})
+    assert exported() == {}
+
+
+def test_exceptions_mark_the_span_failed(exported):
+    with pytest.raises(ValueError):
+        with tracer.span("failing"):
+            raise ValueError("bad input")
+    span = exported()["failing"]
+    assert (span.status, span.status_message) == (STATUS_ERROR, "bad input")
+    assert span.events[0]["attributes"] == {"exception.type": "ValueError", "exception.message": "bad input"}
+
+
+def _app() -> TestClient:
+    app = FastAPI()
+    app.add_middleware(TracingMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        with tracer.span("load item"):
+            return {"traceparent": current_context().traceparent}
+
+    @app.get("/broken")
+    async def broken():
+        return Response(status_code=503)
+
+    return TestClient(app)
+
+
+def test_middleware_continues_the_callers_trace(exported):
+    client = _app()
+    response = client.get("/items/1", headers={"traceparent": INCOMING})
+    returned = SpanContext.from_traceparent(response.headers["traceparent"])
+    inner = SpanContext.from_traceparent(response.json()["traceparent"])
+    client.get("/broken")
+
+    spans = exported()
+    server = spans["GET /items/{item_id}"]
+    assert server.kind == "server"
+    assert (returned.trace_id, server.parent_id) == ("4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7")
+    assert returned.span_id == server.context.span_id != "00f067aa0ba902b7"
+    assert spans["load item"].parent_id == server.context.span_id == returned.span_id
+    assert inner.span_id == spans["load item"].context.span_id
+    assert server.attributes["http.route"] == "/items/{item_id}"
+    assert server.attributes["http.response.status_code"] == 200
+    assert spans["GET /broken"].status == STATUS_ERROR
+
+
+def test_invalid_traceparent_starts_a_new_trace(exported):
+    response = _app().get("/items/2", headers={"traceparent": "not-a-traceparent"})
+    assert response.status_code == 200
+    server = exported()["GET /items/{item_id}"]
+    assert server.parent_id is None
+    assert SpanContext.from_traceparent(response.headers["traceparent"]) == server.context
+
+
+def test_file_exporter_writes_otlp_json_lines(exported, tmp_path):
+    with tracer.span("root", attempts=2, ratio=0.5, ok=True, tags=["a"]) as root:
+        pass
+    child = tracer.start_span("child", parent=root.context, kind="client")
+    child.end()
+
+    path = tmp_path / "spans.jsonl"
+    FileExporter(str(path), "portal-api").export([root, child])
+    request = json.loads(path.read_text().splitlines()[0])
+    resource = request["resourceSpans"][0]
+    assert resource["resource"]["attributes"] == [{"key": "service.name", "value": {"stringValue": "portal-api"}}]
+    exported_root, exported_child = resource["scopeSpans"][0]["spans"]
+    assert exported_root["attributes"] == [
+        {"key": "attempts", "value": {"intValue": "2"}},
+        {"key": "ratio", "value": {"doubleValue": 0.5}},
+        {"key": "ok", "value": {"boolValue": True}},
+        {"key": "tags", "value": {"arrayValue": {"values": [{"stringValue": "a"}]}}},
+    ]
+    assert "parentSpanId" not in exported_root
+    assert (exported_child["parentSpanId"], exported_child["kind"]) == (root.context.span_id, 3)
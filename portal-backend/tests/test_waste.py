@@ -0,0 +1,115 @@
+"""
+Waste Detection
+Orphaned, unassociated and idle resources found by joining inventory, cost rows and metric summaries
+"""
+
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from utils.cost_intelligence import get_cost_engine
+
+NOW = datetime(2026, 10, 19, 6, 0, tzinfo=timezone.utc)
+PREFIX = "/subscriptions/sub-1/resourcegroups/rg/providers"
+
+
+def _row(kind: str, name: str, state: str = "", sku: str = "", since: str = "") -> dict:
+    return {"id": f"{PREFIX}/{kind}/{name}", "name": name, "type": kind, "sku": sku,
+            "state": state, "stateSince": since}
+
+
+INVENTORY = [
+    _row("microsoft.compute/disks", "disk-orphan", "Unattached", "Premium_LRS", "2026-10-01T06:00:00Z"),
+    _row("microsoft.compute/disks", "disk-in-use", "Attached", "Premium_LRS"),
+    _row("microsoft.network/publicipaddresses", "pip-free", "Unassociated", "Standard"),
+    _row("microsoft.network/networkinterfaces", "nic-detached", "Detached"),
+    _row("microsoft.web/serverfarms", "plan-empty", "Empty", "S1"),
+    _row("microsoft.compute/virtualmachines", "vm-stopped", "PowerState/stopped", "Standard_D4s_v3"),
+    _row("microsoft.compute/virtualmachines", "vm-deallocated", "PowerState/deallocated", "Standard_D4s_v3"),
+    _row("microsoft.compute/virtualmachines", "vm-idle", "PowerState/running", "Standard_D2s_v3"),
+    _row("microsoft.compute/virtualmachines", "vm-busy", "PowerState/running", "Standard_D2s_v3"),
+    _row("microsoft.compute/virtualmachines", "vm-new", "PowerState/running", "Standard_D2s_v3"),
+]
+
+
+@pytest.fixture
+def engine():
+    return get_cost_engine()
+
+
+@pytest.fixture
+def inventory(engine):
+    return engine.InventorySnapshot.from_rows(INVENTORY, taken_at=NOW)
+
+
+def _metrics(engine, usage: dict, days: int = 7):
+    """Daily CPU p95 per VM name: (observed days, value)"""
+    names = sorted(usage)
+    p95 = np.full((len(names), days, len(engine.METRICS)), np.nan, dtype=np.float32)
+    for i, name in enumerate(names):
+        observed, cpu = usage[name]
+        p95[i, days - observed:, engine.METRICS.index("cpu")] = cpu
+    return engine.MetricWindow(
+        resource_ids=np.array([f"{PREFIX}/Microsoft.Compute/virtualMachines/{n}".upper() for n in names]),
+        resource_types=np.array(["microsoft.compute/virtualmachines"] * len(names)),
+        skus=np.array(["Standard_D2s_v3"] * len(names)),
+        days=np.array([date(2026, 10, 12) + timedelta(days=d) for d in range(days)], dtype="datetime64[D]"),
+        p50=p95, p95=p95, max=p95,
+    )
+
+
+def _costs(engine, monthly: dict):
+    """Thirty days of cost rows adding up to the given monthly cost per resource name"""
+    names = sorted(monthly)
+    return engine.CostFrame(
+        resource_ids=np.array([next(r["id"] for r in INVENTORY if r["name"] == n) for n in names]),
+        service_names=np.array(["Storage"] * len(names)),
+        days=np.array([date(2026, 9, 19) + timedelta(days=d) for d in range(30)], dtype="datetime64[D]"),
+        costs=np.repeat(np.array([[monthly[n] / 30] for n in names]), 30, axis=1),
+    )
+
+
+def test_inventory_states_flag_orphaned_resources(engine, inventory):
+    findings = {f["resource_name"]: f for f in engine.WasteDetector().detect(inventory, now=NOW)}
+
+    assert {name: f["finding"] for name, f in findings.items()} == {
+        "disk-orphan": "orphaned_disk",
+        "pip-free": "unattached_public_ip",
+        "nic-detached": "idle_nic",
+        "plan-empty": "empty_app_service_plan",
+        "vm-stopped": "stopped_allocated_vm",
+    }
+    disk = findings["disk-orphan"]
+    assert disk["description"] == "Disk (Premium_LRS) is unattached for 18 days."
+    assert (disk["potential_savings"], disk["waste_source"]) == (19.71, "list_price")
+    assert findings["pip-free"]["potential_savings"] == 3.65
+    assert findings["plan-empty"]["potential_savings"] == 73.0
+    # A NIC has no list price: flagged, but with nothing to save
+    assert (findings["nic-detached"]["potential_savings"], findings["nic-detached"]["savings_percentage"]) == (0.0, 0.0)
+    assert findings["vm-stopped"]["potential_savings"] == pytest.approx(4 * 0.048 * 730, abs=0.01)
+
+
+def test_running_vm_is_idle_only_after_enough_quiet_days(engine, inventory):
+    metrics = _metrics(engine, {"vm-idle": (7, 1.5), "vm-busy": (7, 35.0), "vm-new": (3, 0.5)})
+    detector = engine.WasteDetector(idle_cpu_threshold=2.0, min_idle_days=7)
+    idle = [f for f in detector.detect(inventory, metrics=metrics, now=NOW) if f["finding"] == "idle_vm"]
+
+    assert [f["resource_name"] for f in idle] == ["vm-idle"]
+    assert idle[0]["action"] == "Deallocate or delete the VM"
+    assert "peak daily p95 CPU: 1.5% over 7 days" in idle[0]["description"]
+
+
+def test_actual_cost_replaces_list_price(engine, inventory):
+    costs = _costs(engine, {"disk-orphan": 42.0, "disk-in-use": 500.0})
+    findings = engine.WasteDetector().detect(inventory, costs=costs, now=NOW)
+
+    # Findings are ordered by savings; cost rows alone never flag a resource
+    assert [f["resource_name"] for f in findings][:2] == ["vm-stopped", "plan-empty"]
+    disk = next(f for f in findings if f["resource_name"] == "disk-orphan")
+    assert (disk["potential_savings"], disk["waste_source"]) == (42.0, "cost_data")
+    assert "disk-in-use" not in {f["resource_name"] for f in findings}
+
+
+def test_empty_inventory(engine):
+    assert engine.WasteDetector().detect(engine.InventorySnapshot.from_rows([], taken_at=NOW)) == []
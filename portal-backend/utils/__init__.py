@@ -1,14 +1,30 @@
 """
 Utility Functions Package
+
+Exports are resolved on first access, so importing one utility module
+does not pull in the Azure SDK or the cost engine through this package.
 """
 
-from .azure import AzureClient
-from .terraform import TerraformRunner
-from .encryption import encrypt_value, decrypt_value
+import importlib
+
+_EXPORTS = {
+    'AzureClient': '.azure',
+    'TerraformRunner': '.terraform',
+    'encrypt_value': '.encryption',
+    'decrypt_value': '.encryption',
+    'encrypt_many': '.encryption',
+    'decrypt_many': '.encryption',
+    'get_cost_engine': '.cost_intelligence',
+    'EmailNotifier': '.notifications',
+    'TTLCache': '.cache',
+}
+
+__all__ = list(_EXPORTS)
+
 
-__all__ = [
-    'AzureClient',
-    'TerraformRunner',
-    'encrypt_value',
-    'decrypt_value'
-]
\ No newline at end of file
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
@@ -1,23 +1,85 @@
 """
 Azure SDK Utilities
 Interact with Azure services (Cost Management, Resource Graph, Monitor)
+
+The SDK packages take seconds to import, so they are imported on first
+use rather than at module import, keeping them off the startup path.
 """
 
-from azure.identity import DefaultAzureCredential, ClientSecretCredential
-from azure.mgmt.resource import ResourceManagementClient
-from azure.mgmt.monitor import MonitorManagementClient
-from azure.mgmt.costmanagement import CostManagementClient
-from azure.mgmt.costmanagement.models import QueryDefinition, QueryTimePeriod, QueryDataset, QueryAggregation
+from functools import lru_cache
 from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
+import time
 import logging
 
+from utils.metrics import azure_request_duration, azure_throttled
+from utils.tracing import STATUS_ERROR, traced, tracer
+
 logger = logging.getLogger(__name__)
 
+
+class TelemetryHooks:
+    """
+    Time and trace every HTTP attempt an SDK client makes, counting 429s
+
+    Installed as a per-retry policy, so each retry and page of a paged
+    listing is observed separately and gets its own client span under the
+    caller's active span.
+    """
+
+    def __init__(self, client: str):
+        self.client = client
+        self._throttled_labels = (client,)
+
+    def on_request(self, request):
+        request.context["telemetry_span"] = tracer.start_span(
+            f"Azure {self.client} {request.http_request.method}",
+            kind="client",
+            **{"http.request.method": request.http_request.method, "url.full": request.http_request.url.split("?")[0]},
+        )
+        request.context["telemetry_start"] = time.perf_counter()
+
+    def _finish(self, request, status: str):
+        started = request.context.get("telemetry_start")
+        if started is not None:
+            azure_request_duration.observe(time.perf_counter() - started, (self.client, status))
+        span = request.context.get("telemetry_span")
+        if span is not None:
+            span.set_attribute("http.response.status_code", status)
+            if status == "error" or status.startswith("5") or status == "429":
+                span.set_status(STATUS_ERROR, status)
+            span.end()
+
+    def on_response(self, request, response):
+        status_code = response.http_response.status_code
+        self._finish(request, str(status_code))
+        if status_code == 429:
+            azure_throttled.inc(labels=self._throttled_labels)
+
+    def on_exception(self, request):
+        self._finish(request, "error")
+
+
+@lru_cache()
+def _telemetry_policy_class() -> type:
+    from azure.core.pipeline.policies import SansIOHTTPPolicy
+    return type("TelemetryPolicy", (TelemetryHooks, SansIOHTTPPolicy), {})
+
+
+def telemetry_policy(client: str):
+    """A per-retry pipeline policy (SansIOHTTPPolicy) reporting as `client`"""
+    return _telemetry_policy_class()(client)
+
+
 class AzureClient:
     """Azure SDK client wrapper"""
     
     def __init__(self, tenant_id: str, subscription_id: str, client_id: str = None, client_secret: str = None):
+        from azure.identity import DefaultAzureCredential, ClientSecretCredential
+        from azure.mgmt.resource import ResourceManagementClient
+        from azure.mgmt.monitor import MonitorManagementClient
+        from azure.mgmt.costmanagement import CostManagementClient
+        
         self.subscription_id = subscription_id
         
         # Use service principal if provided, else default credential
@@ -31,10 +93,15 @@ class AzureClient:
             self.credential = DefaultAzureCredential()
         
         # Initialize clients
-        self.resource_client = ResourceManagementClient(self.credential, subscription_id)
-        self.monitor_client = MonitorManagementClient(self.credential, subscription_id)
-        self.cost_client = CostManagementClient(self.credential)
+        self.resource_client = ResourceManagementClient(
+            self.credential, subscription_id, per_retry_policies=[telemetry_policy("resource")]
+        )
+        self.monitor_client = MonitorManagementClient(
+            self.credential, subscription_id, per_retry_policies=[telemetry_policy("monitor")]
+        )
+        self.cost_client = CostManagementClient(self.credential, per_retry_policies=[telemetry_policy("cost")])
     
+    @traced("azure.list_resource_groups")
     def list_resource_groups(self) -> List[Dict[str, Any]]:
         """List all resource groups"""
         try:
@@ -44,6 +111,7 @@ class AzureClient:
             logger.error(f"Failed to list resource groups: {e}")
             return []
     
+    @traced("azure.list_resources")
     def list_resources(self, resource_group_name: Optional[str] = None) -> List[Dict[str, Any]]:
         """List resources in subscription or resource group"""
         try:
@@ -57,14 +125,18 @@ class AzureClient:
                 "type": r.type,
                 "location": r.location,
                 "id": r.id,
+                "sku": r.sku.name if r.sku else None,
                 "tags": r.tags
             } for r in resources]
         except Exception as e:
             logger.error(f"Failed to list resources: {e}")
             return []
     
+    @traced("azure.get_resource_costs")
     def get_resource_costs(self, resource_group_name: str, days: int = 30) -> Dict[str, Any]:
         """Get costs for a resource group using Cost Management API"""
+        from azure.mgmt.costmanagement.models import QueryDefinition, QueryTimePeriod, QueryDataset, QueryAggregation
+        
         try:
             scope = f"/subscriptions/{self.subscription_id}/resourceGroups/{resource_group_name}"
             
@@ -116,6 +188,7 @@ class AzureClient:
                 "error": str(e)
             }
     
+    @traced("azure.get_resource_metrics")
     def get_resource_metrics(self, resource_id: str, metric_name: str, hours: int = 24) -> List[Dict[str, Any]]:
         """Get metrics for a resource"""
         try:
@@ -150,6 +223,7 @@ class AzureClient:
             logger.error(f"Failed to get metrics: {e}")
             return []
     
+    @traced("azure.check_resource_health")
     def check_resource_health(self, resource_id: str) -> Dict[str, Any]:
         """Check health status of a resource"""
         try:
@@ -164,8 +238,11 @@ class AzureClient:
             logger.error(f"Failed to check resource health: {e}")
             return {"status": "Unknown", "error": str(e)}
     
+    @traced("azure.get_subscription_cost_summary")
     def get_subscription_cost_summary(self, days: int = 30) -> Dict[str, Any]:
         """Get total subscription costs"""
+        from azure.mgmt.costmanagement.models import QueryDefinition, QueryTimePeriod, QueryDataset, QueryAggregation
+        
         try:
             scope = f"/subscriptions/{self.subscription_id}"
             
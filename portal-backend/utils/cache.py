@@ -0,0 +1,119 @@
+"""
+In-Process Caches
+Small bounded caches for hot request paths
+"""
+
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+import threading
+import time
+
+from utils.metrics import cache_requests
+
+
+class TTLCache:
+    """
+    Bounded LRU cache whose entries expire at an absolute time
+
+    Each entry carries its own expiry (epoch seconds), so a cached value
+    never outlives what it was derived from, e.g. a JWT's `exp`. When full,
+    the least recently used entry is evicted. `on_evict(value)` is called
+    for every value that expires, is evicted, replaced or cleared. Named
+    caches report hits and misses as cache_requests_total{cache=name}.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: Optional[float] = None,
+        on_evict: Optional[Callable[[Any], None]] = None,
+        name: Optional[str] = None,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self.name = name
+        self._hit_labels = (name, "hit")
+        self._miss_labels = (name, "miss")
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evicted(self, entries):
+        if self.on_evict:
+            for value, _ in entries:
+                self.on_evict(value)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        return self.get_as(key, None, default)
+
+    def get_as(self, key: Hashable, convert: Optional[Callable[[Any], Any]], default: Any = None) -> Any:
+        """
+        get(), returning convert(value) computed under the cache lock
+
+        For values that on_evict destroys (e.g. zeroized buffers): the
+        caller receives a copy that a concurrent eviction cannot touch.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                if self.name:
+                    cache_requests.inc(labels=self._miss_labels)
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._data[key]
+            else:
+                self._data.move_to_end(key)
+                if self.name:
+                    cache_requests.inc(labels=self._hit_labels)
+                return convert(value) if convert else value
+        if self.name:
+            cache_requests.inc(labels=self._miss_labels)
+        self._evicted([entry])
+        return default
+
+    def set(self, key: Hashable, value: Any, expires_at: Optional[float] = None):
+        """Store `value` until `expires_at` (default: now + ttl, or forever)"""
+        if expires_at is None and self.ttl is not None:
+            expires_at = time.time() + self.ttl
+        if self.ttl is not None:
+            expires_at = min(expires_at, time.time() + self.ttl)
+        evicted = []
+        with self._lock:
+            previous = self._data.get(key)
+            if previous is not None and previous[0] is not value:
+                evicted.append(previous)
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                evicted.append(self._data.popitem(last=False)[1])
+        self._evicted(evicted)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove and return a value; on_evict is not called for it"""
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def purge(self):
+        """Drop every expired entry now rather than on next access"""
+        now = time.time()
+        with self._lock:
+            expired = [k for k, (_, expires_at) in self._data.items() if expires_at is not None and expires_at <= now]
+            entries = [self._data.pop(k) for k in expired]
+        self._evicted(entries)
+
+    def clear(self):
+        with self._lock:
+            entries = list(self._data.values())
+            self._data.clear()
+        self._evicted(entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+_MISSING = object()
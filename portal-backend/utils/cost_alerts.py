@@ -0,0 +1,216 @@
+"""
+Cost Alert Evaluation
+Scheduled budget checks for every customer's alert rules
+"""
+
+from datetime import date, datetime, timedelta
+from itertools import groupby
+from typing import Any, Dict, List, Optional
+import asyncio
+import smtplib
+import logging
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import or_, update
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import SessionLocal, leader_lock
+from models.cost_alert import CostAlert
+from models.customer import Customer
+from utils.cost_intelligence import get_cost_engine
+from utils.notifications import EmailNotifier
+
+logger = logging.getLogger(__name__)
+
+# Advisory lock key electing the worker that runs the cost scheduler
+SCHEDULER_LOCK_KEY = 0x434F5354  # "COST"
+
+
+def _alert_body(customer_name: str, period: str, alerts: List[Dict[str, Any]]) -> str:
+    lines = [f"Cost alert for {customer_name} ({period}):", ""]
+    for alert in alerts:
+        label = "Forecast month-end spend" if alert["basis"] == "forecast" else "Month-to-date spend"
+        lines.append(
+            f"- {label} ${alert['spend']:,.2f} is {alert['used']:.1f}% of the "
+            f"${alert['budget']:,.2f} monthly budget (alert at {alert['threshold']:g}%)"
+        )
+    return "\n".join(lines)
+
+
+def evaluate_cost_alerts(
+    db: Session,
+    as_of: Optional[date] = None,
+    notifier: Optional[EmailNotifier] = None,
+    now: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """
+    Check all enabled alert rules against month-to-date and forecast spend
+
+    Rules are loaded in one query and evaluated together over the cost
+    rollups. Each rule notifies at most once per billing month, each
+    customer receives at most one email per COST_ALERT_MIN_INTERVAL_HOURS
+    and a run sends at most COST_ALERT_MAX_EMAILS_PER_RUN emails; anything
+    held back is picked up by a later run, as is everything while no SMTP
+    server is configured. Rules are claimed with a
+    conditional UPDATE before sending, so concurrent workers never send
+    the same alert twice.
+    """
+    now = now or datetime.utcnow()
+    notifier = notifier or EmailNotifier()
+
+    rules = (
+        db.query(
+            CostAlert.id,
+            CostAlert.threshold_percentage,
+            CostAlert.basis,
+            CostAlert.alert_emails,
+            CostAlert.last_notified_period,
+            CostAlert.last_notified_at,
+            Customer.customer_id.label("customer_key"),
+            Customer.customer_name,
+            Customer.monthly_budget
+        )
+        .join(Customer, CostAlert.customer_id == Customer.id)
+        .filter(CostAlert.enabled.is_(True), Customer.monthly_budget > 0)
+        .order_by(Customer.customer_id)
+        .all()
+    )
+    summary = {"rules": len(rules), "triggered": 0, "notified": 0, "deferred": 0, "failed": 0}
+    if not rules:
+        return summary
+
+    engine = get_cost_engine()
+    customer_keys = sorted({rule.customer_key for rule in rules})
+    index = {key: i for i, key in enumerate(customer_keys)}
+    rollup = engine.spend_rollup(customer_keys, as_of)
+    period = f"{rollup.as_of:%Y-%m}"
+
+    spend, used, triggered = rollup.evaluate(
+        [index[rule.customer_key] for rule in rules],
+        [rule.monthly_budget for rule in rules],
+        [rule.threshold_percentage for rule in rules],
+        [rule.basis == "forecast" for rule in rules]
+    )
+    triggered_rows = triggered.nonzero()[0].tolist()
+    summary["triggered"] = len(triggered_rows)
+
+    # Latest notification per customer, across all of its rules
+    last_sent: Dict[str, datetime] = {}
+    for rule in rules:
+        if rule.last_notified_at and rule.last_notified_at > last_sent.get(rule.customer_key, datetime.min):
+            last_sent[rule.customer_key] = rule.last_notified_at
+
+    cutoff = now - timedelta(hours=settings.COST_ALERT_MIN_INTERVAL_HOURS)
+    pending = [i for i in triggered_rows if rules[i].last_notified_period != period]
+    batches = []
+    for key, group in groupby(pending, key=lambda i: rules[i].customer_key):
+        group = list(group)
+        if last_sent.get(key, datetime.min) > cutoff or len(batches) >= settings.COST_ALERT_MAX_EMAILS_PER_RUN:
+            summary["deferred"] += len(group)
+            continue
+        batches.append(group)
+    if not batches:
+        return summary
+    if not notifier.configured:
+        # Nothing would be delivered: leave the rules unclaimed until SMTP is set up
+        summary["deferred"] += sum(len(group) for group in batches)
+        return summary
+
+    # Claim the rules; another worker may already have sent them this period
+    claim = (
+        update(CostAlert)
+        .where(
+            CostAlert.id.in_([rules[i].id for group in batches for i in group]),
+            or_(CostAlert.last_notified_period.is_(None), CostAlert.last_notified_period != period)
+        )
+        .values(last_notified_period=period, last_notified_at=now)
+        .returning(CostAlert.id)
+    )
+    claimed = {row.id for row in db.execute(claim)}
+    db.commit()
+
+    sent, failed = [], []
+    try:
+        with notifier.session() as send:
+            for group in batches:
+                group = [i for i in group if rules[i].id in claimed]
+                if not group:
+                    continue
+                first = rules[group[0]]
+                recipients = sorted({email for i in group for email in (rules[i].alert_emails or [])})
+                alerts = [
+                    {
+                        "basis": rules[i].basis,
+                        "spend": float(spend[i]),
+                        "used": float(used[i]),
+                        "budget": rules[i].monthly_budget,
+                        "threshold": rules[i].threshold_percentage
+                    }
+                    for i in group
+                ]
+                try:
+                    if recipients:
+                        send(
+                            recipients,
+                            f"Cost alert: {first.customer_name} at {max(a['used'] for a in alerts):.0f}% of budget",
+                            _alert_body(first.customer_name, period, alerts)
+                        )
+                    sent += group
+                except (smtplib.SMTPException, OSError) as e:
+                    logger.error(f"Cost alert email for {first.customer_key} failed: {e}")
+                    failed += group
+    except (smtplib.SMTPException, OSError) as e:
+        logger.error(f"SMTP connection failed: {e}")
+        done = set(sent) | set(failed)
+        failed += [i for group in batches for i in group if rules[i].id in claimed and i not in done]
+
+    # Release failed claims so the next run retries them
+    for i in failed:
+        db.execute(
+            update(CostAlert)
+            .where(CostAlert.id == rules[i].id)
+            .values(last_notified_period=rules[i].last_notified_period, last_notified_at=rules[i].last_notified_at)
+        )
+    if failed:
+        db.commit()
+    summary["notified"] = len(sent)
+    summary["failed"] = len(failed)
+
+    return summary
+
+
+async def run_cost_alert_scheduler():
+    """
+    Every COST_ALERT_INTERVAL_SECONDS, score newly landed cost days for
+    anomalies and evaluate budget alerts, until cancelled
+
+    Every worker runs the loop, but only the holder of the leader lock
+    does the round: the anomaly detector's state file must have a single
+    writer.
+    """
+    def evaluate() -> Optional[Dict[str, Any]]:
+        with leader_lock(SCHEDULER_LOCK_KEY) as leader:
+            if not leader:
+                return None
+            anomalies = get_cost_engine().CostAnomalyDetector().run()
+            if anomalies:
+                logger.info(f"Detected {len(anomalies)} cost anomalies")
+
+            db = SessionLocal()
+            try:
+                return evaluate_cost_alerts(db)
+            finally:
+                db.close()
+
+    if not EmailNotifier().configured:
+        logger.warning("SMTP_HOST is not set: budget alerts are evaluated but not sent")
+
+    while True:
+        try:
+            summary = await run_in_threadpool(evaluate)
+            if summary is not None:
+                logger.info(f"Cost alerts evaluated: {summary}")
+        except Exception as e:
+            logger.error(f"Cost alert evaluation failed: {e}", exc_info=True)
+        await asyncio.sleep(settings.COST_ALERT_INTERVAL_SECONDS)
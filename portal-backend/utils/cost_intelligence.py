@@ -0,0 +1,46 @@
+"""
+Cost Intelligence Bridge
+Load the cost-intelligence engine into the API process
+"""
+
+from functools import lru_cache
+from pathlib import Path
+import importlib.util
+import sys
+
+from config import settings
+
+MODULE_NAME = "cost_intelligence"
+
+# Relative COST_INTELLIGENCE_PATH values are resolved from portal-backend/, not the CWD
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+@lru_cache()
+def get_cost_engine():
+    """
+    Import the cost-intelligence package once
+
+    Its directory name is not a valid identifier, so it is loaded from
+    COST_INTELLIGENCE_PATH under an importable module name.
+    """
+    if MODULE_NAME in sys.modules:
+        return sys.modules[MODULE_NAME]
+
+    path = (BACKEND_DIR / settings.COST_INTELLIGENCE_PATH).resolve()
+    if not (path / "__init__.py").is_file():
+        raise ImportError(f"Cost intelligence engine not found: {path} (set COST_INTELLIGENCE_PATH)")
+    spec = importlib.util.spec_from_file_location(
+        MODULE_NAME,
+        path / "__init__.py",
+        submodule_search_locations=[str(path)]
+    )
+
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[MODULE_NAME] = module
+    try:
+        spec.loader.exec_module(module)
+    except Exception:
+        del sys.modules[MODULE_NAME]
+        raise
+    return module
@@ -0,0 +1,244 @@
+"""
+Deployment Events
+Coalesce GitHub Actions progress events into batched deployment updates
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import asyncio
+import logging
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import and_, bindparam, case, func, update
+
+from config import settings
+from database import SessionLocal
+from models.deployment import Deployment, DeploymentStatus
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = (
+    DeploymentStatus.COMPLETED.value,
+    DeploymentStatus.FAILED.value,
+    DeploymentStatus.CANCELLED.value,
+)
+
+# Workflow job name keyword -> (status, progress); see deploy-infrastructure.yml
+JOB_STEPS = (
+    ("validate", DeploymentStatus.VALIDATING, 10),
+    ("management", DeploymentStatus.DEPLOYING_MANAGEMENT, 30),
+    ("hub", DeploymentStatus.DEPLOYING_HUB, 60),
+    ("spoke", DeploymentStatus.DEPLOYING_SPOKE, 90),
+)
+
+RUN_CONCLUSIONS = {
+    "success": DeploymentStatus.COMPLETED,
+    "cancelled": DeploymentStatus.CANCELLED,
+}
+
+
+@dataclass
+class RunUpdate:
+    """Latest known state of one workflow run"""
+    run_id: str
+    status: str
+    progress: int
+    step: Optional[str] = None
+    url: Optional[str] = None
+    error: Optional[str] = None
+    completed_at: Optional[datetime] = None
+
+    @property
+    def terminal(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+    @property
+    def rank(self) -> int:
+        """Updates only ever move a deployment to a higher rank"""
+        return 1000 if self.terminal else self.progress
+
+    def merge(self, other: "RunUpdate") -> "RunUpdate":
+        """Keep the further-advanced state; the first terminal state wins"""
+        newer, older = (other, self) if other.rank > self.rank else (self, other)
+        newer.url = newer.url or older.url
+        if newer.terminal:
+            # A failure reported before its job events keeps the progress reached
+            newer.progress = max(newer.progress, older.progress)
+        return newer
+
+
+def _timestamp(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+
+def parse_event(event: str, payload: Dict[str, Any]) -> Optional[RunUpdate]:
+    """
+    Map a GitHub `workflow_run` or `workflow_job` webhook to a RunUpdate
+
+    Returns None for events that carry no deployment progress.
+    """
+    if event == "workflow_run":
+        run = payload.get("workflow_run") or {}
+        if not run.get("id"):
+            return None
+        url = run.get("html_url")
+        if run.get("status") != "completed":
+            return RunUpdate(str(run["id"]), DeploymentStatus.VALIDATING.value, 5, "Started", url)
+        conclusion = run.get("conclusion") or "failure"
+        status = RUN_CONCLUSIONS.get(conclusion, DeploymentStatus.FAILED)
+        return RunUpdate(
+            str(run["id"]), status.value,
+            100 if status == DeploymentStatus.COMPLETED else 0,
+            "Completed" if status == DeploymentStatus.COMPLETED else conclusion.replace("_", " ").capitalize(),
+            url,
+            error=None if status != DeploymentStatus.FAILED else f"Workflow run {conclusion}",
+            completed_at=_timestamp(run.get("updated_at")) or datetime.utcnow(),
+        )
+
+    if event == "workflow_job":
+        job = payload.get("workflow_job") or {}
+        name = job.get("name") or ""
+        if not job.get("run_id"):
+            return None
+        for keyword, status, progress in JOB_STEPS:
+            if keyword in name.lower():
+                break
+        else:
+            return None
+        step = name.encode("ascii", "ignore").decode().strip() or name
+        if job.get("status") == "completed" and job.get("conclusion") not in ("success", "skipped", None):
+            return RunUpdate(
+                str(job["run_id"]), DeploymentStatus.FAILED.value, progress, step,
+                error=f"{step} {job['conclusion']}",
+                completed_at=_timestamp(job.get("completed_at")) or datetime.utcnow(),
+            )
+        return RunUpdate(str(job["run_id"]), status.value, progress, step)
+
+    return None
+
+
+class DeploymentEventQueue:
+    """
+    In-memory buffer of run updates, flushed to the database in batches
+
+    submit() merges an update into the pending state of its run, so any
+    number of events for one run between flushes costs a single row write.
+    Each flush is one executemany UPDATE per kind (progress / terminal),
+    keyed by the indexed github_run_id. The WHERE clauses only let a
+    deployment move forward and never out of a terminal status, which
+    makes duplicate, late and out-of-order events, and flushes from other
+    workers, harmless.
+    """
+
+    def __init__(self, flush_interval: float, max_batch: int):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._pending: Dict[str, RunUpdate] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def submit(self, update_: RunUpdate):
+        current = self._pending.get(update_.run_id)
+        self._pending[update_.run_id] = current.merge(update_) if current else update_
+        if len(self._pending) >= self.max_batch and self._wakeup:
+            self._wakeup.set()
+
+    def _take(self) -> List[RunUpdate]:
+        batch, self._pending = list(self._pending.values()), {}
+        return batch
+
+    @staticmethod
+    def write(batch: List[RunUpdate]) -> int:
+        """Apply a batch of run updates; returns the number of rows changed"""
+        table = Deployment.__table__
+        common = dict(
+            current_step=func.coalesce(bindparam("b_step"), table.c.current_step),
+            github_run_url=func.coalesce(bindparam("b_url"), table.c.github_run_url),
+        )
+        # Separate comparisons rather than NOT IN, which cannot be used with executemany
+        not_terminal = and_(*(func.coalesce(table.c.status, "") != s for s in TERMINAL_STATUSES))
+        progress_stmt = (
+            update(table)
+            .where(
+                table.c.github_run_id == bindparam("b_run_id"),
+                not_terminal,
+                func.coalesce(table.c.progress_percentage, 0) < bindparam("b_progress"),
+            )
+            .values(status=bindparam("b_status"), progress_percentage=bindparam("b_progress"), **common)
+        )
+        terminal_stmt = (
+            update(table)
+            .where(table.c.github_run_id == bindparam("b_run_id"), not_terminal)
+            .values(
+                status=bindparam("b_status"),
+                progress_percentage=case(
+                    (func.coalesce(table.c.progress_percentage, 0) > bindparam("b_progress"), table.c.progress_percentage),
+                    else_=bindparam("b_progress"),
+                ),
+                error_message=func.coalesce(bindparam("b_error"), table.c.error_message),
+                completed_at=bindparam("b_completed_at"),
+                **common,
+            )
+        )
+
+        params = {False: [], True: []}
+        for u in batch:
+            params[u.terminal].append({
+                "b_run_id": u.run_id, "b_status": u.status, "b_progress": u.progress,
+                "b_step": u.step, "b_url": u.url, "b_error": u.error, "b_completed_at": u.completed_at,
+            })
+
+        changed = 0
+        db = SessionLocal()
+        try:
+            for stmt, rows in ((progress_stmt, params[False]), (terminal_stmt, params[True])):
+                if rows:
+                    result = db.execute(stmt, rows)
+                    changed += max(result.rowcount, 0)
+            db.commit()
+        finally:
+            db.close()
+        return changed
+
+    async def flush(self) -> int:
+        batch = self._take()
+        if not batch:
+            return 0
+        try:
+            changed = await run_in_threadpool(self.write, batch)
+        except Exception:
+            # Put the batch back (merging with anything newer) for the next flush
+            for u in batch:
+                self.submit(u)
+            raise
+        logger.debug(f"Flushed {len(batch)} run updates ({changed} deployments changed)")
+        return changed
+
+    async def run(self):
+        """Flush every flush_interval (or when max_batch is reached) until cancelled"""
+        self._wakeup = asyncio.Event()
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                try:
+                    await self.flush()
+                except Exception as e:
+                    logger.error(f"Deployment event flush failed: {e}", exc_info=True)
+        finally:
+            self._wakeup = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+
+deployment_events = DeploymentEventQueue(settings.DEPLOYMENT_EVENT_FLUSH_SECONDS, settings.DEPLOYMENT_EVENT_BATCH_SIZE)
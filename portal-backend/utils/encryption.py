@@ -1,20 +1,40 @@
 """
 Encryption Utilities
 Encrypt/decrypt sensitive data (service principal secrets, passwords)
+
+Ciphertexts are "v{version}:{fernet token}". The version selects the key
+used to encrypt, so keys can be rotated: new values use
+ENCRYPTION_KEY_VERSION while older versions stay readable. Values written
+before versioning (double base64, no prefix) are read with version 1.
 """
 
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, InvalidToken
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from cryptography.hazmat.backends import default_backend
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
 import base64
-import os
 
 from config import settings
 
-# Derive key from SECRET_KEY
-def _get_fernet_key() -> bytes:
-    """Generate Fernet key from SECRET_KEY"""
+LEGACY_KEY_VERSION = 1
+
+def _key_secrets() -> Dict[int, str]:
+    """Key version -> secret; version 1 is always SECRET_KEY"""
+    secrets = {LEGACY_KEY_VERSION: settings.SECRET_KEY}
+    for entry in filter(None, (e.strip() for e in settings.ENCRYPTION_KEYS.split(","))):
+        version, _, secret = entry.partition(":")
+        secrets[int(version)] = secret
+    return secrets
+
+# Derive keys on first use, not at import
+@lru_cache(maxsize=None)
+def _get_fernet(version: int) -> Fernet:
+    """Derive (once per process) the Fernet cipher for a key version"""
+    secrets = _key_secrets()
+    if version not in secrets:
+        raise ValueError(f"Unknown encryption key version: {version}")
     kdf = PBKDF2HMAC(
         algorithm=hashes.SHA256(),
         length=32,
@@ -22,28 +42,58 @@ def _get_fernet_key() -> bytes:
         iterations=100000,
         backend=default_backend()
     )
-    key = base64.urlsafe_b64encode(kdf.derive(settings.SECRET_KEY.encode()))
-    return key
+    key = base64.urlsafe_b64encode(kdf.derive(secrets[version].encode()))
+    return Fernet(key)
+
+def _split(ciphertext: str) -> Tuple[int, bytes]:
+    """Return (key version, Fernet token) for a stored ciphertext"""
+    if ciphertext.startswith("v") and ":" in ciphertext:
+        version, _, token = ciphertext.partition(":")
+        if version[1:].isdigit():
+            return int(version[1:]), token.encode()
+    return LEGACY_KEY_VERSION, base64.urlsafe_b64decode(ciphertext.encode())
 
-# Initialize Fernet cipher
-_fernet = Fernet(_get_fernet_key())
+def key_version(ciphertext: str) -> Optional[int]:
+    """Key version of a stored ciphertext (None for empty values)"""
+    return _split(ciphertext)[0] if ciphertext else None
+
+def needs_rotation(ciphertext: str) -> bool:
+    """True when the value is not encrypted with the current key version"""
+    return bool(ciphertext) and key_version(ciphertext) != settings.ENCRYPTION_KEY_VERSION
 
 def encrypt_value(plaintext: str) -> str:
     """Encrypt string value"""
-    if not plaintext:
-        return ""
-    
-    encrypted = _fernet.encrypt(plaintext.encode())
-    return base64.urlsafe_b64encode(encrypted).decode()
+    return encrypt_many([plaintext])[0]
 
 def decrypt_value(ciphertext: str) -> str:
     """Decrypt string value"""
-    if not ciphertext:
-        return ""
-    
-    try:
-        decoded = base64.urlsafe_b64decode(ciphertext.encode())
-        decrypted = _fernet.decrypt(decoded)
-        return decrypted.decode()
-    except Exception as e:
-        raise ValueError(f"Decryption failed: {str(e)}")
\ No newline at end of file
+    return decrypt_many([ciphertext])[0]
+
+def encrypt_many(plaintexts: List[str]) -> List[str]:
+    """Encrypt many values with the current key"""
+    version = settings.ENCRYPTION_KEY_VERSION
+    fernet = _get_fernet(version)
+    prefix = f"v{version}:"
+    return [prefix + fernet.encrypt(p.encode()).decode() if p else "" for p in plaintexts]
+
+def decrypt_many(ciphertexts: List[str]) -> List[str]:
+    """Decrypt many values, each with the key version it was written with"""
+    results = []
+    for ciphertext in ciphertexts:
+        if not ciphertext:
+            results.append("")
+            continue
+        try:
+            version, token = _split(ciphertext)
+            results.append(_get_fernet(version).decrypt(token).decode())
+        except (InvalidToken, ValueError) as e:
+            raise ValueError(f"Decryption failed: {str(e) or type(e).__name__}")
+    return results
+
+def rotate_many(ciphertexts: List[str]) -> List[str]:
+    """Re-encrypt values with the current key; current ones are returned unchanged"""
+    stale = [i for i, c in enumerate(ciphertexts) if needs_rotation(c)]
+    rotated = list(ciphertexts)
+    for i, value in zip(stale, encrypt_many(decrypt_many([ciphertexts[i] for i in stale]))):
+        rotated[i] = value
+    return rotated
@@ -0,0 +1,199 @@
+"""
+GitHub API Client
+Shared async client for GitHub Actions with retries and rate-limit handling
+
+Importable on its own (no settings or database), so the lightweight
+portal (app.py) can use it; the API's configured client and dispatch
+queue live in utils.workflow_dispatch.
+"""
+
+from typing import Any, Dict, Optional
+import asyncio
+import random
+import time
+import logging
+
+import httpx
+
+from utils.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# Statuses worth retrying; 502/504 only for idempotent methods (the request may have been applied)
+RETRY_ALWAYS = {503}
+RETRY_IDEMPOTENT = {500, 502, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+# GitHub asks clients to wait at least a minute after a secondary rate limit without Retry-After
+SECONDARY_RATE_LIMIT_WAIT = 60.0
+
+
+class GitHubError(Exception):
+    """GitHub API request failed"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class GitHubRateLimited(GitHubError):
+    """Rate limited for longer than the caller is willing to wait"""
+
+    def __init__(self, message: str, retry_at: float):
+        super().__init__(message, 429)
+        self.retry_at = retry_at
+
+
+class GitHubClient:
+    """
+    Pooled async client for one repository
+
+    One httpx.AsyncClient (keep-alive pool, connect/read timeouts) is
+    shared by every request. Connection failures and 503s are retried with
+    exponential backoff and jitter; other 5xx only for idempotent methods,
+    so a dispatch is never sent twice. Primary (x-ratelimit-remaining: 0)
+    and secondary (403/429 with Retry-After) rate limits pause *all*
+    requests of this client until the limit resets, up to max_wait.
+    Pass `transport` (e.g. httpx.MockTransport) or point `base_url` at a
+    local mock server for testing.
+    """
+
+    def __init__(
+        self,
+        token: Optional[str],
+        repo: Optional[str],
+        base_url: str = "https://api.github.com",
+        timeout: float = 10.0,
+        max_retries: int = 4,
+        max_connections: int = 20,
+        max_wait: float = 120.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.token = token
+        self.repo = repo
+        self.base_url = base_url.rstrip("/")
+        self.timeout = httpx.Timeout(timeout, connect=min(timeout, 5.0))
+        self.max_retries = max_retries
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.max_wait = max_wait
+        self.transport = transport
+        self.paused_until = 0.0
+        self.rate_limit_remaining: Optional[int] = None
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.token and self.repo)
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={
+                    "Accept": "application/vnd.github+json",
+                    "Authorization": f"Bearer {self.token}",
+                    "X-GitHub-Api-Version": "2022-11-28",
+                },
+                timeout=self.timeout,
+                limits=self.limits,
+                transport=self.transport,
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _note_rate_limit(self, response: httpx.Response) -> Optional[float]:
+        """Record rate-limit headers; returns the epoch time to wait until, if limited"""
+        remaining = response.headers.get("x-ratelimit-remaining")
+        reset = response.headers.get("x-ratelimit-reset", "")
+        if remaining is not None and remaining.isdigit():
+            self.rate_limit_remaining = int(remaining)
+            if remaining == "0" and reset.isdigit():
+                # Budget used up: hold further requests until the window resets
+                self.paused_until = max(self.paused_until, float(reset) + 1)
+
+        if response.status_code not in (403, 429):
+            return None
+        retry_after = response.headers.get("retry-after")
+        if retry_after and retry_after.isdigit():
+            return time.time() + int(retry_after)
+        if remaining == "0" and reset.isdigit():
+            return float(reset) + 1
+        if "secondary rate limit" in response.text.lower():
+            return time.time() + SECONDARY_RATE_LIMIT_WAIT
+        return None
+
+    async def _wait_for_pause(self):
+        delay = self.paused_until - time.time()
+        if delay <= 0:
+            return
+        if delay > self.max_wait:
+            raise GitHubRateLimited(f"GitHub rate limit resets in {delay:.0f}s", self.paused_until)
+        await asyncio.sleep(delay)
+
+    def _backoff(self, attempt: int) -> float:
+        return min(30.0, 0.5 * 2 ** attempt) * (0.5 + random.random() / 2)
+
+    async def request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        """Send a request with retries; raises GitHubError for final failures"""
+        method = method.upper()
+        with tracer.span(f"GitHub {method}", kind="client", **{"http.request.method": method, "url.path": path}) as span:
+            response = await self._request(method, path, **kwargs)
+            span.set_attribute("http.response.status_code", response.status_code)
+            return response
+
+    async def _request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        idempotent = method in IDEMPOTENT_METHODS
+        attempt = 0
+        while True:
+            await self._wait_for_pause()
+            try:
+                response = await self.client.request(method, path, **kwargs)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+                # Never reached GitHub: safe to retry any method
+                error = GitHubError(f"GitHub API unreachable: {type(e).__name__}")
+            except httpx.TransportError as e:
+                # May have been applied (e.g. read timeout): only idempotent requests are retried
+                error = GitHubError(f"GitHub API request failed: {type(e).__name__}")
+                if not idempotent:
+                    raise error
+            else:
+                limited_until = self._note_rate_limit(response)
+                if limited_until is not None:
+                    self.paused_until = max(self.paused_until, limited_until)
+                    logger.warning(f"GitHub rate limited until {time.strftime('%H:%M:%S', time.localtime(limited_until))}")
+                    if attempt < self.max_retries:
+                        attempt += 1
+                        continue
+                    raise GitHubRateLimited("GitHub rate limit exceeded", self.paused_until)
+                if response.status_code in RETRY_ALWAYS or (idempotent and response.status_code in RETRY_IDEMPOTENT):
+                    error = GitHubError(f"GitHub API error {response.status_code}", response.status_code)
+                elif response.is_error:
+                    raise GitHubError(
+                        f"GitHub API error {response.status_code}: {response.text[:500]}", response.status_code
+                    )
+                else:
+                    return response
+
+            if attempt >= self.max_retries:
+                raise error
+            delay = self._backoff(attempt)
+            attempt += 1
+            logger.info(f"{error}; retrying {method} {path} in {delay:.1f}s ({attempt}/{self.max_retries})")
+            await asyncio.sleep(delay)
+
+    async def dispatch_workflow(self, workflow: str, inputs: Dict[str, Any], ref: str = "main"):
+        """Trigger a workflow_dispatch run (GitHub answers 204 with no run id)"""
+        await self.request(
+            "POST",
+            f"/repos/{self.repo}/actions/workflows/{workflow}/dispatches",
+            json={"ref": ref, "inputs": inputs},
+        )
+
+    def workflow_url(self, workflow: str) -> str:
+        return f"https://github.com/{self.repo}/actions/workflows/{workflow}"
+
@@ -0,0 +1,71 @@
+"""
+HTTP Caching
+Pre-serialized static JSON documents with strong ETags and conditional GET
+"""
+
+from typing import Any, Dict, Optional
+import gzip
+import hashlib
+import json
+
+from fastapi import Request, Response
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """Whether an Accept-Encoding header allows gzip (q=0 refuses it)"""
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding.strip().lower() not in ("gzip", "*"):
+            continue
+        q = params.strip().lower()
+        if q.startswith("q="):
+            try:
+                return float(q[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check (weak comparison, as RFC 9110 requires for it)"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class StaticJSON:
+    """
+    A JSON document serialized (and gzipped) once, served from bytes
+
+    Each request costs a header lookup: the body, its gzip encoding and
+    both strong ETags are computed up front, and a matching If-None-Match
+    is answered with an empty 304.
+    """
+
+    def __init__(self, content: Any, max_age: int, headers: Optional[Dict[str, str]] = None):
+        self.body = json.dumps(content, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        self.gzip_body = gzip.compress(self.body, compresslevel=9, mtime=0)
+        digest = hashlib.sha256(self.body).hexdigest()[:32]
+        self.etag = f'"{digest}"'
+        self.gzip_etag = f'"{digest}-gzip"'  # A different representation needs its own strong ETag
+        self.headers = {
+            "Cache-Control": f"public, max-age={max_age}",
+            "Vary": "Accept-Encoding",
+            **(headers or {}),
+        }
+
+    def response(self, request: Request) -> Response:
+        gzipped = accepts_gzip(request.headers.get("accept-encoding")) and len(self.gzip_body) < len(self.body)
+        etag = self.gzip_etag if gzipped else self.etag
+        headers = {**self.headers, "ETag": etag}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        if gzipped:
+            headers["Content-Encoding"] = "gzip"
+            return Response(self.gzip_body, media_type="application/json", headers=headers)
+        return Response(self.body, media_type="application/json", headers=headers)
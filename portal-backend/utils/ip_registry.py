@@ -0,0 +1,291 @@
+"""
+IP Address Registry
+Fleet-wide CIDR overlap checks and allocation of free address blocks
+"""
+
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Optional, Tuple
+import ipaddress
+import threading
+import time
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from config import settings
+from models.customer import Customer
+
+logger = logging.getLogger(__name__)
+
+
+class CidrConflict(ValueError):
+    """Raised when a CIDR overlaps an address block already in use"""
+
+    def __init__(self, cidr: str, owner: str, existing: str):
+        self.cidr = cidr
+        self.owner = owner
+        self.existing = existing
+        super().__init__(f"{cidr} overlaps {existing} ({owner})")
+
+
+def _interval(cidr: str) -> Tuple[int, int, int]:
+    network = ipaddress.ip_network(cidr, strict=False)
+    return network.version, int(network.network_address), int(network.broadcast_address)
+
+
+class _Intervals:
+    """
+    Address intervals of one IP version, sorted by start
+
+    max_end[i] is the largest end among intervals 0..i, so overlap checks
+    stay correct even when legacy data already contains overlapping blocks.
+    """
+
+    def __init__(self):
+        self.starts: List[int] = []
+        self.ends: List[int] = []
+        self.labels: List[Tuple[str, str]] = []  # (owner, cidr)
+        self.max_end: List[int] = []
+        self.max_index: List[int] = []
+
+    def _rebuild_prefix(self, start_at: int = 0):
+        best = self.max_index[start_at - 1] if start_at else -1
+        del self.max_end[start_at:], self.max_index[start_at:]
+        for i in range(start_at, len(self.starts)):
+            if best < 0 or self.ends[i] > self.ends[best]:
+                best = i
+            self.max_end.append(self.ends[best])
+            self.max_index.append(best)
+
+    def find(self, start: int, end: int) -> Optional[int]:
+        """Index of an interval overlapping [start, end], or None (O(log n))"""
+        i = bisect_right(self.starts, end)
+        if i == 0:
+            return None
+        # Some interval starting at or before `end` reaches `start`
+        if self.max_end[i - 1] >= start:
+            j = bisect_left(self.starts, start)
+            if j < i:
+                return j  # starts inside [start, end]
+            return self.max_index[i - 1]
+        return None
+
+    def add(self, start: int, end: int, label: Tuple[str, str]):
+        i = bisect_right(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+        self.labels.insert(i, label)
+        self._rebuild_prefix(i)
+
+    def remove_owner(self, owner: str):
+        keep = [i for i, label in enumerate(self.labels) if label[0] != owner]
+        if len(keep) == len(self.labels):
+            return
+        self.starts = [self.starts[i] for i in keep]
+        self.ends = [self.ends[i] for i in keep]
+        self.labels = [self.labels[i] for i in keep]
+        self._rebuild_prefix()
+
+
+class CidrRegistry:
+    """
+    Sorted-interval index of every address block in use across the fleet
+
+    check() is O(log n). allocate() walks the gaps of the pool from its
+    start and returns the first free aligned block.
+    """
+
+    def __init__(self):
+        self._versions: Dict[int, _Intervals] = {4: _Intervals(), 6: _Intervals()}
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[Tuple[str, str]]) -> "CidrRegistry":
+        """Build from (owner, cidr) pairs; invalid CIDRs are logged and skipped"""
+        registry = cls()
+        rows = {4: [], 6: []}
+        for owner, cidr in entries:
+            try:
+                version, start, end = _interval(cidr)
+            except ValueError:
+                logger.warning(f"Ignoring invalid CIDR {cidr!r} of {owner}")
+                continue
+            rows[version].append((start, end, (owner, str(cidr))))
+        for version, items in rows.items():
+            items.sort(key=lambda item: item[0])
+            intervals = registry._versions[version]
+            intervals.starts = [item[0] for item in items]
+            intervals.ends = [item[1] for item in items]
+            intervals.labels = [item[2] for item in items]
+            intervals._rebuild_prefix()
+        return registry
+
+    def check(self, cidr: str):
+        """Raise CidrConflict if `cidr` overlaps a registered block"""
+        version, start, end = _interval(cidr)
+        intervals = self._versions[version]
+        hit = intervals.find(start, end)
+        if hit is not None:
+            owner, existing = intervals.labels[hit]
+            raise CidrConflict(cidr, owner, existing)
+
+    def add(self, owner: str, cidr: str, check: bool = True):
+        """Register a block for `owner`, rejecting overlaps unless check=False"""
+        if check:
+            self.check(cidr)
+        version, start, end = _interval(cidr)
+        self._versions[version].add(start, end, (owner, cidr))
+
+    def remove_owner(self, owner: str):
+        for intervals in self._versions.values():
+            intervals.remove_owner(owner)
+
+    def allocate(self, prefix_length: int, pool: Optional[str] = None) -> str:
+        """First free, aligned block of `prefix_length` inside `pool` (not reserved)"""
+        pool_net = ipaddress.ip_network(pool or settings.IP_POOL)
+        if prefix_length < pool_net.prefixlen or prefix_length > pool_net.max_prefixlen:
+            raise ValueError(f"/{prefix_length} does not fit in {pool_net}")
+        size = 1 << (pool_net.max_prefixlen - prefix_length)
+        intervals = self._versions[pool_net.version]
+        candidate = int(pool_net.network_address)
+        pool_end = int(pool_net.broadcast_address)
+
+        while candidate + size - 1 <= pool_end:
+            hit = intervals.find(candidate, candidate + size - 1)
+            if hit is None:
+                return str(ipaddress.ip_network((candidate, prefix_length)))
+            # Jump past everything that overlaps, then re-align
+            i = bisect_right(intervals.starts, candidate + size - 1)
+            blocked_until = intervals.max_end[i - 1]
+            candidate = ((blocked_until + 1 + size - 1) // size) * size
+
+        raise ValueError(f"No free /{prefix_length} left in {pool_net}")
+
+    def __len__(self) -> int:
+        return sum(len(v.starts) for v in self._versions.values())
+
+
+def spoke_cidr(spoke) -> Optional[str]:
+    """CIDR of a spoke_vnets value, given as a string or as {"cidr": ...}"""
+    return spoke.get("cidr") if isinstance(spoke, dict) else spoke
+
+
+def spoke_cidrs(spoke_vnets: Optional[dict]) -> List[str]:
+    """CIDRs of the spokes that have one"""
+    return [cidr for cidr in map(spoke_cidr, (spoke_vnets or {}).values()) if cidr]
+
+
+def customer_cidrs(customer) -> List[str]:
+    """Hub and spoke CIDRs of a customer row"""
+    cidrs = [customer.hub_vnet_cidr] if customer.hub_vnet_cidr else []
+    cidrs += spoke_cidrs(customer.spoke_vnets)
+    if not customer.spoke_vnets and customer.spoke_vnet_cidr:
+        cidrs.append(customer.spoke_vnet_cidr)
+    return cidrs
+
+
+_registry: Optional[CidrRegistry] = None
+_registry_loaded_at = 0.0
+_registry_lock = threading.RLock()
+
+
+# PostgreSQL advisory lock key serializing reservations across workers and instances
+ALLOCATION_LOCK_KEY = 0x43494452  # "CIDR"
+
+
+def get_registry(db: Session, refresh: bool = False) -> CidrRegistry:
+    """
+    Process-wide registry of all customers' address blocks
+
+    Rebuilt from the customers table at most every IP_REGISTRY_TTL_SECONDS
+    (only the CIDR columns are read) or when `refresh` is set, and updated
+    in place as customers are added, so checks between rebuilds are
+    O(log n).
+    """
+    global _registry, _registry_loaded_at
+    with _registry_lock:
+        if refresh or _registry is None or time.monotonic() - _registry_loaded_at > settings.IP_REGISTRY_TTL_SECONDS:
+            rows = db.query(
+                Customer.customer_id, Customer.hub_vnet_cidr, Customer.spoke_vnet_cidr, Customer.spoke_vnets
+            ).all()
+            _registry = CidrRegistry.from_entries(
+                (row.customer_id, cidr) for row in rows for cidr in customer_cidrs(row)
+            )
+            _registry_loaded_at = time.monotonic()
+        return _registry
+
+
+def invalidate_registry():
+    """Force a rebuild on next use (after deletes or bulk changes)"""
+    global _registry
+    with _registry_lock:
+        _registry = None
+
+
+def reserve_cidrs(
+    db: Session,
+    owner: str,
+    hub_vnet_cidr: Optional[str],
+    spoke_vnets: Optional[dict],
+    prefix_length: int = 16,
+) -> Tuple[str, dict]:
+    """
+    Check a new customer's hub/spoke CIDRs against the fleet and reserve them
+
+    `owner` is the customer_id the customer is stored under, the key the
+    registry uses when it is rebuilt from the table. Spokes are given as a
+    CIDR or as {"cidr": ...}, like the spoke_vnets column, and keep their
+    form. Missing CIDRs are allocated from IP_POOL (the hub, and a
+    "production" spoke when no spokes are given). Raises CidrConflict on
+    overlap with another customer or between the customer's own blocks,
+    ValueError for invalid CIDRs; nothing stays reserved when it raises.
+
+    The registry of this worker may miss blocks other workers reserved
+    since its last rebuild, so it is rebuilt from a fresh read inside the
+    caller's transaction, after taking the allocation lock. The caller
+    must insert the customer in that same transaction: the lock is held
+    until it commits or rolls back.
+    """
+    spokes = {name: dict(spoke) if isinstance(spoke, dict) else spoke for name, spoke in (spoke_vnets or {}).items()}
+    lock_allocations(db)
+    with _registry_lock:
+        registry = get_registry(db, refresh=True)
+        try:
+            for cidr in ([hub_vnet_cidr] if hub_vnet_cidr else []) + spoke_cidrs(spokes):
+                registry.add(owner, str(ipaddress.ip_network(cidr)))
+            if not hub_vnet_cidr:
+                hub_vnet_cidr = registry.allocate(prefix_length)
+                registry.add(owner, hub_vnet_cidr)
+            if not spokes:
+                spokes = {"production": None}
+            for name, spoke in spokes.items():
+                if not spoke_cidr(spoke):
+                    cidr = registry.allocate(prefix_length)
+                    registry.add(owner, cidr)
+                    if isinstance(spoke, dict):
+                        spoke["cidr"] = cidr
+                    else:
+                        spokes[name] = cidr
+        except ValueError:
+            registry.remove_owner(owner)
+            raise
+    return hub_vnet_cidr, spokes
+
+
+def lock_allocations(db: Session):
+    """
+    Serialize CIDR reservation until the current transaction ends
+
+    A transaction-level advisory lock on PostgreSQL. Other databases are
+    development setups: there only this process's reservations are
+    serialized.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": ALLOCATION_LOCK_KEY})
+
+
+def release_cidrs(owner: str):
+    """Drop an owner's reservations, e.g. when creating the customer failed"""
+    with _registry_lock:
+        if _registry is not None:
+            _registry.remove_owner(owner)
@@ -0,0 +1,120 @@
+"""
+Encryption Key Rotation
+Re-encrypt stored secrets with the current key version
+
+Run: python -m utils.key_rotation  (exits 1 if any secret could not be rotated)
+"""
+
+from typing import Dict, List, Optional
+import logging
+import sys
+
+from sqlalchemy import bindparam, select, update
+
+from config import settings
+from database import SessionLocal
+from models.customer import Customer
+from utils.encryption import rotate_many
+from utils.logging import configure_logging
+
+logger = logging.getLogger(__name__)
+
+
+def _rotate_batch(rows) -> List[Optional[str]]:
+    """
+    New ciphertext per row, None where the secret cannot be decrypted
+
+    One rotate_many call for the batch; only a batch containing an
+    unreadable secret is retried row by row to find it.
+    """
+    try:
+        return rotate_many([row.sp_client_secret for row in rows])
+    except ValueError:
+        pass
+    rotated = []
+    for row in rows:
+        try:
+            rotated.append(rotate_many([row.sp_client_secret])[0])
+        except ValueError as e:
+            logger.error(f"Cannot decrypt sp_client_secret of customer {row.id}, left unrotated: {e}")
+            rotated.append(None)
+    return rotated
+
+
+def reencrypt_customer_secrets(batch_size: int = 500) -> Dict[str, int]:
+    """
+    Rotate every customer's sp_client_secret to ENCRYPTION_KEY_VERSION
+
+    Rows are read in primary-key order, batch_size at a time, selecting
+    only the id and secret of rows not yet on the current key, so memory
+    stays flat regardless of table size. Each batch is re-encrypted with
+    one rotate_many call and written with one executemany UPDATE that
+    only applies where the stored ciphertext is unchanged,
+    so a secret updated concurrently is never overwritten. The job can be
+    stopped and restarted at any time.
+
+    A secret that cannot be decrypted (unknown key version, corrupt
+    value) is logged with its customer id and left as it is; the rest of
+    the table is still rotated. "rotated" counts rows actually updated,
+    "failed" the secrets that could not be decrypted.
+    """
+    current_prefix = f"v{settings.ENCRYPTION_KEY_VERSION}:"
+    table = Customer.__table__
+    stmt = (
+        update(table)
+        .where(table.c.id == bindparam("b_id"), table.c.sp_client_secret == bindparam("b_old"))
+        .values(sp_client_secret=bindparam("b_new"))
+    )
+    summary = {"rotated": 0, "failed": 0, "batches": 0}
+    last_id = 0
+
+    db = SessionLocal()
+    try:
+        while True:
+            rows = db.execute(
+                select(Customer.id, Customer.sp_client_secret)
+                .where(
+                    Customer.id > last_id,
+                    Customer.sp_client_secret.is_not(None),
+                    Customer.sp_client_secret != "",
+                    Customer.sp_client_secret.not_like(f"{current_prefix}%")
+                )
+                .order_by(Customer.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+
+            rotated = _rotate_batch(rows)
+            summary["failed"] += rotated.count(None)
+            changes = [
+                {"b_id": row.id, "b_old": row.sp_client_secret, "b_new": new}
+                for row, new in zip(rows, rotated)
+                if new is not None and new != row.sp_client_secret
+            ]
+            if changes:
+                # Rows whose secret changed since the read match nothing and are not counted
+                summary["rotated"] += db.execute(stmt, changes).rowcount
+                db.commit()
+
+            last_id = rows[-1].id
+            summary["batches"] += 1
+            logger.info(f"Re-encrypted {summary['rotated']} customer secrets (up to id {last_id})")
+    finally:
+        db.close()
+
+    return summary
+
+
+def main() -> int:
+    configure_logging(settings.LOG_LEVEL, "text")
+    summary = reencrypt_customer_secrets()
+    logger.info(
+        f"Key rotation finished: {summary['rotated']} rotated, {summary['failed']} failed "
+        f"in {summary['batches']} batches"
+    )
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
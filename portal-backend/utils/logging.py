@@ -0,0 +1,274 @@
+"""
+Structured Logging
+JSON log records written off the event loop, with request/deployment context
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+import atexit
+import json
+import logging
+import queue
+import random
+import re
+import sys
+import traceback
+import uuid
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+deployment_id_var: ContextVar[Optional[str]] = ContextVar("deployment_id", default=None)
+
+REDACTED = "[REDACTED]"
+
+# Attribute names of a bare LogRecord; anything else came in through `extra=`
+_RECORD_FIELDS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message", "asctime", "request_id", "deployment_id",
+}
+
+# Keys whose values are never logged, in `extra=` dicts and in messages
+_SECRET_KEY = re.compile(r"secret|password|passwd|token|api_?key|credential|private_?key|connection_?string", re.I)
+
+# KEY=value, "key": "value" and key: value forms for secret-looking keys, plus bearer tokens
+_SECRET_TEXT = re.compile(
+    r"""(?P<key>\b[\w.-]*(?:secret|password|passwd|token|api_?key|private_?key|connection_?string)[\w.-]*["']?\s*[=:]\s*["']?)"""
+    r"""(?P<value>[^\s"',;&}]+)"""
+    r"""|(?P<scheme>\bBearer\s+)(?P<bearer>[\w.~+/=-]+)""",
+    re.I,
+)
+# Cheap pre-check: most messages contain none of these, so the full regex never runs for them
+_SECRET_HINT = re.compile(r"secret|password|passwd|token|key|bearer|credential|connection", re.I)
+
+
+def _redact_match(match: "re.Match") -> str:
+    if match.group("scheme"):
+        return match.group("scheme") + REDACTED
+    return match.group("key") + REDACTED
+
+
+def redact_text(text: str) -> str:
+    """Mask values of secret-looking assignments (ARM_CLIENT_SECRET=..., "password": ...)"""
+    if not _SECRET_HINT.search(text):
+        return text
+    return _SECRET_TEXT.sub(_redact_match, text)
+
+
+def redact(value: Any, key: str = "") -> Any:
+    """Redact a structured value: secret keys are masked, strings are scanned"""
+    if key and _SECRET_KEY.search(key):
+        return REDACTED
+    if isinstance(value, str):
+        return redact_text(value)
+    if isinstance(value, dict):
+        return {k: redact(v, str(k)) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(v) for v in value]
+    return value
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of DEBUG/INFO records from noisy loggers
+
+    `rates` maps logger names to the fraction kept; a name also applies to
+    its children (utils.github covers utils.github.client). Warnings and
+    errors are never dropped. Resolved rates are memoised per logger name,
+    so the common case is one dict lookup.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._resolved: Dict[str, float] = {}
+
+    def _rate(self, name: str) -> float:
+        rate = self._resolved.get(name)
+        if rate is None:
+            rate = 1.0
+            parts = name.split(".")
+            for i in range(len(parts), 0, -1):
+                prefix = ".".join(parts[:i])
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+            self._resolved[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+
+def parse_sampling(spec: str) -> Dict[str, float]:
+    """Parse "uvicorn.access=0.1,utils.github=0.5" into a rate map"""
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, rate = item.partition("=")
+        rates[name.strip()] = min(1.0, max(0.0, float(rate)))
+    return rates
+
+
+class ContextQueueHandler(QueueHandler):
+    """
+    Enqueue records without formatting them
+
+    Runs on the calling thread (often the event loop), so it only does
+    what cannot be deferred: resolve the message, capture the context IDs
+    and render any traceback. Redaction, JSON encoding and the write
+    happen on the listener thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        record.request_id = request_id_var.get()
+        record.deployment_id = deployment_id_var.get()
+        if record.exc_info:
+            record.exc_text = "".join(traceback.format_exception(*record.exc_info)).rstrip()
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; extra fields are included and redacted"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": redact_text(record.message if hasattr(record, "message") else record.getMessage()),
+        }
+        for field in ("request_id", "deployment_id"):
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = redact(value, key)
+        if record.exc_text:
+            entry["exception"] = redact_text(record.exc_text)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable format for local development, with the same redaction"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        context = " ".join(
+            f"{field}={getattr(record, field)}"
+            for field in ("request_id", "deployment_id")
+            if getattr(record, field, None) is not None
+        )
+        text = super().format(record)
+        return redact_text(f"{text} [{context}]" if context else text)
+
+
+_listener: Optional[QueueListener] = None
+
+
+def configure_logging(level: str = "INFO", fmt: str = "json", sampling: str = "", stream=None) -> QueueListener:
+    """
+    Route all logging through one queue to a background writer thread
+
+    Replaces the root logger's handlers; uvicorn's loggers are re-pointed
+    at the root so access and error logs share the pipeline. Safe to call
+    again (the previous listener is stopped first).
+    """
+    global _listener
+    shutdown_logging()
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    handler = ContextQueueHandler(log_queue)
+    rates = parse_sampling(sampling)
+    if rates:
+        handler.addFilter(SamplingFilter(rates))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers = []
+        uvicorn_logger.propagate = True
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
+
+
+@contextmanager
+def log_context(request_id: Optional[str] = None, deployment_id: Optional[Any] = None):
+    """Attach IDs to every record logged inside the block (and tasks started in it)"""
+    tokens = []
+    if request_id is not None:
+        tokens.append((request_id_var, request_id_var.set(str(request_id))))
+    if deployment_id is not None:
+        tokens.append((deployment_id_var, deployment_id_var.set(str(deployment_id))))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+class RequestContextMiddleware:
+    """
+    ASGI middleware giving each request an ID
+
+    Uses the caller's X-Request-ID when it looks sane, otherwise a new
+    one, and echoes it in the response headers.
+    """
+
+    header = b"x-request-id"
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", ()):
+            if name == self.header:
+                candidate = value.decode("latin-1")
+                if 0 < len(candidate) <= 128 and candidate.isprintable():
+                    request_id = candidate
+                break
+        request_id = request_id or uuid.uuid4().hex
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", ())) + [(self.header, request_id.encode("latin-1"))]
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_id_var.reset(token)
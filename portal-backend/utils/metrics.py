@@ -0,0 +1,305 @@
+"""
+Metrics
+Low-overhead counters, gauges and histograms with Prometheus text exposition
+"""
+
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import math
+import threading
+import time
+
+LabelValues = Tuple[str, ...]
+
+# Seconds; suits both ~1 ms handlers and multi-second Azure calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Seconds; Terraform commands run from seconds to an hour
+LONG_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class _Shards:
+    """
+    Per-thread value tables
+
+    Every thread writes only its own dict, so updates need no lock and
+    are never lost; a scrape sums all shards. The lock is only taken when
+    a thread writes to a metric for the first time.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._all: List[Dict[LabelValues, list]] = []
+        self._lock = threading.Lock()
+
+    def mine(self) -> Dict[LabelValues, list]:
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            with self._lock:
+                self._all.append(values)
+            return values
+
+    def snapshot(self) -> List[Dict[LabelValues, list]]:
+        with self._lock:
+            shards = list(self._all)
+        return [dict(shard) for shard in shards]
+
+
+class Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def samples(self) -> Iterable[Tuple[str, LabelValues, float]]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """Monotonic counter; inc(labels=(...)) with label values in labelnames order"""
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._shards = _Shards()
+
+    def inc(self, amount: float = 1.0, labels: LabelValues = ()):
+        values = self._shards.mine()
+        cell = values.get(labels)
+        if cell is None:
+            values[labels] = [amount]
+        else:
+            cell[0] += amount
+
+    def samples(self):
+        totals: Dict[LabelValues, float] = {}
+        for shard in self._shards.snapshot():
+            for labels, cell in shard.items():
+                totals[labels] = totals.get(labels, 0.0) + cell[0]
+        for labels, value in totals.items():
+            yield self.name + "_total", labels, value
+
+
+class Gauge(Metric):
+    """Value read at scrape time from a callback returning {label values: value}"""
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._callbacks: List[Callable[[], Dict[LabelValues, float]]] = []
+
+    def track(self, callback: Callable[[], Dict[LabelValues, float]]):
+        self._callbacks.append(callback)
+
+    def samples(self):
+        for callback in self._callbacks:
+            for labels, value in callback().items():
+                yield self.name, labels, value
+
+
+class Histogram(Metric):
+    """Bucketed distribution; observe() is a bisect and two increments"""
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._shards = _Shards()
+        self._size = len(self.buckets) + 2  # bucket counts, +Inf count, sum
+
+    def observe(self, value: float, labels: LabelValues = ()):
+        values = self._shards.mine()
+        cell = values.get(labels)
+        if cell is None:
+            cell = values[labels] = [0] * (self._size - 1) + [0.0]
+        cell[bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    def samples(self):
+        totals: Dict[LabelValues, list] = {}
+        for shard in self._shards.snapshot():
+            for labels, cell in shard.items():
+                total = totals.get(labels)
+                if total is None:
+                    totals[labels] = list(cell)
+                else:
+                    for i, v in enumerate(cell):
+                        total[i] += v
+        for labels, cell in totals.items():
+            running = 0
+            for bound, count in zip(self.buckets, cell):
+                running += count
+                yield self.name + "_bucket", labels + (_format_bound(bound),), running
+            running += cell[-2]
+            yield self.name + "_bucket", labels + ("+Inf",), running
+            yield self.name + "_count", labels, running
+            yield self.name + "_sum", labels, cell[-1]
+
+
+def _format_bound(bound: float) -> str:
+    return repr(float(bound))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format 0.0.4"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for sample, labels, value in metric.samples():
+                names = metric.labelnames + (("le",) if sample.endswith("_bucket") else ())
+                if names:
+                    rendered = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, labels))
+                    lines.append(f"{sample}{{{rendered}}} {_format_value(value)}")
+                else:
+                    lines.append(f"{sample} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return registry.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return registry.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return registry.register(Histogram(name, documentation, labelnames, buckets))
+
+
+# ---------------------------------------------------------------------------
+# Application metrics
+# ---------------------------------------------------------------------------
+
+http_request_duration = histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status")
+)
+db_queries_per_request = histogram(
+    "db_queries_per_request", "Database queries issued while handling a request", ("route",), COUNT_BUCKETS
+)
+db_time_per_request = histogram(
+    "db_time_per_request_seconds", "Database time spent while handling a request", ("route",)
+)
+db_query_duration = histogram("db_query_duration_seconds", "Database query latency")
+db_query_errors = counter("db_query_errors", "Database statements that raised")
+azure_request_duration = histogram(
+    "azure_request_duration_seconds", "Azure SDK HTTP request latency", ("client", "status")
+)
+azure_throttled = counter("azure_throttled", "Azure SDK requests throttled (HTTP 429)", ("client",))
+terraform_duration = histogram(
+    "terraform_command_duration_seconds", "Terraform command duration", ("component", "command", "result"), LONG_BUCKETS
+)
+cache_requests = counter("cache_requests", "Cache lookups by result", ("cache", "result"))
+queue_depth = gauge("queue_depth", "Items waiting in in-process queues", ("queue",))
+
+
+class _DbUsage:
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+# Set per request by the middleware; threadpool workers inherit the same object
+_db_usage: ContextVar[Optional[_DbUsage]] = ContextVar("db_usage", default=None)
+
+
+def instrument_engine(engine):
+    """Count and time every query on `engine`, globally and per request"""
+    from sqlalchemy import event
+
+    # Start times keyed by execution context: a statement that fails never
+    # reaches after_cursor_execute, and handle_error drops its entry instead
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", {})[context] = time.perf_counter()
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        db_query_errors.inc()
+        if exception_context.connection is not None:
+            exception_context.connection.info.get("query_start", {}).pop(exception_context.execution_context, None)
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop(context)
+        db_query_duration.observe(elapsed)
+        usage = _db_usage.get()
+        if usage is not None:
+            usage.queries += 1
+            usage.seconds += elapsed
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency and DB usage per route template
+
+    Routes are labelled by their template (/api/deployments/{deployment_id}),
+    never the raw path, to keep label cardinality bounded; unmatched paths
+    share the label "unmatched".
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = ["500"]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = str(message["status"])
+            await send(message)
+
+        usage = _DbUsage()
+        token = _db_usage.set(usage)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _db_usage.reset(token)
+            route = scope.get("route")
+            label = getattr(route, "path", None) or "unmatched"
+            http_request_duration.observe(elapsed, (scope["method"], label, status[0]))
+            db_queries_per_request.observe(usage.queries, (label,))
+            db_time_per_request.observe(usage.seconds, (label,))
+
+
+def observe_terraform(component: str, command: str, seconds: float, success: bool):
+    terraform_duration.observe(seconds, (component, command, "success" if success else "error"))
@@ -0,0 +1,86 @@
+"""
+Email Notifications
+SMTP delivery for portal alerts
+"""
+
+from contextlib import contextmanager
+from email.message import EmailMessage
+from typing import Callable, Iterator, List, Optional
+import smtplib
+import logging
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class EmailNotifier:
+    """
+    Send plain-text emails through the configured SMTP server
+
+    One connection is opened per batch of messages. Without SMTP_HOST
+    messages are only logged; callers tracking delivery check `configured`
+    first. For local testing point SMTP_HOST/SMTP_PORT
+    at a sink such as `python -m aiosmtpd -n -l localhost:1025` and set
+    SMTP_USE_TLS=false.
+    """
+
+    def __init__(
+        self,
+        host: Optional[str] = None,
+        port: Optional[int] = None,
+        user: Optional[str] = None,
+        password: Optional[str] = None,
+        use_tls: Optional[bool] = None,
+        from_email: Optional[str] = None
+    ):
+        self.host = host or settings.SMTP_HOST
+        self.port = port or settings.SMTP_PORT
+        self.user = user or settings.SMTP_USER
+        self.password = password or settings.SMTP_PASSWORD
+        self.use_tls = settings.SMTP_USE_TLS if use_tls is None else use_tls
+        self.from_email = from_email or settings.FROM_EMAIL
+
+    @property
+    def configured(self) -> bool:
+        """Whether messages are delivered rather than only logged"""
+        return bool(self.host)
+
+    def _message(self, recipients: List[str], subject: str, body: str) -> EmailMessage:
+        message = EmailMessage()
+        message["From"] = self.from_email
+        message["To"] = ", ".join(recipients)
+        message["Subject"] = subject
+        message.set_content(body)
+        return message
+
+    @contextmanager
+    def session(self) -> Iterator[Callable[[List[str], str, str], None]]:
+        """
+        Yield a send(recipients, subject, body) function sharing one connection
+
+        Usage:
+            with notifier.session() as send:
+                send(["ops@example.com"], "Subject", "Body")
+        """
+        if not self.host:
+            def log_only(recipients: List[str], subject: str, body: str):
+                logger.info(f"SMTP_HOST not set, email not sent to {recipients}: {subject}")
+            yield log_only
+            return
+
+        with smtplib.SMTP(self.host, self.port, timeout=30) as smtp:
+            if self.use_tls:
+                smtp.starttls()
+            if self.user and self.password:
+                smtp.login(self.user, self.password)
+
+            def send(recipients: List[str], subject: str, body: str):
+                smtp.send_message(self._message(recipients, subject, body))
+
+            yield send
+
+    def send(self, recipients: List[str], subject: str, body: str):
+        """Send a single email"""
+        with self.session() as send:
+            send(recipients, subject, body)
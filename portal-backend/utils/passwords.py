@@ -0,0 +1,99 @@
+"""
+Password Hashing
+bcrypt hashing and verification off the event loop
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import TYPE_CHECKING, Optional, Tuple
+import asyncio
+import threading
+import logging
+
+from config import settings
+
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache()
+def get_pwd_context() -> "CryptContext":
+    """
+    bcrypt context, built on first use
+
+    passlib takes ~30 ms to import, so it is kept off the startup path.
+    Hashes with fewer rounds than BCRYPT_ROUNDS are reported as needing
+    an update.
+    """
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing queue is full"""
+    pass
+
+
+class PasswordHasher:
+    """
+    Run bcrypt in a bounded thread pool
+
+    bcrypt releases the GIL while hashing, so worker threads use separate
+    cores without blocking the event loop. At most `queue_limit` operations
+    may be running or waiting; beyond that calls fail fast with
+    PasswordHasherBusy instead of queueing without bound.
+    """
+
+    def __init__(self, workers: int, queue_limit: int, context: Optional["CryptContext"] = None):
+        self._context = context
+        self.queue_limit = queue_limit
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._dummy_hash: Optional[str] = None
+
+    @property
+    def context(self) -> "CryptContext":
+        return self._context or get_pwd_context()
+
+    async def _run(self, func, *args):
+        with self._lock:
+            if self._pending >= self.queue_limit:
+                raise PasswordHasherBusy(f"{self._pending} password hash operations pending")
+            self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _verify_and_update(self, password: str, hashed: Optional[str]) -> Tuple[bool, Optional[str]]:
+        if hashed is None:
+            # Unknown user: spend the same time as a real check
+            if self._dummy_hash is None:
+                self._dummy_hash = self.context.hash("dummy-password")
+            self.context.verify(password, self._dummy_hash)
+            return False, None
+        return self.context.verify_and_update(password, hashed)
+
+    async def verify_and_update(self, password: str, hashed: Optional[str]) -> Tuple[bool, Optional[str]]:
+        """
+        Verify `password`; returns (valid, new hash or None)
+
+        A new hash is returned when the stored one uses outdated
+        parameters, so callers can upgrade it on successful login.
+        Pass hashed=None for unknown users to keep timing uniform.
+        """
+        return await self._run(self._verify_and_update, password, hashed)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+
+password_hasher = PasswordHasher(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_QUEUE_LIMIT)
@@ -0,0 +1,264 @@
+"""
+Request Profiling
+Opt-in sampled stack profiles and DB query logs for slow requests
+"""
+
+from collections import Counter, deque
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Set
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+
+from config import settings
+
+# Only frames from the application (not the stdlib or site-packages) are kept in stacks
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+MAX_QUERIES = 500
+MAX_STATEMENT = 1000
+
+
+@dataclass(eq=False)
+class Profile:
+    """Everything captured for one profiled request"""
+    id: int
+    method: str
+    path: str
+    trigger: str
+    started_at: datetime
+    threads: Set[int]
+    route: Optional[str] = None
+    status: Optional[int] = None
+    duration_ms: float = 0.0
+    samples: int = 0
+    stacks: Counter = field(default_factory=Counter)
+    queries: List[Dict[str, Any]] = field(default_factory=list)
+    query_count: int = 0
+    query_ms: float = 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status": self.status,
+            "trigger": self.trigger,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(self.duration_ms, 2),
+            "samples": self.samples,
+            "query_count": self.query_count,
+            "query_ms": round(self.query_ms, 2),
+        }
+
+    def detail(self, top: int = 100) -> Dict[str, Any]:
+        """Summary plus collapsed stacks ("outer;inner count", flamegraph input) and queries"""
+        return {
+            **self.summary(),
+            "stacks": [{"stack": stack, "samples": n} for stack, n in self.stacks.most_common(top)],
+            "queries": self.queries,
+        }
+
+
+_active_profile: ContextVar[Optional[Profile]] = ContextVar("active_profile", default=None)
+
+
+def _frame_label(frame) -> Optional[str]:
+    code = frame.f_code
+    if not code.co_filename.startswith(APP_ROOT):
+        return None
+    return f"{code.co_name} ({code.co_filename[len(APP_ROOT):]}:{frame.f_lineno})"
+
+
+class StackSampler:
+    """
+    Background thread sampling the stacks of threads serving profiled requests
+
+    A profiled request runs on the event loop thread, plus any threadpool
+    worker that issues a query on its behalf (registered by the DB hook).
+    Every `interval` seconds the current frame of each of those threads is
+    walked and the application frames are counted as one collapsed stack.
+    The thread only runs while at least one profile is active, so nothing
+    is sampled otherwise. Concurrent requests sharing the event loop can
+    show up in each other's loop-thread samples.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._active: Set[Profile] = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, profile: Profile):
+        with self._lock:
+            self._active.add(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+                self._thread.start()
+
+    def stop(self, profile: Profile):
+        with self._lock:
+            self._active.discard(profile)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    self._thread = None
+                    return
+                active = list(self._active)
+            frames = sys._current_frames()
+            for profile in active:
+                for ident in list(profile.threads):
+                    frame = frames.get(ident)
+                    stack = []
+                    while frame is not None:
+                        label = _frame_label(frame)
+                        if label:
+                            stack.append(label)
+                        frame = frame.f_back
+                    if stack:
+                        profile.stacks[";".join(reversed(stack))] += 1
+                profile.samples += 1
+
+
+class Profiler:
+    """
+    Decide which requests to profile and keep the slow ones
+
+    A request is profiled when it carries `X-Profile: <PROFILING_TOKEN>`
+    or wins the PROFILING_SAMPLE_RATE draw. Header-triggered profiles are
+    always kept; sampled ones only when slower than slow_ms. The last
+    `keep` profiles are held in memory for the admin endpoint.
+    """
+
+    def __init__(self, sample_rate: float, token: Optional[str], slow_ms: float, keep: int, interval: float):
+        self.sample_rate = sample_rate
+        self.token = token.encode() if token else None
+        self.slow_ms = slow_ms
+        self.sampler = StackSampler(interval)
+        self.profiles: Deque[Profile] = deque(maxlen=keep)
+        self._ids = itertools.count(1)
+
+    def trigger(self, scope) -> Optional[str]:
+        if self.token:
+            for name, value in scope.get("headers", ()):
+                if name == b"x-profile":
+                    if value == self.token:
+                        return "header"
+                    break
+        if self.sample_rate and random.random() < self.sample_rate:
+            return "sampled"
+        return None
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+    def get(self, profile_id: int) -> Optional[Profile]:
+        for profile in self.profiles:
+            if profile.id == profile_id:
+                return profile
+        return None
+
+
+request_profiler = Profiler(
+    settings.PROFILING_SAMPLE_RATE,
+    settings.PROFILING_TOKEN,
+    settings.PROFILING_SLOW_MS,
+    settings.PROFILING_KEEP,
+    settings.PROFILING_INTERVAL_MS / 1000,
+)
+
+
+def record_query(statement: str, seconds: float, executemany: bool):
+    """Called by the DB hook for every query; a no-op unless the request is profiled"""
+    profile = _active_profile.get()
+    if profile is None:
+        return
+    profile.threads.add(threading.get_ident())
+    profile.query_count += 1
+    profile.query_ms += seconds * 1000
+    if len(profile.queries) < MAX_QUERIES:
+        profile.queries.append({
+            "statement": statement[:MAX_STATEMENT],
+            "ms": round(seconds * 1000, 3),
+            "executemany": executemany,
+        })
+
+
+def instrument_engine(engine):
+    """Log queries issued by profiled requests (parameters are never stored)"""
+    from sqlalchemy import event
+
+    # Keyed by execution context, as in utils.metrics: a failed statement
+    # never reaches after_cursor_execute, so handle_error drops its entry
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if _active_profile.get() is not None:
+            conn.info.setdefault("profile_start", {})[context] = time.perf_counter()
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        if exception_context.connection is not None:
+            exception_context.connection.info.get("profile_start", {}).pop(exception_context.execution_context, None)
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info.get("profile_start", {}).pop(context, None)
+        if start is not None:
+            record_query(statement, time.perf_counter() - start, executemany)
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling selected requests
+
+    Unprofiled requests cost one header scan and, with sampling enabled,
+    one random draw.
+    """
+
+    def __init__(self, app, profiler: Optional[Profiler] = None):
+        self.app = app
+        self.profiler = profiler or request_profiler
+
+    async def __call__(self, scope, receive, send):
+        trigger = self.profiler.trigger(scope) if scope["type"] == "http" else None
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile = Profile(
+            id=self.profiler.next_id(),
+            method=scope["method"],
+            path=scope["path"],
+            trigger=trigger,
+            started_at=datetime.utcnow(),
+            threads={threading.get_ident()},
+        )
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                headers = list(message.get("headers", ()))
+                headers.append((b"x-profile-id", str(profile.id).encode()))
+                message["headers"] = headers
+            await send(message)
+
+        token = _active_profile.set(profile)
+        self.profiler.sampler.start(profile)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profile.duration_ms = (time.perf_counter() - start) * 1000
+            self.profiler.sampler.stop(profile)
+            _active_profile.reset(token)
+            profile.route = getattr(scope.get("route"), "path", None)
+            if trigger == "header" or profile.duration_ms >= self.profiler.slow_ms:
+                self.profiler.profiles.append(profile)
@@ -0,0 +1,177 @@
+"""
+Workflow Run Reconciler
+Periodically sync in-flight deployments with their GitHub Actions runs
+"""
+
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import re
+import logging
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import bindparam, select, update
+
+from config import settings
+from database import SessionLocal
+from models.deployment import Deployment
+from utils.deployment_events import TERMINAL_STATUSES, DeploymentEventQueue, RunUpdate, parse_event
+from utils.github import GitHubClient, GitHubError
+from utils.workflow_dispatch import github_client
+from utils.tracing import annotate, traced
+
+logger = logging.getLogger(__name__)
+
+# run-name of deploy-infrastructure.yml: "Deploy <customer_id> #<deployment_id>"
+RUN_TITLE_DEPLOYMENT = re.compile(r"#(\d+)\s*$")
+
+PAGE_SIZE = 100
+
+
+def title_deployment_id(title: Optional[str]) -> Optional[int]:
+    """Deployment id embedded in a run's display title, if any"""
+    match = RUN_TITLE_DEPLOYMENT.search(title or "")
+    return int(match.group(1)) if match else None
+
+
+class RunReconciler:
+    """
+    Match workflow runs to in-flight deployments in bulk
+
+    Each sweep lists the workflow's runs created since the oldest
+    in-flight deployment, 100 per page, with If-None-Match. Pages that did
+    not change come back as 304, which GitHub does not count against the
+    rate limit, and are served from the previous sweep's copy. Runs are
+    matched by github_run_id, or by the deployment id in the run title
+    for deployments not linked yet. Only rows whose status or progress
+    actually moved are written, through the same forward-only UPDATE as
+    the webhook path, so the two never fight.
+    """
+
+    def __init__(self, client: GitHubClient, workflow: str, max_pages: int = 50):
+        self.client = client
+        self.workflow = workflow
+        self.max_pages = max_pages
+        self._pages: Dict[str, Tuple[str, Dict[str, Any]]] = {}  # url -> (etag, body)
+        self.stats = {"requests": 0, "not_modified": 0}
+
+    async def _get_page(self, path: str, params: Dict[str, Any], pages: Dict[str, Tuple[str, Dict[str, Any]]]) -> Dict[str, Any]:
+        key = f"{path}?{sorted(params.items())}"
+        cached = self._pages.get(key)
+        headers = {"If-None-Match": cached[0]} if cached else {}
+        response = await self.client.request("GET", path, params=params, headers=headers)
+        self.stats["requests"] += 1
+        if response.status_code == 304 and cached:
+            self.stats["not_modified"] += 1
+            body = cached[1]
+        else:
+            body = response.json()
+        etag = response.headers.get("etag") or (cached[0] if cached else None)
+        if etag:
+            pages[key] = (etag, body)
+        return body
+
+    async def list_runs(self, since: datetime) -> List[Dict[str, Any]]:
+        """All runs of the workflow created on or after `since`"""
+        path = f"/repos/{self.client.repo}/actions/workflows/{self.workflow}/runs"
+        pages: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+        runs: List[Dict[str, Any]] = []
+        for page in range(1, self.max_pages + 1):
+            body = await self._get_page(path, {
+                "per_page": PAGE_SIZE,
+                "page": page,
+                "created": f">={since.date().isoformat()}",
+                "exclude_pull_requests": "true",
+            }, pages)
+            batch = body.get("workflow_runs") or []
+            runs.extend(batch)
+            if len(batch) < PAGE_SIZE or len(runs) >= body.get("total_count", 0):
+                break
+        # Keep only the pages of this sweep so the cache cannot grow without bound
+        self._pages = pages
+        return runs
+
+    @staticmethod
+    def _in_flight() -> List[Any]:
+        """Deployments still running, started within GITHUB_RECONCILE_MAX_AGE_HOURS"""
+        cutoff = datetime.utcnow() - timedelta(hours=settings.GITHUB_RECONCILE_MAX_AGE_HOURS)
+        db = SessionLocal()
+        try:
+            return db.execute(
+                select(
+                    Deployment.id, Deployment.github_run_id, Deployment.status,
+                    Deployment.progress_percentage, Deployment.started_at
+                ).where(Deployment.status.not_in(TERMINAL_STATUSES), Deployment.started_at >= cutoff)
+            ).all()
+        finally:
+            db.close()
+
+    @staticmethod
+    def _link(links: List[Dict[str, Any]]):
+        """Store run ids/URLs for deployments matched by title (never overwrites a link)"""
+        table = Deployment.__table__
+        stmt = (
+            update(table)
+            .where(table.c.id == bindparam("b_id"), table.c.github_run_id.is_(None))
+            .values(github_run_id=bindparam("b_run_id"), github_run_url=bindparam("b_url"))
+        )
+        db = SessionLocal()
+        try:
+            db.execute(stmt, links)
+            db.commit()
+        finally:
+            db.close()
+
+    @traced("reconcile_runs")
+    async def reconcile(self) -> Dict[str, int]:
+        """One sweep; returns counts of in-flight, runs seen, linked and updated"""
+        rows = await run_in_threadpool(self._in_flight)
+        summary = {"in_flight": len(rows), "runs": 0, "linked": 0, "updated": 0}
+        if not rows:
+            return summary
+
+        oldest = min((r.started_at for r in rows if r.started_at), default=datetime.utcnow())
+        runs = await self.list_runs(oldest - timedelta(days=1))
+        summary["runs"] = len(runs)
+        by_run_id = {str(run["id"]): run for run in runs}
+        by_deployment = {}
+        for run in runs:
+            deployment_id = title_deployment_id(run.get("display_title"))
+            # Newest run wins (the list is newest first), e.g. after a re-dispatch
+            if deployment_id is not None:
+                by_deployment.setdefault(deployment_id, run)
+
+        links, moved = [], []
+        for row in rows:
+            run = by_run_id.get(row.github_run_id) if row.github_run_id else by_deployment.get(row.id)
+            if run is None:
+                continue
+            if not row.github_run_id:
+                links.append({"b_id": row.id, "b_run_id": str(run["id"]), "b_url": run.get("html_url")})
+            state: Optional[RunUpdate] = parse_event("workflow_run", {"workflow_run": run})
+            if state and (state.terminal or state.progress > (row.progress_percentage or 0)):
+                moved.append(state)
+
+        if links:
+            await run_in_threadpool(self._link, links)
+        if moved:
+            summary["updated"] = await run_in_threadpool(DeploymentEventQueue.write, moved)
+        summary["linked"] = len(links)
+        annotate(**{f"reconcile.{k}": v for k, v in summary.items()})
+        return summary
+
+    async def run(self, interval: float):
+        """Reconcile every `interval` seconds until cancelled"""
+        while True:
+            try:
+                summary = await self.reconcile()
+                if summary["linked"] or summary["updated"]:
+                    logger.info(f"Run reconciliation: {summary}")
+            except GitHubError as e:
+                logger.warning(f"Run reconciliation skipped: {e}")
+            except Exception as e:
+                logger.error(f"Run reconciliation failed: {e}", exc_info=True)
+            await asyncio.sleep(interval)
+
+
+run_reconciler = RunReconciler(github_client, settings.GITHUB_WORKFLOW_FILE)
@@ -0,0 +1,254 @@
+"""
+Shared State Store
+Deployment state of the lightweight portal, consistent across workers and instances
+
+Self-contained (no API settings, engine or models), so app.py can build
+a store from its own environment.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+import asyncio
+import copy
+import logging
+import threading
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import Column, DateTime, Integer, JSON, MetaData, String, Table, create_engine, event, insert, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+
+logger = logging.getLogger(__name__)
+
+# Compare-and-swap attempts before a write gives up
+MAX_WRITE_ATTEMPTS = 20
+
+Mutation = Callable[[Optional[Dict[str, Any]]], Optional[Dict[str, Any]]]
+
+# Schema of migration 0004; models.portal_state maps this same table for the API
+portal_state = Table(
+    "portal_state",
+    MetaData(),
+    Column("namespace", String(50), primary_key=True),  # e.g. "deployments"
+    Column("key", String(100), primary_key=True),
+    Column("value", JSON, nullable=False),
+    Column("version", Integer, nullable=False, default=1),  # Bumped on every write
+    Column("updated_at", DateTime, default=datetime.utcnow, onupdate=datetime.utcnow),
+)
+
+
+class StateConflict(RuntimeError):
+    """A write kept losing to concurrent writes of the same entry"""
+
+
+@dataclass
+class StateEntry:
+    """One stored value and the version it was read at"""
+    namespace: str
+    key: str
+    value: Dict[str, Any]
+    version: int
+
+
+class StateStore:
+    """
+    Key/value records grouped by namespace, with atomic updates
+
+    update() hands the mutation a private copy of the current value and
+    only stores the result if nobody else wrote the entry in between,
+    retrying otherwise, so concurrent writers never overwrite each
+    other's changes. wait() returns as soon as an entry moves past a
+    known version: writes made by this process wake waiters at once,
+    writes from other workers are seen within `poll_interval`.
+
+    Subclasses implement the blocking _get, _list and _write; they run in
+    the threadpool.
+    """
+
+    def __init__(self, poll_interval: float):
+        self.poll_interval = poll_interval
+        self._changed: Optional[asyncio.Condition] = None
+
+    def _get(self, namespace: str, key: str) -> Optional[StateEntry]:
+        raise NotImplementedError
+
+    def _list(self, namespace: str) -> List[StateEntry]:
+        raise NotImplementedError
+
+    def _write(self, namespace: str, key: str, mutate: Mutation) -> Optional[StateEntry]:
+        raise NotImplementedError
+
+    @property
+    def changed(self) -> asyncio.Condition:
+        if self._changed is None:
+            self._changed = asyncio.Condition()
+        return self._changed
+
+    async def _notify(self):
+        async with self.changed:
+            self.changed.notify_all()
+
+    async def get(self, namespace: str, key: str) -> Optional[StateEntry]:
+        return await run_in_threadpool(self._get, namespace, key)
+
+    async def list(self, namespace: str) -> List[StateEntry]:
+        return await run_in_threadpool(self._list, namespace)
+
+    async def put(self, namespace: str, key: str, value: Dict[str, Any]) -> StateEntry:
+        """Create or replace an entry"""
+        entry = await run_in_threadpool(self._write, namespace, key, lambda current: value)
+        await self._notify()
+        return entry
+
+    async def update(
+        self, namespace: str, key: str, mutate: Callable[[Dict[str, Any]], Dict[str, Any]]
+    ) -> Optional[StateEntry]:
+        """Apply `mutate` to an existing entry atomically; None if there is no such entry"""
+        entry = await run_in_threadpool(
+            self._write, namespace, key, lambda current: None if current is None else mutate(current)
+        )
+        if entry is not None:
+            await self._notify()
+        return entry
+
+    async def wait(self, namespace: str, key: str, after_version: int, timeout: float) -> Optional[StateEntry]:
+        """The entry once its version exceeds `after_version`, or as it stands after `timeout` seconds"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            entry = await self.get(namespace, key)
+            remaining = deadline - loop.time()
+            if entry is None or entry.version > after_version or remaining <= 0:
+                return entry
+            async with self.changed:
+                try:
+                    await asyncio.wait_for(self.changed.wait(), min(remaining, self.poll_interval))
+                except asyncio.TimeoutError:
+                    pass
+
+
+class MemoryStateStore(StateStore):
+    """Process-local store; only consistent with a single worker"""
+
+    def __init__(self, poll_interval: float = 1.0):
+        super().__init__(poll_interval)
+        self._entries: Dict[tuple, StateEntry] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, namespace, key):
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            return copy.deepcopy(entry)
+
+    def _list(self, namespace):
+        with self._lock:
+            return [copy.deepcopy(e) for (ns, _), e in self._entries.items() if ns == namespace]
+
+    def _write(self, namespace, key, mutate):
+        with self._lock:
+            current = self._entries.get((namespace, key))
+            value = mutate(copy.deepcopy(current.value) if current else None)
+            if value is None:
+                return None
+            entry = StateEntry(namespace, key, copy.deepcopy(value), current.version + 1 if current else 1)
+            self._entries[(namespace, key)] = entry
+            return copy.deepcopy(entry)
+
+
+class SqlStateStore(StateStore):
+    """
+    Store in the portal_state table, shared by every process using the database
+
+    Writes are compare-and-swap on the row version: a single UPDATE ...
+    WHERE version = <read version>, atomic on every backend, so no row
+    locks are held while the mutation runs.
+    """
+
+    def __init__(self, engine: Engine, poll_interval: float):
+        super().__init__(poll_interval)
+        self.engine = engine
+
+    @staticmethod
+    def _entry(row) -> StateEntry:
+        return StateEntry(row.namespace, row.key, row.value, row.version)
+
+    def _get(self, namespace, key):
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                select(portal_state).where(portal_state.c.namespace == namespace, portal_state.c.key == key)
+            ).first()
+            return self._entry(row) if row else None
+
+    def _list(self, namespace):
+        with self.engine.connect() as conn:
+            rows = conn.execute(select(portal_state).where(portal_state.c.namespace == namespace))
+            return [self._entry(row) for row in rows]
+
+    def _write(self, namespace, key, mutate):
+        with self.engine.connect() as conn:
+            for _ in range(MAX_WRITE_ATTEMPTS):
+                row = conn.execute(
+                    select(portal_state.c.value, portal_state.c.version)
+                    .where(portal_state.c.namespace == namespace, portal_state.c.key == key)
+                ).first()
+                value = mutate(copy.deepcopy(row.value) if row else None)
+                if value is None:
+                    conn.rollback()
+                    return None
+
+                if row is None:
+                    try:
+                        conn.execute(insert(portal_state).values(namespace=namespace, key=key, value=value, version=1))
+                        conn.commit()
+                    except IntegrityError:
+                        conn.rollback()  # Created concurrently; retry as an update
+                        continue
+                    return StateEntry(namespace, key, value, 1)
+
+                result = conn.execute(
+                    update(portal_state)
+                    .where(
+                        portal_state.c.namespace == namespace,
+                        portal_state.c.key == key,
+                        portal_state.c.version == row.version,
+                    )
+                    .values(value=value, version=row.version + 1, updated_at=datetime.utcnow())
+                )
+                conn.commit()
+                if result.rowcount == 1:
+                    return StateEntry(namespace, key, value, row.version + 1)
+
+        raise StateConflict(f"Too many concurrent writes to {namespace}/{key}")
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")  # Readers don't block the writer
+    cursor.execute("PRAGMA busy_timeout=30000")
+    cursor.close()
+
+
+def create_state_store(backend: str, url: Optional[str] = None, poll_interval: float = 1.0) -> StateStore:
+    """
+    Build a "database" or "memory" store
+
+    "database" uses the portal_state table at `url`: the API's database
+    (created by the migrations) or e.g. a SQLite file shared by the
+    workers of one host, where the table is created on first use.
+    "memory" keeps state in the process and is only correct with a single
+    worker.
+    """
+    if backend == "memory":
+        logger.warning("STATE_BACKEND=memory: deployment state is not shared between workers")
+        return MemoryStateStore(poll_interval)
+    if backend != "database":
+        raise ValueError(f"Unknown STATE_BACKEND {backend!r} (expected database or memory)")
+    if not url:
+        raise ValueError("The database state backend needs a database URL")
+
+    engine = create_engine(url, pool_pre_ping=True)
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _sqlite_pragmas)
+    portal_state.create(engine, checkfirst=True)
+    return SqlStateStore(engine, poll_interval)
@@ -4,6 +4,8 @@ Wrapper for running Terraform commands
 """
 
 import subprocess
+import time
+import hashlib
 import json
 import os
 from typing import Dict, Any, Optional
@@ -12,9 +14,82 @@ import logging
 
 from config import settings
 from models.customer import Customer
+from utils.cache import TTLCache
+from utils.encryption import decrypt_value
+from utils.metrics import observe_terraform
+from utils.tracing import tracer
 
 logger = logging.getLogger(__name__)
 
+def _zeroize(secret: bytearray):
+    """Overwrite a cached secret in place before it is released"""
+    secret[:] = bytes(len(secret))
+
+# Decrypted secrets keyed by ciphertext hash (memory only, zeroized when dropped)
+_secret_cache = TTLCache(
+    settings.TERRAFORM_SECRET_CACHE_SIZE,
+    ttl=settings.TERRAFORM_SECRET_CACHE_TTL_SECONDS,
+    on_evict=_zeroize,
+    name="terraform_secret"
+)
+
+# Expired secrets nobody reads again are zeroized by a purge run at most this often
+SECRET_PURGE_INTERVAL_SECONDS = 60
+_next_secret_purge = 0.0
+
+# Credential-free base environments keyed by customer and subscription
+_env_cache = TTLCache(
+    settings.TERRAFORM_SECRET_CACHE_SIZE, ttl=settings.TERRAFORM_SECRET_CACHE_TTL_SECONDS, name="terraform_env"
+)
+
+def client_secret(encrypted_secret: str) -> str:
+    """
+    Decrypt a service principal secret through the secret cache
+    
+    The plaintext is held as a bytearray so it can be zeroized on expiry
+    or eviction; the returned str copy lives only in runner environments.
+    The buffer never leaves the cache: it is decoded under the cache lock,
+    so a concurrent set, purge or eviction cannot wipe it mid-read.
+    Reads expire entries lazily; the full purge runs at most every
+    SECRET_PURGE_INTERVAL_SECONDS rather than on every call.
+    """
+    global _next_secret_purge
+    now = time.monotonic()
+    if now >= _next_secret_purge:
+        _next_secret_purge = now + SECRET_PURGE_INTERVAL_SECONDS
+        _secret_cache.purge()
+    key = hashlib.sha256(encrypted_secret.encode()).digest()
+    secret = _secret_cache.get_as(key, bytearray.decode)
+    if secret is None:
+        secret = decrypt_value(encrypted_secret)
+        _secret_cache.set(key, bytearray(secret.encode()))
+    return secret
+
+def base_environment(customer: Customer, subscription_id: str) -> Dict[str, str]:
+    """
+    Shared environment for a customer and subscription, without the secret
+    
+    Built from os.environ once per TTL and reused by every runner for that
+    subscription. Callers must copy it before adding to it.
+    """
+    key = (customer.id, subscription_id, customer.tenant_id, customer.sp_client_id)
+    env = _env_cache.get(key)
+    if env is None:
+        env = os.environ.copy()
+        env.update({
+            "ARM_TENANT_ID": customer.tenant_id,
+            "ARM_SUBSCRIPTION_ID": subscription_id,
+            "ARM_CLIENT_ID": customer.sp_client_id,
+            "TF_IN_AUTOMATION": "1"
+        })
+        _env_cache.set(key, env)
+    return env
+
+def clear_credential_caches():
+    """Zeroize cached secrets and drop cached environments (e.g. after key rotation)"""
+    _secret_cache.clear()
+    _env_cache.clear()
+
 class TerraformRunner:
     """
     Execute Terraform commands for customer deployments
@@ -31,15 +106,21 @@ class TerraformRunner:
         if not self.working_dir.exists():
             raise FileNotFoundError(f"Terraform directory not found: {self.working_dir}")
         
-        # Set environment variables for Azure authentication
-        self.env = os.environ.copy()
-        self.env.update({
-            "ARM_TENANT_ID": customer.tenant_id,
-            "ARM_SUBSCRIPTION_ID": self._get_subscription_id(component),
-            "ARM_CLIENT_ID": customer.sp_client_id,
-            "ARM_CLIENT_SECRET": self._decrypt_secret(customer.sp_client_secret),
-            "TF_IN_AUTOMATION": "1"
-        })
+        # Fail before any command runs: unknown component, undecryptable secret
+        self.subscription_id = self._get_subscription_id(component)
+        client_secret(customer.sp_client_secret)
+        
+    @property
+    def env(self) -> Dict[str, str]:
+        """
+        Process environment with Azure credentials for this component
+        
+        Built per command from the cached base environment and secret, so
+        runners hold no plaintext secret between commands.
+        """
+        env = dict(base_environment(self.customer, self.subscription_id))
+        env["ARM_CLIENT_SECRET"] = client_secret(self.customer.sp_client_secret)
+        return env
     
     def _get_subscription_id(self, component: str) -> str:
         """Get subscription ID for component"""
@@ -53,15 +134,15 @@ class TerraformRunner:
         
         raise ValueError(f"Unknown component: {component}")
     
-    def _decrypt_secret(self, encrypted_secret: str) -> str:
-        """Decrypt service principal secret"""
-        # TODO: Implement actual decryption
-        from ..utils.encryption import decrypt_value
-        return decrypt_value(encrypted_secret)
-    
     def _run_command(self, command: list, capture_output: bool = True) -> Dict[str, Any]:
         """Execute Terraform command"""
         logger.info(f"Running: {' '.join(command)} in {self.working_dir}")
+        started = time.perf_counter()
+        success = False
+        span = tracer.start_span(
+            f"terraform {command[1]}",
+            **{"terraform.component": self.component, "customer.id": self.customer_id}
+        )
         
         try:
             result = subprocess.run(
@@ -72,21 +153,29 @@ class TerraformRunner:
                 text=True,
                 timeout=3600  # 1 hour timeout
             )
+            success = result.returncode == 0
+            span.set_attribute("process.exit_code", result.returncode)
             
             return {
-                "success": result.returncode == 0,
+                "success": success,
                 "stdout": result.stdout,
                 "stderr": result.stderr,
                 "returncode": result.returncode
             }
         
-        except subprocess.TimeoutExpired:
+        except subprocess.TimeoutExpired as e:
             logger.error(f"Terraform command timed out: {command}")
+            span.record_exception(e)
             raise Exception("Terraform execution timed out (1 hour)")
         
         except Exception as e:
             logger.error(f"Terraform command failed: {e}", exc_info=True)
+            span.record_exception(e)
             raise
+        
+        finally:
+            observe_terraform(self.component, command[1], time.perf_counter() - started, success)
+            span.end()
     
     def init(self) -> Dict[str, Any]:
         """Run terraform init"""
@@ -0,0 +1,395 @@
+"""
+Tracing
+OpenTelemetry-compatible spans with W3C context propagation and offline exporters
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, TextIO
+import atexit
+import functools
+import inspect
+import json
+import queue
+import random
+import re
+import sys
+import threading
+import time
+
+
+# OTLP enums
+SPAN_KIND = {"internal": 1, "server": 2, "client": 3, "producer": 4, "consumer": 5}
+STATUS_UNSET, STATUS_OK, STATUS_ERROR = 0, 1, 2
+
+TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+@dataclass(frozen=True)
+class SpanContext:
+    """Identity of a span; what crosses process, queue and task boundaries"""
+    trace_id: str
+    span_id: str
+    sampled: bool
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    @classmethod
+    def from_traceparent(cls, header: Optional[str]) -> Optional["SpanContext"]:
+        match = TRACEPARENT.match((header or "").strip().lower())
+        if not match or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+            return None
+        return cls(match.group(1), match.group(2), int(match.group(3), 16) & 1 == 1)
+
+
+class Span:
+    """One timed operation; unsampled spans carry context but record nothing"""
+
+    def __init__(self, name: str, context: SpanContext, parent_id: Optional[str], kind: str, attributes: Dict[str, Any]):
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = attributes
+        self.events: List[Dict[str, Any]] = []
+        self.status = STATUS_UNSET
+        self.status_message: Optional[str] = None
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+
+    def set_attribute(self, key: str, value: Any):
+        if self.context.sampled:
+            self.attributes[key] = value
+
+    def set_status(self, status: int, message: Optional[str] = None):
+        self.status = status
+        self.status_message = message
+
+    def record_exception(self, exc: BaseException):
+        if self.context.sampled:
+            self.events.append({
+                "name": "exception",
+                "timeUnixNano": time.time_ns(),
+                "attributes": {"exception.type": type(exc).__name__, "exception.message": str(exc)[:1000]},
+            })
+        self.set_status(STATUS_ERROR, str(exc)[:200])
+
+    def end(self):
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        if self.context.sampled:
+            tracer.processor.submit(self)
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+
+_current: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def current_context() -> Optional[SpanContext]:
+    """Context of the active span, to hand to work that runs elsewhere"""
+    span = _current.get()
+    return span.context if span else None
+
+
+def record_error(exc: BaseException):
+    """Mark the active span failed for an error that is handled rather than raised"""
+    span = _current.get()
+    if span is not None:
+        span.record_exception(exc)
+
+
+def annotate(**attributes):
+    """Add attributes to the active span, if any"""
+    span = _current.get()
+    if span is not None:
+        for key, value in attributes.items():
+            span.set_attribute(key, value)
+
+
+def _hex(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+class Tracer:
+    """
+    Creates spans and tracks the active one in a contextvar
+
+    The active span follows asyncio tasks and run_in_threadpool calls
+    automatically; pass `parent=` (a SpanContext captured with
+    current_context()) for work handed over through a queue. Sampling is
+    decided once per trace, at its root.
+    """
+
+    def __init__(self, sample_rate: float, processor: "BatchProcessor"):
+        self.sample_rate = sample_rate
+        self.processor = processor
+
+    def start_span(self, name: str, parent: Optional[SpanContext] = None, kind: str = "internal", **attributes) -> Span:
+        parent = parent or current_context()
+        if parent is None:
+            context = SpanContext(_hex(128), _hex(64), random.random() < self.sample_rate)
+        else:
+            context = SpanContext(parent.trace_id, _hex(64), parent.sampled)
+        return Span(name, context, parent.span_id if parent else None, kind, attributes if context.sampled else {})
+
+    @contextmanager
+    def span(self, name: str, parent: Optional[SpanContext] = None, kind: str = "internal", **attributes) -> Iterator[Span]:
+        """Run the block in a new active span; exceptions mark it as failed"""
+        span = self.start_span(name, parent, kind, **attributes)
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            _current.reset(token)
+            span.end()
+
+
+def traced(name: str, **attributes):
+    """Decorator running a sync or async function in its own span"""
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with tracer.span(name, **attributes):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name, **attributes):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ---------------------------------------------------------------------------
+# Export
+# ---------------------------------------------------------------------------
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_otlp_value(v) for v in value]}}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": k, "value": _otlp_value(v)} for k, v in attributes.items() if v is not None]
+
+
+def otlp_span(span: Span) -> Dict[str, Any]:
+    """A span in OTLP/JSON form"""
+    record = {
+        "traceId": span.context.trace_id,
+        "spanId": span.context.span_id,
+        "name": span.name,
+        "kind": SPAN_KIND.get(span.kind, 1),
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": _otlp_attributes(span.attributes),
+        "status": {"code": span.status},
+    }
+    if span.parent_id:
+        record["parentSpanId"] = span.parent_id
+    if span.status_message:
+        record["status"]["message"] = span.status_message
+    if span.events:
+        record["events"] = [
+            {"name": e["name"], "timeUnixNano": str(e["timeUnixNano"]), "attributes": _otlp_attributes(e["attributes"])}
+            for e in span.events
+        ]
+    return record
+
+
+class FileExporter:
+    """
+    Append spans as OTLP/JSON lines (one ExportTraceServiceRequest per batch)
+
+    The file can be replayed into any OpenTelemetry collector or viewed
+    offline, e.g. `jq '.resourceSpans[].scopeSpans[].spans[]'`.
+    """
+
+    def __init__(self, path: str, service_name: str):
+        self.path = path
+        self.resource = {"attributes": _otlp_attributes({"service.name": service_name})}
+
+    def export(self, spans: List[Span]):
+        request = {"resourceSpans": [{
+            "resource": self.resource,
+            "scopeSpans": [{"scope": {"name": "portal-backend"}, "spans": [otlp_span(s) for s in spans]}],
+        }]}
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(request, separators=(",", ":"), default=str) + "\n")
+
+
+class ConsoleExporter:
+    """One readable line per span: duration, name, ids and attributes"""
+
+    def __init__(self, stream: Optional[TextIO] = None):
+        self.stream = stream or sys.stderr
+
+    def export(self, spans: List[Span]):
+        for span in spans:
+            status = " ERROR" if span.status == STATUS_ERROR else ""
+            attributes = " ".join(f"{k}={v}" for k, v in span.attributes.items())
+            self.stream.write(
+                f"[trace {span.context.trace_id} span {span.context.span_id} parent {span.parent_id or '-'}] "
+                f"{span.duration_ms:10.1f} ms {span.name}{status} {attributes}\n"
+            )
+        self.stream.flush()
+
+
+class BatchProcessor:
+    """
+    Export finished spans from a background thread
+
+    end() only enqueues; the thread exports every `interval` seconds or
+    once `max_batch` spans are waiting, so exporter I/O never runs on the
+    event loop. Without an exporter spans are dropped at once.
+    """
+
+    def __init__(self, interval: float = 1.0, max_batch: int = 512):
+        self.interval = interval
+        self.max_batch = max_batch
+        self.exporter = None
+        self._queue: "queue.SimpleQueue[Optional[Span]]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, exporter):
+        self.shutdown()
+        self.exporter = exporter
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def submit(self, span: Span):
+        if self.exporter is not None:
+            self._queue.put(span)
+
+    def _export(self, batch: List[Span]):
+        try:
+            self.exporter.export(batch)
+        except Exception as e:
+            sys.stderr.write(f"Span export failed: {e}\n")
+
+    def _run(self):
+        batch: List[Span] = []
+        deadline = time.monotonic() + self.interval
+        while True:
+            try:
+                span = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                if batch:
+                    self._export(batch)
+                    batch = []
+                deadline = time.monotonic() + self.interval
+                continue
+            if span is None:
+                if batch:
+                    self._export(batch)
+                return
+            batch.append(span)
+            if len(batch) >= self.max_batch:
+                self._export(batch)
+                batch = []
+
+    def shutdown(self):
+        """Export what is queued and stop the thread"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.exporter = None
+
+
+tracer = Tracer(1.0, BatchProcessor())  # Sample rate from configure_tracing
+
+
+def configure_tracing(exporter: Optional[str] = None, path: Optional[str] = None, sample_rate: Optional[float] = None):
+    """
+    Start exporting to TRACING_EXPORTER: "console", "file" (OTLP/JSON lines) or "none"
+
+    Settings are read here rather than at import, so instrumented modules
+    (e.g. utils.github) stay importable without the API's configuration.
+    """
+    from config import settings
+
+    tracer.sample_rate = settings.TRACING_SAMPLE_RATE if sample_rate is None else sample_rate
+    exporter = exporter or settings.TRACING_EXPORTER
+    path = path or settings.TRACING_FILE
+    if exporter == "console":
+        tracer.processor.start(ConsoleExporter())
+    elif exporter == "file":
+        tracer.processor.start(FileExporter(path, settings.APP_NAME))
+    else:
+        tracer.processor.shutdown()
+
+
+def shutdown_tracing():
+    tracer.processor.shutdown()
+
+
+atexit.register(shutdown_tracing)
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware opening a server span per request
+
+    Continues the caller's trace when a valid `traceparent` header is sent
+    and returns the request's own traceparent in the response.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        parent = None
+        for name, value in scope.get("headers", ()):
+            if name == b"traceparent":
+                parent = SpanContext.from_traceparent(value.decode("latin-1"))
+                break
+
+        with tracer.span(
+            f"{scope['method']} {scope['path']}", parent=parent, kind="server",
+            **{"http.request.method": scope["method"], "url.path": scope["path"]},
+        ) as span:
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.response.status_code", message["status"])
+                    if message["status"] >= 500:
+                        span.set_status(STATUS_ERROR)
+                    headers = list(message.get("headers", ()))
+                    headers.append((b"traceparent", span.context.traceparent.encode()))
+                    message["headers"] = headers
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = getattr(scope.get("route"), "path", None)
+                if route:
+                    span.name = f"{scope['method']} {route}"
+                    span.set_attribute("http.route", route)
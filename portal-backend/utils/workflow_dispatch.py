@@ -0,0 +1,165 @@
+"""
+Workflow Dispatch
+The API's GitHub client and the paced queue that sends deployment workflow dispatches
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+import asyncio
+import time
+import logging
+
+from fastapi.concurrency import run_in_threadpool
+
+from config import settings
+from database import SessionLocal
+from models.deployment import Deployment, DeploymentStatus
+from utils.github import GitHubClient, GitHubError
+from utils.logging import log_context
+from utils.tracing import SpanContext, current_context, record_error, tracer
+
+logger = logging.getLogger(__name__)
+
+
+github_client = GitHubClient(
+    settings.GITHUB_TOKEN,
+    settings.GITHUB_REPO,
+    base_url=settings.GITHUB_API_URL,
+    timeout=settings.GITHUB_HTTP_TIMEOUT_SECONDS,
+    max_retries=settings.GITHUB_MAX_RETRIES,
+    max_connections=settings.GITHUB_MAX_CONNECTIONS,
+    max_wait=settings.GITHUB_MAX_RATE_LIMIT_WAIT_SECONDS,
+)
+
+
+@dataclass
+class DispatchJob:
+    deployment_id: int
+    inputs: Dict[str, Any]
+    trace: Optional[SpanContext] = None  # Span of the request that queued it
+
+
+class WorkflowDispatchQueue:
+    """
+    Bounded queue of workflow dispatches sent at a steady pace
+
+    Requests enqueue and return at once; a single worker sends one
+    dispatch every `interval` seconds (GitHub recommends spacing mutating
+    calls to avoid secondary rate limits), so onboarding many customers
+    at once becomes an even stream. The deployment row is moved to
+    validating or failed when its dispatch completes.
+
+    The inputs are also stored on the deployment (dispatch_inputs) until
+    the dispatch is sent, so recover() can re-queue what a stopped worker
+    still held. Before sending, a job claims its row by clearing
+    dispatch_inputs in one conditional UPDATE; a job whose row was
+    already claimed, e.g. queued by two workers after a restart, is
+    dropped, so no deployment is dispatched twice.
+    """
+
+    def __init__(self, client: GitHubClient, workflow: str, ref: str, interval: float, maxsize: int):
+        self.client = client
+        self.workflow = workflow
+        self.ref = ref
+        self.interval = interval
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+
+    def submit(self, deployment_id: int, inputs: Dict[str, Any]):
+        """Queue a dispatch; raises asyncio.QueueFull when the backlog is full"""
+        self._queue.put_nowait(DispatchJob(deployment_id, inputs, current_context()))
+
+    @staticmethod
+    def _undispatched():
+        db = SessionLocal()
+        try:
+            return db.query(Deployment.id, Deployment.dispatch_inputs).filter(
+                Deployment.status == DeploymentStatus.PENDING.value,
+                Deployment.dispatch_inputs.isnot(None),
+            ).order_by(Deployment.started_at).all()
+        finally:
+            db.close()
+
+    async def recover(self) -> int:
+        """Re-queue pending deployments whose dispatch was never sent; returns how many"""
+        rows = await run_in_threadpool(self._undispatched)
+        queued = 0
+        for deployment_id, inputs in rows:
+            try:
+                self.submit(deployment_id, inputs)
+            except asyncio.QueueFull:
+                logger.warning(f"Dispatch queue full, {len(rows) - queued} undispatched deployments left for the next start")
+                break
+            queued += 1
+        if queued:
+            logger.info(f"Re-queued {queued} undispatched deployments")
+        return queued
+
+    @staticmethod
+    def _claim(deployment_id: int) -> bool:
+        db = SessionLocal()
+        try:
+            claimed = db.query(Deployment).filter(
+                Deployment.id == deployment_id,
+                Deployment.status == DeploymentStatus.PENDING.value,
+                Deployment.dispatch_inputs.isnot(None),
+            ).update({"dispatch_inputs": None}, synchronize_session=False)
+            db.commit()
+            return claimed == 1
+        finally:
+            db.close()
+
+    @staticmethod
+    def _record(deployment_id: int, values: Dict[str, Any]):
+        db = SessionLocal()
+        try:
+            db.query(Deployment).filter(Deployment.id == deployment_id).update(values)
+            db.commit()
+        finally:
+            db.close()
+
+    async def _dispatch(self, job: DispatchJob):
+        if not await run_in_threadpool(self._claim, job.deployment_id):
+            logger.info(f"Deployment {job.deployment_id} already dispatched, skipping")
+            return
+        try:
+            await self.client.dispatch_workflow(self.workflow, job.inputs, self.ref)
+        except GitHubError as e:
+            logger.error(f"Workflow dispatch for deployment {job.deployment_id} failed: {e}")
+            record_error(e)
+            values = {"status": DeploymentStatus.FAILED.value, "error_message": str(e)[:1000]}
+        else:
+            values = {
+                "status": DeploymentStatus.VALIDATING.value,
+                "github_run_url": self.client.workflow_url(self.workflow),
+            }
+        await run_in_threadpool(self._record, job.deployment_id, values)
+
+    async def run(self):
+        """Send queued dispatches until cancelled"""
+        while True:
+            job = await self._queue.get()
+            started = time.monotonic()
+            try:
+                with log_context(deployment_id=job.deployment_id), tracer.span(
+                    "workflow_dispatch", parent=job.trace, kind="producer",
+                    **{"deployment.id": job.deployment_id, "github.workflow": self.workflow},
+                ):
+                    await self._dispatch(job)
+            except Exception as e:
+                logger.error(f"Workflow dispatch worker error: {e}", exc_info=True)
+            finally:
+                self._queue.task_done()
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+
+dispatch_queue = WorkflowDispatchQueue(
+    github_client,
+    settings.GITHUB_WORKFLOW_FILE,
+    settings.GITHUB_WORKFLOW_REF,
+    settings.GITHUB_DISPATCH_INTERVAL_SECONDS,
+    settings.GITHUB_DISPATCH_QUEUE_SIZE,
+)
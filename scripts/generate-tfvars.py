@@ -2,20 +2,230 @@
 """
 Generate Terraform tfvars from Excel parameter sheet
 Usage: python generate-tfvars.py deployment-parameters.xlsx
+       python generate-tfvars.py deployment-parameters.json|.yaml
+       python generate-tfvars.py --batch params/ 'customers/*/params.xlsx' [--summary summary.json]
+       python generate-tfvars.py --from-db postgresql://... [--workers 8]
+       python generate-tfvars.py params.xlsx --format json   # terraform.tfvars.json
 """
 
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import pandas as pd
+import argparse
+import glob
 import json
+import os
 import sys
+import tempfile
 from pathlib import Path
 import ipaddress
+import math
+import re
+
+class ParameterTable:
+    """
+    Parameter rows of one sheet, indexed for direct lookup
+    
+    Rows are indexed by Parameter and by (Component, Parameter); the first
+    row wins, as with the sheet scans this replaces.
+    """
+    
+    def __init__(self, rows):
+        self.rows = rows
+        self.values = {}
+        self.by_component = {}
+        for row in rows:
+            parameter = row.get('Parameter')
+            if parameter is None:
+                continue
+            self.values.setdefault(parameter, row.get('Value'))
+            self.by_component.setdefault((row.get('Component'), parameter), row.get('Value'))
+    
+    def get(self, parameter, component=None, default=None):
+        """Value of a parameter, optionally within a component"""
+        if component is not None and (component, parameter) in self.by_component:
+            return self.by_component[(component, parameter)]
+        return self.values.get(parameter, default)
+
+def _clean(value):
+    """Empty cells (NaN) become None"""
+    return None if not isinstance(value, (list, dict)) and pd.isna(value) else value
+
+def _rows(sheet):
+    """Sheet content from a structured file: list of rows, or {Parameter: Value}"""
+    if isinstance(sheet, dict):
+        return [{'Parameter': k, 'Value': v} for k, v in sheet.items()]
+    return list(sheet or [])
+
+def load_parameters(input_file, sheet_names=None):
+    """
+    Load every sheet of a parameter file (or only `sheet_names`) into ParameterTables
+    
+    Excel workbooks are parsed once for all sheets. JSON/YAML files use the
+    same sheet names as keys and skip Excel entirely.
+    """
+    path = Path(input_file)
+    suffix = path.suffix.lower()
+    if suffix == '.json':
+        with open(path) as f:
+            data = json.load(f)
+    elif suffix in ('.yaml', '.yml'):
+        import yaml
+        with open(path) as f:
+            data = yaml.safe_load(f)
+    else:
+        frames = pd.read_excel(path, sheet_name=list(sheet_names) if sheet_names is not None else None)
+        return {
+            name: ParameterTable([{k: _clean(v) for k, v in row.items()} for row in df.to_dict('records')])
+            for name, df in frames.items()
+        }
+    return {
+        name: ParameterTable(_rows(sheet)) for name, sheet in data.items()
+        if sheet_names is None or name in sheet_names
+    }
+
+IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_-]*$')
+NON_IDENTIFIER = re.compile(r'[^a-z0-9_]+')
+HCL_ESCAPES = {'\\': '\\\\', '"': '\\"', '\n': '\\n', '\r': '\\r', '\t': '\\t'}
+
+def variable_name(parameter):
+    """
+    Terraform variable name for a sheet parameter ("Storage/Data Lake" -> "storage_data_lake")
+    
+    Returns None when nothing usable is left.
+    """
+    name = NON_IDENTIFIER.sub('_', str(parameter).strip().lower()).strip('_')
+    if not name:
+        return None
+    return name if IDENTIFIER.match(name) else f'_{name}'
+
+def tf_value(value):
+    """
+    Normalize a parameter value for Terraform
+    
+    numpy/pandas scalars become Python values, whole floats (Excel numbers)
+    become ints, tuples/sets become lists (sets sorted) and dates ISO strings.
+    """
+    if hasattr(value, 'tolist'):
+        value = value.tolist()
+    if isinstance(value, bool) or value is None or isinstance(value, (int, str)):
+        return value
+    if isinstance(value, float):
+        if not math.isfinite(value):
+            raise ValueError(f"Cannot represent {value} in tfvars")
+        return int(value) if value.is_integer() else value
+    if isinstance(value, dict):
+        return {str(k): tf_value(v) for k, v in value.items()}
+    if isinstance(value, (set, frozenset)):
+        return sorted(tf_value(v) for v in value)
+    if isinstance(value, (list, tuple)):
+        return [tf_value(v) for v in value]
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    raise TypeError(f"Unsupported tfvars value type: {type(value).__name__}")
+
+def hcl_string(text):
+    """Quoted HCL string; template sequences are escaped so values stay literal"""
+    out = []
+    for ch in text:
+        if ch in HCL_ESCAPES:
+            out.append(HCL_ESCAPES[ch])
+        elif ord(ch) < 0x20 or ord(ch) == 0x7f:
+            out.append(f'\\u{ord(ch):04x}')
+        else:
+            out.append(ch)
+    return '"' + ''.join(out).replace('${', '$${').replace('%{', '%%{') + '"'
+
+def _hcl_key(key):
+    return key if IDENTIFIER.match(key) else hcl_string(key)
+
+def _hcl(value, out, indent):
+    """Append the HCL rendering of a normalized value to `out`"""
+    if value is None:
+        out.append('null')
+    elif isinstance(value, bool):
+        out.append('true' if value else 'false')
+    elif isinstance(value, (int, float)):
+        out.append(repr(value))
+    elif isinstance(value, str):
+        out.append(hcl_string(value))
+    elif isinstance(value, list):
+        if not value:
+            out.append('[]')
+        elif all(not isinstance(v, (list, dict)) for v in value):
+            out.append('[')
+            for i, item in enumerate(value):
+                if i:
+                    out.append(', ')
+                _hcl(item, out, indent)
+            out.append(']')
+        else:
+            pad = '  ' * (indent + 1)
+            out.append('[\n')
+            for item in value:
+                out.append(pad)
+                _hcl(item, out, indent + 1)
+                out.append(',\n')
+            out.append('  ' * indent + ']')
+    elif not value:
+        out.append('{}')
+    else:
+        out.append('{\n')
+        _hcl_body(value, out, indent + 1)
+        out.append('  ' * indent + '}')
+
+def _hcl_body(mapping, out, indent):
+    """Sorted `key = value` lines with the `=` signs aligned"""
+    keys = {k: _hcl_key(k) for k in mapping}
+    width = max(len(k) for k in keys.values())
+    pad = '  ' * indent
+    for key in sorted(mapping):
+        out.append(f"{pad}{keys[key].ljust(width)} = ")
+        _hcl(mapping[key], out, indent)
+        out.append('\n')
+
+def render_tfvars(tfvars):
+    """Deterministic HCL tfvars: sorted keys at every level, nested maps and lists"""
+    values = tf_value(tfvars)
+    for key in values:
+        if not IDENTIFIER.match(key):
+            raise ValueError(f"Invalid Terraform variable name: {key!r}")
+    out = []
+    if values:
+        _hcl_body(values, out, 0)
+    return ''.join(out)
+
+def render_tfvars_json(tfvars):
+    """Deterministic .tfvars.json with the same normalization as render_tfvars"""
+    return json.dumps(tf_value(tfvars), indent=2, sort_keys=True, ensure_ascii=False) + '\n'
+
+TFVARS_FORMATS = {
+    'hcl': ('terraform.tfvars', render_tfvars),
+    'json': ('terraform.tfvars.json', render_tfvars_json),
+}
 
 class TerraformGenerator:
-    def __init__(self, excel_file):
+    def __init__(self, excel_file, output_dir="terraform/environments", sheets=None, verbose=True, output_format='hcl'):
         self.excel_file = excel_file
+        self.output_dir = output_dir
+        self.tfvars_name = TFVARS_FORMATS[output_format][0]
+        self.sheets = {name: ParameterTable(_rows(sheet)) for name, sheet in sheets.items()} if sheets else None
+        self.verbose = verbose
         self.customer_info = None
         self.errors = []
         self.warnings = []
+        self.written = []
+        self.unchanged = []
+        self.removed = []
+    
+    def log(self, message):
+        if self.verbose:
+            print(message)
+    
+    def sheet(self, name):
+        """Parameter table of a sheet (empty if the sheet is missing)"""
+        if self.sheets is None:
+            self.sheets = load_parameters(self.excel_file)
+        return self.sheets.get(name) or ParameterTable([])
         
     def validate_cidr(self, cidr):
         """Validate CIDR notation"""
@@ -27,17 +237,24 @@ class TerraformGenerator:
     
     def check_cidr_overlap(self, cidrs):
         """Check for overlapping CIDRs"""
-        networks = [ipaddress.ip_network(c) for c in cidrs]
-        for i, net1 in enumerate(networks):
-            for net2 in networks[i+1:]:
-                if net1.overlaps(net2):
-                    return f"Overlap detected: {net1} and {net2}"
+        # Sort once, then compare each block with the furthest-reaching one before it
+        networks = sorted(
+            (ipaddress.ip_network(c, strict=False) for c in cidrs),
+            key=lambda n: (n.version, n.network_address, n.prefixlen)
+        )
+        widest = None
+        for net in networks:
+            if widest is not None and widest.version == net.version and widest.broadcast_address >= net.network_address:
+                return f"Overlap detected: {widest} and {net}"
+            if widest is None or widest.version != net.version or net.broadcast_address > widest.broadcast_address:
+                widest = net
         return None
     
     def read_customer_info(self):
         """Read customer information tab"""
-        df = pd.read_excel(self.excel_file, sheet_name='Customer-Info')
-        self.customer_info = df.set_index('Parameter')['Value'].to_dict()
+        self.customer_info = dict(self.sheet('Customer-Info').values)
+        if 'Customer-Info' not in self.sheets:
+            self.errors.append("Missing sheet: Customer-Info")
         
         # Validate required fields
         required = ['Customer ID', 'Environment', 'Primary Region', 'Region Code']
@@ -47,7 +264,7 @@ class TerraformGenerator:
     
     def generate_management_tfvars(self):
         """Generate Management tfvars"""
-        df = pd.read_excel(self.excel_file, sheet_name='Management')
+        table = self.sheet('Management')
         
         tfvars = {
             'customer_id': self.customer_info['Customer ID'],
@@ -57,16 +274,23 @@ class TerraformGenerator:
         }
         
         # Add component-specific values
-        for _, row in df.iterrows():
-            if pd.notna(row['Value']) and row['Value'] != '':
-                key = row['Parameter'].lower().replace(' ', '_')
+        for row in table.rows:
+            if row.get('Value') is None or row['Value'] == '':
+                continue
+            if row.get('Parameter') is None:
+                self.warnings.append(f"Management: value {row['Value']!r} has no parameter name, skipped")
+                continue
+            key = variable_name(row['Parameter'])
+            if key is None:
+                self.warnings.append(f"Management: parameter {row['Parameter']!r} is not a usable variable name, skipped")
+            else:
                 tfvars[key] = row['Value']
         
         return tfvars
     
     def generate_hub_tfvars(self):
         """Generate Hub tfvars"""
-        df = pd.read_excel(self.excel_file, sheet_name='Hub')
+        table = self.sheet('Hub')
         
         tfvars = {
             'customer_id': self.customer_info['Customer ID'],
@@ -76,21 +300,21 @@ class TerraformGenerator:
         }
         
         # Extract VNet CIDR
-        hub_cidr = df[df['Parameter'] == 'CIDR']['Value'].values[0]
+        hub_cidr = table.get('CIDR')
         if not self.validate_cidr(hub_cidr):
             self.errors.append(f"Invalid Hub CIDR: {hub_cidr}")
         
         tfvars['hub_vnet_cidr'] = hub_cidr
         
         # Firewall settings
-        tfvars['firewall_sku'] = df[df['Parameter'] == 'SKU']['Value'].values[0]
-        tfvars['enable_bastion'] = df[df['Parameter'] == 'Enable']['Value'].values[0] == 'Yes'
+        tfvars['firewall_sku'] = table.get('SKU')
+        tfvars['enable_bastion'] = table.get('Enable') == 'Yes'
         
         return tfvars
     
     def generate_spoke_tfvars(self, spoke_name):
         """Generate Spoke tfvars"""
-        df = pd.read_excel(self.excel_file, sheet_name=f'Spoke-{spoke_name}')
+        table = self.sheet(f'Spoke-{spoke_name}')
         
         tfvars = {
             'customer_id': self.customer_info['Customer ID'],
@@ -101,83 +325,278 @@ class TerraformGenerator:
         }
         
         # Extract spoke CIDR
-        spoke_cidr = df[df['Parameter'] == 'VNet CIDR']['Value'].values[0]
+        spoke_cidr = table.get('VNet CIDR')
         if not self.validate_cidr(spoke_cidr):
             self.errors.append(f"Invalid Spoke CIDR: {spoke_cidr}")
         
         tfvars['spoke_vnet_cidr'] = spoke_cidr
         
         # Service enablement
-        services = df[df['Component'] == 'Services']
-        tfvars['enable_keyvault'] = services[services['Parameter'] == 'Key Vault']['Value'].values[0] == 'Yes'
-        tfvars['enable_sql'] = services[services['Parameter'] == 'SQL Database']['Value'].values[0] == 'Yes'
-        tfvars['enable_storage'] = services[services['Parameter'] == 'Storage/Data Lake']['Value'].values[0] == 'Yes'
-        tfvars['enable_datafactory'] = services[services['Parameter'] == 'Data Factory']['Value'].values[0] == 'Yes'
+        tfvars['enable_keyvault'] = table.get('Key Vault', 'Services') == 'Yes'
+        tfvars['enable_sql'] = table.get('SQL Database', 'Services') == 'Yes'
+        tfvars['enable_storage'] = table.get('Storage/Data Lake', 'Services') == 'Yes'
+        tfvars['enable_datafactory'] = table.get('Data Factory', 'Services') == 'Yes'
         
         return tfvars
     
     def write_tfvars(self, tfvars, output_file):
-        """Write tfvars to file"""
-        with open(output_file, 'w') as f:
-            for key, value in tfvars.items():
-                if isinstance(value, str):
-                    f.write(f'{key} = "{value}"\n')
-                elif isinstance(value, bool):
-                    f.write(f'{key} = {str(value).lower()}\n')
-                else:
-                    f.write(f'{key} = {value}\n')
+        """Write tfvars (HCL, or JSON for *.json) in one write; returns False when already identical"""
+        render = render_tfvars_json if str(output_file).endswith('.json') else render_tfvars
+        return write_if_changed(output_file, render(tfvars))
+    
+    def _write(self, tfvars, path):
+        if self.write_tfvars(tfvars, path):
+            self.written.append(str(path))
+            self.log(f"  ✅ Created: {path}")
+        else:
+            self.unchanged.append(str(path))
+            self.log(f"  ⏸️  Unchanged: {path}")
+        # Terraform loads both terraform.tfvars and terraform.tfvars.json
+        for name, _ in TFVARS_FORMATS.values():
+            stale = path.with_name(name)
+            if stale != path and stale.exists():
+                stale.unlink()
+                self.removed.append(str(stale))
+                self.log(f"  🗑️  Removed: {stale}")
     
     def generate_all(self):
         """Generate all tfvars files"""
-        print("🚀 Terraform Variables Generator")
-        print("=" * 50)
+        self.log("🚀 Terraform Variables Generator")
+        self.log("=" * 50)
         
         # Read customer info
         self.read_customer_info()
         
+        # Hub and spokes are peered, so their address spaces must not overlap
+        spoke_sheets = [s for s in self.sheets if s.startswith('Spoke-')]
+        cidrs = [self.sheet('Hub').get('CIDR')] + [self.sheet(s).get('VNet CIDR') for s in spoke_sheets]
+        overlap = self.check_cidr_overlap([c for c in cidrs if c and self.validate_cidr(c)])
+        if overlap:
+            self.errors.append(overlap)
+        
         if self.errors:
-            print("\n❌ ERRORS:")
+            self.log("\n❌ ERRORS:")
             for error in self.errors:
-                print(f"  - {error}")
+                self.log(f"  - {error}")
             return False
         
         customer_id = self.customer_info['Customer ID']
+        base = Path(self.output_dir) / str(customer_id)
         
         # Generate Management
-        print("\n📊 Generating Management tfvars...")
-        mgmt_tfvars = self.generate_management_tfvars()
-        mgmt_path = f"terraform/environments/{customer_id}/management/terraform.tfvars"
-        Path(mgmt_path).parent.mkdir(parents=True, exist_ok=True)
-        self.write_tfvars(mgmt_tfvars, mgmt_path)
-        print(f"  ✅ Created: {mgmt_path}")
+        self.log("\n📊 Generating Management tfvars...")
+        self._write(self.generate_management_tfvars(), base / "management" / self.tfvars_name)
         
         # Generate Hub
-        print("\n🌐 Generating Hub tfvars...")
-        hub_tfvars = self.generate_hub_tfvars()
-        hub_path = f"terraform/environments/{customer_id}/hub/terraform.tfvars"
-        Path(hub_path).parent.mkdir(parents=True, exist_ok=True)
-        self.write_tfvars(hub_tfvars, hub_path)
-        print(f"  ✅ Created: {hub_path}")
+        self.log("\n🌐 Generating Hub tfvars...")
+        self._write(self.generate_hub_tfvars(), base / "hub" / self.tfvars_name)
         
         # Generate Spokes
-        print("\n📦 Generating Spoke tfvars...")
-        spoke_sheets = [s for s in pd.ExcelFile(self.excel_file).sheet_names if s.startswith('Spoke-')]
+        self.log("\n📦 Generating Spoke tfvars...")
         for sheet in spoke_sheets:
             spoke_name = sheet.replace('Spoke-', '')
-            spoke_tfvars = self.generate_spoke_tfvars(spoke_name)
-            spoke_path = f"terraform/environments/{customer_id}/spokes/{spoke_name}/terraform.tfvars"
-            Path(spoke_path).parent.mkdir(parents=True, exist_ok=True)
-            self.write_tfvars(spoke_tfvars, spoke_path)
-            print(f"  ✅ Created: {spoke_path}")
+            self._write(self.generate_spoke_tfvars(spoke_name), base / "spokes" / spoke_name / self.tfvars_name)
+        
+        if self.warnings:
+            self.log("\n⚠️  WARNINGS:")
+            for warning in self.warnings:
+                self.log(f"  - {warning}")
         
-        print("\n✅ Generation complete!")
+        self.log("\n✅ Generation complete!")
         return True
+    
+    def summary(self, source):
+        """Machine-readable result of generate_all"""
+        return {
+            'source': str(source),
+            'customer_id': (self.customer_info or {}).get('Customer ID'),
+            'written': self.written,
+            'unchanged': self.unchanged,
+            'removed': self.removed,
+            'errors': self.errors,
+            'warnings': self.warnings,
+        }
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python generate-tfvars.py <excel-file>")
-        sys.exit(1)
+def write_if_changed(path, content):
+    """
+    Atomically replace `path` with `content` unless it already matches
     
-    generator = TerraformGenerator(sys.argv[1])
-    success = generator.generate_all()
-    sys.exit(0 if success else 1)
\ No newline at end of file
+    Unchanged files keep their mtime, so downstream fingerprinting and
+    plans see no change. Returns True when the file was written.
+    """
+    path = Path(path)
+    data = content.encode()
+    try:
+        if path.read_bytes() == data:
+            return False
+    except FileNotFoundError:
+        pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return True
+
+def customer_sheets(row):
+    """Parameter sheets for a customers table row"""
+    sheets = {
+        'Customer-Info': {
+            'Customer ID': row.get('customer_id'),
+            'Environment': row.get('environment') or 'prod',
+            'Primary Region': row.get('region'),
+            'Region Code': row.get('region_code'),
+        },
+        'Hub': {
+            'CIDR': row.get('hub_vnet_cidr'),
+            'SKU': row.get('firewall_sku') or 'Standard',
+            'Enable': 'Yes' if row.get('enable_bastion', True) else 'No',
+        },
+    }
+    spokes = row.get('spoke_vnets')
+    if isinstance(spokes, str):
+        spokes = json.loads(spokes)
+    if isinstance(spokes, dict) and spokes:
+        for name, spoke in spokes.items():
+            cidr = spoke.get('cidr') if isinstance(spoke, dict) else spoke
+            sheets[f'Spoke-{name}'] = {'VNet CIDR': cidr}
+    elif row.get('spoke_vnet_cidr'):
+        sheets['Spoke-main'] = {'VNet CIDR': row['spoke_vnet_cidr']}
+    return sheets
+
+def load_customer_rows(database_url):
+    """All rows of the customers table as dicts"""
+    from sqlalchemy import MetaData, Table, create_engine, select
+    
+    engine = create_engine(database_url)
+    try:
+        customers = Table('customers', MetaData(), autoload_with=engine)
+        with engine.connect() as conn:
+            return [dict(row._mapping) for row in conn.execute(select(customers).order_by(customers.c.id))]
+    finally:
+        engine.dispose()
+
+INPUT_SUFFIXES = ('.xlsx', '.xlsm', '.json', '.yaml', '.yml')
+
+def expand_inputs(patterns):
+    """Parameter files from directories and glob patterns, sorted and de-duplicated"""
+    files = set()
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            candidates = path.iterdir()
+        else:
+            candidates = (Path(p) for p in glob.glob(pattern, recursive=True))
+        files.update(
+            p for p in candidates
+            if p.is_file() and p.suffix.lower() in INPUT_SUFFIXES and not p.name.startswith('~$')
+        )
+    return sorted(files)
+
+def source_customer_id(source):
+    """Customer ID of a batch source, reading only its Customer-Info sheet (None if unreadable)"""
+    if not isinstance(source, str):
+        return source['Customer-Info'].get('Customer ID')
+    try:
+        sheets = load_parameters(source, ['Customer-Info'])
+    except Exception:
+        return None  # Reported by the generation itself
+    info = sheets.get('Customer-Info')
+    return info.get('Customer ID') if info else None
+
+def source_label(source):
+    return source if isinstance(source, str) else f"customers:{source['Customer-Info'].get('Customer ID')}"
+
+def _generate_one(source, output_dir, output_format='hcl'):
+    """Process pool worker: generate one customer, never raise"""
+    generator = TerraformGenerator(source if isinstance(source, str) else None, output_dir=output_dir,
+                                   sheets=None if isinstance(source, str) else source, verbose=False,
+                                   output_format=output_format)
+    try:
+        generator.generate_all()
+    except Exception as e:
+        generator.errors.append(f"{type(e).__name__}: {e}")
+    return generator.summary(source_label(source))
+
+def run_batch(sources, output_dir, workers=None, output_format='hcl'):
+    """
+    Generate tfvars for many customers in a process pool and summarize
+    
+    Inputs are matched by customer ID first: two inputs for one customer
+    would write the same files, so only the first (in input order) is
+    generated and the others are reported as failed.
+    """
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        customer_ids = list(pool.map(source_customer_id, sources))
+        
+        first = {}
+        futures = []
+        for source, customer_id in zip(sources, customer_ids):
+            if customer_id is not None and customer_id in first:
+                results.append({
+                    'source': source_label(source),
+                    'customer_id': customer_id,
+                    'written': [],
+                    'unchanged': [],
+                    'removed': [],
+                    'errors': [f"Duplicate customer ID {customer_id} (also in {first[customer_id]}), not generated"],
+                    'warnings': [],
+                })
+                continue
+            if customer_id is not None:
+                first[customer_id] = source_label(source)
+            futures.append(pool.submit(_generate_one, source, output_dir, output_format))
+        
+        for future in as_completed(futures):
+            results.append(future.result())
+    results.sort(key=lambda r: r['source'])
+    
+    return {
+        'inputs': len(results),
+        'succeeded': sum(1 for r in results if not r['errors']),
+        'failed': sum(1 for r in results if r['errors']),
+        'files_written': sum(len(r['written']) for r in results),
+        'files_unchanged': sum(len(r['unchanged']) for r in results),
+        'files_removed': sum(len(r['removed']) for r in results),
+        'warnings': sum(len(r['warnings']) for r in results),
+        'results': results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate Terraform tfvars from parameter sheets")
+    parser.add_argument('inputs', nargs='*', help="Parameter file (.xlsx/.json/.yaml); with --batch, files, directories or globs")
+    parser.add_argument('--batch', action='store_true', help="Generate for every input in a process pool")
+    parser.add_argument('--from-db', metavar='DATABASE_URL', nargs='?', const=os.getenv('DATABASE_URL'),
+                        help="Batch over rows of the customers table (default: $DATABASE_URL)")
+    parser.add_argument('--output-dir', default='terraform/environments')
+    parser.add_argument('--format', choices=sorted(TFVARS_FORMATS), default='hcl',
+                        help="terraform.tfvars (hcl) or terraform.tfvars.json (json)")
+    parser.add_argument('--workers', type=int, default=None, help="Process pool size (default: CPU count)")
+    parser.add_argument('--summary', help="Write the JSON summary here instead of stdout")
+    args = parser.parse_args()
+    
+    if not args.batch and not args.from_db:
+        if len(args.inputs) != 1:
+            parser.error("expected exactly one parameter file (or use --batch / --from-db)")
+        generator = TerraformGenerator(args.inputs[0], output_dir=args.output_dir, output_format=args.format)
+        return 0 if generator.generate_all() else 1
+    
+    sources = [str(p) for p in expand_inputs(args.inputs)]
+    if args.from_db:
+        sources += [customer_sheets(row) for row in load_customer_rows(args.from_db)]
+    
+    summary = run_batch(sources, args.output_dir, args.workers, args.format)
+    output = json.dumps(summary, indent=2, default=str)
+    if args.summary:
+        write_if_changed(args.summary, output + "\n")
+    else:
+        print(output)
+    return 1 if summary['failed'] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
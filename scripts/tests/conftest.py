@@ -0,0 +1,32 @@
+"""
+Script Tests
+The scripts have hyphenated file names, so they are loaded by path
+
+Run from scripts: python -m pytest tests
+"""
+
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+
+
+def load_script(name):
+    """Import scripts/<name>.py as a module named with underscores"""
+    module_name = name.replace('-', '_')
+    if module_name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(module_name, SCRIPTS_DIR / f"{name}.py")
+        module = importlib.util.module_from_spec(spec)
+        # Registered before running it, so process pool workers can unpickle its functions
+        sys.modules[module_name] = module
+        spec.loader.exec_module(module)
+    return sys.modules[module_name]
+
+
+@pytest.fixture(scope="session")
+def gen():
+    """scripts/generate-tfvars.py"""
+    return load_script('generate-tfvars')
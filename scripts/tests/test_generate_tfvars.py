@@ -0,0 +1,269 @@
+"""
+Generate tfvars
+The typed HCL/JSON serializer and management variable names
+"""
+
+import json
+
+import pytest
+
+
+def test_render_nested_maps_and_lists(gen):
+    rendered = gen.render_tfvars({
+        'zones': (1, 2, 3),
+        'tags': {'env': 'prod', 'cost center': 'cc-01'},
+        'subnets': [{'name': 'app', 'cidr': '10.0.1.0/24'}, {'name': 'data', 'ports': [1433.0]}],
+        'empty': {},
+        'none': None,
+        'flag': True,
+        'ratio': 0.5,
+    })
+    assert rendered == (
+        'empty   = {}\n'
+        'flag    = true\n'
+        'none    = null\n'
+        'ratio   = 0.5\n'
+        'subnets = [\n'
+        '  {\n'
+        '    cidr = "10.0.1.0/24"\n'
+        '    name = "app"\n'
+        '  },\n'
+        '  {\n'
+        '    name  = "data"\n'
+        '    ports = [1433]\n'
+        '  },\n'
+        ']\n'
+        'tags    = {\n'
+        '  "cost center" = "cc-01"\n'
+        '  env           = "prod"\n'
+        '}\n'
+        'zones   = [1, 2, 3]\n'
+    )
+
+
+def test_render_is_deterministic(gen):
+    first = gen.render_tfvars({'b': {'y': 1, 'x': 2}, 'a': {'c', 'b', 'a'}})
+    second = gen.render_tfvars({'a': {'a', 'c', 'b'}, 'b': {'x': 2, 'y': 1}})
+    assert first == second
+    assert first.startswith('a = ["a", "b", "c"]\n')
+
+
+@pytest.mark.parametrize('text, quoted', [
+    ('plain', '"plain"'),
+    ('say "hi"', '"say \\"hi\\""'),
+    ('C:\\path', '"C:\\\\path"'),
+    ('line\nbreak\ttab', '"line\\nbreak\\ttab"'),
+    ('bell\x07', '"bell\\u0007"'),
+    ('${var.secret}', '"$${var.secret}"'),
+    ('%{ if true }', '"%%{ if true }"'),
+    ('$5 and 100%', '"$5 and 100%"'),
+])
+def test_hcl_string_quoting_and_template_escapes(gen, text, quoted):
+    assert gen.hcl_string(text) == quoted
+
+
+def test_json_output_matches_hcl_normalization(gen):
+    values = {'count': 3.0, 'tags': {'env': 'prod'}, 'literal': '${not.a.template}', 'zones': {2, 1}}
+    assert json.loads(gen.render_tfvars_json(values)) == {
+        'count': 3, 'tags': {'env': 'prod'}, 'literal': '${not.a.template}', 'zones': [1, 2]
+    }
+
+
+@pytest.mark.parametrize('value', [float('nan'), float('inf')])
+def test_non_finite_numbers_are_rejected(gen, value):
+    with pytest.raises(ValueError):
+        gen.render_tfvars({'ratio': value})
+
+
+@pytest.mark.parametrize('name', ['storage/data lake', '1st', 'has space', ''])
+def test_invalid_variable_names_are_rejected(gen, name):
+    with pytest.raises(ValueError, match='Invalid Terraform variable name'):
+        gen.render_tfvars({name: 1})
+
+
+@pytest.mark.parametrize('parameter, name', [
+    ('Log Retention Days', 'log_retention_days'),
+    ('Storage/Data Lake', 'storage_data_lake'),
+    (' SKU (tier) ', 'sku_tier'),
+    ('2nd Region', '_2nd_region'),
+    ('///', None),
+])
+def test_variable_names_from_parameters(gen, parameter, name):
+    assert gen.variable_name(parameter) == name
+
+
+def test_management_sheet_rows_with_unusable_names_are_skipped(gen):
+    generator = gen.TerraformGenerator(None, sheets={
+        'Customer-Info': {'Customer ID': 'abc', 'Environment': 'prd', 'Primary Region': 'eastus', 'Region Code': 'eus'},
+        'Management': [
+            {'Parameter': 'Log Retention Days', 'Value': 90},
+            {'Parameter': 'Storage/Data Lake', 'Value': 'Yes'},
+            {'Parameter': None, 'Value': 'orphan'},
+            {'Parameter': '---', 'Value': 'dashes'},
+            {'Parameter': 'Unset', 'Value': None},
+        ],
+    }, verbose=False)
+    generator.read_customer_info()
+    tfvars = generator.generate_management_tfvars()
+
+    assert tfvars['log_retention_days'] == 90
+    assert tfvars['storage_data_lake'] == 'Yes'
+    assert 'unset' not in tfvars
+    assert len(generator.warnings) == 2
+    gen.render_tfvars(tfvars)
+
+
+def _params(customer_id, hub='10.1.0.0/16', spokes=None):
+    sheets = {
+        'Customer-Info': {'Customer ID': customer_id, 'Environment': 'prd', 'Primary Region': 'eastus', 'Region Code': 'eus'},
+        'Management': {'Log Retention Days': 90},
+        'Hub': {'CIDR': hub, 'SKU': 'Standard', 'Enable': 'Yes'},
+    }
+    for name, cidr in (spokes or {'prod': '10.2.0.0/16'}).items():
+        sheets[f'Spoke-{name}'] = {'VNet CIDR': cidr}
+    return sheets
+
+
+def _write_params(directory, file_name, sheets):
+    path = directory / file_name
+    path.write_text(json.dumps(sheets))
+    return str(path)
+
+
+def test_batch_generates_every_customer(gen, tmp_path):
+    inputs = tmp_path / 'params'
+    inputs.mkdir()
+    sources = [_write_params(inputs, 'a.json', _params('abc')), _write_params(inputs, 'b.json', _params('xyz'))]
+    sources.append(gen.customer_sheets({'customer_id': 'db1', 'region': 'westeurope', 'region_code': 'weu',
+                                        'hub_vnet_cidr': '10.5.0.0/16', 'spoke_vnets': {'prod': {'cidr': '10.6.0.0/16'}}}))
+    out = tmp_path / 'environments'
+
+    summary = gen.run_batch(sources, str(out), workers=2)
+    assert (summary['inputs'], summary['succeeded'], summary['failed']) == (3, 3, 0)
+    assert summary['files_written'] == 9
+    assert 'hub_vnet_cidr  = "10.5.0.0/16"' in (out / 'db1' / 'hub' / 'terraform.tfvars').read_text()
+
+    again = gen.run_batch(sources, str(out), workers=2)
+    assert (again['files_written'], again['files_unchanged']) == (0, 9)
+
+
+def test_batch_skips_duplicate_customer_ids_before_generating(gen, tmp_path):
+    first = _write_params(tmp_path, 'a.json', _params('abc', hub='10.1.0.0/16'))
+    second = _write_params(tmp_path, 'b.json', _params('abc', hub='10.9.0.0/16'))
+    out = tmp_path / 'environments'
+
+    summary = gen.run_batch([first, second], str(out), workers=2)
+    assert (summary['succeeded'], summary['failed']) == (1, 1)
+    duplicate = next(r for r in summary['results'] if r['source'] == second)
+    assert duplicate['written'] == []
+    assert f'also in {first}' in duplicate['errors'][0]
+    # Only the first input's files exist; the duplicate never ran
+    assert '10.1.0.0/16' in (out / 'abc' / 'hub' / 'terraform.tfvars').read_text()
+
+
+def test_switching_format_removes_the_other_file(gen, tmp_path):
+    source = _write_params(tmp_path, 'a.json', _params('abc'))
+    out = tmp_path / 'environments'
+    hub = out / 'abc' / 'hub'
+
+    gen.run_batch([source], str(out), workers=1)
+    summary = gen.run_batch([source], str(out), workers=1, output_format='json')
+    assert sorted(p.name for p in hub.iterdir()) == ['terraform.tfvars.json']
+    assert summary['files_removed'] == 3
+    assert json.loads((hub / 'terraform.tfvars.json').read_text())['hub_vnet_cidr'] == '10.1.0.0/16'
+
+    gen.run_batch([source], str(out), workers=1, output_format='hcl')
+    assert sorted(p.name for p in hub.iterdir()) == ['terraform.tfvars']
+
+
+def test_batch_reports_unreadable_inputs(gen, tmp_path):
+    broken = tmp_path / 'broken.json'
+    broken.write_text('{not json')
+    summary = gen.run_batch([str(broken)], str(tmp_path / 'environments'), workers=1)
+    assert summary['failed'] == 1
+    assert summary['results'][0]['errors'][0].startswith('JSONDecodeError')
+
+
+def test_parameter_table_lookup(gen):
+    table = gen.ParameterTable([
+        {'Component': 'Firewall', 'Parameter': 'SKU', 'Value': 'Premium'},
+        {'Component': 'Gateway', 'Parameter': 'SKU', 'Value': 'VpnGw1'},
+        {'Component': 'Services', 'Parameter': 'Key Vault', 'Value': 'Yes'},
+        {'Component': 'Other', 'Parameter': 'Key Vault', 'Value': 'No'},
+        {'Component': 'Notes', 'Parameter': None, 'Value': 'ignored'},
+    ])
+    # The first row wins, overall and per component
+    assert table.get('SKU') == 'Premium'
+    assert table.get('SKU', 'Gateway') == 'VpnGw1'
+    assert table.get('Key Vault', 'Services') == 'Yes'
+    assert table.get('Key Vault', 'Other') == 'No'
+    # Unknown components fall back to the parameter alone
+    assert table.get('SKU', 'Bastion') == 'Premium'
+    assert table.get('Missing', default='x') == 'x'
+    assert len(table.rows) == 5
+
+
+def _workbook(path):
+    import pandas as pd
+
+    with pd.ExcelWriter(path) as writer:
+        pd.DataFrame({'Parameter': ['Customer ID', 'Environment'], 'Value': ['abc', 'prd']}).to_excel(
+            writer, sheet_name='Customer-Info', index=False)
+        pd.DataFrame({
+            'Component': ['Services', 'Services', None],
+            'Parameter': ['Key Vault', 'SQL Database', 'VNet CIDR'],
+            'Value': ['Yes', None, '10.2.0.0/16'],
+        }).to_excel(writer, sheet_name='Spoke-prod', index=False)
+
+
+def test_load_parameters_from_excel(gen, tmp_path):
+    path = tmp_path / 'params.xlsx'
+    _workbook(path)
+
+    sheets = gen.load_parameters(path)
+    assert sorted(sheets) == ['Customer-Info', 'Spoke-prod']
+    assert sheets['Customer-Info'].get('Customer ID') == 'abc'
+    spoke = sheets['Spoke-prod']
+    assert spoke.get('Key Vault', 'Services') == 'Yes'
+    # Empty cells are None, not NaN
+    assert spoke.get('SQL Database', 'Services') is None
+    assert spoke.get('VNet CIDR') == '10.2.0.0/16'
+
+    assert list(gen.load_parameters(path, ['Customer-Info'])) == ['Customer-Info']
+
+
+@pytest.mark.parametrize('suffix', ['.json', '.yaml'])
+def test_load_parameters_from_structured_files(gen, tmp_path, suffix):
+    import yaml
+
+    data = {
+        'Customer-Info': {'Customer ID': 'abc', 'Environment': 'prd'},
+        'Spoke-prod': [{'Component': 'Services', 'Parameter': 'Key Vault', 'Value': 'Yes'}],
+    }
+    path = tmp_path / f'params{suffix}'
+    path.write_text(json.dumps(data) if suffix == '.json' else yaml.safe_dump(data))
+
+    sheets = gen.load_parameters(path)
+    assert sheets['Customer-Info'].get('Environment') == 'prd'
+    assert sheets['Spoke-prod'].get('Key Vault', 'Services') == 'Yes'
+    assert list(gen.load_parameters(path, ['Spoke-prod'])) == ['Spoke-prod']
+
+
+@pytest.mark.parametrize('cidrs, overlap', [
+    (['10.1.0.0/16', '10.2.0.0/16', '10.3.0.0/16'], None),
+    (['10.1.0.0/16', '10.0.0.0/16'], None),                       # adjacent
+    (['10.0.0.0/8', '10.2.0.0/16', '10.200.0.0/16'], '10.0.0.0/8 and 10.2.0.0/16'),
+    (['10.3.0.0/16', '10.1.0.0/16', '10.1.128.0/17'], '10.1.0.0/16 and 10.1.128.0/17'),
+    (['10.1.0.0/16', 'fd00::/8', 'fd00:1::/64'], 'fd00::/8 and fd00:1::/64'),
+])
+def test_check_cidr_overlap(gen, cidrs, overlap):
+    result = gen.TerraformGenerator(None, verbose=False).check_cidr_overlap(cidrs)
+    assert result == (f'Overlap detected: {overlap}' if overlap else None)
+
+
+def test_overlapping_spoke_stops_generation(gen, tmp_path):
+    generator = gen.TerraformGenerator(None, output_dir=str(tmp_path), verbose=False,
+                                       sheets=_params('abc', spokes={'prod': '10.2.0.0/16', 'dev': '10.1.4.0/24'}))
+    assert generator.generate_all() is False
+    assert generator.errors == ['Overlap detected: 10.1.0.0/16 and 10.1.4.0/24']
+    assert not (tmp_path / 'abc').exists()
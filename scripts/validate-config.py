@@ -0,0 +1,475 @@
+#!/usr/bin/env python3
+"""
+Validate customer configuration directories
+Usage: python validate-config.py                      # every customers/<id>/
+       python validate-config.py abc xyz              # selected customers
+       python validate-config.py --workers 8 --json report.json
+       python validate-config.py --no-cache
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import hashlib
+import ipaddress
+import json
+import os
+import re
+import sys
+import tempfile
+from pathlib import Path
+
+import yaml
+
+CONFIG_FILES = ('config.yaml', 'cost-budget.yaml', 'tags.yaml')
+DEFAULT_ROOT = Path(__file__).resolve().parent.parent / 'customers'
+CACHE_NAME = '.validate-cache.json'
+
+# Base monthly price per package tier (matches the portal's package catalog)
+TIER_PRICES = {'basic': 1500, 'standard': 3500, 'premium': 6500}
+
+# libyaml's loader when available; same results, several times faster
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+# Tag policy
+REQUIRED_TAGS = ('CostCenter', 'Owner', 'Environment')
+MAX_TAGS = 50
+TAG_NAME_INVALID = re.compile(r'[<>%&\\?/]')
+
+# ---------------------------------------------------------------------------
+# Schemas (a JSON Schema subset, compiled once into validator functions)
+# ---------------------------------------------------------------------------
+
+CIDR = {'type': 'string', 'format': 'cidr'}
+EMAIL = {'type': 'string', 'pattern': r'^[^@\s]+@[^@\s]+\.[^@\s]+$'}
+
+SCHEMAS = {
+    'config.yaml': {
+        'type': 'object',
+        'required': ['customer', 'azure', 'network'],
+        'additionalProperties': False,
+        'properties': {
+            'customer': {
+                'type': 'object',
+                'required': ['id', 'name', 'email'],
+                'additionalProperties': False,
+                'properties': {
+                    'id': {'type': 'string', 'pattern': r'^[a-z0-9]{3,6}$'},
+                    'name': {'type': 'string', 'minLength': 1, 'maxLength': 100},
+                    'email': EMAIL,
+                    'package_tier': {'enum': list(TIER_PRICES)},
+                },
+            },
+            'azure': {
+                'type': 'object',
+                'required': ['region', 'region_code', 'environment'],
+                'additionalProperties': False,
+                'properties': {
+                    'region': {'type': 'string', 'pattern': r'^[a-z0-9]+$'},
+                    'region_code': {'type': 'string', 'pattern': r'^[a-z0-9]{2,5}$'},
+                    'environment': {'enum': ['prod', 'staging', 'dev', 'test']},
+                },
+            },
+            'network': {
+                'type': 'object',
+                'required': ['hub_vnet_cidr', 'spoke_vnets'],
+                'additionalProperties': False,
+                'properties': {
+                    'hub_vnet_cidr': CIDR,
+                    'spoke_vnets': {'type': 'object', 'minProperties': 1, 'additionalProperties': CIDR},
+                },
+            },
+            'features': {
+                'type': 'object',
+                'additionalProperties': False,
+                'properties': {
+                    'enable_bastion': {'type': 'boolean'},
+                    'enable_vpn_gateway': {'type': 'boolean'},
+                    'firewall_sku': {'enum': ['Basic', 'Standard', 'Premium']},
+                },
+            },
+        },
+    },
+    'cost-budget.yaml': {
+        'type': 'object',
+        'required': ['monthly_budget'],
+        'additionalProperties': False,
+        'properties': {
+            'monthly_budget': {'type': 'number', 'minimum': 0},
+            'currency': {'type': 'string', 'pattern': r'^[A-Z]{3}$'},
+            'alert_thresholds': {'type': 'array', 'items': {'type': 'number', 'minimum': 1, 'maximum': 200}},
+            'alert_emails': {'type': 'array', 'items': EMAIL},
+            'spoke_budgets': {'type': 'object', 'additionalProperties': {'type': 'number', 'minimum': 0}},
+        },
+    },
+    'tags.yaml': {
+        'type': 'object',
+        'required': ['tags'],
+        'additionalProperties': False,
+        'properties': {
+            'tags': {
+                'type': 'object',
+                'additionalProperties': {'type': 'string', 'maxLength': 256},
+            },
+        },
+    },
+}
+
+TYPES = {
+    'object': dict,
+    'array': list,
+    'string': str,
+    'boolean': bool,
+    'integer': int,
+    'number': (int, float),
+}
+
+def _is_cidr(value):
+    try:
+        ipaddress.ip_network(value)
+        return True
+    except ValueError:
+        return False
+
+FORMATS = {'cidr': _is_cidr}
+
+def compile_schema(schema):
+    """
+    Turn a schema into a function check(value, path, errors)
+
+    Patterns, nested schemas and property tables are resolved here once,
+    so validating a file only runs the prepared checks.
+    """
+    checks = []
+
+    if 'type' in schema:
+        expected = TYPES[schema['type']]
+        name = schema['type']
+        def check_type(value, path, errors):
+            # bool is an int subclass; never accept it as a number
+            if not isinstance(value, expected) or (isinstance(value, bool) and name != 'boolean'):
+                errors.append(f"{path}: expected {name}, got {type(value).__name__}")
+                return False
+            return True
+        type_check = check_type
+    else:
+        type_check = None
+
+    if 'enum' in schema:
+        allowed = schema['enum']
+        def check_enum(value, path, errors):
+            if value not in allowed:
+                errors.append(f"{path}: {value!r} is not one of {allowed}")
+        checks.append(check_enum)
+
+    if 'pattern' in schema:
+        pattern = re.compile(schema['pattern'])
+        def check_pattern(value, path, errors):
+            if not pattern.search(value):
+                errors.append(f"{path}: {value!r} does not match {pattern.pattern}")
+        checks.append(check_pattern)
+
+    if 'format' in schema:
+        fmt, test = schema['format'], FORMATS[schema['format']]
+        def check_format(value, path, errors):
+            if not test(value):
+                errors.append(f"{path}: {value!r} is not a valid {fmt}")
+        checks.append(check_format)
+
+    for key, op, message in (('minLength', lambda v, n: len(v) >= n, "shorter than"),
+                             ('maxLength', lambda v, n: len(v) <= n, "longer than"),
+                             ('minimum', lambda v, n: v >= n, "below"),
+                             ('maximum', lambda v, n: v <= n, "above"),
+                             ('minProperties', lambda v, n: len(v) >= n, "has fewer entries than")):
+        if key in schema:
+            def check_bound(value, path, errors, bound=schema[key], op=op, message=message):
+                if not op(value, bound):
+                    errors.append(f"{path}: {value!r} is {message} {bound}")
+            checks.append(check_bound)
+
+    if 'properties' in schema or 'required' in schema or 'additionalProperties' in schema:
+        properties = {k: compile_schema(v) for k, v in schema.get('properties', {}).items()}
+        required = schema.get('required', [])
+        extra = schema.get('additionalProperties', True)
+        extra_check = compile_schema(extra) if isinstance(extra, dict) else None
+        def check_object(value, path, errors):
+            for key in required:
+                if key not in value:
+                    errors.append(f"{path}: missing required key '{key}'")
+            for key, item in value.items():
+                if key in properties:
+                    properties[key](item, f"{path}.{key}", errors)
+                elif extra_check:
+                    extra_check(item, f"{path}.{key}", errors)
+                elif extra is False:
+                    errors.append(f"{path}: unknown key '{key}'")
+        checks.append(check_object)
+
+    if 'items' in schema:
+        item_check = compile_schema(schema['items'])
+        def check_items(value, path, errors):
+            for i, item in enumerate(value):
+                item_check(item, f"{path}[{i}]", errors)
+        checks.append(check_items)
+
+    def check(value, path, errors):
+        if type_check and not type_check(value, path, errors):
+            return
+        for c in checks:
+            c(value, path, errors)
+    return check
+
+VALIDATORS = {name: compile_schema(schema) for name, schema in SCHEMAS.items()}
+
+# Cache entries are only valid for this exact version of the rules
+RULES_HASH = hashlib.sha256(Path(__file__).read_bytes()).hexdigest()[:16]
+
+# ---------------------------------------------------------------------------
+# Per-customer validation (runs in worker processes)
+# ---------------------------------------------------------------------------
+
+def customer_hash(customer_dir):
+    """sha256 over the rules and the customer's config files"""
+    digest = hashlib.sha256(RULES_HASH.encode())
+    for name in CONFIG_FILES:
+        path = Path(customer_dir) / name
+        digest.update(name.encode() + b'\0')
+        digest.update(path.read_bytes() if path.exists() else b'<missing>')
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+def network_cidrs(config):
+    """(name, cidr) for the hub and each spoke; invalid values are skipped"""
+    network = config.get('network') or {}
+    entries = [('hub', network.get('hub_vnet_cidr'))]
+    spokes = network.get('spoke_vnets')
+    if isinstance(spokes, dict):
+        entries += [(f"spoke:{name}", cidr) for name, cidr in spokes.items()]
+    return [(name, str(cidr)) for name, cidr in entries if isinstance(cidr, str) and _is_cidr(cidr)]
+
+def find_overlaps(entries):
+    """
+    Overlapping pairs among (owner, cidr) entries
+
+    Sort once by start address, then compare each block with the
+    furthest-reaching block before it: O(n log n) instead of all pairs.
+    """
+    nets = sorted(
+        ((ipaddress.ip_network(cidr), owner) for owner, cidr in entries),
+        key=lambda item: (item[0].version, item[0].network_address, item[0].prefixlen)
+    )
+    overlaps = []
+    widest = None
+    for net, owner in nets:
+        if widest is not None and widest[0].version == net.version and widest[0].broadcast_address >= net.network_address:
+            overlaps.append((widest, (net, owner)))
+        if widest is None or widest[0].version != net.version or net.broadcast_address > widest[0].broadcast_address:
+            widest = (net, owner)
+    return overlaps
+
+def validate_customer(customer_dir):
+    """
+    Validate one customer directory
+
+    Returns {'customer', 'hash', 'errors', 'warnings', 'cidrs'}; cidrs feed
+    the cross-customer overlap check.
+    """
+    customer_dir = Path(customer_dir)
+    errors, warnings = [], []
+    docs = {}
+
+    for name in CONFIG_FILES:
+        path = customer_dir / name
+        if not path.exists():
+            errors.append(f"{name}: file missing")
+            continue
+        try:
+            with open(path, encoding='utf-8') as f:
+                docs[name] = yaml.load(f, Loader=YAML_LOADER)
+        except yaml.YAMLError as e:
+            errors.append(f"{name}: invalid YAML: {e}")
+            continue
+        if docs[name] is None:
+            errors.append(f"{name}: file is empty")
+            del docs[name]
+            continue
+        VALIDATORS[name](docs[name], name, errors)
+
+    config = docs.get('config.yaml') if isinstance(docs.get('config.yaml'), dict) else {}
+    budget = docs.get('cost-budget.yaml') if isinstance(docs.get('cost-budget.yaml'), dict) else {}
+    tags_doc = docs.get('tags.yaml') if isinstance(docs.get('tags.yaml'), dict) else {}
+    customer = config.get('customer') if isinstance(config.get('customer'), dict) else {}
+    azure = config.get('azure') if isinstance(config.get('azure'), dict) else {}
+    network = config.get('network') if isinstance(config.get('network'), dict) else {}
+    spokes = network.get('spoke_vnets') if isinstance(network.get('spoke_vnets'), dict) else {}
+
+    if customer.get('id') is not None and customer.get('id') != customer_dir.name:
+        errors.append(f"config.yaml: customer.id '{customer.get('id')}' does not match directory '{customer_dir.name}'")
+
+    # CIDRs: no overlap between the customer's own hub and spokes
+    cidrs = network_cidrs(config)
+    for (net1, name1), (net2, name2) in find_overlaps(cidrs):
+        errors.append(f"config.yaml: {name1} {net1} overlaps {name2} {net2}")
+
+    # Budgets
+    monthly = budget.get('monthly_budget')
+    if isinstance(monthly, (int, float)) and not isinstance(monthly, bool):
+        tier = customer.get('package_tier', 'standard')
+        if monthly == 0:
+            warnings.append("cost-budget.yaml: monthly_budget is 0, budget alerts are disabled")
+        elif tier in TIER_PRICES and monthly < TIER_PRICES[tier]:
+            warnings.append(f"cost-budget.yaml: monthly_budget {monthly} is below the {tier} package price {TIER_PRICES[tier]}")
+        spoke_budgets = budget.get('spoke_budgets') if isinstance(budget.get('spoke_budgets'), dict) else {}
+        for name in spoke_budgets:
+            if name not in spokes:
+                errors.append(f"cost-budget.yaml: spoke_budgets.{name} has no matching spoke in config.yaml")
+        allocated = sum(v for v in spoke_budgets.values() if isinstance(v, (int, float)) and not isinstance(v, bool))
+        if allocated > monthly:
+            errors.append(f"cost-budget.yaml: spoke budgets total {allocated} exceeds monthly_budget {monthly}")
+    thresholds = budget.get('alert_thresholds')
+    if isinstance(thresholds, list) and thresholds != sorted(set(t for t in thresholds if isinstance(t, (int, float)))):
+        errors.append("cost-budget.yaml: alert_thresholds must be ascending and unique")
+    if thresholds and not budget.get('alert_emails'):
+        warnings.append("cost-budget.yaml: alert_thresholds set but no alert_emails")
+
+    # Tag policy
+    tags = tags_doc.get('tags') if isinstance(tags_doc.get('tags'), dict) else None
+    if tags is not None:
+        for name in REQUIRED_TAGS:
+            if not tags.get(name):
+                errors.append(f"tags.yaml: required tag '{name}' missing")
+        if len(tags) > MAX_TAGS:
+            errors.append(f"tags.yaml: {len(tags)} tags, Azure allows at most {MAX_TAGS}")
+        for name in tags:
+            if len(str(name)) > 512 or TAG_NAME_INVALID.search(str(name)):
+                errors.append(f"tags.yaml: invalid tag name '{name}'")
+        environment = azure.get('environment')
+        if environment and tags.get('Environment') and tags['Environment'] != environment:
+            errors.append(f"tags.yaml: Environment tag '{tags['Environment']}' does not match azure.environment '{environment}'")
+
+    return {
+        'customer': customer_dir.name,
+        'hash': customer_hash(customer_dir),
+        'errors': errors,
+        'warnings': warnings,
+        'cidrs': cidrs,
+    }
+
+# ---------------------------------------------------------------------------
+# Cache and orchestration
+# ---------------------------------------------------------------------------
+
+def load_cache(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            cache = json.load(f)
+        return cache if isinstance(cache, dict) else {}
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def save_cache(path, cache):
+    """Write the cache atomically so an interrupted run never corrupts it"""
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, indent=1, sort_keys=True)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+def customer_dirs(root, names=None):
+    """Customer directories under root; '_'/'.'-prefixed ones (e.g. _template) are skipped"""
+    root = Path(root)
+    if names:
+        return [root / name for name in names]
+    return sorted(p for p in root.iterdir() if p.is_dir() and not p.name.startswith(('_', '.')))
+
+def validate_all(dirs, cache=None, workers=None):
+    """
+    Validate customer directories, reusing cached results for unchanged ones
+
+    Only directories whose hash is not in the cache are parsed, in a
+    process pool. Cross-customer CIDR overlaps are checked afterwards on
+    every customer, cached or not. Returns (results, revalidated count).
+    """
+    cache = {} if cache is None else cache
+    results, pending = {}, []
+    for d in dirs:
+        if not d.is_dir():
+            results[d.name] = {'customer': d.name, 'hash': None, 'errors': [f"{d}: directory not found"], 'warnings': [], 'cidrs': []}
+            continue
+        cached = cache.get(d.name)
+        if cached and cached.get('hash') == customer_hash(d):
+            results[d.name] = cached
+        else:
+            pending.append(d)
+
+    if len(pending) > 1 and workers != 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            fresh = list(pool.map(validate_customer, pending, chunksize=max(1, len(pending) // (4 * (workers or os.cpu_count() or 1)))))
+    else:
+        fresh = [validate_customer(d) for d in pending]
+    for result in fresh:
+        results[result['customer']] = result
+        cache[result['customer']] = result
+
+    # Fleet-wide: no two customers may share address space
+    fleet = [(name, cidr) for name, r in results.items() for _, cidr in r['cidrs']]
+    cross = {name: [] for name in results}
+    for (net1, owner1), (net2, owner2) in find_overlaps(fleet):
+        if owner1 != owner2:
+            cross[owner1].append(f"config.yaml: {net1} overlaps {net2} of customer {owner2}")
+            cross[owner2].append(f"config.yaml: {net2} overlaps {net1} of customer {owner1}")
+    report = {}
+    for name, result in results.items():
+        report[name] = dict(result, errors=result['errors'] + cross[name])
+    return report, len(pending)
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate customer configuration directories")
+    parser.add_argument('customers', nargs='*', help="Customer IDs (default: every directory under --root)")
+    parser.add_argument('--root', default=str(DEFAULT_ROOT), help="Directory containing customer directories")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--no-cache', action='store_true', help=f"Ignore and do not update {CACHE_NAME}")
+    parser.add_argument('--json', metavar='PATH', help="Also write the report as JSON")
+    args = parser.parse_args()
+
+    root = Path(args.root)
+    cache_path = root / CACHE_NAME
+    cache = {} if args.no_cache else load_cache(cache_path)
+
+    dirs = customer_dirs(root, args.customers)
+    report, revalidated = validate_all(dirs, cache, args.workers)
+    if not args.customers:
+        # Forget customers that no longer exist
+        cache = {name: entry for name, entry in cache.items() if name in report}
+
+    if not args.no_cache:
+        save_cache(cache_path, cache)
+
+    print("🔍 Customer Configuration Validator")
+    print("=" * 50)
+    failed = 0
+    for name in sorted(report):
+        result = report[name]
+        if result['errors']:
+            failed += 1
+            print(f"\n❌ {name}")
+            for error in result['errors']:
+                print(f"  - {error}")
+        else:
+            print(f"\n✅ {name}")
+        for warning in result['warnings']:
+            print(f"  ⚠️  {warning}")
+
+    print(f"\n{len(report)} customers, {revalidated} revalidated, {failed} failed")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump([{k: v for k, v in report[name].items() if k != 'cidrs'} for name in sorted(report)], f, indent=2)
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()